@@ -0,0 +1,426 @@
+"""
+Replays the inputs in dataset/ through slips and measures its throughput,
+the latency of the flows through each module and the resources used by
+each slips process
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import redis
+import yaml
+
+from benchmarks.inputs import (
+    BENCHMARK_INPUTS,
+    BenchmarkInput,
+    prepare_input,
+)
+from benchmarks.process_monitor import ProcessMonitor
+from slips_files.common.performance_profilers.latency_histogram import (
+    LatencyHistogram,
+)
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    STAGE_LATENCY,
+    MetricKey,
+    merge_pipeline_metrics,
+)
+from slips_files.common.slips_utils import utils
+
+DEFAULT_CONFIG = "config/slips.yaml"
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+# modules that can't be disabled without changing how slips runs
+ALWAYS_ENABLED_MODULES = ("progress_bar",)
+# the percentiles of the latency of each module compared with the baseline
+COMPARED_PERCENTILES = ("p50", "p99")
+
+
+def get_all_modules() -> List[str]:
+    """returns the names of the dirs of all slips modules"""
+    return sorted(
+        module
+        for module in os.listdir("modules")
+        if os.path.exists(os.path.join("modules", module, f"{module}.py"))
+    )
+
+
+def write_config(
+    modules: List[str], output_dir: str, redis_unix_socket: bool = True
+) -> str:
+    """
+    writes a copy of slips.yaml that disables all the modules except the
+    given ones and enables the pipeline metrics
+    :param redis_unix_socket: False to connect to redis using TCP
+    :return: the path of the written config
+    """
+    with open(DEFAULT_CONFIG) as f:
+        config = yaml.safe_load(f)
+
+    disabled = [
+        module
+        for module in get_all_modules()
+        if module not in modules and module not in ALWAYS_ENABLED_MODULES
+    ]
+    config["modules"]["disable"] = f"[{', '.join(disabled)}]"
+    config["Profiling"]["pipeline_metrics_enable"] = True
+    config["parameters"]["redis_unix_socket"] = redis_unix_socket
+
+    path = os.path.join(output_dir, "slips.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def shutdown_redis(port: int):
+    """closes the redis server slips started on the given port"""
+    try:
+        redis.StrictRedis(host="localhost", port=port).shutdown(nosave=True)
+    except redis.exceptions.RedisError:
+        # it's already closed
+        pass
+
+
+def read_pipeline_metrics(port: int) -> Dict[MetricKey, LatencyHistogram]:
+    """
+    reads the pipeline metrics slips processes stored in the given redis
+    server before stopping
+    """
+    try:
+        stored_metrics = redis.StrictRedis(
+            host="localhost", port=port, decode_responses=True
+        ).hgetall("pipeline_metrics")
+    except redis.exceptions.RedisError:
+        return {}
+    return merge_pipeline_metrics(stored_metrics)
+
+
+def get_flow_latency(
+    metrics: Dict[MetricKey, LatencyHistogram],
+) -> Tuple[LatencyHistogram, Dict[str, LatencyHistogram]]:
+    """
+    :return: the latency of the flows from being read until they were
+    added to their profile, and until they were consumed by each module
+    """
+    profiled = LatencyHistogram()
+    consumed = {}
+    for (metric, labels), histogram in metrics.items():
+        if metric != STAGE_LATENCY:
+            continue
+        labels = dict(labels)
+        if labels["stage"] == "profiled":
+            profiled = histogram
+        elif labels["stage"] == "consumed":
+            consumed[labels["module"]] = histogram
+    return profiled, consumed
+
+
+def run_benchmark(
+    benchmark_input: BenchmarkInput,
+    scale: int,
+    config: str,
+    redis_port: int,
+    output_dir: str,
+) -> dict:
+    """
+    runs slips on the given input and waits for it to stop
+    :return: the measurements of the run
+    """
+    input_path = prepare_input(benchmark_input, scale, output_dir)
+    slips_output_dir = os.path.join(output_dir, benchmark_input.name)
+    os.makedirs(slips_output_dir, exist_ok=True)
+    command = [
+        sys.executable,
+        "slips.py",
+        "-e",
+        "1",
+        "-f",
+        input_path,
+        "-o",
+        slips_output_dir,
+        "-P",
+        str(redis_port),
+        "-c",
+        config,
+    ]
+
+    with open(
+        os.path.join(slips_output_dir, "slips_output.txt"), "w"
+    ) as slips_output:
+        start = time.time()
+        slips = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=slips_output,
+            stderr=subprocess.STDOUT,
+        )
+        monitor = ProcessMonitor(slips.pid, redis_port)
+        monitor.start()
+        return_code = slips.wait()
+        wall_time = time.time() - start
+        processes = monitor.stop()
+    metrics = read_pipeline_metrics(redis_port)
+    shutdown_redis(redis_port)
+
+    profiled, consumed = get_flow_latency(metrics)
+    # from reading the first flow until the last one was profiled, so the
+    # time slips takes to start and stop isn't counted
+    processing_time = profiled.get_period()
+    return {
+        "input": input_path,
+        "return_code": return_code,
+        "flows": profiled.count,
+        "wall_time": wall_time,
+        "processing_time": processing_time,
+        "throughput": (
+            profiled.count / processing_time if processing_time else 0.0
+        ),
+        # from reading each flow until each module consumed it
+        "latency": {
+            module: histogram.summary()
+            for module, histogram in sorted(consumed.items())
+        },
+        "cpu_time": sum(usage["cpu_time"] for usage in processes.values()),
+        "peak_rss": sum(usage["peak_rss"] for usage in processes.values()),
+        "processes": processes,
+    }
+
+
+def get_compared_metrics(
+    result: dict,
+) -> List[Tuple[Tuple[str, ...], bool]]:
+    """
+    :return: (path of the metric in the given result, is higher better?)
+    for each metric that is compared with the baseline
+    """
+    metrics = [(("throughput",), True)]
+    for module in result.get("latency", {}):
+        for percentile in COMPARED_PERCENTILES:
+            metrics.append((("latency", module, percentile), False))
+    metrics += [(("cpu_time",), False), (("peak_rss",), False)]
+    return metrics
+
+
+def get_metric(result: dict, path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare_with_baseline(
+    results: dict, baseline: dict, tolerance: float
+) -> List[str]:
+    """
+    :param tolerance: how much worse than the baseline a metric can be,
+    0.1 means 10%
+    :return: a description of each metric that is worse than the
+    baseline by more than the tolerance
+    """
+    for setting in ("scale", "modules"):
+        if results[setting] != baseline.get(setting):
+            return [
+                f"The baseline was recorded with {setting} "
+                f"{baseline.get(setting)}, not {results[setting]}. "
+                f"Record a new one using --save-baseline"
+            ]
+
+    regressions = []
+    for name, result in results["inputs"].items():
+        expected_result = baseline.get("inputs", {}).get(name)
+        if not expected_result:
+            continue
+
+        for path, higher_is_better in get_compared_metrics(result):
+            value = get_metric(result, path)
+            expected = get_metric(expected_result, path)
+            if not expected or value is None:
+                continue
+            change = (value - expected) / expected
+            if higher_is_better:
+                is_worse = change < -tolerance
+            else:
+                is_worse = change > tolerance
+            if is_worse:
+                regressions.append(
+                    f"{name} {'.'.join(path)}: {expected:.6g} -> "
+                    f"{value:.6g} ({change:+.1%})"
+                )
+    return regressions
+
+
+def get_environment() -> Dict[str, str]:
+    """info about where the benchmarks ran, stored with the results"""
+    commit, branch = utils.get_branch_info() or (None, None)
+    return {
+        "slips_version": utils.get_slips_version(),
+        "commit": commit,
+        "branch": branch,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": datetime.now().isoformat(),
+    }
+
+
+def print_results(results: dict):
+    for name, result in results["inputs"].items():
+        print(
+            f"{name}: {result['flows']} flows in "
+            f"{result['processing_time']:.2f}s, "
+            f"{result['throughput']:.1f} flows/s, "
+            f"slips ran for {result['wall_time']:.2f}s, "
+            f"CPU time {result['cpu_time']:.2f}s, "
+            f"peak RSS {utils.convert_to_mb(result['peak_rss']):.1f}MB"
+        )
+        for module, latency in result["latency"].items():
+            print(
+                f"\t{module}: p50 latency {latency['p50'] * 1000:.2f}ms, "
+                f"p99 latency {latency['p99'] * 1000:.2f}ms"
+            )
+
+
+def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python3 -m benchmarks",
+        description="Measure the throughput and latency of slips on the "
+        "inputs in dataset/ and compare them with a baseline",
+    )
+    parser.add_argument(
+        "-i",
+        "--inputs",
+        nargs="+",
+        choices=list(BENCHMARK_INPUTS),
+        default=list(BENCHMARK_INPUTS),
+        help="the inputs to replay",
+    )
+    parser.add_argument(
+        "-s",
+        "--scale",
+        type=int,
+        default=1,
+        help="repeat each input this many times, each copy is shifted in "
+        "time to start after the previous one",
+    )
+    parser.add_argument(
+        "-m",
+        "--modules",
+        nargs="*",
+        default=["flowalerts"],
+        help="the slips modules to run, the rest are disabled",
+    )
+    parser.add_argument(
+        "-P",
+        "--port",
+        type=int,
+        default=6390,
+        help="the port of the redis server slips starts",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="output/benchmarks",
+        help="dir to store the results and slips output in",
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help="the results to compare with",
+    )
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="how much worse than the baseline each metric can be, "
+        "0.15 means 15%%",
+    )
+    parser.add_argument(
+        "--redis-tcp",
+        action="store_true",
+        help="connect to redis using TCP instead of a unix socket, to "
+        "compare the two",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as the new baseline",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    """
+    :return: 1 if a metric is worse than the baseline, 0 otherwise
+    """
+    args = parse_args(args)
+    if utils.is_port_in_use(args.port):
+        print(
+            f"Port {args.port} is already in use. "
+            f"Choose another one using -P"
+        )
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    config = write_config(
+        args.modules, args.output, redis_unix_socket=not args.redis_tcp
+    )
+    results = {
+        "scale": args.scale,
+        "modules": sorted(args.modules),
+        "redis_unix_socket": not args.redis_tcp,
+        "environment": get_environment(),
+        "inputs": {},
+    }
+    for name in args.inputs:
+        print(f"Running slips on {BENCHMARK_INPUTS[name].path} ...")
+        results["inputs"][name] = run_benchmark(
+            BENCHMARK_INPUTS[name],
+            args.scale,
+            config,
+            args.port,
+            args.output,
+        )
+
+    print_results(results)
+    results_path = os.path.join(args.output, "results.json")
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results are stored in {results_path}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline is stored in {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(
+            f"No baseline found in {args.baseline}. "
+            f"Record one using --save-baseline"
+        )
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if not regressions:
+        print("No regressions compared with the baseline.")
+        return 0
+
+    print("Regressions compared with the baseline:")
+    for regression in regressions:
+        print(f"\t{regression}")
+    return 1
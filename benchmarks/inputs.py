@@ -0,0 +1,222 @@
+"""
+The inputs the benchmarks replay, and the synthetic scaling of them
+"""
+
+import json
+import os
+import shutil
+from copy import deepcopy
+from dataclasses import dataclass
+from datetime import (
+    datetime,
+    timedelta,
+)
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from slips_files.common.slips_utils import utils
+
+# the scaled json lines are as compact as the ones written by zeek
+# and suricata
+JSON_SEPARATORS = (",", ":")
+
+
+@dataclass
+class BenchmarkInput:
+    name: str
+    # path to the file or the zeek dir given to slips with -f
+    path: str
+    # writes the input repeated the given number of times to the given
+    # path: scaler(path, copies, output). None if it can't be scaled
+    scaler: Optional[Callable] = None
+
+
+def shift_ts(ts, seconds: float):
+    """
+    shifts the given timestamp by the given seconds keeping its format
+    """
+    time_format = utils.get_time_format(ts)
+    if time_format == "unixtimestamp":
+        if isinstance(ts, str):
+            return f"{float(ts) + seconds:.6f}"
+        return ts + seconds
+    if not time_format:
+        return ts
+    shifted = datetime.strptime(ts, time_format) + timedelta(seconds=seconds)
+    return shifted.strftime(time_format)
+
+
+def get_span(timestamps: Iterable) -> float:
+    """
+    returns the seconds between the first and last given timestamps,
+    plus 1 second so that the copies of the input don't overlap
+    """
+    timestamps = [
+        float(utils.convert_format(ts, "unixtimestamp"))
+        for ts in timestamps
+        if ts
+    ]
+    if not timestamps:
+        return 1.0
+    return max(timestamps) - min(timestamps) + 1
+
+
+def get_copy_uid(uid: str, copy: int) -> str:
+    return uid if not copy else f"{uid}{copy}"
+
+
+def scale_binetflow(path: str, copies: int, output: str):
+    with open(path) as f:
+        header, *lines = f.readlines()
+    separator = "\t" if "\t" in header else ","
+    rows = [line.rstrip("\n").split(separator) for line in lines if line]
+    span = get_span(row[0] for row in rows)
+
+    with open(output, "w") as f:
+        f.write(header)
+        for copy in range(copies):
+            for row in rows:
+                shifted = [shift_ts(row[0], copy * span), *row[1:]]
+                f.write(separator.join(shifted) + "\n")
+
+
+def scale_suricata(path: str, copies: int, output: str):
+    with open(path) as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    span = get_span(event.get("timestamp") for event in events)
+
+    with open(output, "w") as f:
+        for copy in range(copies):
+            for event in events:
+                event = deepcopy(event)
+                seconds = copy * span
+                event["timestamp"] = shift_ts(event["timestamp"], seconds)
+                flow = event.get("flow", {})
+                for field in ("start", "end"):
+                    if field in flow:
+                        flow[field] = shift_ts(flow[field], seconds)
+                if "flow_id" in event:
+                    # keep it a valid unsigned 64-bit int
+                    event["flow_id"] = (event["flow_id"] + copy) % 2**64
+                f.write(json.dumps(event, separators=JSON_SEPARATORS) + "\n")
+
+
+def read_zeek_log(path: str) -> Tuple[List[str], List]:
+    """
+    :return: the comment lines of a zeek tab log and the flows of the log.
+    each flow is a dict if the log is json, or a list of fields if
+    it's a tab log
+    """
+    comments, flows = [], []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#"):
+                comments.append(line)
+            elif line.strip():
+                if line.startswith("{"):
+                    flows.append(json.loads(line))
+                else:
+                    flows.append(line.rstrip("\n").split("\t"))
+    return comments, flows
+
+
+def get_tab_fields(comments: List[str]) -> List[str]:
+    for comment in comments:
+        if comment.startswith("#fields"):
+            return comment.rstrip("\n").split("\t")[1:]
+    return []
+
+
+def scale_zeek_flow(flow, fields: List[str], seconds: float, copy: int):
+    """shifts the ts of the given zeek flow and makes its uid unique"""
+    if isinstance(flow, dict):
+        flow = dict(flow)
+        if "ts" in flow:
+            flow["ts"] = shift_ts(flow["ts"], seconds)
+        if "uid" in flow:
+            flow["uid"] = get_copy_uid(flow["uid"], copy)
+        return json.dumps(flow, separators=JSON_SEPARATORS)
+
+    flow = list(flow)
+    for idx, field in enumerate(fields[: len(flow)]):
+        if field == "ts":
+            flow[idx] = shift_ts(flow[idx], seconds)
+        elif field == "uid":
+            flow[idx] = get_copy_uid(flow[idx], copy)
+    return "\t".join(flow)
+
+
+def scale_zeek_dir(path: str, copies: int, output: str):
+    os.makedirs(output, exist_ok=True)
+    logs: Dict[str, Tuple[List[str], List]] = {
+        log: read_zeek_log(os.path.join(path, log))
+        for log in os.listdir(path)
+        if log.endswith(".log")
+    }
+
+    timestamps = []
+    for comments, flows in logs.values():
+        fields = get_tab_fields(comments)
+        for flow in flows:
+            if isinstance(flow, dict):
+                timestamps.append(flow.get("ts"))
+            elif "ts" in fields:
+                timestamps.append(flow[fields.index("ts")])
+    span = get_span(timestamps)
+
+    for log, (comments, flows) in logs.items():
+        fields = get_tab_fields(comments)
+        with open(os.path.join(output, log), "w") as f:
+            f.writelines(
+                comment
+                for comment in comments
+                if not comment.startswith("#close")
+            )
+            for copy in range(copies):
+                for flow in flows:
+                    f.write(
+                        scale_zeek_flow(flow, fields, copy * span, copy) + "\n"
+                    )
+
+
+# the inputs in dataset/ replayed by the benchmarks
+BENCHMARK_INPUTS: Dict[str, BenchmarkInput] = {
+    benchmark_input.name: benchmark_input
+    for benchmark_input in (
+        BenchmarkInput("zeek", "dataset/test9-mixed-zeek-dir", scale_zeek_dir),
+        BenchmarkInput(
+            "binetflow", "dataset/test2-malicious.binetflow", scale_binetflow
+        ),
+        BenchmarkInput(
+            "suricata", "dataset/test6-malicious.suricata.json", scale_suricata
+        ),
+        # nfdump files are binary, they can't be scaled without nfdump
+        BenchmarkInput("nfdump", "dataset/test1-normal.nfdump"),
+    )
+}
+
+
+def prepare_input(
+    benchmark_input: BenchmarkInput, scale: int, output_dir: str
+) -> str:
+    """
+    writes the given input repeated scale times to the given dir.
+    each copy starts after the previous one ends
+    :return: the path of the input to give slips
+    """
+    if scale <= 1 or not benchmark_input.scaler:
+        return benchmark_input.path
+
+    output = os.path.join(
+        output_dir, f"x{scale}-{os.path.basename(benchmark_input.path)}"
+    )
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    benchmark_input.scaler(benchmark_input.path, scale, output)
+    return output
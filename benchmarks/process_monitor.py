@@ -0,0 +1,88 @@
+"""
+Measures the CPU time and peak memory of each slips process
+"""
+
+import threading
+from typing import Dict
+
+import psutil
+import redis
+
+
+class ProcessMonitor:
+    """
+    Samples the CPU time and the RSS of a slips process and all of its
+    children until stop() is called. the processes are named using the
+    PIDs slips stores in redis
+    """
+
+    def __init__(self, pid: int, redis_port: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.redis = redis.StrictRedis(
+            host="localhost", port=redis_port, decode_responses=True
+        )
+        # {pid: name of the slips process}
+        self.names: Dict[int, str] = {pid: "slips.py"}
+        # {pid: {"cpu_time": seconds, "peak_rss": bytes}}
+        self.usage: Dict[int, Dict[str, float]] = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: the CPU time in seconds and the peak RSS in bytes of each
+        slips process, the processes slips didn't name are summed in
+        'other'
+        """
+        self.stop_event.set()
+        self.thread.join()
+        usage: Dict[str, Dict[str, float]] = {}
+        for pid, process_usage in self.usage.items():
+            name = self.names.get(pid, "other")
+            total = usage.setdefault(name, {"cpu_time": 0.0, "peak_rss": 0})
+            total["cpu_time"] += process_usage["cpu_time"]
+            total["peak_rss"] = max(
+                total["peak_rss"], process_usage["peak_rss"]
+            )
+        return usage
+
+    def update_names(self):
+        try:
+            pids = self.redis.hgetall("PIDs")
+        except redis.exceptions.RedisError:
+            # slips didn't start redis yet
+            return
+        for name, pid in pids.items():
+            self.names[int(pid)] = name
+
+    def sample(self):
+        try:
+            slips = psutil.Process(self.pid)
+            processes = [slips, *slips.children(recursive=True)]
+        except psutil.Error:
+            return
+
+        for process in processes:
+            try:
+                with process.oneshot():
+                    cpu_times = process.cpu_times()
+                    rss = process.memory_info().rss
+            except psutil.Error:
+                # the process exited
+                continue
+            usage = self.usage.setdefault(
+                process.pid, {"cpu_time": 0.0, "peak_rss": 0}
+            )
+            # the last sample before the process exits is its total
+            usage["cpu_time"] = cpu_times.user + cpu_times.system
+            usage["peak_rss"] = max(usage["peak_rss"], rss)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.update_names()
+            self.stop_event.wait(self.interval)
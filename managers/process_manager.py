@@ -1,8 +1,9 @@
+import ast
 import asyncio
 import importlib
-import inspect
 import os
 import pkgutil
+import queue
 import signal
 import sys
 import time
@@ -17,6 +18,7 @@ from multiprocessing import (
 )
 from typing import (
     List,
+    Optional,
     Tuple,
     Dict,
 )
@@ -31,7 +33,6 @@ import modules
 from modules.progress_bar.progress_bar import PBar
 from modules.update_manager.update_manager import UpdateManager
 from slips_files.common.slips_utils import utils
-from slips_files.common.abstracts.module import IModule
 
 from slips_files.common.style import green
 from slips_files.core.evidencehandler import EvidenceHandler
@@ -40,6 +41,34 @@ from slips_files.core.output import Output
 from slips_files.core.profiler import Profiler
 
 
+def run_module(module_name: str, class_name: str, modules_ready: Queue, *args):
+    """
+    Imports the given slips module and runs it in the current process.
+    this is the target of the process of each module, so the heavy
+    dependencies of a module (e.g. tensorflow) are only imported by its
+    own process and not by slips.py
+    :param module_name: the import path of the module,
+    e.g. modules.arp.arp
+    :param class_name: the name of the IModule subclass in it
+    :param modules_ready: (module_name, error) is put in this queue once
+    the module is initialized and subscribed to its channels, error is
+    None unless the module failed to import or initialize
+    :param args: passed to the module's __init__()
+    """
+    try:
+        module_class = getattr(
+            importlib.import_module(module_name), class_name
+        )
+        # the module subscribes to its channels in its __init__()
+        module = module_class(*args)
+    except Exception as e:
+        modules_ready.put((module_name, f"{e}\n{traceback.format_exc()}"))
+        return
+
+    modules_ready.put((module_name, None))
+    module.run()
+
+
 class ProcessManager:
     def __init__(self, main):
         self.main = main
@@ -76,6 +105,12 @@ class ProcessManager:
         # send_pipe used only for sending
         self.pbar_recv_pipe, self.output_send_pipe = Pipe(False)
         self.pbar_finished: Event = Event()
+        # each module puts (module name, error) here once it's initialized.
+        # redis drops the msgs published to channels with no subscribers,
+        # so the input doesn't start until the modules are subscribed
+        self.modules_ready = Queue()
+        # seconds to wait for all modules to initialize
+        self.modules_init_timeout = 120
 
     def read_config(self):
         self.modules_to_ignore: list = self.main.conf.get_disabled_modules(
@@ -254,68 +289,93 @@ class ProcessManager:
                 return True
         return False
 
+    @staticmethod
+    def get_module_metadata(module_path: str) -> Optional[Dict[str, str]]:
+        """
+        Reads the name and description of the slips module defined in the
+        given file without importing it, so the dependencies of the
+        module are only imported by the module's own process.
+        :param module_path: path of the .py file of the module
+        :return: {"class": class name, "name": module name,
+        "description": module description} or None if the file doesn't
+        define a slips module
+        """
+        with open(module_path) as module_file:
+            tree = ast.parse(module_file.read(), filename=module_path)
+
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+
+            bases = [
+                base.id if isinstance(base, ast.Name) else base.attr
+                for base in node.bases
+                if isinstance(base, (ast.Name, ast.Attribute))
+            ]
+            if "IModule" not in bases:
+                continue
+
+            metadata = {"class": node.name}
+            for stmt in node.body:
+                if not (
+                    isinstance(stmt, ast.Assign)
+                    and len(stmt.targets) == 1
+                    and isinstance(stmt.targets[0], ast.Name)
+                    and stmt.targets[0].id in ("name", "description")
+                ):
+                    continue
+                metadata[stmt.targets[0].id] = ast.literal_eval(stmt.value)
+
+            if "name" in metadata:
+                metadata.setdefault("description", "")
+                return metadata
+        return None
+
     def get_modules(self):
         """
         Get modules from the 'modules' folder.
+        The modules aren't imported here, only their metadata is read,
+        each module is imported by its own process when it's started.
         """
-        # This plugins import will automatically load the modules
-        # and put them in the __modules__ variable
         plugins = {}
         failed_to_load_modules = 0
 
-        # __path__ is the current path of this python program
-        look_for_modules_in = modules.__path__
-        prefix = f"{modules.__name__}."
-        # Walk recursively through all modules and packages found on the .
-        # folder.
-        for loader, module_name, ispkg in pkgutil.walk_packages(
-            look_for_modules_in, prefix
-        ):
-            # If current item is a package, skip.
-            if ispkg:
+        # each module is the file that has the same name as its dir,
+        # e.g. modules/arp/arp.py
+        for module_info in pkgutil.iter_modules(modules.__path__):
+            if not module_info.ispkg:
                 continue
 
-            # to avoid loading everything in the dir,
-            # only load modules that have the same name as the dir name
-            dir_name = module_name.split(".")[1]
-            file_name = module_name.split(".")[2]
-            if dir_name != file_name:
+            dir_name = module_info.name
+            module_name = f"{modules.__name__}.{dir_name}.{dir_name}"
+            module_path = os.path.join(
+                module_info.module_finder.path, dir_name, f"{dir_name}.py"
+            )
+            if not os.path.exists(module_path):
                 continue
 
             if self.is_ignored_module(module_name):
                 continue
 
-            # Try to import the module, otherwise skip.
             try:
-                # "level specifies whether to use absolute or relative imports.
-                # The default is -1 which
-                # indicates both absolute and relative imports will
-                # be attempted.
-                # 0 means only perform absolute imports.
-                # Positive values for level indicate the number of parent
-                # directories to search relative to the directory of the
-                # module calling __import__()."
-                module = importlib.import_module(module_name)
-            except ImportError as e:
+                metadata = self.get_module_metadata(module_path)
+            except (OSError, SyntaxError, ValueError) as e:
                 print(
                     f"Something wrong happened while "
-                    f"importing the module {module_name}: {e}"
+                    f"reading the module {module_name}: {e}"
                 )
                 print(traceback.format_exc())
                 failed_to_load_modules += 1
                 continue
 
-            # Walk through all members of currently imported modules.
-            for member_name, member_object in inspect.getmembers(module):
-                # Check if current member is a class.
-                if inspect.isclass(member_object) and (
-                    issubclass(member_object, IModule)
-                    and member_object is not IModule
-                ):
-                    plugins[member_object.name] = dict(
-                        obj=member_object,
-                        description=member_object.description,
-                    )
+            if not metadata:
+                continue
+
+            plugins[metadata["name"]] = dict(
+                module=module_name,
+                cls=metadata["class"],
+                description=metadata["description"],
+            )
 
         # Change the order of the blocking module(load it first)
         # so it can receive msgs sent from other modules
@@ -339,11 +399,41 @@ class ProcessManager:
         print("-" * 27)
         self.main.print(f"Disabled Modules: {self.modules_to_ignore}", 1, 0)
 
-    def load_modules(self):
-        """responsible for starting all the modules in the modules/ dir"""
-        modules_to_call = self.get_modules()[0]
-        for module_name in modules_to_call:
-            module_class = modules_to_call[module_name]["obj"]
+    def start_module(self, module_name: str, module_info: dict) -> Process:
+        """
+        Starts the given module in a new process without waiting for it
+        to initialize, the module is imported and initialized by its own
+        process so all modules start in parallel.
+        the module reports when it's initialized using self.modules_ready
+        :param module_info: the module's info as returned by get_modules()
+        """
+        module = Process(
+            target=run_module,
+            args=(
+                module_info["module"],
+                module_info["cls"],
+                self.modules_ready,
+                self.main.logger,
+                self.main.args.output,
+                self.main.redis_port,
+                self.termination_event,
+            ),
+            name=module_name,
+        )
+        module.start()
+        return module
+
+    def load_modules(self) -> int:
+        """
+        responsible for starting all the modules in the modules/ dir.
+        returns once all of them are initialized and subscribed to
+        their channels
+        :return: the number of modules that failed to start
+        """
+        modules_to_call, failed_to_load_modules = self.get_modules()
+        # {import path of the module: (module name, module process)}
+        started_modules: Dict[str, Tuple[str, Process]] = {}
+        for module_name, module_info in modules_to_call.items():
             if module_name == "Progress Bar":
                 # started it manually in main.py to be able to start it
                 # very early.
@@ -351,20 +441,80 @@ class ProcessManager:
                 # starts, because when the pbar is supported, it handles
                 # all the printing
                 continue
-            module = module_class(
-                self.main.logger,
-                self.main.args.output,
-                self.main.redis_port,
-                self.termination_event,
-            )
-            module.start()
+            module = self.start_module(module_name, module_info)
             self.main.db.store_pid(module_name, int(module.pid))
+            started_modules[module_info["module"]] = (module_name, module)
+
+        failed_to_load_modules += self.wait_for_modules_to_start(
+            started_modules, modules_to_call
+        )
+        return failed_to_load_modules
+
+    def wait_for_modules_to_start(
+        self,
+        started_modules: Dict[str, Tuple[str, Process]],
+        modules_to_call: dict,
+    ) -> int:
+        """
+        waits for the given modules to report that they're initialized
+        or that they failed to, for modules_init_timeout seconds at most
+        :param started_modules: {import path of the module:
+        (module name, module process)}
+        :param modules_to_call: the modules info as returned by
+        get_modules()
+        :return: the number of modules that failed to start
+        """
+        pending = dict(started_modules)
+        failed_modules = 0
+        deadline = time.time() + self.modules_init_timeout
+        while pending and time.time() < deadline:
+            try:
+                module_path, error = self.modules_ready.get(timeout=1)
+            except queue.Empty:
+                # a module that crashed before reporting isn't waited for
+                for module_path, (module_name, module) in list(
+                    pending.items()
+                ):
+                    if not module.is_alive():
+                        del pending[module_path]
+                        failed_modules += 1
+                        self.main.print(
+                            f"The module {module_name} stopped before "
+                            f"it was initialized.",
+                            0,
+                            1,
+                        )
+                continue
+
+            if module_path not in pending:
+                continue
+            module_name, module = pending.pop(module_path)
+            if error:
+                failed_modules += 1
+                self.main.print(
+                    f"Something wrong happened while "
+                    f"starting the module {module_name}: {error}",
+                    0,
+                    1,
+                )
+                continue
+
             self.print_started_module(
                 module_name,
                 module.pid,
                 modules_to_call[module_name]["description"],
             )
 
+        for module_name, _ in pending.values():
+            self.main.print(
+                f"The module {module_name} wasn't initialized in "
+                f"{self.modules_init_timeout} seconds, it may miss the "
+                f"first flows.",
+                0,
+                1,
+            )
+        return failed_modules
+
     def print_started_module(
         self, module_name: str, module_pid: int, module_description: str
     ) -> None:
@@ -387,41 +537,79 @@ class ProcessManager:
             f"\t{green(module)} \tStopped. " f"" f"{green(modules_left)} left."
         )
 
-    def start_update_manager(self, local_files=False, ti_feeds=False):
+    def create_update_manager(self) -> UpdateManager:
+        # pass a dummy termination event for update manager to
+        # update orgs and ports info
+        return UpdateManager(
+            self.main.logger,
+            self.main.args.output,
+            self.main.redis_port,
+            multiprocessing.Event(),
+        )
+
+    def update_local_files(self):
         """
-        starts the update manager process
-        PS; this function is blocking, slips.py will not start the rest of the
-         module unless this functionis done
-        :kwarg local_files: if true, updates the local ports and
-                org files from disk
-        :kwarg TI_feeds: if true, updates the remote TI feeds, this takes time
+        Loads the ports info, the organizations info and the whitelist
+        from their local files if their content changed since the last
+        time they were loaded.
+        runs in the background, the readers keep using the previously
+        loaded data until the new data is stored
         """
         try:
             # only one instance of slips should be able to update ports
             # and orgs at a time
             # so this function will only be allowed to run from 1 slips
             # instance.
-            with Lock(name="slips_ports_and_orgs"):
-                # pass a dummy termination event for update manager to
-                # update orgs and ports info
-                update_manager = UpdateManager(
-                    self.main.logger,
-                    self.main.args.output,
-                    self.main.redis_port,
-                    multiprocessing.Event(),
+            with Lock(name="slips_local_files_update"):
+                update_manager = self.create_update_manager()
+                update_manager.update_ports_info()
+                update_manager.update_org_files()
+                update_manager.update_whitelist()
+        except CannotAcquireLock:
+            # another instance of slips is updating ports and orgs
+            return
+
+    def start_update_manager(self, local_files=False, ti_feeds=False):
+        """
+        starts the update manager process
+        PS; updating the TI feeds is blocking, slips.py will not start the
+        rest of the modules unless they're updated
+        :kwarg local_files: if true, updates the local ports and
+                org files and the whitelist from disk. in the background
+                if a previous run of slips already loaded them
+        :kwarg TI_feeds: if true, updates the remote TI feeds, this takes time
+        """
+        if local_files:
+            if (
+                self.main.db.load_cached_whitelist()
+                and self.main.db.has_cached_ports_info()
+            ):
+                # slips uses the whitelist parsed by the previous run
+                # until the new one is ready, the ports and orgs info of
+                # the previous run are already in the cache db
+                updater = Process(
+                    target=self.update_local_files,
+                    name="Local Files Updater",
                 )
+                updater.start()
+            else:
+                # the first run or the cache db was flushed, the modules
+                # can't start without them
+                self.update_local_files()
 
-                if local_files:
-                    update_manager.update_ports_info()
-                    update_manager.update_org_files()
-                    update_manager.update_whitelist()
+        if not ti_feeds:
+            return
 
-                if ti_feeds:
-                    update_manager.print("Updating TI feeds")
-                    asyncio.run(update_manager.update_ti_files())
+        try:
+            # only one instance of slips should be able to update TI
+            # feeds at a time
+            with Lock(name="slips_ports_and_orgs"):
+                update_manager = self.create_update_manager()
+                update_manager.print("Updating TI feeds")
+                asyncio.run(update_manager.update_ti_files())
 
         except CannotAcquireLock:
-            # another instance of slips is updating ports and orgs
+            # another instance of slips is updating the TI feeds
             return
 
     def warn_about_pending_modules(self, pending_modules: List[Process]):
@@ -749,6 +937,9 @@ class ProcessManager:
 
                 self.kill_all_children()
 
+            # the processes stored their last metrics before stopping
+            self.main.export_pipeline_metrics(force=True)
+
             if self.main.args.save:
                 self.main.save_the_db()
 
@@ -1,10 +1,9 @@
 import json
 import ipaddress
 import time
-import threading
-from multiprocessing import Queue
 from typing import List
 
+from modules.arp.arp_scan_aggregator import ArpScanAggregator
 from slips_files.common.flow_classifier import FlowClassifier
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
@@ -37,11 +36,17 @@ class ARP(IModule):
         }
         self.read_configuration()
         self.classifier = FlowClassifier()
-        # this dict will categorize arp requests by profileid_twid
-        self.cache_arp_requests = {}
         # Threshold to use to detect a port scan. How many arp minimum
         # are required?
         self.arp_scan_threshold = 5
+        # wait 10s for mmore arp scan evidence to come
+        self.time_to_wait = 10
+        # keeps the arp requests of each profileid_twid and combines
+        # the arp scans detected in the same tw
+        self.arp_scans = ArpScanAggregator(
+            threshold=self.arp_scan_threshold,
+            time_to_wait=self.time_to_wait,
+        )
         self.delete_arp_periodically = False
         self.arp_ts = 0
         self.period_before_deleting = 0
@@ -51,13 +56,6 @@ class ARP(IModule):
             self.arp_ts = time.time()
             # in seconds
             self.period_before_deleting = 3600
-        self.timer_thread_arp_scan = threading.Thread(
-            target=self.wait_for_arp_scans, daemon=True
-        )
-        self.pending_arp_scan_evidence = Queue()
-        self.alerted_once_arp_scan = False
-        # wait 10s for mmore arp scan evidence to come
-        self.time_to_wait = 10
 
     def read_configuration(self):
         conf = ConfigParser()
@@ -65,62 +63,12 @@ class ARP(IModule):
         self.delete_zeek_files = conf.delete_zeek_files()
         self.store_zeek_files_copy = conf.store_zeek_files_copy()
 
-    def wait_for_arp_scans(self):
-        """
-        This thread waits for 10s then checks if more
-        arp scans happened to reduce the number of alerts
-        """
-        # this evidence is the one that triggered this thread
-        scans_ctr = 0
-        while True:
-            try:
-                evidence: dict = self.pending_arp_scan_evidence.get(
-                    timeout=0.5
-                )
-            except Exception:
-                # nothing in queue
-                time.sleep(5)
-                continue
-            # unpack the evidence that triggered the thread
-            (ts, profileid, twid, uids) = evidence
-
-            # wait 10s if a new evidence arrived
-            time.sleep(self.time_to_wait)
-
-            while True:
-                try:
-                    new_evidence = self.pending_arp_scan_evidence.get(
-                        timeout=0.5
-                    )
-                except Exception:
-                    # queue is empty
-                    break
-
-                (ts2, profileid2, twid2, uids2) = new_evidence
-                if profileid == profileid2 and twid == twid2:
-                    # this should be combined with the past alert
-                    ts = ts2
-                    uids += uids2
-                else:
-                    # this is an ip performing arp scan in a diff
-                    # profile or a diff twid, we shouldn't accumulate its
-                    # evidence  store it back in the queue until we're done
-                    # with the current one
-                    scans_ctr += 1
-                    self.pending_arp_scan_evidence.put(new_evidence)
-                    if scans_ctr == 3:
-                        scans_ctr = 0
-                        break
-
-            self.set_evidence_arp_scan(ts, profileid, twid, uids)
-
     def check_arp_scan(self, profileid, twid, flow):
         """
         Check if the profile is doing an arp scan
-        If IP X sends arp requests to 3 or more different
+        If IP X sends arp requests to 5 or more different
         IPs within 30 seconds, then this IP X is doing arp scan
-        The key profileid_twid is used to group requests
-        from the same saddr
+        The requests are grouped by profileid and twid
         arp flows don't have uids, the uids received are
         randomly generated by slips
         """
@@ -132,16 +80,6 @@ class ARP(IModule):
         ):
             return False
 
-        def get_uids():
-            """
-            get the uids causing this evidence
-            """
-            res = []
-            for daddr, daddr_info in cached_requests.items():
-                for uid in daddr_info["uids"]:
-                    res.append(uid)
-            return res
-
         # The Gratuitous arp is sent as a broadcast, as a way for a
         # node to announce or update its IP to MAC mapping
         # to the entire network. It shouldn't be marked as an arp scan
@@ -153,59 +91,18 @@ class ARP(IModule):
         if flow.saddr == "0.0.0.0":
             return False
 
-        daddr_info = {flow.daddr: {"uids": [flow.uid], "ts": flow.starttime}}
-        try:
-            # Get together all the arp requests to IPs in this TW
-            cached_requests = self.cache_arp_requests[f"{profileid}_{twid}"]
-            # Append the arp request, and when it happened
-            if flow.daddr in cached_requests:
-                cached_requests[flow.daddr]["uids"].append(flow.uid)
-                cached_requests[flow.daddr]["ts"] = flow.starttime
-                self.cache_arp_requests[f"{profileid}_{twid}"] = (
-                    cached_requests
-                )
-            else:
-                cached_requests.update(daddr_info)
-        except KeyError:
-            # create the key for this profileid_twid if it doesn't exist
-            self.cache_arp_requests[f"{profileid}_{twid}"] = daddr_info
-
-            return True
-
-        # the list of daddrs that are scanned by the current
-        # proffileid in the curr tw
-        daddrs = list(cached_requests.keys())
-
-        # The minimum amount of arp packets to send to be
-        # considered as scan is 5
-        if len(daddrs) >= self.arp_scan_threshold:
-            # check if these requests happened within 30 secs
-            # get the first and the last request of the 10
-            first_daddr = daddrs[0]
-            last_daddr = daddrs[-1]
-            starttime = cached_requests[first_daddr]["ts"]
-            endtime = cached_requests[last_daddr]["ts"]
-            # todo do we need mac addresses?
-            self.diff = utils.get_time_diff(starttime, endtime)
+        ts = float(utils.convert_format(flow.starttime, "unixtimestamp"))
+        detected, scans = self.arp_scans.add_request(
+            profileid, twid, flow.daddr, ts, flow.uid
+        )
+        # the first scan in a tw is reported immediately, the next
+        # ones are combined and reported once time_to_wait passes
+        self.report_arp_scans(scans)
+        return detected
 
-            # in seconds
-            if self.diff <= 30.00:
-                uids = get_uids()
-                # we are sure this is an arp scan
-                if not self.alerted_once_arp_scan:
-                    self.alerted_once_arp_scan = True
-                    self.set_evidence_arp_scan(
-                        flow.starttime, profileid, twid, uids
-                    )
-                else:
-                    # after alerting once, wait 10s to see
-                    # if more evidence are coming
-                    self.pending_arp_scan_evidence.put(
-                        (flow.starttime, profileid, twid, uids)
-                    )
-
-                return True
-        return False
+    def report_arp_scans(self, scans):
+        for ts, profileid, twid, uids in scans:
+            self.set_evidence_arp_scan(ts, profileid, twid, uids)
 
     def set_evidence_arp_scan(self, ts, profileid, twid, uids: List[str]):
         confidence: float = 0.8
@@ -230,17 +127,6 @@ class ARP(IModule):
         )
 
         self.db.set_evidence(evidence)
-        # after we set evidence, clear the dict so we can detect if it
-        # does another scan
-        try:
-            self.cache_arp_requests.pop(f"{profileid}_{twid}")
-        except KeyError:
-            # when a tw is closed, we clear all its' entries from the
-            # cache_arp_requests dict
-            # having keyerr is a result of closing a timewindow before
-            # setting an evidence
-            # ignore it
-            pass
 
     def check_dstip_outside_localnet(self, twid, flow):
         """Function to setEvidence when daddr is outside the local network"""
@@ -478,7 +364,10 @@ class ARP(IModule):
     def pre_main(self):
         """runs once before the main() is executed in a loop"""
         utils.drop_root_privs()
-        self.timer_thread_arp_scan.start()
+
+    def shutdown_gracefully(self):
+        # report the arp scans that are still waiting for more scans
+        self.report_arp_scans(self.arp_scans.flush_all())
 
     def main(self):
         if (
@@ -515,17 +404,12 @@ class ARP(IModule):
                 # Unsolicited ARPs should be of type reply only, not request
                 self.detect_unsolicited_arp(twid, flow)
 
-        # if the tw is closed, remove all its entries from the cache dict
+        # if the tw is closed, remove all its entries from the cache
         if msg := self.get_msg("tw_closed"):
             profileid_tw = msg["data"]
             # when a tw is closed, this means that it's too
             # old so we don't check for arp scan in this time
             # range anymore
-            # this copy is made to avoid dictionary
-            # changed size during iteration err
-            cache_copy = self.cache_arp_requests.copy()
-            for key in cache_copy:
-                if profileid_tw in key:
-                    self.cache_arp_requests.pop(key)
-                    # don't break, keep looking for more
-                    # keys that belong to the same tw
+            self.report_arp_scans(self.arp_scans.close_tw(profileid_tw))
+
+        self.report_arp_scans(self.arp_scans.flush_due())
@@ -0,0 +1,208 @@
+import heapq
+import time
+from collections import (
+    OrderedDict,
+    deque,
+)
+from typing import (
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+# (ts, profileid, twid, uids) of an arp scan that should be reported
+ArpScan = Tuple[float, str, str, List[str]]
+
+
+class ArpScanState:
+    """the arp requests of 1 profile in 1 timewindow"""
+
+    __slots__ = (
+        "requests",
+        "alerted",
+        "pending_ts",
+        "pending_uids",
+        "deadline",
+    )
+
+    def __init__(self, max_uids: int):
+        # {daddr: (ts of the last request to it, uids of the requests
+        # to it)} ordered by the time of the last request
+        self.requests: OrderedDict = OrderedDict()
+        # the first scan of each tw is reported immediately, the rest
+        # are combined until the deadline
+        self.alerted = False
+        # the ts and uids of the scans waiting for the deadline
+        self.pending_ts: Optional[float] = None
+        self.pending_uids: Deque[str] = deque(maxlen=max_uids)
+        self.deadline: Optional[float] = None
+
+
+class ArpScanAggregator:
+    """
+    Detects and combines the ARP scans of each profile and timewindow
+    using bounded state.
+    An arp scan is detected when a profile sends arp requests to
+    threshold different IPs within window seconds. The first scan in
+    a timewindow is reported immediately, the following ones are
+    combined for time_to_wait seconds to reduce the number of alerts.
+    The combined scans are reported when their deadline is over, when
+    their timewindow is closed or when their state is evicted.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 5,
+        window: float = 30,
+        time_to_wait: float = 10,
+        max_tracked: int = 10000,
+        max_uids: int = 1000,
+    ):
+        # min number of different IPs requested to consider it a scan
+        self.threshold = threshold
+        # in seconds
+        self.window = window
+        self.time_to_wait = time_to_wait
+        # max number of profiles and timewindows tracked at the same
+        # time, the least recently used ones are evicted
+        self.max_tracked = max_tracked
+        # max number of uids kept per scan
+        self.max_uids = max_uids
+        # max number of uids kept per requested ip
+        self.max_uids_per_daddr = max(max_uids // threshold, 1)
+        # {profileid_twid: state} ordered by the time of the last use
+        self.states: Dict[str, ArpScanState] = OrderedDict()
+        # heap of (deadline, profileid_twid), this is the only
+        # scheduler of the pending scans.
+        # entries whose state was flushed are skipped when popped
+        self.deadlines: List[Tuple[float, str]] = []
+
+    @staticmethod
+    def get_key(profileid: str, twid: str) -> str:
+        # the same format as the profileid_tw of the tw_closed channel
+        return f"{profileid}_{twid}"
+
+    def get_state(self, key: str) -> Tuple[ArpScanState, List[ArpScan]]:
+        """
+        returns the state of the given profileid_twid, creates it if it
+        doesn't exist
+        :return: (the state, the scans of the evicted states)
+        """
+        evicted = []
+        if key in self.states:
+            self.states.move_to_end(key)
+            return self.states[key], evicted
+
+        while len(self.states) >= self.max_tracked:
+            old_key, old_state = self.states.popitem(last=False)
+            if scan := self.get_pending_scan(old_key, old_state):
+                evicted.append(scan)
+
+        state = ArpScanState(self.max_uids)
+        self.states[key] = state
+        return state, evicted
+
+    @staticmethod
+    def split_key(key: str) -> Tuple[str, str]:
+        profileid, twid = key.rsplit("_", 1)
+        return profileid, twid
+
+    def get_pending_scan(
+        self, key: str, state: ArpScanState
+    ) -> Optional[ArpScan]:
+        """returns the combined scans of the given state and clears them"""
+        if state.pending_ts is None:
+            return None
+
+        profileid, twid = self.split_key(key)
+        scan = (state.pending_ts, profileid, twid, list(state.pending_uids))
+        state.pending_ts = None
+        state.pending_uids.clear()
+        state.deadline = None
+        return scan
+
+    def add_request(
+        self, profileid: str, twid: str, daddr: str, ts: float, uid: str
+    ) -> Tuple[bool, List[ArpScan]]:
+        """
+        adds the arp request of the given profile to the given ip
+        :param ts: unix timestamp of the request
+        :return: (True if this request completed a scan, the scans that
+        should be reported now)
+        """
+        key = self.get_key(profileid, twid)
+        state, to_report = self.get_state(key)
+        requests = state.requests
+
+        if daddr in requests:
+            uids = requests.pop(daddr)[1]
+            uids.append(uid)
+        else:
+            uids = deque([uid], maxlen=self.max_uids_per_daddr)
+        requests[daddr] = (ts, uids)
+
+        # forget the requests that are too old to be a part of the
+        # same scan
+        while requests:
+            first_ts = next(iter(requests.values()))[0]
+            if ts - first_ts <= self.window:
+                break
+            requests.popitem(last=False)
+
+        if len(requests) < self.threshold:
+            return False, to_report
+
+        # we are sure this is an arp scan
+        scan_uids = [uid for _, uids in requests.values() for uid in uids]
+        # clear the requests so we can detect if it does another scan
+        requests.clear()
+
+        if not state.alerted:
+            state.alerted = True
+            to_report.append((ts, profileid, twid, scan_uids))
+            return True, to_report
+
+        # wait for more scans to combine them with this one
+        state.pending_ts = ts
+        state.pending_uids.extend(scan_uids)
+        if state.deadline is None:
+            state.deadline = time.time() + self.time_to_wait
+            heapq.heappush(self.deadlines, (state.deadline, key))
+        return True, to_report
+
+    def flush_due(self, now: Optional[float] = None) -> List[ArpScan]:
+        """returns the combined scans whose deadline is over"""
+        now = time.time() if now is None else now
+        to_report = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, key = heapq.heappop(self.deadlines)
+            state = self.states.get(key)
+            if not state or state.deadline != deadline:
+                # already flushed
+                continue
+            if scan := self.get_pending_scan(key, state):
+                to_report.append(scan)
+        return to_report
+
+    def close_tw(self, profileid_tw: str) -> List[ArpScan]:
+        """
+        forgets the state of the given closed timewindow
+        :param profileid_tw: profileid_twid as received in tw_closed
+        :return: the scans of this timewindow that weren't reported yet
+        """
+        state = self.states.pop(profileid_tw, None)
+        if not state:
+            return []
+        scan = self.get_pending_scan(profileid_tw, state)
+        return [scan] if scan else []
+
+    def flush_all(self) -> List[ArpScan]:
+        """returns all the combined scans that weren't reported yet"""
+        to_report = []
+        for key, state in self.states.items():
+            if scan := self.get_pending_scan(key, state):
+                to_report.append(scan)
+        self.deadlines.clear()
+        return to_report
@@ -1,4 +1,8 @@
 from slips_files.common.abstracts.module import IModule
+from modules.blocking.set_blocker import (
+    IpsetBlocker,
+    NftablesBlocker,
+)
 import platform
 import sys
 import os
@@ -29,7 +33,12 @@ class Blocking(IModule):
         self.firewall = self.determine_linux_firewall()
         self.set_sudo_according_to_env()
         self.initialize_chains_in_firewall()
+        # blocks whole IPs using kernel sets when nft or ipset are
+        # available, None if they aren't
+        self.set_blocker = self.create_set_blocker()
         # this will keep track of ips that are blocked only for a specific time
+        # by iptables rules, ips blocked by the set_blocker are unblocked
+        # by the kernel
         # format {ip: (block_for(seconds), time_of_blocking(epoch))}
         self.unblock_ips = {}
 
@@ -83,6 +92,30 @@ class Blocking(IModule):
             )
             sys.exit()
 
+    def create_set_blocker(self):
+        """
+        Returns the nftables or ipset backend that keeps the blocked IPs
+        in kernel sets, or None if none of them can be used.
+        rules with ports or protocols are still added using iptables
+        """
+        if shutil.which("nft"):
+            set_blocker = NftablesBlocker(sudo=bool(self.sudo))
+        elif shutil.which("ipset") and self.firewall == "iptables":
+            set_blocker = IpsetBlocker(sudo=bool(self.sudo))
+        else:
+            return None
+
+        if not set_blocker.initialize():
+            self.print(
+                f"Unable to use {set_blocker.__class__.__name__} for "
+                f"blocking, using iptables rules instead. "
+                f"{set_blocker.last_error}",
+                0,
+                1,
+            )
+            return None
+        return set_blocker
+
     def delete_slipsBlocking_chain(self):
         """Flushes and deletes everything in slipsBlocking chain"""
         # check if slipsBlocking chain exists before flushing it and suppress stderr and stdout while checking
@@ -100,6 +133,8 @@ class Blocking(IModule):
             # flush and delete all the rules in slipsBlocking
             cmd = f"{self.sudo}iptables -F slipsBlocking >/dev/null 2>&1 ; {self.sudo} iptables -X slipsBlocking >/dev/null 2>&1"
             os.system(cmd)
+            if self.set_blocker:
+                self.set_blocker.delete()
             print("Successfully deleted slipsBlocking chain.")
             return True
         elif self.firewall == "nftables":
@@ -108,6 +143,8 @@ class Blocking(IModule):
             os.system(f"{self.sudo}nft flush chain inet slipsBlocking")
             # Delete slipsBlocking chain from nftables
             os.system(f"{self.sudo}nft delete chain inet slipsBlocking")
+            if self.set_blocker:
+                self.set_blocker.delete()
             return True
         return False
 
@@ -194,6 +231,8 @@ class Blocking(IModule):
 
     def is_ip_blocked(self, ip) -> bool:
         """Checks if ip is already blocked or not"""
+        if self.set_blocker:
+            return self.set_blocker.is_blocked(ip)
 
         command = f"{self.sudo}iptables -L slipsBlocking -v -n"
         # Execute command
@@ -224,6 +263,15 @@ class Blocking(IModule):
         if self.is_ip_blocked(ip_to_block):
             return False
 
+        if self.set_blocker and not (dport or sport or protocol):
+            # the kernel unblocks it once block_for is over
+            blocked = self.set_blocker.block(
+                ip_to_block, from_=from_, to=to, timeout=block_for
+            )
+            if blocked:
+                self.print(f"Blocked: {ip_to_block}")
+            return blocked
+
         if self.firewall == "iptables":
             # Blocking in iptables
             # Set the default behaviour to block all traffic from and to an ip
@@ -293,6 +341,14 @@ class Blocking(IModule):
         protocol=None,
     ):
         """Unblocks an ip based on the flags passed in the message"""
+        if self.set_blocker and not (dport or sport or protocol):
+            unblocked = self.set_blocker.unblock(
+                ip_to_unblock, from_=from_, to=to
+            )
+            if unblocked:
+                self.print(f"Unblocked: {ip_to_unblock}")
+            return unblocked
+
         # This dictionary will be used to construct the rule
         options = {
             "protocol": f" -p {protocol}" if protocol else "",
@@ -359,6 +415,30 @@ class Blocking(IModule):
         for ip in unblocked_ips:
             self.unblock_ips.pop(ip)
 
+    def apply_set_changes(self, force=False):
+        """
+        applies the blocks and unblocks queued in the set_blocker in 1
+        batch, once the oldest one waited for max_batch_delay
+        """
+        if not self.set_blocker:
+            return
+
+        if force:
+            applied = self.set_blocker.apply()
+        else:
+            applied = self.set_blocker.apply_if_due()
+
+        if not applied:
+            self.print(
+                f"Error applying the blocking changes: "
+                f"{self.set_blocker.last_error}",
+                0,
+                1,
+            )
+
+    def shutdown_gracefully(self):
+        self.apply_set_changes(force=True)
+
     def main(self):
         # There's an IP that needs to be blocked
         if msg := self.get_msg("new_blocking"):
@@ -396,3 +476,4 @@ class Blocking(IModule):
             else:
                 self.unblock_ip(ip, from_, to, dport, sport, protocol)
         self.check_for_ips_to_unblock()
+        self.apply_set_changes()
@@ -0,0 +1,460 @@
+import ipaddress
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+# the directions an ip can be blocked in. "from" blocks the traffic
+# coming from the ip, "to" blocks the traffic going to it
+DIRECTIONS = ("from", "to")
+
+
+class CommandRunner:
+    """Runs the firewall commands"""
+
+    def run(
+        self, cmd: List[str], stdin: Optional[str] = None
+    ) -> Tuple[int, str]:
+        """
+        :param stdin: text to pass to the command's stdin, used for
+        applying a whole batch in 1 command
+        :return: (exit code, stdout and stderr)
+        """
+        try:
+            result = subprocess.run(
+                cmd,
+                input=stdin,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+            )
+        except OSError as e:
+            return 1, str(e)
+        return result.returncode, result.stdout
+
+
+class RecordingCommandRunner(CommandRunner):
+    """
+    Records the commands instead of running them, so the blocking
+    backends can be used without root. e.g. in the unit tests
+    """
+
+    def __init__(self, returncode: int = 0, output: str = ""):
+        # [(cmd, stdin)]
+        self.commands: List[Tuple[List[str], Optional[str]]] = []
+        self.returncode = returncode
+        self.output = output
+
+    def run(
+        self, cmd: List[str], stdin: Optional[str] = None
+    ) -> Tuple[int, str]:
+        self.commands.append((cmd, stdin))
+        return self.returncode, self.output
+
+
+class SetBlocker(ABC):
+    """
+    Blocks IPs by adding them to kernel sets that are matched by a
+    fixed number of firewall rules, instead of adding 1 rule per ip.
+    The changes are queued and applied in batches, 1 command per batch.
+    Blocking for a limited time uses the per-element timeouts of the
+    sets, so the kernel removes the ip when the timeout is over.
+    A mirror of the sets is kept in memory so checking if an ip is
+    blocked doesn't run any command.
+    """
+
+    # apply the queued changes once this many are queued
+    batch_size = 500
+    # or once the oldest queued change is this old, in seconds
+    max_batch_delay = 1
+
+    def __init__(
+        self,
+        sudo: bool = False,
+        runner: Optional[CommandRunner] = None,
+    ):
+        self.sudo = ["sudo"] if sudo else []
+        self.runner = runner or CommandRunner()
+        # {(ip, direction): time the block expires or None if it
+        # doesn't expire}
+        self.blocked: Dict[Tuple[str, str], Optional[float]] = {}
+        # the changes that aren't applied yet.
+        # [(action, ip, direction, timeout, previous state)], action is
+        # "add" or "delete". the previous state is (was blocked, expiry)
+        # and is used for reverting the mirror if applying them fails
+        self.pending: List[tuple] = []
+        self.first_pending_time: Optional[float] = None
+        # the output of the last failed command
+        self.last_error = ""
+
+    @abstractmethod
+    def initialize(self) -> bool:
+        """creates the sets and the rules that match them"""
+
+    @abstractmethod
+    def delete(self) -> bool:
+        """deletes the sets and the rules that match them"""
+
+    @abstractmethod
+    def build_batch(self, changes: List[tuple]) -> str:
+        """returns the script that applies the given changes"""
+
+    @abstractmethod
+    def run_batch(self, script: str) -> Tuple[int, str]:
+        """applies the given script, returns (exit code, output)"""
+
+    @staticmethod
+    def get_family(ip: str) -> Optional[str]:
+        """returns ipv4 or ipv6 or None if the given ip is invalid"""
+        try:
+            version = ipaddress.ip_address(ip).version
+        except ValueError:
+            return None
+        return f"ipv{version}"
+
+    @staticmethod
+    def get_timeout(timeout: float) -> int:
+        """the sets accept whole seconds only"""
+        return max(int(timeout), 1)
+
+    def is_blocked(self, ip: str, direction: Optional[str] = None) -> bool:
+        """
+        checks the in-memory mirror of the sets
+        :param direction: from or to. if not given, the ip is considered
+        blocked if it's blocked in any direction
+        """
+        directions = (direction,) if direction else DIRECTIONS
+        now = time.time()
+        for direction in directions:
+            if (ip, direction) not in self.blocked:
+                continue
+            expiry = self.blocked[(ip, direction)]
+            if expiry is None or expiry > now:
+                return True
+            # the kernel already removed it
+            del self.blocked[(ip, direction)]
+        return False
+
+    def get_directions(self, from_: bool, to: bool) -> List[str]:
+        # block all traffic from and to the ip by default
+        if not from_ and not to:
+            from_, to = True, True
+        return [
+            direction
+            for direction, requested in zip(DIRECTIONS, (from_, to))
+            if requested
+        ]
+
+    def queue(self, action: str, ip: str, direction: str, timeout=None):
+        key = (ip, direction)
+        previous_state = (key in self.blocked, self.blocked.get(key))
+        self.pending.append((action, ip, direction, timeout, previous_state))
+        if action == "add":
+            self.blocked[(ip, direction)] = (
+                time.time() + timeout if timeout else None
+            )
+        else:
+            self.blocked.pop((ip, direction), None)
+
+        if self.first_pending_time is None:
+            self.first_pending_time = time.time()
+        if len(self.pending) >= self.batch_size:
+            self.apply()
+
+    def block(
+        self,
+        ip: str,
+        from_: bool = True,
+        to: bool = True,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        queues blocking the given ip
+        :param timeout: seconds to block the ip for, blocks it
+        forever if not given
+        :return: True if the ip wasn't already blocked in the given
+        directions
+        """
+        if not self.get_family(ip):
+            return False
+
+        queued = False
+        for direction in self.get_directions(from_, to):
+            if self.is_blocked(ip, direction):
+                continue
+            self.queue("add", ip, direction, timeout)
+            queued = True
+        return queued
+
+    def unblock(self, ip: str, from_: bool = True, to: bool = True) -> bool:
+        """
+        queues unblocking the given ip
+        :return: True if the ip was blocked in any of the given directions
+        """
+        queued = False
+        for direction in self.get_directions(from_, to):
+            if not self.is_blocked(ip, direction):
+                continue
+            self.queue("delete", ip, direction)
+            queued = True
+        return queued
+
+    def is_batch_due(self) -> bool:
+        return self.first_pending_time is not None and (
+            time.time() - self.first_pending_time >= self.max_batch_delay
+        )
+
+    def apply_if_due(self) -> bool:
+        """
+        applies the queued changes if the oldest one waited long enough
+        :return: False if applying them failed
+        """
+        if not self.is_batch_due():
+            return True
+        return self.apply()
+
+    def apply(self) -> bool:
+        """
+        applies all the queued changes in 1 command.
+        if the command fails, the mirror is reverted to what it was
+        before these changes
+        :return: True if the changes were applied
+        """
+        changes, self.pending = self.pending, []
+        self.first_pending_time = None
+        if not changes:
+            return True
+
+        returncode, output = self.run_batch(self.build_batch(changes))
+        if returncode == 0:
+            return True
+
+        self.last_error = output
+        for _, ip, direction, _, previous_state in reversed(changes):
+            was_blocked, expiry = previous_state
+            if was_blocked:
+                self.blocked[(ip, direction)] = expiry
+            else:
+                self.blocked.pop((ip, direction), None)
+        return False
+
+
+class NftablesBlocker(SetBlocker):
+    """
+    Keeps the blocked IPs in the sets of the slipsBlocking nftables
+    table, and applies each batch as 1 nft transaction
+    """
+
+    table = "inet slipsBlocking"
+    # {chain: hook}
+    chains = {
+        "input": "input",
+        "output": "output",
+        "forward": "forward",
+    }
+    # {(direction, family): the nft expression matching the
+    # direction of the packets}
+    matches = {
+        ("from", "ipv4"): "ip saddr",
+        ("to", "ipv4"): "ip daddr",
+        ("from", "ipv6"): "ip6 saddr",
+        ("to", "ipv6"): "ip6 daddr",
+    }
+
+    @staticmethod
+    def get_set_name(direction: str, family: str) -> str:
+        return f"{direction}_{family}"
+
+    def nft(self, script: str) -> Tuple[int, str]:
+        # nft applies the whole file atomically
+        return self.runner.run([*self.sudo, "nft", "-f", "-"], stdin=script)
+
+    def initialize(self) -> bool:
+        script = [f"add table {self.table}"]
+        for direction, family in self.matches:
+            set_name = self.get_set_name(direction, family)
+            script.append(
+                f"add set {self.table} {set_name} "
+                f"{{ type {family}_addr; flags timeout; }}"
+            )
+
+        for chain, hook in self.chains.items():
+            # priority -1 so slips rules are checked before the
+            # rules in the default filter chains
+            script.append(
+                f"add chain {self.table} {chain} "
+                f"{{ type filter hook {hook} priority -1; policy accept; }}"
+            )
+            # remove the rules added by previous runs of slips
+            script.append(f"flush chain {self.table} {chain}")
+            for (direction, family), match in self.matches.items():
+                set_name = self.get_set_name(direction, family)
+                script.append(
+                    f"add rule {self.table} {chain} {match} @{set_name} drop"
+                )
+
+        returncode, output = self.nft("\n".join(script) + "\n")
+        if returncode != 0:
+            self.last_error = output
+        return returncode == 0
+
+    def delete(self) -> bool:
+        returncode, output = self.runner.run(
+            [*self.sudo, "nft", "delete", "table", *self.table.split()]
+        )
+        self.blocked.clear()
+        return returncode == 0
+
+    def build_batch(self, changes: List[tuple]) -> str:
+        script = []
+        for action, ip, direction, timeout, _ in changes:
+            set_name = self.get_set_name(direction, self.get_family(ip))
+            element = f"{self.table} {set_name} {{ {ip} }}"
+            if action == "add":
+                if timeout:
+                    element = (
+                        f"{self.table} {set_name} "
+                        f"{{ {ip} timeout {self.get_timeout(timeout)}s }}"
+                    )
+                script.append(f"add element {element}")
+            else:
+                # deleting an element that isn't in the set fails the
+                # whole transaction, e.g. if its timeout is over.
+                # adding it first makes sure it's there
+                script.append(f"add element {element}")
+                script.append(f"delete element {element}")
+        return "\n".join(script) + "\n"
+
+    def run_batch(self, script: str) -> Tuple[int, str]:
+        return self.nft(script)
+
+
+class IpsetBlocker(SetBlocker):
+    """
+    Keeps the blocked IPs in ipsets matched by the rules of the
+    slipsBlocking iptables and ip6tables chains, and applies each
+    batch using 1 ipset restore
+    """
+
+    chain = "slipsBlocking"
+    # {family: (ipset family, iptables binary)}
+    families = {
+        "ipv4": ("inet", "iptables"),
+        "ipv6": ("inet6", "ip6tables"),
+    }
+    # {direction: the ipset flag matching the direction of the packets}
+    flags = {
+        "from": "src",
+        "to": "dst",
+    }
+
+    @staticmethod
+    def get_set_name(direction: str, family: str) -> str:
+        return f"slipsBlocking_{direction}_{family}"
+
+    def get_rules(self) -> List[Tuple[str, List[str]]]:
+        """
+        :return: [(iptables binary, rule)] of the rules that drop the
+        packets matching the sets
+        """
+        rules = []
+        for family, (_, iptables) in self.families.items():
+            for direction, flag in self.flags.items():
+                set_name = self.get_set_name(direction, family)
+                rules.append(
+                    (
+                        iptables,
+                        [
+                            "-m",
+                            "set",
+                            "--match-set",
+                            set_name,
+                            flag,
+                            "-j",
+                            "DROP",
+                        ],
+                    )
+                )
+        return rules
+
+    def ensure_rule(self, iptables: str, chain: str, rule: List[str]) -> bool:
+        """inserts the given rule in the given chain if it's not there"""
+        returncode, _ = self.runner.run(
+            [*self.sudo, iptables, "-C", chain, *rule]
+        )
+        if returncode == 0:
+            return True
+        returncode, output = self.runner.run(
+            [*self.sudo, iptables, "-I", chain, *rule]
+        )
+        if returncode != 0:
+            self.last_error = output
+        return returncode == 0
+
+    def initialize(self) -> bool:
+        script = [
+            f"create {self.get_set_name(direction, family)} hash:ip "
+            f"family {ipset_family} timeout 0"
+            for family, (ipset_family, _) in self.families.items()
+            for direction in self.flags
+        ]
+        returncode, output = self.run_batch("\n".join(script) + "\n")
+        if returncode != 0:
+            self.last_error = output
+            return False
+
+        for _, iptables in self.families.values():
+            # fails if the chain already exists
+            self.runner.run([*self.sudo, iptables, "-N", self.chain])
+            for chain in ("INPUT", "OUTPUT", "FORWARD"):
+                if not self.ensure_rule(iptables, chain, ["-j", self.chain]):
+                    return False
+
+        return all(
+            self.ensure_rule(iptables, self.chain, rule)
+            for iptables, rule in self.get_rules()
+        )
+
+    def delete(self) -> bool:
+        for iptables, rule in self.get_rules():
+            self.runner.run([*self.sudo, iptables, "-D", self.chain, *rule])
+
+        deleted = True
+        for family in self.families:
+            for direction in self.flags:
+                returncode, _ = self.runner.run(
+                    [
+                        *self.sudo,
+                        "ipset",
+                        "destroy",
+                        self.get_set_name(direction, family),
+                    ]
+                )
+                deleted = deleted and returncode == 0
+        self.blocked.clear()
+        return deleted
+
+    def build_batch(self, changes: List[tuple]) -> str:
+        script = []
+        for action, ip, direction, timeout, _ in changes:
+            set_name = self.get_set_name(direction, self.get_family(ip))
+            if action == "add":
+                line = f"add {set_name} {ip}"
+                if timeout:
+                    line += f" timeout {self.get_timeout(timeout)}"
+            else:
+                line = f"del {set_name} {ip}"
+            script.append(line)
+        return "\n".join(script) + "\n"
+
+    def run_batch(self, script: str) -> Tuple[int, str]:
+        # -exist ignores adding ips that are already in the set and
+        # deleting ips that aren't
+        return self.runner.run(
+            [*self.sudo, "ipset", "restore", "-exist"], stdin=script
+        )
@@ -404,17 +404,8 @@ class Conn(IFlowalertsAnalyzer):
         other_ip = self.db.get_the_other_ip_version(profileid)
         if other_ip:
             other_ip = json.loads(other_ip)
-        # get the domain of this ip
-        dns_resolution = self.db.get_dns_resolution(daddr)
-
-        try:
-            if other_ip and other_ip in dns_resolution.get("resolved-by", []):
-                return True
-        except AttributeError:
-            # It can be that the dns_resolution sometimes gives back a
-            # list and gets this error
-            pass
-        return False
+        # was the domain of this ip resolved by the other ip?
+        return bool(other_ip) and self.db.is_ip_resolved_by(daddr, other_ip)
 
     def check_connection_without_dns_resolution(self, profileid, twid, flow):
         """
@@ -455,7 +446,7 @@ class Conn(IFlowalertsAnalyzer):
                 return False
 
         # search 24hs back for a dns resolution
-        if self.db.is_ip_resolved(flow.daddr, 24):
+        if self.db.is_ip_resolved(flow.daddr, 24, twid=twid):
             return False
 
         if flow.uid not in self.connections_checked_in_conn_dns_timer_thread:
@@ -2,11 +2,16 @@ import numpy
 from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import StandardScaler
 import pickle
-import pandas as pd
 import json
 import datetime
+import time
 import traceback
 import warnings
+from typing import (
+    List,
+    Optional,
+    Tuple,
+)
 
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
@@ -43,6 +48,28 @@ class FlowMLDetection(IModule):
         "Train or test a Machine Learning model to detect malicious flows"
     )
     authors = ["Sebastian Garcia"]
+    # Discard some type of flows that dont have ports
+    protos_to_discard = ("arp", "ARP", "icmp", "igmp", "ipv6-icmp")
+    # flow fields that are not used as features by the model
+    non_feature_fields = {
+        "appproto",
+        "daddr",
+        "saddr",
+        "starttime",
+        "type_",
+        "smac",
+        "dmac",
+        "history",
+        "uid",
+        "dir_",
+        "dbytes",
+        "dpkts",
+        "endtime",
+        "bytes",
+        "flow_source",
+        "label",
+        "module_labels",
+    }
 
     def init(self):
         # Subscribe to the channel
@@ -60,46 +87,57 @@ class FlowMLDetection(IModule):
         self.scaler = StandardScaler()
         self.model_path = "./modules/flowmldetection/model.bin"
         self.scaler_path = "./modules/flowmldetection/scaler.bin"
+        # In training, only the flows stored after the last trained flow
+        # are used, this is the sqlite rowid of that flow
+        self.last_trained_rowid = 0
+        # the flows relabeled after they were used for training are
+        # trained again with their new label, this is the id of the last
+        # relabeling we checked
+        self.last_relabel_id = 0
+        # number of flows read from the db and given to the model at a time
+        self.training_chunk_size = 1000
+        # the trained model is stored on disk every model_store_interval
+        # seconds and on shutdown, instead of after every training
+        self.model_store_interval = 300
+        self.last_model_store_time = time.time()
+        # In testing, flows are detected in batches of batch_size flows,
+        # or after batch_timeout seconds from the first flow of the batch,
+        # whichever comes first
+        self.batch_size = 100
+        self.batch_timeout = 0.5
+        # the flows waiting to be detected and their twids
+        self.batch: List[Tuple[dict, str]] = []
+        self.batch_start_time: Optional[float] = None
+        # the features of the flows in the batch, allocated once we know
+        # the number of features
+        self.batch_features: Optional[numpy.ndarray] = None
 
     def read_configuration(self):
         conf = ConfigParser()
         self.mode = conf.get_ml_mode()
 
-    def train(self):
+    def train(self, x_flows: numpy.ndarray, y_flows: List[str]):
         """
-        Train a model based on the flows we receive and the labels
+        Incrementally train the model and the scaler with the given
+        features and labels
         """
         try:
-            # Process the labels to have only Normal and Malware
-            self.flows.label = self.flows.label.str.replace(
-                r"(^.*ormal.*$)", "Normal", regex=True
-            )
-            self.flows.label = self.flows.label.str.replace(
-                r"(^.*alware.*$)", "Malware", regex=True
-            )
-            self.flows.label = self.flows.label.str.replace(
-                r"(^.*alicious.*$)", "Malware", regex=True
-            )
-
-            # Separate
-            y_flow = self.flows["label"]
-            X_flow = self.flows.drop("label", axis=1)
-            X_flow = X_flow.drop("module_labels", axis=1)
-
-            # Normalize this batch of data so far. This can get progressivle slow
-            X_flow = self.scaler.fit_transform(X_flow)
+            # Normalize this chunk of data. The scaler keeps the mean and
+            # variance of all the chunks it saw so far
+            self.scaler.partial_fit(x_flows)
+            x_flows = self.scaler.transform(x_flows)
 
             # Train
             try:
                 self.clf.partial_fit(
-                    X_flow, y_flow, classes=["Malware", "Normal"]
+                    x_flows, y_flows, classes=["Malware", "Normal"]
                 )
             except Exception:
                 self.print("Error while calling clf.train()")
                 self.print(traceback.format_exc(), 0, 1)
 
             # See score so far in training
-            score = self.clf.score(X_flow, y_flow)
+            score = self.clf.score(x_flows, y_flows)
 
             # To debug the training score
             # self.scores.append(score)
@@ -111,226 +149,297 @@ class FlowMLDetection(IModule):
             # plt.plot(self.scores)
             # plt.savefig('train-scores.png')
 
-            # Store the models on disk
-            self.store_model()
-
         except Exception:
             self.print("Error in train()", 0, 1)
             self.print(traceback.format_exc(), 0, 1)
 
-    def process_features(self, dataset):
+    @staticmethod
+    def get_training_label(label: Optional[str]) -> Optional[str]:
         """
-        Discards some features of the dataset and can create new.
-        Clean the dataset
+        Process the labels to have only Normal and Malware.
+        Returns None for flows that can't be used for training,
+        e.g. unknown ones
         """
-        try:
-            # Discard some type of flows that dont have ports
-            to_discard = ["arp", "ARP", "icmp", "igmp", "ipv6-icmp"]
-            for proto in to_discard:
-                dataset = dataset[dataset.proto != proto]
-
-            # For now, discard the ports
-            to_drop = [
-                "appproto",
-                "daddr",
-                "saddr",
-                "starttime",
-                "type_",
-                "smac",
-                "dmac",
-                "history",
-                "uid",
-                "dir_",
-                "dbytes",
-                "endtime",
-                "bytes",
-                "flow_source",
-            ]
-            for field in to_drop:
-                try:
-                    dataset = dataset.drop(field, axis=1)
-                except (ValueError, KeyError):
-                    pass
+        if not label:
+            return None
+        if "ormal" in label or label == "benign":
+            return "Normal"
+        if "alware" in label or "alicious" in label:
+            return "Malware"
+        return None
+
+    def add_features_fields(self, flow: dict, interpreted_state: str):
+        """
+        adds the fields the model expects to the given flow dict
+        """
+        flow.update(
+            {
+                "allbytes": flow["sbytes"] + flow["dbytes"],
+                # the flow["state"] is the origstate, we dont need that here
+                # we need the interpreted state
+                "state": interpreted_state,
+                "pkts": flow["spkts"] + flow["dpkts"],
+            }
+        )
 
-            # Convert state to categorical
-            dataset.state = dataset.state.str.replace(
-                r"(^.*NotEstablished.*$)", "0", regex=True
-            )
-            dataset.state = dataset.state.str.replace(
-                r"(^.*Established.*$)", "1", regex=True
-            )
-            # Convert proto to categorical. For now we only have few states,
-            # so we can hardcode...
-            # We dont use the data to create categories because in testing mode
-            # we dont see all the protocols
-            # Also we dont store the Categorizer because the user can retrain
-            # with its own data.
-            dataset.proto = dataset.proto.str.lower()
-            dataset.proto = dataset.proto.str.replace(
-                r"(^.*tcp.*$)", "0", regex=True
-            )
-            dataset.proto = dataset.proto.str.replace(
-                r"(^.*udp.*$)", "1", regex=True
-            )
-            dataset.proto = dataset.proto.str.replace(
-                r"(^.*icmp.*$)", "2", regex=True
-            )
-            dataset.proto = dataset.proto.str.replace(
-                r"(^.*icmp-ipv6.*$)", "3", regex=True
-            )
-            dataset.proto = dataset.proto.str.replace(
-                r"(^.*arp.*$)", "4", regex=True
-            )
-            fields_to_convert_to_flow = [
-                dataset.proto,
-                dataset.dport,
-                dataset.sport,
-                dataset.dur,
-                dataset.pkts,
-                dataset.spkts,
-                dataset.allbytes,
-                dataset.sbytes,
-                dataset.state,
-            ]
-            for field in fields_to_convert_to_flow:
-                try:
-                    field = field.astype("float64")
-                except ValueError:
-                    pass
+    def process_training_chunk(
+        self, chunk: List[Tuple[int, str, str]]
+    ) -> Tuple[Optional[numpy.ndarray], List[str]]:
+        """
+        converts the given chunk of (rowid, flow, label) read from the
+        flows table to features and labels ready for training.
+        unlabeled flows and the ones that have no ports are skipped
+        """
+        features: List[List[float]] = []
+        labels: List[str] = []
+        for _, flow, label in chunk:
+            label: Optional[str] = self.get_training_label(label)
+            if not label:
+                continue
 
-            return dataset
-        except Exception:
-            # Stop the timer
-            self.print("Error in process_features()")
-            self.print(traceback.format_exc(), 0, 1)
+            flow: dict = json.loads(flow)
+            if flow.get("proto") in self.protos_to_discard:
+                continue
+
+            try:
+                interpreted_state = self.db.get_final_state_from_flags(
+                    flow["state"], flow["spkts"] + flow["dpkts"]
+                )
+                self.add_features_fields(flow, interpreted_state)
+            except (KeyError, TypeError):
+                # this type of flow doesnt have the fields we need
+                continue
 
-    def process_flows(self):
+            flow_features: Optional[List[float]] = self.get_flow_features(flow)
+            if flow_features is None or (
+                features and len(flow_features) != len(features[0])
+            ):
+                continue
+
+            features.append(flow_features)
+            labels.append(label)
+
+        if not features:
+            return None, []
+        return numpy.array(features, dtype=numpy.float64), labels
+
+    def train_on_new_flows(self):
         """
-        Process all the flwos in the DB
-        Store the pandas df in self.flows
+        Trains the model with the labeled flows stored in the db since
+        the last training, training_chunk_size flows at a time.
+        The model is stored on disk every model_store_interval seconds.
         """
-        try:
-            # We get all the flows so far
-            # because this retraining happens in batches
-            flows = self.db.get_all_flows()
-            # Check how many different labels are in the DB
-            # We need both normal and malware
-            labels = self.db.get_labels()
-            if len(labels) == 1:
-                # Only 1 label has flows
-                # There are not enough different labels, so insert two flows
-                # that are fake but representative of a normal and malware flow
-                # they are only for the training process
-                # At least 1 flow of each label is required
-                # self.print(f'Amount of labeled flows: {labels}', 0, 1)
-                flows.append(
-                    {
-                        "ts": 1594417039.029793,
-                        "dur": "1.9424750804901123",
-                        "saddr": "10.7.10.101",
-                        "sport": "49733",
-                        "daddr": "40.70.224.145",
-                        "dport": "443",
-                        "proto": "tcp",
-                        "state": "Established",
-                        "allbytes": 42764,
-                        "spkts": 37,
-                        "sbytes": 25517,
-                        "appproto": "ssl",
-                        "label": "Malware",
-                        "module_labels": {
-                            "flowalerts-long-connection": "Malware"
-                        },
-                    }
-                )
-                flows.append(
-                    {
-                        "ts": 1382355032.706468,
-                        "dur": "10.896695",
-                        "saddr": "147.32.83.52",
-                        "sport": "47956",
-                        "daddr": "80.242.138.72",
-                        "dport": "80",
-                        "proto": "tcp",
-                        "state": "Established",
-                        "allbytes": 67696,
-                        "spkts": 1,
-                        "sbytes": 100,
-                        "appproto": "http",
-                        "label": "Normal",
-                        "module_labels": {
-                            "flowalerts-long-connection": "Normal"
-                        },
-                    }
-                )
-                # If there are enough flows, we dont insert them anymore
+        for chunk in self.db.iterate_flows_in_chunks(
+            self.last_trained_rowid, self.training_chunk_size
+        ):
+            # the rowid of the last flow in this chunk, the next training
+            # starts after it
+            self.last_trained_rowid = chunk[-1][0]
+            x_flows, y_flows = self.process_training_chunk(chunk)
+            if x_flows is None:
+                continue
+            self.train(x_flows, y_flows)
+
+        self.train_on_relabeled_flows()
+        if (
+            time.time() - self.last_model_store_time
+            >= self.model_store_interval
+        ):
+            self.store_model()
+
+    def train_on_relabeled_flows(self):
+        """
+        Trains the model again with the flows that were relabeled after
+        training on them, e.g. the flows of an alert that were stored as
+        benign. the flows that weren't trained on yet are skipped, they
+        are trained with their new label as new flows
+        """
+        for chunk in self.db.iterate_relabeled_flows_in_chunks(
+            self.last_relabel_id, self.training_chunk_size
+        ):
+            self.last_relabel_id = chunk[-1][0]
+            trained = [
+                (relabel_id, flow, label)
+                for relabel_id, rowid, flow, label in chunk
+                if rowid <= self.last_trained_rowid
+            ]
+            x_flows, y_flows = self.process_training_chunk(trained)
+            if x_flows is None:
+                continue
+            self.train(x_flows, y_flows)
 
-            # Convert to pandas df
-            df_flows = pd.DataFrame(flows)
+    @staticmethod
+    def encode_state(state: str) -> Optional[float]:
+        """
+        Convert the interpreted state to categorical.
+        For now we only have few states, so we can hardcode...
+        """
+        if "NotEstablished" in state:
+            return 0.0
+        if "Established" in state:
+            return 1.0
 
-            # Process features
-            df_flows = self.process_features(df_flows)
+    @staticmethod
+    def encode_proto(proto: str) -> Optional[float]:
+        """
+        Convert the proto to categorical.
+        We dont use the data to create categories because in testing mode
+        we dont see all the protocols
+        Also we dont store the Categorizer because the user can retrain
+        with its own data.
+        """
+        proto = proto.lower()
+        if "tcp" in proto:
+            return 0.0
+        if "udp" in proto:
+            return 1.0
+        if "icmp" in proto:
+            return 2.0
+        if "arp" in proto:
+            return 4.0
+
+    def get_flow_features(self, flow: dict) -> Optional[List[float]]:
+        """
+        Returns the features of the given flow, they're the numerical
+        values of the flow fields in the same order as the flow dict.
+        Returns None if the flow has a feature that can't be converted to
+        a number
+        """
+        features = []
+        for field, value in flow.items():
+            if field in self.non_feature_fields:
+                continue
+
+            if field == "proto":
+                value = self.encode_proto(str(value))
+            elif field == "state":
+                value = self.encode_state(str(value))
+            else:
+                try:
+                    value = float(value)
+                except (ValueError, TypeError):
+                    value = None
 
-            # Update the flow to the processed version
-            self.flows = df_flows
-        except Exception:
-            # Stop the timer
-            self.print("Error in process_flows()")
-            self.print(traceback.format_exc(), 0, 1)
+            if value is None:
+                return None
+            features.append(value)
+        return features
 
-    def process_flow(self, flow_to_process: dict):
+    def add_flow_to_batch(self, flow: dict, twid: str):
         """
-        Process one flow. Only used during detection in testing
-        returns the pandas df with the processed flow
+        Converts the given flow to features and adds it to the batch
+        of flows waiting to be detected.
         """
-        try:
-            # Convert the flow to a pandas dataframe
-            raw_flow = pd.DataFrame(flow_to_process, index=[0])
-            dflow = self.process_features(raw_flow)
-            # Update the flow to the processed version
-            return dflow
-        except Exception:
-            # Stop the timer
-            self.print("Error in process_flow()")
-            self.print(traceback.format_exc(), 0, 1)
+        # After processing the flow, it may happen that we
+        # delete icmp/arp/etc
+        if flow["proto"] in self.protos_to_discard:
+            return
+
+        features: Optional[List[float]] = self.get_flow_features(flow)
+        if features is None:
+            self.print(
+                f"Unable to get the features of flow "
+                f"{flow['saddr']}:{flow['sport']} -> "
+                f"{flow['daddr']}:{flow['dport']}/{flow['proto']}",
+                0,
+                3,
+            )
+            return
+
+        if self.batch_features is None or self.batch_features.shape[1] != len(
+            features
+        ):
+            # detect what we have so far before changing the shape
+            self.detect_batch()
+            self.batch_features = numpy.empty(
+                (self.batch_size, len(features)), dtype=numpy.float64
+            )
+
+        elif len(self.batch) >= self.batch_size:
+            self.detect_batch()
 
-    def detect(self, x_flow) -> numpy.ndarray:
+        if not self.batch:
+            self.batch_start_time = time.time()
+
+        self.batch_features[len(self.batch)] = features
+        self.batch.append((flow, twid))
+
+    def is_batch_ready(self) -> bool:
+        if not self.batch:
+            return False
+        return (
+            len(self.batch) >= self.batch_size
+            or time.time() - self.batch_start_time >= self.batch_timeout
+        )
+
+    def detect(self, x_flows: numpy.ndarray) -> Optional[numpy.ndarray]:
         """
-        Detects the given flow with the current model stored
+        Detects the given flows features with the current model stored
         and returns the predection array
         """
         try:
-            # clean the flow
-            fields_to_drop = [
-                "label",
-                "module_labels",
-                "uid",
-                "history",
-                "dir_",
-                "dbytes",
-                "dpkts",
-                "endtime",
-                "bytes",
-                "flow_source",
-            ]
-            for field in fields_to_drop:
-                try:
-                    x_flow = x_flow.drop(field, axis=1)
-                except (KeyError, ValueError):
-                    pass
-            # Scale the flow
-            x_flow: numpy.ndarray = self.scaler.transform(x_flow)
-            pred: numpy.ndarray = self.clf.predict(x_flow)
+            # Scale the flows
+            x_flows: numpy.ndarray = self.scaler.transform(x_flows)
+            pred: numpy.ndarray = self.clf.predict(x_flows)
             return pred
         except Exception as e:
             self.print(f"Error in detect(): {e}")
             self.print(traceback.format_exc(), 0, 1)
 
+    def detect_batch(self):
+        """
+        Detects all the flows in the batch with one call to the model,
+        and sets evidence for each malicious one
+        """
+        if not self.batch:
+            return
+
+        batch, self.batch = self.batch, []
+        preds: Optional[numpy.ndarray] = self.detect(
+            self.batch_features[: len(batch)]
+        )
+        if preds is None:
+            return
+
+        for (flow, twid), pred in zip(batch, preds):
+            self.handle_prediction(flow, twid, pred)
+
+    def handle_prediction(self, flow: dict, twid: str, pred: str):
+        label = flow["label"]
+        if label and label != "unknown" and label != pred:
+            # If the user specified a label in test mode,
+            # and the label is diff from the prediction,
+            # print in debug mode
+            self.print(
+                f"Report Prediction {pred} for label"
+                f' {label} flow {flow["saddr"]}:'
+                f'{flow["sport"]} ->'
+                f' {flow["daddr"]}:'
+                f'{flow["dport"]}/'
+                f'{flow["proto"]}',
+                0,
+                3,
+            )
+        if pred == "Malware":
+            # Generate an alert
+            self.set_evidence_malicious_flow(flow, twid)
+            self.print(
+                f"Prediction {pred} for label {label}"
+                f' flow {flow["saddr"]}:'
+                f'{flow["sport"]} -> '
+                f'{flow["daddr"]}:'
+                f'{flow["dport"]}/'
+                f'{flow["proto"]}',
+                0,
+                2,
+            )
+
     def store_model(self):
         """
         Store the trained model on disk
         """
         self.print("Storing the trained model and scaler on disk.", 0, 2)
+        self.last_model_store_time = time.time()
         with open(self.model_path, "wb") as f:
             data = pickle.dumps(self.clf)
             f.write(data)
@@ -409,7 +518,12 @@ class FlowMLDetection(IModule):
     def shutdown_gracefully(self):
         # Confirm that the module is done processing
         if self.mode == "train":
+            # train with the flows that arrived after the last training
+            self.train_on_new_flows()
             self.store_model()
+        elif self.mode == "test":
+            # detect the flows that are still waiting in the batch
+            self.detect_batch()
 
     def pre_main(self):
         utils.drop_root_privs()
@@ -423,13 +537,9 @@ class FlowMLDetection(IModule):
             self.flow = msg["flow"]
             # these fields are expected in testing. update the original
             # flow dict to have them
+            self.add_features_fields(self.flow, msg["interpreted_state"])
             self.flow.update(
                 {
-                    "allbytes": (self.flow["sbytes"] + self.flow["dbytes"]),
-                    # the flow["state"] is the origstate, we dont need that here
-                    # we need the interpreted state
-                    "state": msg["interpreted_state"],
-                    "pkts": self.flow["spkts"] + self.flow["dpkts"],
                     "label": msg["label"],
                     "module_labels": msg["module_labels"],
                 }
@@ -454,45 +564,13 @@ class FlowMLDetection(IModule):
                         f"Training the model with the last group of "
                         f"flows and labels. Total flows: {sum_labeled_flows}."
                     )
-                    # Process all flows in the DB and make them ready
-                    # for pandas
-                    self.process_flows()
-                    # Train an algorithm
-                    self.train()
+                    # Train an algorithm with the flows we didn't
+                    # train with yet
+                    self.train_on_new_flows()
             elif self.mode == "test":
-                # We are testing, which means using the model to detect
-                processed_flow = self.process_flow(self.flow)
-
-                # After processing the flow, it may happen that we
-                # delete icmp/arp/etc so the dataframe can be empty
-                if processed_flow is not None and not processed_flow.empty:
-                    # Predict
-                    pred: numpy.ndarray = self.detect(processed_flow)
-                    label = self.flow["label"]
-                    if label and label != "unknown" and label != pred[0]:
-                        # If the user specified a label in test mode,
-                        # and the label is diff from the prediction,
-                        # print in debug mode
-                        self.print(
-                            f"Report Prediction {pred[0]} for label"
-                            f' {label} flow {self.flow["saddr"]}:'
-                            f'{self.flow["sport"]} ->'
-                            f' {self.flow["daddr"]}:'
-                            f'{self.flow["dport"]}/'
-                            f'{self.flow["proto"]}',
-                            0,
-                            3,
-                        )
-                    if pred[0] == "Malware":
-                        # Generate an alert
-                        self.set_evidence_malicious_flow(self.flow, twid)
-                        self.print(
-                            f"Prediction {pred[0]} for label {label}"
-                            f' flow {self.flow["saddr"]}:'
-                            f'{self.flow["sport"]} -> '
-                            f'{self.flow["daddr"]}:'
-                            f'{self.flow["dport"]}/'
-                            f'{self.flow["proto"]}',
-                            0,
-                            2,
-                        )
+                # We are testing, which means using the model to detect.
+                # the flow is detected later with the rest of its batch
+                self.add_flow_to_batch(self.flow, twid)
+
+        if self.mode == "test" and self.is_batch_ready():
+            self.detect_batch()
@@ -0,0 +1,130 @@
+import time
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from threading import Lock
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+class EnrichmentPool:
+    """
+    Runs the slow lookups of the IP info module (rDNS, whois, RDAP, JARM)
+    on a bounded pool of threads so that one slow lookup doesn't block
+    the rest of the msgs the module receives.
+    Each lookup writes its own results to the db when it's done.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_pending: int = 10000,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = 30,
+        on_error: Optional[Callable[[str, Hashable, Exception], None]] = None,
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ip_info"
+        )
+        # lookups submitted after this many lookups are pending are dropped
+        self.max_pending = max_pending
+        # {kind: seconds}, after these seconds the lookup is considered
+        # timed out and the same lookup can be submitted again
+        self.timeouts: Dict[str, float] = timeouts or {}
+        self.default_timeout = default_timeout
+        self.on_error = on_error
+        # {(kind, key): (future, deadline)}
+        self.in_flight: Dict[Tuple[str, Hashable], Tuple[Future, float]] = {}
+        self.lock = Lock()
+        # check for timed out lookups at most once every second
+        self.expiry_check_interval = 1
+        self.last_expiry_check = 0
+
+    def get_timeout(self, kind: str) -> float:
+        return self.timeouts.get(kind, self.default_timeout)
+
+    def is_in_flight(self, kind: str, key: Hashable) -> bool:
+        with self.lock:
+            return (kind, key) in self.in_flight
+
+    def submit(
+        self, kind: str, key: Hashable, func: Callable, *args, **kwargs
+    ) -> bool:
+        """
+        runs func(*args, **kwargs) in the pool unless the same lookup
+        is already running or pending
+        :param kind: the kind of the lookup, e.g. rdns, asn, age, jarm
+        :param key: what is being looked up, e.g. the ip or the domain
+        :return: True if the lookup was submitted
+        """
+        with self.lock:
+            if (kind, key) in self.in_flight:
+                return False
+
+            if len(self.in_flight) >= self.max_pending:
+                return False
+
+            future = self.executor.submit(func, *args, **kwargs)
+            deadline = time.time() + self.get_timeout(kind)
+            self.in_flight[(kind, key)] = (future, deadline)
+
+        future.add_done_callback(
+            lambda done: self._handle_done(kind, key, done)
+        )
+        return True
+
+    def _handle_done(self, kind: str, key: Hashable, future: Future):
+        with self.lock:
+            # only remove it if it's the same lookup, a timed out lookup
+            # may have been submitted again
+            if self.in_flight.get((kind, key), (None,))[0] is future:
+                del self.in_flight[(kind, key)]
+
+        if future.cancelled():
+            return
+
+        if (exception := future.exception()) and self.on_error:
+            self.on_error(kind, key, exception)
+
+    def expire_timed_out(self) -> List[Tuple[str, Hashable]]:
+        """
+        stops tracking the lookups that took longer than the timeout of
+        their kind, so they don't block the same lookup forever.
+        the ones that didn't start yet are cancelled, the ones that
+        are running can't be interrupted and will finish in the
+        background
+        :return: the (kind, key) of the lookups that timed out
+        """
+        now = time.time()
+        timed_out = []
+        if now - self.last_expiry_check < self.expiry_check_interval:
+            return timed_out
+        self.last_expiry_check = now
+
+        with self.lock:
+            for lookup, (future, deadline) in list(self.in_flight.items()):
+                if now > deadline:
+                    future.cancel()
+                    del self.in_flight[lookup]
+                    timed_out.append(lookup)
+        return timed_out
+
+    def wait(self, timeout: Optional[float] = None):
+        """waits for the pending lookups to finish"""
+        with self.lock:
+            futures = [future for future, _ in self.in_flight.values()]
+        wait(futures, timeout=timeout)
+
+    def shutdown(self):
+        """cancels the pending lookups without waiting for the running ones"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            self.in_flight.clear()
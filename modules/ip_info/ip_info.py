@@ -1,5 +1,10 @@
 import platform
-from typing import Union
+import os
+from typing import (
+    List,
+    Optional,
+    Union,
+)
 from uuid import uuid4
 import datetime
 import maxminddb
@@ -16,6 +21,7 @@ import asyncio
 import multiprocessing
 
 from modules.ip_info.jarm import JARM
+from modules.ip_info.enrichment_pool import EnrichmentPool
 from slips_files.common.flow_classifier import FlowClassifier
 from .asn_info import ASN
 from slips_files.common.abstracts.module import IModule
@@ -44,6 +50,22 @@ class IPInfo(IModule):
         self.pending_mac_queries = multiprocessing.Queue()
         self.asn = ASN(self.db)
         self.JARM = JARM()
+        # cache the JARM hash of each ip and port for a day
+        self.jarm_cache_ttl = 86400
+        # failed probes are usually transient, so they're retried sooner
+        self.failed_jarm_cache_ttl = 600
+        # the slow lookups run here so they don't block the main loop
+        self.enrichment_pool = EnrichmentPool(
+            max_workers=8,
+            timeouts={
+                "rdns": 10,
+                "asn": 30,
+                "age": 30,
+                # including the time waiting for other targets to be probed
+                "jarm": 3 * JARM.timeout,
+            },
+            on_error=self.handle_enrichment_error,
+        )
         self.classifier = FlowClassifier()
         # Set the output queue of our database instance
         # To which channels do you wnat to subscribe? When a message arrives on the channel the module will wakeup
@@ -60,6 +82,16 @@ class IPInfo(IModule):
         # update asn every 1 month
         self.update_period = 2592000
         self.is_gw_mac_set = False
+        self.mac_db_path = "databases/macaddress-db.json"
+        # self.mac_db is a dict of {mac prefix: vendor}, it's only set
+        # once the mac db is read
+        # lengths of the prefixes in the mac db, longest first
+        self.mac_prefix_lengths: List[int] = []
+        # modification time of the mac db when we last read it
+        self.mac_db_mtime: Optional[float] = None
+        self.last_mac_db_check = 0
+        # check if update manager updated the mac db every 60s
+        self.mac_db_check_interval = 60
         # we can only getthe age of these tlds
         self.valid_tlds = [
             ".ac_uk",
@@ -196,15 +228,61 @@ class IPInfo(IModule):
 
     async def read_macdb(self):
         while True:
-            try:
-                self.mac_db = open("databases/macaddress-db.json", "r")
+            if self.load_mac_db():
                 return True
-            except OSError:
-                # update manager hasn't downloaded it yet
-                try:
-                    time.sleep(3)
-                except KeyboardInterrupt:
-                    return False
+            # update manager hasn't downloaded it yet
+            try:
+                time.sleep(3)
+            except KeyboardInterrupt:
+                return False
+
+    def load_mac_db(self) -> bool:
+        """
+        Reads the mac db into a dict of {mac prefix: vendor} so the
+        vendor lookups don't parse the file each time.
+        the prefixes are OUIs (MA-L) or the longer MA-M and MA-S prefixes
+        :return: False if the mac db couldn't be read
+        """
+        try:
+            # get the mtime before reading the file, if the file is
+            # changed while we're reading, we'll read it again
+            mtime = os.path.getmtime(self.mac_db_path)
+            with open(self.mac_db_path, "r") as mac_db:
+                index = {}
+                for line in mac_db:
+                    try:
+                        line = json.loads(line)
+                        prefix: str = line["macPrefix"].upper()
+                        index[prefix] = line["vendorName"]
+                    except (json.decoder.JSONDecodeError, KeyError):
+                        continue
+        except OSError:
+            return False
+
+        self.mac_db = index
+        self.mac_prefix_lengths = sorted(
+            {len(prefix) for prefix in index}, reverse=True
+        )
+        self.mac_db_mtime = mtime
+        return True
+
+    def reload_mac_db_if_updated(self):
+        """
+        reads the mac db again if update manager updated it since the
+        last time we read it
+        """
+        now = time.time()
+        if now - self.last_mac_db_check < self.mac_db_check_interval:
+            return
+        self.last_mac_db_check = now
+
+        try:
+            mtime = os.path.getmtime(self.mac_db_path)
+        except OSError:
+            return
+
+        if mtime != self.mac_db_mtime:
+            self.load_mac_db()
 
     # GeoInfo functions
     def get_geocountry(self, ip) -> dict:
@@ -296,19 +374,13 @@ class IPInfo(IModule):
             self.pending_mac_queries.put((mac_addr, profileid))
             return False
 
-        oui = mac_addr[:8].upper()
-        # parse the mac db and search for this oui
-        self.mac_db.seek(0)
-        while True:
-            line = self.mac_db.readline()
-            if line == "":
-                # reached the end of file without finding the vendor
-                # set the vendor to unknown to avoid searching for it again
-                return False
-
-            if oui in line:
-                line = json.loads(line)
-                return line["vendorName"]
+        self.reload_mac_db_if_updated()
+        mac_addr = mac_addr.upper()
+        # the longest matching prefix is the most specific vendor
+        for length in self.mac_prefix_lengths:
+            if vendor := self.mac_db.get(mac_addr[:length]):
+                return vendor
+        return False
 
     def get_vendor(self, mac_addr: str, profileid: str) -> dict:
         """
@@ -384,12 +456,11 @@ class IPInfo(IModule):
         return age
 
     def shutdown_gracefully(self):
+        self.enrichment_pool.shutdown()
         if hasattr(self, "asn_db"):
             self.asn_db.close()
         if hasattr(self, "country_db"):
             self.country_db.close()
-        if hasattr(self, "mac_db"):
-            self.mac_db.close()
 
     # GW
     def get_gateway_ip(self):
@@ -595,10 +666,36 @@ class IPInfo(IModule):
             # only update the ASN for this IP if more than 1 month
             # passed since last ASN update on this IP
             if self.asn.update_asn(cached_ip_info, self.update_period):
-                self.asn.get_asn(ip, cached_ip_info)
-            self.get_rdns(ip)
+                self.enrichment_pool.submit(
+                    "asn", ip, self.asn.get_asn, ip, cached_ip_info
+                )
+            self.enrichment_pool.submit("rdns", ip, self.get_rdns, ip)
+
+    def handle_enrichment_error(self, kind: str, key, exception: Exception):
+        self.print(f"Error getting the {kind} of {key}: {exception}", 0, 1)
+
+    def check_jarm_hash(self, flow: dict, twid: str):
+        """
+        sets an evidence if the JARM hash of the given flow's
+        destination is blacklisted
+        """
+        daddr, dport = flow["daddr"], flow["dport"]
+        jarm_hash: str = self.db.get_jarm_hash(daddr, dport)
+        if not jarm_hash:
+            jarm_hash = self.JARM.JARM_hash(daddr, dport)
+            ttl = (
+                self.failed_jarm_cache_ttl
+                if jarm_hash == JARM.empty_hash
+                else self.jarm_cache_ttl
+            )
+            self.db.set_jarm_hash(daddr, dport, jarm_hash, ttl)
+        if self.db.is_blacklisted_jarm(jarm_hash):
+            self.set_evidence_malicious_jarm_hash(flow, twid)
 
     def main(self):
+        for kind, key in self.enrichment_pool.expire_timed_out():
+            self.print(f"Timed out getting the {kind} of {key}", 2, 0)
+
         if msg := self.get_msg("new_MAC"):
             data = json.loads(msg["data"])
             mac_addr: str = data["MAC"]
@@ -621,7 +718,9 @@ class IPInfo(IModule):
             msg = json.loads(msg["data"])
             flow = self.classifier.convert_to_flow_obj(msg["flow"])
             if domain := flow.query:
-                self.get_age(domain)
+                self.enrichment_pool.submit(
+                    "age", domain, self.get_age, domain
+                )
 
         if msg := self.get_msg("new_ip"):
             ip = msg["data"]
@@ -643,9 +742,10 @@ class IPInfo(IModule):
             msg: dict = json.loads(msg["data"])
             flow: dict = msg["flow"]
             if msg["attacker_type"] == "ip":
-                jarm_hash: str = self.JARM.JARM_hash(
-                    flow["daddr"], flow["dport"]
+                self.enrichment_pool.submit(
+                    "jarm",
+                    (flow["daddr"], flow["dport"]),
+                    self.check_jarm_hash,
+                    flow,
+                    msg["twid"],
                 )
-
-                if self.db.is_blacklisted_jarm(jarm_hash):
-                    self.set_evidence_malicious_jarm_hash(flow, msg["twid"])
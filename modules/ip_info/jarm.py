@@ -7,9 +7,21 @@ import os
 import random
 import hashlib
 import ipaddress
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 class JARM:
+    # seconds to wait for all the server hellos of a target
+    timeout = 20
+    # max number of targets probed at the same time by all JARM objects,
+    # each one uses 10 sockets
+    max_concurrent_targets = 4
+    targets_semaphore = threading.BoundedSemaphore(max_concurrent_targets)
+    # the hash of a target that timed out or didn't reply to any probe
+    empty_hash = "0" * 62
+
     # Randomly choose a grease value
     def choose_grease(self):
         grease_list = [
@@ -413,35 +425,35 @@ class JARM:
         return ext
 
     # Send the assembled client hello using a socket
-    def send_packet(self, packet):
+    def send_packet(
+        self, packet, destination_host, destination_port, deadline
+    ):
+        # all the hellos of the same target share the deadline
+        timeout = max(deadline - time.time(), 0.001)
         try:
             # Determine if the input is an IP or domain name
             try:
                 if (
-                    type(ipaddress.ip_address(self.destination_host))
+                    type(ipaddress.ip_address(destination_host))
                     == ipaddress.IPv4Address
                 ) or (
-                    type(ipaddress.ip_address(self.destination_host))
+                    type(ipaddress.ip_address(destination_host))
                     == ipaddress.IPv6Address
                 ):
                     raw_ip = True
-                    ip = (self.destination_host, self.destination_port)
+                    ip = (destination_host, destination_port)
             except ValueError:
                 ip = (None, None)
                 raw_ip = False
             # Connect the socket
-            if ":" in self.destination_host:
+            if ":" in destination_host:
                 sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-                # Timeout of 20 seconds
-                sock.settimeout(20)
-                sock.connect(
-                    (self.destination_host, self.destination_port, 0, 0)
-                )
+                sock.settimeout(timeout)
+                sock.connect((destination_host, destination_port, 0, 0))
             else:
                 sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                # Timeout of 20 seconds
-                sock.settimeout(20)
-                sock.connect((self.destination_host, self.destination_port))
+                sock.settimeout(timeout)
+                sock.connect((destination_host, destination_port))
             # Resolve IP if given a domain name
             if raw_ip == False:
                 ip = sock.getpeername()
@@ -568,7 +580,7 @@ class JARM:
     def jarm_hash(self, jarm_raw):
         # If jarm is empty, 62 zeros for the hash
         if jarm_raw == "|||,|||,|||,|||,|||,|||,|||,|||,|||,|||":
-            return "0" * 62
+            return JARM.empty_hash
         fuzzy_hash = ""
         handshakes = jarm_raw.split(",")
         alpns_and_ext = ""
@@ -686,7 +698,7 @@ class JARM:
     def get_hash(self, jarm_raw):
         # If jarm is empty, 62 zeros for the hash
         if jarm_raw == "|||,|||,|||,|||,|||,|||,|||,|||,|||,|||":
-            return "0" * 62
+            return JARM.empty_hash
         fuzzy_hash = ""
         handshakes = jarm_raw.split(",")
         alpns_and_ext = ""
@@ -858,8 +870,6 @@ class JARM:
         return selected_ciphers
 
     def JARM_hash(self, destination_host, destination_port=443) -> str:
-        self.destination_host = destination_host
-        self.destination_port = destination_port
         # Select the packets and formats to send
         # Array format = [destination_host,destination_port,version,cipher_list,cipher_order,GREASE,RARE_APLN,1.3_SUPPORT,extension_orders]
         tls1_2_forward = [
@@ -990,22 +1000,30 @@ class JARM:
             tls1_3_invalid,
             tls1_3_middle_out,
         ]
-        jarm = ""
-        # Assemble, send, and decipher each packet
-        iterate = 0
-        while iterate < len(queue):
-            payload = self.packet_building(queue[iterate])
-            server_hello, ip = self.send_packet(payload)
-            # Deal with timeout error
-            if server_hello == "TIMEOUT":
-                jarm = "|||,|||,|||,|||,|||,|||,|||,|||,|||,|||"
-                break
-            ans = self.read_packet(server_hello, queue[iterate])
-            jarm += ans
-            iterate += 1
-            if iterate == len(queue):
-                break
-            else:
-                jarm += ","
+        # send all the hellos concurrently
+        with self.targets_semaphore:
+            deadline = time.time() + self.timeout
+            with ThreadPoolExecutor(max_workers=len(queue)) as executor:
+                server_hellos = list(
+                    executor.map(
+                        lambda jarm_details: self.send_packet(
+                            self.packet_building(jarm_details),
+                            destination_host,
+                            destination_port,
+                            deadline,
+                        )[0],
+                        queue,
+                    )
+                )
+
+        # Deal with timeout error
+        if "TIMEOUT" in server_hellos:
+            jarm = "|||,|||,|||,|||,|||,|||,|||,|||,|||,|||"
+        else:
+            # decipher each packet
+            jarm = ",".join(
+                self.read_packet(server_hello, jarm_details)
+                for server_hello, jarm_details in zip(server_hellos, queue)
+            )
         # Fuzzy hash
         return self.get_hash(jarm)
@@ -79,11 +79,12 @@ class Redis{
     getDNSResolution(ip){
       return new Promise((resolve,reject)=>{
         var resolved_dns = '';
-        this.db.hget('DNSresolution',ip,(err,value)=> {
+        this.db.zrange('DNSresolution_'+ip+'_domains',0,-1,(err,value)=> {
           if(err){console.log('Error in getDNSResolution() in kalipso_redis.js. Error: ',err);
                   reject(resolved_dns)}
           else{
-            if(value == null){value = ''}
+            if(value == null || value.length == 0){value = ''}
+            else{value = JSON.stringify(value)}
             resolved_dns = value
             resolve(resolved_dns)
           }
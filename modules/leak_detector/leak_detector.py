@@ -4,14 +4,26 @@ import time
 import binascii
 import os
 import subprocess
-import json
 import shutil
 from typing import (
     Dict,
+    Iterable,
     List,
+    Optional,
 )
 from uuid import uuid4
 
+try:
+    import yara
+except ImportError:
+    # the yara python bindings aren't installed, use the yara binary
+    yara = None
+
+from modules.leak_detector.pcap_index import (
+    PacketInfo,
+    PcapIndex,
+)
+
 from slips_files.common.slips_utils import utils
 from slips_files.common.abstracts.module import IModule
 from slips_files.core.structures.evidence import (
@@ -45,8 +57,15 @@ class LeakDetector(IModule):
         self.compiled_yara_rules_path = (
             "modules/leak_detector/yara_rules/compiled/"
         )
+        # used to find the packets of the yara matches
+        self.packet_index: Optional[PcapIndex] = None
+        # {offset: info of the packet at this offset}
+        self.packets_info: Dict[int, Optional[PacketInfo]] = {}
+        # all the yara rules compiled in 1 ruleset, only used when the
+        # yara python bindings are installed
+        self.rules = None
         self.bin_found = False
-        if self.is_yara_installed():
+        if yara or self.is_yara_installed():
             self.bin_found = True
 
     def is_yara_installed(self) -> bool:
@@ -64,112 +83,24 @@ class LeakDetector(IModule):
         )
         return False
 
-    def fix_json_packet(self, json_packet):
+    def resolve_offsets(self, offsets: Iterable[int]):
         """
-        in very large pcaps, tshark gets killed before it's done processing,
-        but the first packet info is printed in a corrupted json format
-        this function fixes the printed packet
+        finds and decodes the packets at all the given offsets at once.
+        the pcap is only indexed the first time this is called
         """
-        json_packet = json_packet.replace("Killed", "")
-        json_packet += "}]"
-        try:
-            return json.loads(json_packet)
-        except json.decoder.JSONDecodeError:
-            return False
+        if not self.packet_index:
+            self.packet_index = PcapIndex(self.pcap)
+        self.packets_info.update(self.packet_index.get_packets_info(offsets))
 
-    def get_packet_info(self, offset: int):
+    def get_packet_info(self, offset: int) -> Optional[PacketInfo]:
         """
-        Parse pcap and determine the packet at this offset
-        returns  a tuple with packet info (srcip, dstip, proto, sport, dport, ts) or False if not found
+        Determine the packet at this offset
+        returns  a tuple with packet info (srcip, dstip, proto, sport, dport, ts) or None if not found
         """
         offset = int(offset)
-        with open(self.pcap, "rb") as f:
-            # every pcap header is 24 bytes
-            f.read(24)
-            packet_number = 0
-
-            packet_data_length = True
-            while packet_data_length:
-                # the number of the packet we're currently working with,
-                # since packets start from 1 in tshark,
-                # the first packet should be 1
-                packet_number += 1
-                # this offset is exactly when the packet starts
-                start_offset = f.tell() + 1
-                # get the Packet header, every packet header is exactly 16 bytes long
-                packet_header = f.read(16)
-                # get the length of the Packet Data field
-                # (the second last 4 bytes of the header),
-                # [::-1] for little endian
-                packet_data_length = packet_header[8:12][::-1]
-                # convert the hex into decimal
-                packet_length_in_decimal = int.from_bytes(
-                    packet_data_length, "big"
-                )
-
-                # read until the end of this packet
-                f.read(packet_length_in_decimal)
-                # this offset is exactly when the packet ends
-                end_offset = f.tell()
-                if offset <= end_offset and offset >= start_offset:
-                    # print(f"Found a match. Packet number in wireshark: {packet_number+1}")
-                    # use tshark to get packet info
-                    cmd = f'tshark -r "{self.pcap}" -T json -Y frame.number=={packet_number}'
-                    tshark_proc = subprocess.Popen(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.DEVNULL,
-                        stdin=subprocess.PIPE,
-                        shell=True,
-                    )
-
-                    result, error = tshark_proc.communicate()
-                    if error:
-                        self.print(
-                            f"tshark error {tshark_proc.returncode}: {error.strip()}"
-                        )
-                        return
-
-                    json_packet: str = result.decode()
-
-                    try:
-                        json_packet: List[Dict[str, str]] = json.loads(
-                            json_packet
-                        )
-                    except json.decoder.JSONDecodeError:
-                        json_packet = self.fix_json_packet(json_packet)
-
-                    if json_packet:
-                        # sometime tshark can't find the desired packet?
-                        json_packet = json_packet[0]["_source"]["layers"]
-
-                        # get ip family and used protocol
-                        used_protocols = json_packet["frame"][
-                            "frame.protocols"
-                        ]
-                        ip_family = (
-                            "ipv6" if "ipv6" in used_protocols else "ip"
-                        )
-                        if "tcp" in used_protocols:
-                            proto = "tcp"
-                        elif "udp" in used_protocols:
-                            proto = "udp"
-                        else:
-                            # probably ipv6.hopopt
-                            return
-
-                        try:
-                            ts = json_packet["frame"]["frame.time_epoch"]
-                            srcip = json_packet[ip_family][f"{ip_family}.src"]
-                            dstip = json_packet[ip_family][f"{ip_family}.dst"]
-                            sport = json_packet[proto][f"{proto}.srcport"]
-                            dport = json_packet[proto][f"{proto}.dstport"]
-                        except KeyError:
-                            return
-
-                        return srcip, dstip, proto, sport, dport, ts
-
-        return False
+        if offset not in self.packets_info:
+            self.resolve_offsets([offset])
+        return self.packets_info[offset]
 
     def set_evidence_yara_match(self, info: dict):
         """
@@ -203,10 +134,6 @@ class LeakDetector(IModule):
         # generate a random uid
         uid = base64.b64encode(binascii.b2a_hex(os.urandom(9))).decode("utf-8")
         profileid = f"profile_{srcip}"
-        # sometimes this module tries to find the profile before it's created. so
-        # wait a while before alerting.
-        time.sleep(4)
-
         description = (
             f"{rule} to destination address: {dstip} "
             f"port: {portproto} {port_info or ''}. "
@@ -267,8 +194,13 @@ class LeakDetector(IModule):
 
     def compile_and_save_rules(self):
         """
-        Compile and save all yara rules in the compiled_yara_rules_path
+        Compile all yara rules. when the yara python bindings are
+        installed, they're compiled once into 1 ruleset in memory,
+        otherwise they're compiled and saved in the
+        compiled_yara_rules_path
         """
+        if yara:
+            return self.compile_rules()
 
         try:
             os.mkdir(self.compiled_yara_rules_path)
@@ -294,6 +226,22 @@ class LeakDetector(IModule):
                 return False
         return True
 
+    def compile_rules(self) -> bool:
+        """
+        Compiles all yara rules into 1 ruleset using the yara python
+        bindings, each rule file is a separate namespace
+        """
+        filepaths = {
+            yara_rule: os.path.join(self.yara_rules_path, yara_rule)
+            for yara_rule in os.listdir(self.yara_rules_path)
+        }
+        try:
+            self.rules = yara.compile(filepaths=filepaths)
+        except yara.Error as e:
+            self.print(f"Error compiling the yara rules: {e}")
+            return False
+        return True
+
     def delete_compiled_rules(self):
         """
         delete old YARA compiled rules when a new version of yara is being used
@@ -301,8 +249,38 @@ class LeakDetector(IModule):
         shutil.rmtree(self.compiled_yara_rules_path)
         os.mkdir(self.compiled_yara_rules_path)
 
-    def find_matches(self):
-        """Run yara rules on the given pcap and find matches"""
+    def find_matches_in_process(self) -> List[dict]:
+        """
+        Scans the pcap with all the compiled rules at once using
+        the yara python bindings
+        """
+        matches: List[dict] = []
+        try:
+            # fast mode stops searching for strings when they
+            # were already found
+            yara_matches = self.rules.match(self.pcap, fast=True)
+        except yara.Error as e:
+            self.print(f"YARA error: {e}")
+            return matches
+
+        for yara_match in yara_matches:
+            for string in yara_match.strings:
+                for instance in string.instances:
+                    matches.append(
+                        {
+                            "rule": yara_match.rule,
+                            "vars_matched": string.identifier.replace("$", ""),
+                            "strings_matched": instance.matched_data.decode(
+                                "utf-8", "replace"
+                            ),
+                            "offset": instance.offset,
+                        }
+                    )
+        return matches
+
+    def find_matches_using_cli(self) -> List[dict]:
+        """Run the compiled yara rules on the given pcap using the yara bin"""
+        matches: List[dict] = []
         for compiled_rule in os.listdir(self.compiled_yara_rules_path):
             compiled_rule_path = os.path.join(
                 self.compiled_yara_rules_path, compiled_rule
@@ -329,15 +307,17 @@ class LeakDetector(IModule):
                     self.delete_compiled_rules()
                     # will re-compile and save rules again and try to find matches
                     self.run()
+                    # the matches are handled by the new run
+                    return []
                 else:
                     self.print(
                         f"YARA error {yara_proc.returncode}: {error.strip()}"
                     )
-                    return
+                    return matches
 
             if not lines:
                 # no match
-                return
+                continue
 
             lines = lines.splitlines()
             matching_rule = lines[0].split()[0]
@@ -352,7 +332,7 @@ class LeakDetector(IModule):
                 # strings_matched is exactly the string that was found that triggered this detection
                 # starts from the var until the end of the line
                 strings_matched = " ".join(list(line[2:]))
-                self.set_evidence_yara_match(
+                matches.append(
                     {
                         "rule": matching_rule,
                         "vars_matched": var,
@@ -361,6 +341,26 @@ class LeakDetector(IModule):
                     }
                 )
 
+        return matches
+
+    def find_matches(self):
+        """Run yara rules on the given pcap and find matches"""
+        if self.rules:
+            matches = self.find_matches_in_process()
+        else:
+            matches = self.find_matches_using_cli()
+
+        if not matches:
+            return
+
+        # find the packets of all matches in 1 pass over the pcap
+        self.resolve_offsets(match["offset"] for match in matches)
+        # sometimes this module tries to find the profile before it's created. so
+        # wait a while before alerting.
+        time.sleep(4)
+        for match in matches:
+            self.set_evidence_yara_match(match)
+
     def pre_main(self):
         utils.drop_root_privs()
 
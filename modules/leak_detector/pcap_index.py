@@ -0,0 +1,211 @@
+import ipaddress
+import mmap
+import os
+import struct
+from bisect import bisect_right
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+# (srcip, dstip, proto, sport, dport, ts)
+PacketInfo = Tuple[str, str, str, int, int, float]
+
+# every pcap header is 24 bytes
+PCAP_HEADER_LEN = 24
+# every packet header is exactly 16 bytes long
+PACKET_HEADER_LEN = 16
+# {magic number: ts fraction per second}
+PCAP_MAGIC_NUMBERS = {
+    0xA1B2C3D4: 1_000_000,
+    0xA1B23C4D: 1_000_000_000,
+}
+# link layer types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101)
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+# the address families used by BSD loopback for ipv6
+BSD_AF_INET6 = (24, 28, 30)
+# ipv6 extension headers we can skip to find the transport header
+IPV6_EXTENSION_HEADERS = (0, 43, 44, 51, 60)
+TRANSPORT_PROTOCOLS = {6: "tcp", 17: "udp"}
+
+
+class PcapIndex:
+    """
+    Maps byte offsets of a pcap to the packets containing them.
+    The pcap is read once to build the index, the packets are then
+    decoded directly from the pcap without using tshark
+    """
+
+    def __init__(self, pcap: str):
+        self.pcap = pcap
+        # the offsets where each packet header starts. the index of
+        # the offset in this list is the packet number - 1
+        self.packet_offsets: List[int] = []
+        # "<" or ">"
+        self.byte_order = "<"
+        self.ts_fraction = 1_000_000
+        self.linktype = LINKTYPE_ETHERNET
+        self.build()
+
+    def build(self):
+        """walks the packet headers of the pcap and stores their offsets"""
+        if os.path.getsize(self.pcap) < PCAP_HEADER_LEN:
+            return
+
+        with open(self.pcap, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pcap:
+                self.parse_pcap_header(pcap)
+                packet_header = struct.Struct(f"{self.byte_order}8xI4x")
+                offset = PCAP_HEADER_LEN
+                while offset + PACKET_HEADER_LEN <= len(pcap):
+                    self.packet_offsets.append(offset)
+                    (packet_length,) = packet_header.unpack_from(pcap, offset)
+                    offset += PACKET_HEADER_LEN + packet_length
+
+    def parse_pcap_header(self, pcap: mmap.mmap):
+        for byte_order in ("<", ">"):
+            (magic,) = struct.unpack_from(f"{byte_order}I", pcap, 0)
+            if magic in PCAP_MAGIC_NUMBERS:
+                self.byte_order = byte_order
+                self.ts_fraction = PCAP_MAGIC_NUMBERS[magic]
+                break
+        (self.linktype,) = struct.unpack_from(f"{self.byte_order}I", pcap, 20)
+
+    def get_packet_number(self, offset: int) -> Optional[int]:
+        """
+        returns the number of the packet containing the given offset,
+        starting from 1 like tshark
+        """
+        if offset < PCAP_HEADER_LEN:
+            return None
+        packet_number = bisect_right(self.packet_offsets, offset)
+        return packet_number or None
+
+    def get_packets_info(
+        self, offsets: Iterable[int]
+    ) -> Dict[int, Optional[PacketInfo]]:
+        """
+        decodes the packets containing the given offsets, reading each
+        packet only once
+        :return: {offset: packet info or None if the packet isn't a
+        tcp or udp packet}
+        """
+        packet_numbers = {
+            offset: self.get_packet_number(int(offset)) for offset in offsets
+        }
+        decoded: Dict[int, Optional[PacketInfo]] = {}
+        if not any(packet_numbers.values()):
+            return dict.fromkeys(packet_numbers)
+
+        with open(self.pcap, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pcap:
+                for packet_number in sorted(
+                    set(filter(None, packet_numbers.values()))
+                ):
+                    decoded[packet_number] = self.decode_packet(
+                        pcap, self.packet_offsets[packet_number - 1]
+                    )
+
+        return {
+            offset: decoded.get(packet_number)
+            for offset, packet_number in packet_numbers.items()
+        }
+
+    def decode_packet(
+        self, pcap: mmap.mmap, offset: int
+    ) -> Optional[PacketInfo]:
+        ts_sec, ts_fraction, packet_length = struct.unpack_from(
+            f"{self.byte_order}III4x", pcap, offset
+        )
+        ts = ts_sec + ts_fraction / self.ts_fraction
+        start = offset + PACKET_HEADER_LEN
+        packet: bytes = pcap[start : start + packet_length]
+        try:
+            return self.decode_link_layer(packet, ts)
+        except (struct.error, ValueError, IndexError):
+            # truncated or malformed packet
+            return None
+
+    def decode_link_layer(
+        self, packet: bytes, ts: float
+    ) -> Optional[PacketInfo]:
+        if self.linktype == LINKTYPE_ETHERNET:
+            (ethertype,) = struct.unpack_from("!H", packet, 12)
+            header_len = 14
+            while ethertype in ETHERTYPE_VLAN:
+                (ethertype,) = struct.unpack_from("!H", packet, header_len + 2)
+                header_len += 4
+            return self.decode_ethertype(ethertype, packet[header_len:], ts)
+
+        if self.linktype == LINKTYPE_LINUX_SLL:
+            (ethertype,) = struct.unpack_from("!H", packet, 14)
+            return self.decode_ethertype(ethertype, packet[16:], ts)
+
+        if self.linktype == LINKTYPE_LINUX_SLL2:
+            (ethertype,) = struct.unpack_from("!H", packet, 0)
+            return self.decode_ethertype(ethertype, packet[20:], ts)
+
+        if self.linktype == LINKTYPE_NULL:
+            # the family is in the byte order of the host that captured it
+            (family,) = struct.unpack_from(f"{self.byte_order}I", packet, 0)
+            ethertype = (
+                ETHERTYPE_IPV6 if family in BSD_AF_INET6 else ETHERTYPE_IPV4
+            )
+            return self.decode_ethertype(ethertype, packet[4:], ts)
+
+        if self.linktype in (*LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+            ethertype = (
+                ETHERTYPE_IPV6 if packet[0] >> 4 == 6 else ETHERTYPE_IPV4
+            )
+            return self.decode_ethertype(ethertype, packet, ts)
+
+        return None
+
+    def decode_ethertype(
+        self, ethertype: int, packet: bytes, ts: float
+    ) -> Optional[PacketInfo]:
+        if ethertype == ETHERTYPE_IPV4:
+            header_len = (packet[0] & 0x0F) * 4
+            protocol = packet[9]
+            srcip = str(ipaddress.IPv4Address(bytes(packet[12:16])))
+            dstip = str(ipaddress.IPv4Address(bytes(packet[16:20])))
+        elif ethertype == ETHERTYPE_IPV6:
+            protocol = packet[6]
+            srcip = str(ipaddress.IPv6Address(bytes(packet[8:24])))
+            dstip = str(ipaddress.IPv6Address(bytes(packet[24:40])))
+            header_len = 40
+            while protocol in IPV6_EXTENSION_HEADERS:
+                next_header, length = (
+                    packet[header_len],
+                    packet[header_len + 1],
+                )
+                if protocol == 44:
+                    # fragment headers have a fixed length
+                    header_len += 8
+                elif protocol == 51:
+                    header_len += (length + 2) * 4
+                else:
+                    header_len += (length + 1) * 8
+                protocol = next_header
+        else:
+            return None
+
+        proto = TRANSPORT_PROTOCOLS.get(protocol)
+        if not proto:
+            return None
+
+        sport, dport = struct.unpack_from("!HH", packet, header_len)
+        return srcip, dstip, proto, sport, dport, ts
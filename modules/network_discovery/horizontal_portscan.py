@@ -36,9 +36,7 @@ class HorizontalPortscan:
         dstips_to_discard = []
         # Remove dstips that have DNS resolution already
         for dip in dstips:
-            dns_resolution = self.db.get_dns_resolution(dip)
-            dns_resolution = dns_resolution.get("domains", [])
-            if dns_resolution:
+            if self.db.get_domains_of_resolved_ip(dip):
                 dstips_to_discard.append(dip)
         return dstips_to_discard
 
@@ -1,12 +1,21 @@
 import sqlite3
 import datetime
 import time
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Tuple,
+)
 from slips_files.common.printer import Printer
 from slips_files.core.output import Output
 
 
 class TrustDB:
     name = "P2P Trust DB"
+    # max number of ips in 1 query, sqlite limits the number of
+    # parameters of each query
+    max_ips_per_query = 500
 
     def __init__(
         self,
@@ -77,6 +86,30 @@ class TrustDB:
             "network_score REAL NOT NULL, "
             "update_time DATE NOT NULL);"
         )
+        self.create_indexes()
+
+    def create_indexes(self):
+        """
+        creates covering indexes for the columns used to compute the
+        opinion on ips, so the lookups don't scan the tables
+        """
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS reports_reported_key_idx "
+            "ON reports (key_type, reported_key, update_time, "
+            "reporter_peerid, score, confidence);"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS peer_ips_peerid_idx "
+            "ON peer_ips (peerid, update_time, ipaddress);"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS go_reliability_peerid_idx "
+            "ON go_reliability (peerid, update_time, reliability);"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS slips_reputation_ipaddress_idx "
+            "ON slips_reputation (ipaddress, update_time, score, confidence);"
+        )
 
     def delete_tables(self):
         self.conn.execute("DROP TABLE IF EXISTS opinion_cache;")
@@ -252,7 +285,8 @@ class TrustDB:
             "FROM go_reliability "
             "WHERE peerid = ? "
             "ORDER BY update_time DESC "
-            "LIMIT 1;"
+            "LIMIT 1;",
+            (reporter_peerid,),
         )
         if res := go_reliability_cur.fetchone():
             return res[0]
@@ -279,45 +313,78 @@ class TrustDB:
         Returns a list of tuples, where each tuple contains the report score, report confidence,
         reporter reliability, reporter score, and reporter confidence for a given IP address.
         """
-        reports = self.get_reports_for_ip(ipaddress)
-        reporters_scores = []
+        return self.get_opinions_on_ips([ipaddress])[ipaddress]
 
-        for (
-            reporter_peerid,
-            report_timestamp,
-            report_score,
-            report_confidence,
-            reported_ip,
-        ) in reports:
-            reporter_ipaddress = self.get_reporter_ip(
-                reporter_peerid, report_timestamp
-            )
-            if reporter_ipaddress == ipaddress:
-                continue
-
-            reporter_reliability = self.get_reporter_reliability(
-                reporter_peerid
-            )
-            if reporter_reliability is None:
-                continue
-
-            reporter_score, reporter_confidence = self.get_reporter_reputation(
-                reporter_ipaddress
-            )
-            if reporter_score is None or reporter_confidence is None:
-                continue
-
-            reporters_scores.append(
-                (
-                    report_score,
-                    report_confidence,
-                    reporter_reliability,
-                    reporter_score,
-                    reporter_confidence,
-                )
-            )
-
-        return reporters_scores
+    def get_opinions_on_ips(
+        self, ipaddresses: Iterable[str]
+    ) -> Dict[str, List[Tuple[float, float, float, float, float]]]:
+        """
+        Same as get_opinion_on_ip() but for many IPs at once
+        :return: {ip: [(report score, report confidence,
+        reporter reliability, reporter score, reporter confidence)]}
+        """
+        ipaddresses = list(dict.fromkeys(ipaddresses))
+        opinions = {ip: [] for ip in ipaddresses}
+        for i in range(0, len(ipaddresses), self.max_ips_per_query):
+            chunk = ipaddresses[i : i + self.max_ips_per_query]
+            for reported_ip, *opinion in self.query_opinions(chunk):
+                opinions[reported_ip].append(tuple(opinion))
+        return opinions
+
+    def query_opinions(self, ipaddresses: List[str]) -> List[tuple]:
+        """
+        Gets the reports on the given IPs with the credentials of each
+        reporter in 1 query. for each report, the reporter's IP is the
+        latest IP of the reporter at the time of the report, and the
+        reporter's reliability and reputation are the latest ones.
+        reports by reporters with unknown IP, reliability or reputation,
+        and reports by the reported IP itself are skipped.
+        :return: [(reported ip, report score, report confidence,
+        reporter reliability, reporter score, reporter confidence)]
+        sorted by the report time, latest first
+        """
+        placeholders = ", ".join("?" * len(ipaddresses))
+        cur = self.conn.execute(
+            # each report with the ip of the reporter at the time of
+            # the report
+            "WITH ip_reports AS ("
+            "  SELECT reports.reporter_peerid, reports.reported_key, "
+            "         reports.score, reports.confidence, "
+            "         reports.update_time, "
+            "         peer_ips.ipaddress AS reporter_ip, "
+            "         ROW_NUMBER() OVER ("
+            "           PARTITION BY reports.id "
+            "           ORDER BY peer_ips.update_time DESC"
+            "         ) AS row_number "
+            "  FROM reports "
+            "  JOIN peer_ips "
+            "    ON peer_ips.peerid = reports.reporter_peerid "
+            "   AND peer_ips.update_time <= reports.update_time "
+            "  WHERE reports.key_type = 'ip' "
+            f"   AND reports.reported_key IN ({placeholders})"
+            ") "
+            "SELECT ip_reports.reported_key, ip_reports.score, "
+            "       ip_reports.confidence, go_reliability.reliability, "
+            "       slips_reputation.score, slips_reputation.confidence "
+            "FROM ip_reports "
+            # the latest reliability of the reporter
+            "JOIN go_reliability ON go_reliability.id = ("
+            "  SELECT id FROM go_reliability "
+            "  WHERE peerid = ip_reports.reporter_peerid "
+            "  ORDER BY update_time DESC LIMIT 1"
+            ") "
+            # the latest reputation of the reporter's ip
+            "JOIN slips_reputation ON slips_reputation.id = ("
+            "  SELECT id FROM slips_reputation "
+            "  WHERE ipaddress = ip_reports.reporter_ip "
+            "  ORDER BY update_time DESC LIMIT 1"
+            ") "
+            "WHERE ip_reports.row_number = 1 "
+            "  AND ip_reports.reporter_ip != ip_reports.reported_key "
+            "ORDER BY ip_reports.update_time DESC;",
+            ipaddresses,
+        )
+        return cur.fetchall()
 
 
 if __name__ == "__main__":
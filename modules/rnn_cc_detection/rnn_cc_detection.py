@@ -1,6 +1,13 @@
 import warnings
 import json
-from typing import Dict
+import time
+from collections import OrderedDict
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
 from uuid import uuid4
 
 import numpy as np
@@ -34,10 +41,36 @@ class CCDetection(IModule):
     name = "RNN C&C Detection"
     description = "Detect C&C channels based on behavioral letters"
     authors = ["Sebastian Garcia", "Kamila Babayeva", "Ondrej Lukas"]
+    # Length of behavioral model with which we trained our module
+    max_length = 500
+    # Convert each of the stratosphere letters to an integer. There are 50
+    vocabulary = "abcdefghiABCDEFGHIrstuvwxyzRSTUVWXYZ1234567890,.+*"
+    # This is a simple encoding that is not one-hot.
+    # maps the ascii code of each letter to its integer, letters that are
+    # not in the vocabulary are -1
+    letters_lookup = np.full(256, -1.0)
+    letters_lookup[
+        np.frombuffer(vocabulary.encode("ascii"), dtype=np.uint8)
+    ] = np.arange(len(vocabulary), dtype=float)
 
     def init(self):
         self.subscribe_to_channels()
         self.exporter = StratoLettersExporter(self.db)
+        # new_letters msgs waiting to be scored.
+        # only the latest msg of each tuple is kept, since its letters
+        # contain the letters of the previous msgs
+        # {(profileid, twid, tupleid): msg}
+        self.pending_sequences: Dict[Tuple[str, str, str], dict] = {}
+        # the pending sequences are scored in 1 call to the model once
+        # there are batch_size of them, or batch_timeout seconds after the
+        # first one was received, whichever comes first
+        self.batch_size = 64
+        self.batch_timeout = 0.5
+        self.batch_start_time: Optional[float] = None
+        # LRU cache of the scores of the sequences we scored before
+        # {sequence: score}
+        self.scores_cache: OrderedDict[str, float] = OrderedDict()
+        self.scores_cache_size = 10000
 
     def subscribe_to_channels(self):
         self.c1 = self.db.subscribe("new_letters")
@@ -124,50 +157,47 @@ class CCDetection(IModule):
 
         self.db.set_evidence(evidence)
 
-    def convert_input_for_module(self, pre_behavioral_model):
+    def is_valid_sequence(self, pre_behavioral_model: str) -> bool:
+        """checks that all the letters are in the vocabulary"""
+        try:
+            letters = np.frombuffer(
+                pre_behavioral_model.encode("ascii"), dtype=np.uint8
+            )
+        except UnicodeEncodeError:
+            return False
+        return bool((self.letters_lookup[letters] >= 0).all())
+
+    def convert_input_for_module(
+        self, pre_behavioral_models: List[str]
+    ) -> np.ndarray:
         """
         Takes the input from the letters and converts them
         to whatever is needed by the model
-        The pre_behavioral_model is a 1D array of letters in an array
+        The pre_behavioral_models is a list of strings of letters, the
+        letters should be in the vocabulary
+        returns an array of shape (len(pre_behavioral_models), 500, 1)
         """
-        # TODO: set the max_length in the function call
-
-        # Length of behavioral model with which we trained our module
-        max_length = 500
-
-        # Convert each of the stratosphere letters to an integer. There are 50
-        vocabulary = list("abcdefghiABCDEFGHIrstuvwxyzRSTUVWXYZ1234567890,.+*")
-        int_of_letters = {}
-
-        # This is a simple encoding that is not one-hot.
-        for i, letter in enumerate(vocabulary):
-            int_of_letters[letter] = float(i)
-
-        # String to test
-        # pre_behavioral_model = "88*y*y*h*h*h*h*h*h*h*y*y*h*h*h*y*y*"
-
-        # Be sure only max_length chars come. Not sure why we receive more
-        pre_behavioral_model = pre_behavioral_model[:max_length]
-
-        # Add padding to the letters passed
-        # self.print(f'Seq sent: {pre_behavioral_model}')
-        pre_behavioral_model += "0" * (max_length - len(pre_behavioral_model))
-        # self.print(f'Padded Seq sent: {pre_behavioral_model}')
-
-        # Convert to ndarray
-        pre_behavioral_model = np.array(
-            [[int_of_letters[i]] for i in pre_behavioral_model]
+        # pad with "0" to max_length
+        padding: float = self.letters_lookup[ord("0")]
+        behavioral_models = np.full(
+            (len(pre_behavioral_models), self.max_length), padding
         )
-        # self.print(f'The sequence has shape {pre_behavioral_model.shape}')
+        for row, pre_behavioral_model in enumerate(pre_behavioral_models):
+            # Be sure only max_length chars come. Not sure why we
+            # receive more
+            letters = np.frombuffer(
+                pre_behavioral_model[: self.max_length].encode("ascii"),
+                dtype=np.uint8,
+            )
+            behavioral_models[row, : len(letters)] = self.letters_lookup[
+                letters
+            ]
 
-        # Reshape into (1, 500, 1) We need the first 1, because this is one sample only, but keras expects a 3d vector
-        pre_behavioral_model = np.reshape(
-            pre_behavioral_model, (1, max_length, 1)
+        # Reshape into (n, 500, 1) keras expects a 3d vector
+        return behavioral_models.reshape(
+            (len(pre_behavioral_models), self.max_length, 1)
         )
 
-        # self.print(f'Post Padded Seq sent: {pre_behavioral_model}. Shape: {pre_behavioral_model.shape}')
-        return pre_behavioral_model
-
     def get_confidence(self, pre_behavioral_model):
         threshold_confidence = 100
         if len(pre_behavioral_model) >= threshold_confidence:
@@ -176,8 +206,10 @@ class CCDetection(IModule):
         return len(pre_behavioral_model) / threshold_confidence
 
     def handle_new_letters(self, msg: Dict):
-        """handles msgs from the tw_closed channel"""
-
+        """
+        handles msgs from the new_letters channel
+        adds the letters of the tuple to the sequences waiting to be scored
+        """
         msg = msg["data"]
         msg = json.loads(msg)
         pre_behavioral_model = msg["new_symbol"]
@@ -194,51 +226,111 @@ class CCDetection(IModule):
         if "established" not in state.lower():
             return
 
-        # to reduce false positives
-        threshold = 0.99
+        if not self.is_valid_sequence(pre_behavioral_model):
+            self.print(
+                f"Unable to score the sequence: {pre_behavioral_model}", 0, 3
+            )
+            return
+
+        if not self.pending_sequences:
+            self.batch_start_time = time.time()
+        self.pending_sequences[(profileid, twid, tupleid)] = msg
+
+    def is_batch_ready(self) -> bool:
+        if not self.pending_sequences:
+            return False
+        return (
+            len(self.pending_sequences) >= self.batch_size
+            or time.time() - self.batch_start_time >= self.batch_timeout
+        )
+
+    def get_cached_score(self, sequence: str) -> Optional[float]:
+        score = self.scores_cache.get(sequence)
+        if score is not None:
+            self.scores_cache.move_to_end(sequence)
+        return score
+
+    def cache_score(self, sequence: str, score: float):
+        self.scores_cache[sequence] = score
+        self.scores_cache.move_to_end(sequence)
+        if len(self.scores_cache) > self.scores_cache_size:
+            # remove the least recently used
+            self.scores_cache.popitem(last=False)
+
+    def score_pending_sequences(self):
+        """
+        predicts the score of all the pending sequences with 1 call to
+        the model, the scores of the sequences we saw before are taken from
+        the cache
+        """
+        pending, self.pending_sequences = self.pending_sequences, {}
+        # {sequence: [msgs with this sequence]}
+        to_predict: Dict[str, List[dict]] = {}
+        for msg in pending.values():
+            # the model only sees the first max_length letters
+            sequence: str = msg["new_symbol"][: self.max_length]
+            score: Optional[float] = self.get_cached_score(sequence)
+            if score is None:
+                to_predict.setdefault(sequence, []).append(msg)
+                continue
+            self.handle_score(msg, score)
+
+        if not to_predict:
+            return
+
+        sequences: List[str] = list(to_predict)
         # function to convert each letter of behavioral model to ascii
-        behavioral_model = self.convert_input_for_module(pre_behavioral_model)
+        behavioral_models = self.convert_input_for_module(sequences)
         # predict the score of behavioral model being c&c channel
-        self.print(
-            f"predicting the sequence: {pre_behavioral_model}",
-            3,
-            0,
-        )
-        score = self.tcpmodel.predict(behavioral_model, verbose=0)
-        self.print(
-            f" >> sequence: {pre_behavioral_model}. "
-            f"final prediction score: {score[0][0]:.20f}",
-            3,
-            0,
-        )
-        # get a float instead of numpy array
-        score = score[0][0]
-        if score > threshold:
-            threshold_confidence = 100
-            if len(pre_behavioral_model) >= threshold_confidence:
-                confidence = 1
-            else:
-                confidence = len(pre_behavioral_model) / threshold_confidence
-            uid = msg["uid"]
-            stime = flow["starttime"]
-            self.set_evidence_cc_channel(
-                score,
-                confidence,
-                uid,
-                stime,
-                tupleid,
-                profileid,
-                twid,
+        self.print(f"predicting {len(sequences)} sequences", 3, 0)
+        scores = self.tcpmodel.predict(behavioral_models, verbose=0)
+        for sequence, score in zip(sequences, scores):
+            # get a float instead of numpy array
+            score = float(score[0])
+            self.print(
+                f" >> sequence: {sequence}. "
+                f"final prediction score: {score:.20f}",
+                3,
+                0,
             )
-            to_send = {
-                "attacker_type": utils.detect_ioc_type(flow["daddr"]),
-                "profileid": profileid,
-                "twid": twid,
-                "flow": flow,
-            }
-            # we only check malicious jarm hashes when there's a CC
-            # detection
-            self.db.publish("check_jarm_hash", json.dumps(to_send))
+            self.cache_score(sequence, score)
+            for msg in to_predict[sequence]:
+                self.handle_score(msg, score)
+
+    def handle_score(self, msg: dict, score: float):
+        """sets an evidence if the given score of the msg's letters is
+        high enough"""
+        # to reduce false positives
+        threshold = 0.99
+        if score <= threshold:
+            return
+
+        pre_behavioral_model = msg["new_symbol"]
+        profileid = msg["profileid"]
+        twid = msg["twid"]
+        tupleid = msg["tupleid"]
+        flow = msg["flow"]
+        confidence = self.get_confidence(pre_behavioral_model)
+        uid = msg["uid"]
+        stime = flow["starttime"]
+        self.set_evidence_cc_channel(
+            score,
+            confidence,
+            uid,
+            stime,
+            tupleid,
+            profileid,
+            twid,
+        )
+        to_send = {
+            "attacker_type": utils.detect_ioc_type(flow["daddr"]),
+            "profileid": profileid,
+            "twid": twid,
+            "flow": flow,
+        }
+        # we only check malicious jarm hashes when there's a CC
+        # detection
+        self.db.publish("check_jarm_hash", json.dumps(to_send))
 
     def handle_tw_closed(self, msg: Dict):
         """handles msgs from the tw_closed channel"""
@@ -247,6 +339,10 @@ class CCDetection(IModule):
         twid = profileid_tw[-1]
         self.exporter.export(profileid, twid)
 
+    def shutdown_gracefully(self):
+        # score the sequences that are still waiting
+        self.score_pending_sequences()
+
     def pre_main(self):
         utils.drop_root_privs()
         # TODO: set the decision threshold in the function call
@@ -263,5 +359,8 @@ class CCDetection(IModule):
         if msg := self.get_msg("new_letters"):
             self.handle_new_letters(msg)
 
+        if self.is_batch_ready():
+            self.score_pending_sequences()
+
         if msg := self.get_msg("tw_closed"):
             self.handle_tw_closed(msg)
@@ -145,8 +145,7 @@ class Timeline(IModule):
         """
         returns a list or a str with the dns resolution of the given ip
         """
-        dns_resolution: dict = self.db.get_dns_resolution(ip)
-        dns_resolution: list = dns_resolution.get("domains", [])
+        dns_resolution: list = self.db.get_domains_of_resolved_ip(ip)
 
         # we should take only one resolution, if there is more
         # than 3, because otherwise it does not fit in the timeline.
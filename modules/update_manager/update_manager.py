@@ -7,6 +7,7 @@ import time
 import traceback
 from typing import (
     IO,
+    Dict,
     Optional,
     Tuple,
 )
@@ -199,6 +200,14 @@ class UpdateManager(IModule):
         # there are ports that are by default considered unknown to slips,
         # but if it's known to be used by a specific organization, slips won't consider it 'unknown'.
         # in ports_info_filepath  we have a list of organizations range/ip and the port it's known to use
+        # {portproto: {"org_name": [..], "ip": [..]}}
+        ports: Dict[str, dict] = {}
+
+        def add_org_of_port(organization, ip, portproto):
+            org_info = ports.setdefault(portproto, {"org_name": [], "ip": []})
+            org_info["org_name"].append(organization)
+            org_info["ip"].append(ip)
+
         with open(ports_info_filepath, "r") as f:
             line_number = 0
             while True:
@@ -226,15 +235,11 @@ class UpdateManager(IModule):
 
                         for port in range(first_port, last_port + 1):
                             portproto = f"{port}/{proto}"
-                            self.db.set_organization_of_port(
-                                organization, ip, portproto
-                            )
+                            add_org_of_port(organization, ip, portproto)
                     else:
                         # it's a single port
                         portproto = f"{ports_range}/{proto}"
-                        self.db.set_organization_of_port(
-                            organization, ip, portproto
-                        )
+                        add_org_of_port(organization, ip, portproto)
 
                 except IndexError:
                     self.print(
@@ -243,8 +248,27 @@ class UpdateManager(IModule):
                         1,
                     )
                     continue
+
+        # replace the old info at once so the readers never use a
+        # partially loaded file
+        self.db.set_organizations_of_ports(ports)
         return line_number
 
+    def read_services(self, services_filepath):
+        """
+        Reads the port descriptions from slips_files/ports_info/services.csv
+        and store them in the db
+        """
+        ports_info: Dict[str, str] = {}
+        with open(services_filepath, "r") as f:
+            for line in f:
+                name = line.split(",")[0]
+                port = line.split(",")[1]
+                proto = line.split(",")[2]
+                # descr = line.split(',')[3]
+                ports_info[f"{str(port)}/{proto}"] = name
+        self.db.set_ports_info(ports_info)
+
     def update_local_file(self, file_path) -> bool:
         """
         Returns True if update was successful
@@ -255,13 +279,7 @@ class UpdateManager(IModule):
                 self.read_ports_info(file_path)
 
             elif "services.csv" in file_path:
-                with open(file_path, "r") as f:
-                    for line in f:
-                        name = line.split(",")[0]
-                        port = line.split(",")[1]
-                        proto = line.split(",")[2]
-                        # descr = line.split(',')[3]
-                        self.db.set_port_info(f"{str(port)}/{proto}", name)
+                self.read_services(file_path)
 
             # Store the new hash of file in the database
             file_info = {"hash": self.new_hash}
@@ -1418,9 +1436,23 @@ class UpdateManager(IModule):
     def update_whitelist(self):
         """
         parses the whitelist using the whitelist
-         parser and stores it in the db
+         parser and stores it in the db if it changed since the last
+         time it was parsed
         """
+        whitelist_path = self.whitelist.parser.whitelist_path
+        if not os.path.exists(whitelist_path):
+            return
+
+        if self.db.has_cached_whitelist() and not (
+            self.check_if_update_local_file(whitelist_path)
+        ):
+            # the whitelist parsed by the previous run is up to date
+            return
+
         self.whitelist.update()
+        self.db.set_ti_feed_info(
+            whitelist_path, {"hash": utils.get_sha256_hash(whitelist_path)}
+        )
 
     def update_org_files(self):
         for org in utils.supported_orgs:
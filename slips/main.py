@@ -10,7 +10,10 @@ import sys
 import time
 from datetime import datetime
 from distutils.dir_util import copy_tree
-from typing import Set
+from typing import (
+    Optional,
+    Set,
+)
 
 from managers.host_ip_manager import HostIPManager
 from managers.metadata_manager import MetadataManager
@@ -22,6 +25,10 @@ from slips_files.common.performance_profilers.cpu_profiler import CPUProfiler
 from slips_files.common.performance_profilers.memory_profiler import (
     MemoryProfiler,
 )
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    PipelineMetricsExporter,
+    create_pipeline_metrics_exporter,
+)
 from slips_files.common.printer import Printer
 from slips_files.common.slips_utils import utils
 from slips_files.common.style import green
@@ -50,6 +57,8 @@ class Main:
         self.last_updated_stats_time = datetime.now()
         self.input_type = False
         self.proc_man = ProcessManager(self)
+        # set once the db is started if pipeline_metrics_enable is set
+        self.metrics_exporter: Optional[PipelineMetricsExporter] = None
         # in testing mode we manually set the following params
         # TODO use mocks instead of this testing param
         if not testing:
@@ -522,6 +531,19 @@ class Main:
         )
         self.print(msg)
 
+    def export_pipeline_metrics(self, force=False):
+        """
+        writes the pipeline metrics stored by all processes to
+        metrics.prom in the output dir every pipeline_metrics_interval
+        :param force: export them now regardless of the interval
+        """
+        if not self.metrics_exporter:
+            return
+        if force:
+            self.metrics_exporter.export()
+        else:
+            self.metrics_exporter.export_if_due()
+
     def is_total_flows_unknown(self) -> bool:
         """
         Determines if slips knows the total flows it's gonna be
@@ -577,6 +599,10 @@ class Main:
                 self.print(str(e), 1, 1)
                 self.terminate_slips()
 
+            self.metrics_exporter = create_pipeline_metrics_exporter(
+                self.db, self.args.output
+            )
+
             self.db.set_input_metadata(
                 {
                     "output_dir": self.args.output,
@@ -653,7 +679,8 @@ class Main:
             # if slips is given a .rdb file, don't load the
             # modules as we don't need them
             if not self.args.db:
-                # update local files before starting modules
+                # update local files in the background, modules use the
+                # previously loaded data until the update is done.
                 # if wait_for_TI_to_finish is set to true in the config file,
                 # slips will wait untill all TI files are updated before
                 # starting the rest of the modules
@@ -662,6 +689,9 @@ class Main:
                     ti_feeds=self.conf.wait_for_TI_to_finish(),
                 )
                 self.print("Starting modules", 1, 0)
+                # returns once the modules are subscribed to their
+                # channels, so they don't miss the msgs published by the
+                # input and the profiler
                 self.proc_man.load_modules()
                 # give outputprocess time to print all the started modules
                 time.sleep(0.5)
@@ -729,8 +759,10 @@ class Main:
                 self.ui_man.check_if_webinterface_started()
 
                 self.update_stats()
+                self.export_pipeline_metrics()
 
                 self.db.check_tw_to_close()
+                self.db.archive_closed_tws()
 
                 modified_profiles: Set[str] = (
                     self.metadata_man.update_slips_stats_in_the_db()[1]
@@ -27,10 +27,13 @@ class ICore(IModule, Process):
         """
         must be called run because this is what multiprocessing runs
         """
+        self.register()
         try:
             # this should be defined in every core file
             # this won't run in a loop because it's not a module
             error: bool = self.main()
+            self.mark_msgs_as_processed()
+            self.store_pipeline_metrics()
             if error or self.should_stop():
                 # finished with some error
                 self.shutdown_gracefully()
@@ -40,4 +43,6 @@ class ICore(IModule, Process):
         except Exception:
             self.print(f"Problem in {self.name}", 0, 1)
             self.print(traceback.format_exc(), 0, 1)
+        finally:
+            self.db.unregister_module(self.name)
         return True
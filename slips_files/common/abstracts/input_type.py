@@ -1,4 +1,10 @@
+import csv
 from abc import ABC, abstractmethod
+from typing import (
+    Iterable,
+    List,
+    Optional,
+)
 
 
 class IInputType(ABC):
@@ -11,3 +17,58 @@ class IInputType(ABC):
         """
         Process all fields of a given line
         """
+
+    def process_lines(self, lines: dict) -> List:
+        """
+        Process a batch of lines of the same type at once.
+        input types that can parse many lines faster than one by one
+        should override this
+        :param lines: dict with the type of the lines and a list of
+        lines in the 'data' key
+        :return: one item per line, either what process_line() returns
+        for it, or the exception raised while processing it
+        """
+        flows = []
+        for data in lines["data"]:
+            try:
+                flows.append(self.process_line({**lines, "data": data}))
+            except Exception as e:
+                flows.append(e)
+        return flows
+
+    @staticmethod
+    def split_lines(lines: Iterable[str], separator: str) -> List[List[str]]:
+        """
+        splits the given lines into fields using the compiled csv reader.
+        the same as calling line.strip().split(separator) on each line,
+        quotes aren't handled
+        """
+        lines = [line.strip() for line in lines]
+        try:
+            return list(
+                csv.reader(lines, delimiter=separator, quoting=csv.QUOTE_NONE)
+            )
+        except csv.Error:
+            # e.g. a field larger than the csv field size limit
+            return [line.split(separator) for line in lines]
+
+    @staticmethod
+    def convert_int_column(values: List) -> List[Optional[int]]:
+        """
+        converts all the given values to int at once
+        :return: the converted values, None for the ones that aren't
+        valid ints
+        """
+        try:
+            return list(map(int, values))
+        except (ValueError, TypeError):
+            pass
+
+        # at least one of them isn't an int, convert them one by one
+        converted = []
+        for value in values:
+            try:
+                converted.append(int(value))
+            except (ValueError, TypeError):
+                converted.append(None)
+        return converted
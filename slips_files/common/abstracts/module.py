@@ -4,9 +4,14 @@ from abc import ABC, abstractmethod
 from multiprocessing import Process, Event
 from typing import (
     Dict,
+    List,
     Optional,
 )
 
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    PipelineMetrics,
+    create_pipeline_metrics,
+)
 from slips_files.common.printer import Printer
 from slips_files.core.output import Output
 from slips_files.common.slips_utils import utils
@@ -42,12 +47,19 @@ class IModule(ABC, Process):
         self.printer = Printer(self.logger, self.name)
         self.db = DBManager(self.logger, self.output_dir, self.redis_port)
         self.keyboard_int_ctr = 0
+        # the channels of the msgs received and not processed yet
+        self.unprocessed_msgs: List[str] = []
+        # None unless pipeline_metrics_enable is set in slips.yaml
+        self.pipeline_metrics: Optional[PipelineMetrics] = (
+            create_pipeline_metrics(self.db, self.name)
+        )
         self.init(**kwargs)
         # should after the module's init() so the module has a chance to
         # set its own channels
         # tracks whether or not in the last iteration there was a msg
         # received in that channel
         self.channel_tracker: Dict[str, dict] = self.init_channel_tracker()
+        self.db.init_msgs_received_in_channels(self.name, list(self.channels))
 
     def print(self, *args, **kwargs):
         return self.printer.print(*args, **kwargs)
@@ -143,15 +155,37 @@ class IModule(ABC, Process):
         executed once before the main loop
         """
 
+    def mark_msgs_as_processed(self):
+        """
+        counts the msgs received so far as processed. closed timewindows
+        are archived once all modules processed the msgs published before
+        closing them
+        """
+        for channel in self.unprocessed_msgs:
+            self.db.incr_msgs_received_in_channel(self.name, channel)
+        self.unprocessed_msgs.clear()
+
     def get_msg(self, channel: str) -> Optional[dict]:
+        # modules are done with the previous msgs when they ask for
+        # the next one
+        self.mark_msgs_as_processed()
         message = self.db.get_message(self.channels[channel])
         if utils.is_msg_intended_for(message, channel):
             self.channel_tracker[channel]["msg_received"] = True
-            self.db.incr_msgs_received_in_channel(self.name, channel)
+            self.unprocessed_msgs.append(channel)
+            if self.pipeline_metrics:
+                self.pipeline_metrics.add_consumed_msg(channel, message)
             return message
 
         self.channel_tracker[channel]["msg_received"] = False
 
+    def store_pipeline_metrics(self):
+        """
+        stores the metrics recorded since the last time they were stored
+        """
+        if self.pipeline_metrics:
+            self.pipeline_metrics.store()
+
     def print_traceback(self):
         exception_line = sys.exc_info()[2].tb_lineno
         self.print(f"Problem in pre_main() line {exception_line}", 0, 1)
@@ -174,9 +208,27 @@ class IModule(ABC, Process):
             self.print_traceback()
             return True
 
+        # closed timewindows are archived once the running modules
+        # processed their msgs, modules that stopped aren't waited for
+        self.register()
+        try:
+            return self.main_loop()
+        finally:
+            self.db.unregister_module(self.name)
+
+    def register(self):
+        if self.channels:
+            self.db.register_module(self.name)
+
+    def main_loop(self) -> bool:
+        """
+        calls main() until the module should stop
+        """
         while True:
             try:
                 if self.should_stop():
+                    self.mark_msgs_as_processed()
+                    self.store_pipeline_metrics()
                     self.shutdown_gracefully()
                     return True
 
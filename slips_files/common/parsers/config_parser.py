@@ -128,6 +128,14 @@ class ConfigParser(object):
             timeout = 5
         return timeout
 
+    def zeek_workers(self) -> int:
+        workers = self.read_configuration("parameters", "zeek_workers", 1)
+        try:
+            workers = int(workers)
+        except ValueError:
+            workers = 1
+        return max(workers, 1)
+
     def online_whitelist_update_period(self):
         update_period = self.read_configuration(
             "threatintelligence", "online_whitelist_update_period", 604800
@@ -537,6 +545,19 @@ class ConfigParser(object):
     def deletePrevdb(self):
         return self.read_configuration("parameters", "deletePrevdb", True)
 
+    def use_redis_unix_socket(self) -> bool:
+        return self.read_configuration("parameters", "redis_unix_socket", True)
+
+    def redis_max_connections(self) -> int:
+        max_connections = self.read_configuration(
+            "parameters", "redis_max_connections", 128
+        )
+        try:
+            max_connections = int(max_connections)
+        except ValueError:
+            max_connections = 128
+        return max(max_connections, 1)
+
     def rotation_period(self):
         rotation_period = self.read_configuration(
             "parameters", "rotation_period", "1 day"
@@ -576,6 +597,11 @@ class ConfigParser(object):
 
         return period * 24 * 60 * 60
 
+    def archive_closed_timewindows(self) -> bool:
+        return self.read_configuration(
+            "parameters", "archive_closed_timewindows", True
+        )
+
     def wait_for_modules_to_finish(self) -> int:
         """returns period in mins"""
         wait_for_modules_to_finish = self.read_configuration(
@@ -717,3 +743,19 @@ class ConfigParser(object):
         return self.read_configuration(
             "Profiling", "memory_profiler_multiprocess", True
         )
+
+    def get_pipeline_metrics_enable(self) -> bool:
+        return self.read_configuration(
+            "Profiling", "pipeline_metrics_enable", False
+        )
+
+    def get_pipeline_metrics_interval(self) -> float:
+        """returns the period in seconds"""
+        interval = self.read_configuration(
+            "Profiling", "pipeline_metrics_interval", 10
+        )
+        try:
+            interval = float(interval)
+        except ValueError:
+            interval = 10
+        return interval if interval > 0 else 10
@@ -0,0 +1,159 @@
+import math
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+
+class LatencyHistogram:
+    """
+    Counts latencies in buckets whose bounds grow exponentially, so the
+    percentiles of millions of latencies can be estimated without storing
+    them. a percentile is off by less than 1/buckets_per_doubling of
+    its value
+    """
+
+    def __init__(
+        self,
+        min_latency: float = 1e-6,
+        max_latency: float = 3600.0,
+        buckets_per_doubling: int = 8,
+    ):
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.buckets_per_doubling = buckets_per_doubling
+        self.buckets: List[int] = [0] * (
+            self.get_bucket(max_latency, clamp=False) + 1
+        )
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        # when the first measured latency started and the last one ended,
+        # only set for the latencies added with their timestamp
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+    def get_bucket(self, latency: float, clamp: bool = True) -> int:
+        if latency <= self.min_latency:
+            return 0
+        bucket = math.ceil(
+            math.log2(latency / self.min_latency) * self.buckets_per_doubling
+        )
+        if clamp:
+            return min(bucket, len(self.buckets) - 1)
+        return bucket
+
+    def get_upper_bound(self, bucket: int) -> float:
+        return self.min_latency * 2 ** (bucket / self.buckets_per_doubling)
+
+    def add(
+        self,
+        latency: float,
+        count: int = 1,
+        timestamp: Optional[float] = None,
+    ):
+        """
+        :param latency: in seconds
+        :param count: number of times this latency was seen
+        :param timestamp: unix timestamp of when the latency ended, used to
+        know the period the latencies were measured in
+        """
+        self.buckets[self.get_bucket(latency)] += count
+        self.count += count
+        self.sum += latency * count
+        self.max = max(self.max, latency)
+        if timestamp is not None:
+            self.update_period(timestamp - latency, timestamp)
+
+    def update_period(self, first: Optional[float], last: Optional[float]):
+        if first is not None:
+            self.first = (
+                first if self.first is None else min(self.first, first)
+            )
+        if last is not None:
+            self.last = last if self.last is None else max(self.last, last)
+
+    def get_period(self) -> float:
+        """
+        :return: seconds from the start of the first latency until the end
+        of the last one, 0 if no latencies were added with their timestamp
+        """
+        if self.first is None or self.last is None:
+            return 0.0
+        return self.last - self.first
+
+    def percentile(self, percentile: float) -> float:
+        """
+        :param percentile: from 0 to 100
+        :return: the upper bound of the bucket that has the given
+        percentile, 0 if no latencies were added
+        """
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percentile / 100) or 1
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                break
+        if bucket == len(self.buckets) - 1:
+            # latencies bigger than max_latency are in the last bucket
+            return self.max
+        return min(self.get_upper_bound(bucket), self.max)
+
+    def merge(self, other: "LatencyHistogram"):
+        """adds the latencies of the given histogram to this one"""
+        for bucket, count in enumerate(other.buckets):
+            self.buckets[bucket] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        self.update_period(other.first, other.last)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+    def to_dict(self) -> dict:
+        """returns the histogram as a json serializable dict"""
+        return {
+            "min_latency": self.min_latency,
+            "max_latency": self.max_latency,
+            "buckets_per_doubling": self.buckets_per_doubling,
+            # only the non empty buckets
+            "buckets": {
+                bucket: count
+                for bucket, count in enumerate(self.buckets)
+                if count
+            },
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "first": self.first,
+            "last": self.last,
+        }
+
+    @classmethod
+    def from_dict(cls, histogram: dict) -> "LatencyHistogram":
+        """creates a histogram from the dict returned by to_dict()"""
+        new = cls(
+            min_latency=histogram["min_latency"],
+            max_latency=histogram["max_latency"],
+            buckets_per_doubling=histogram["buckets_per_doubling"],
+        )
+        for bucket, count in histogram["buckets"].items():
+            # json converts the keys to str
+            new.buckets[int(bucket)] = count
+        new.count = histogram["count"]
+        new.sum = histogram["sum"]
+        new.max = histogram["max"]
+        new.first = histogram.get("first")
+        new.last = histogram.get("last")
+        return new
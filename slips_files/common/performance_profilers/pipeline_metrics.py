@@ -0,0 +1,280 @@
+import json
+import os
+import time
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from slips_files.common.parsers.config_parser import ConfigParser
+from slips_files.common.performance_profilers.latency_histogram import (
+    LatencyHistogram,
+)
+
+# the time from when the input process read a flow until it's dequeued by
+# the profiler, added to its profile, or consumed by a module
+STAGE_LATENCY = "slips_flow_stage_latency_seconds"
+# the time from when a msg is published until a module consumes it
+MODULE_LAG = "slips_module_lag_seconds"
+# the number of msgs waiting in the profiler queue
+PROFILER_QUEUE_DEPTH = "slips_profiler_queue_depth"
+# the number of msgs published in a channel that a module didn't
+# consume yet
+MODULE_BACKLOG = "slips_module_backlog_messages"
+
+HELP = {
+    STAGE_LATENCY: "Seconds from reading a flow until it reaches the stage",
+    MODULE_LAG: "Seconds from publishing a msg until the module consumes it",
+    PROFILER_QUEUE_DEPTH: "Msgs waiting in the profiler queue",
+    MODULE_BACKLOG: "Msgs published in the channel not consumed by "
+    "the module yet",
+}
+# the args of the histograms of the metrics that aren't in seconds
+HISTOGRAM_ARGS = {
+    PROFILER_QUEUE_DEPTH: {"min_latency": 1, "max_latency": 2**20},
+}
+QUANTILES = (0.5, 0.9, 0.99)
+# (metric name, ((label, value), ...))
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class PipelineMetrics:
+    """
+    Records the metrics of one slips process in histograms and stores
+    them in redis every interval. the main process merges the ones stored
+    by all processes using PipelineMetricsExporter
+    """
+
+    def __init__(self, db, process: str, interval: float):
+        self.db = db
+        self.process = process
+        # seconds between storing the metrics in redis
+        self.interval = interval
+        self.histograms: Dict[MetricKey, LatencyHistogram] = {}
+        self.last_stored = time.time()
+
+    def add(
+        self,
+        metric: str,
+        value: float,
+        timestamp: Optional[float] = None,
+        **labels: str,
+    ):
+        """
+        :param timestamp: when the measured latency ended, see
+        LatencyHistogram.add()
+        """
+        key = (metric, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = LatencyHistogram(**HISTOGRAM_ARGS.get(metric, {}))
+            self.histograms[key] = histogram
+        histogram.add(value, timestamp=timestamp)
+        self.store_if_due()
+
+    def add_consumed_msg(self, channel: str, msg: dict):
+        """
+        records how long the given msg took to reach the module that
+        consumed it. only msgs published with time_read and time_published
+        are recorded
+        """
+        try:
+            data = json.loads(msg["data"])
+            time_read = data["time_read"]
+            time_published = data["time_published"]
+        except (json.JSONDecodeError, TypeError, KeyError):
+            return
+
+        now = time.time()
+        self.add(
+            STAGE_LATENCY,
+            now - time_read,
+            timestamp=now,
+            stage="consumed",
+            module=self.process,
+        )
+        self.add(
+            MODULE_LAG,
+            now - time_published,
+            module=self.process,
+            channel=channel,
+        )
+
+    def store_if_due(self):
+        if time.time() - self.last_stored >= self.interval:
+            self.store()
+
+    def store(self):
+        """stores all the histograms recorded so far in redis"""
+        self.last_stored = time.time()
+        if not self.histograms:
+            return
+        metrics = [
+            {
+                "metric": metric,
+                "labels": dict(labels),
+                "histogram": histogram.to_dict(),
+            }
+            for (metric, labels), histogram in self.histograms.items()
+        ]
+        self.db.store_pipeline_metrics(self.process, json.dumps(metrics))
+
+
+def create_pipeline_metrics(db, process: str) -> Optional[PipelineMetrics]:
+    """
+    returns None if pipeline_metrics_enable isn't set in slips.yaml
+    """
+    conf = ConfigParser()
+    if not conf.get_pipeline_metrics_enable():
+        return None
+    return PipelineMetrics(db, process, conf.get_pipeline_metrics_interval())
+
+
+def escape_label_value(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    labels = ",".join(
+        f'{label}="{escape_label_value(value)}"' for label, value in labels
+    )
+    return f"{{{labels}}}"
+
+
+def merge_pipeline_metrics(
+    stored_metrics: Dict[str, str],
+) -> Dict[MetricKey, LatencyHistogram]:
+    """
+    merges the histograms with the same labels of all processes
+    :param stored_metrics: the metrics stored in redis by each process
+    using PipelineMetrics.store()
+    """
+    histograms: Dict[MetricKey, LatencyHistogram] = {}
+    for metrics in stored_metrics.values():
+        for metric in json.loads(metrics):
+            key = (metric["metric"], tuple(sorted(metric["labels"].items())))
+            histogram = LatencyHistogram.from_dict(metric["histogram"])
+            if key in histograms:
+                histograms[key].merge(histogram)
+            else:
+                histograms[key] = histogram
+    return histograms
+
+
+class PipelineMetricsExporter:
+    """
+    Merges the metrics stored in redis by all slips processes and writes
+    them to metrics.prom in the output dir using the prometheus text
+    format, for the node exporter's textfile collector to pick them up
+    """
+
+    def __init__(self, db, output_dir: str, interval: float):
+        self.db = db
+        self.path = os.path.join(output_dir, "metrics.prom")
+        self.interval = interval
+        self.last_exported = 0.0
+
+    def get_histograms(self) -> Dict[MetricKey, LatencyHistogram]:
+        """merges the histograms with the same labels of all processes"""
+        return merge_pipeline_metrics(self.db.get_pipeline_metrics())
+
+    def get_backlogs(self) -> Dict[MetricKey, int]:
+        """
+        returns the number of msgs each module didn't consume yet in
+        each channel it's subscribed to
+        """
+        published = self.db.get_msgs_published_at_runtime()
+        backlogs = {}
+        for module in self.db.get_pids():
+            received = self.db.get_msgs_received_at_runtime(module)
+            for channel, msgs in received.items():
+                labels = (("channel", channel), ("module", module))
+                backlogs[(MODULE_BACKLOG, labels)] = max(
+                    int(published.get(channel, 0)) - int(msgs), 0
+                )
+        return backlogs
+
+    def get_prometheus_text(self) -> str:
+        lines: List[str] = []
+        # histograms are exported as summaries, their quantiles are
+        # estimated by slips
+        for metric, histograms in self.group_by_metric(
+            self.get_histograms()
+        ).items():
+            lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {metric} summary")
+            for labels, histogram in histograms:
+                for quantile in QUANTILES:
+                    quantile_labels = format_labels(
+                        labels + (("quantile", str(quantile)),)
+                    )
+                    value = histogram.percentile(quantile * 100)
+                    lines.append(f"{metric}{quantile_labels} {value:.9g}")
+                lines.append(
+                    f"{metric}_sum{format_labels(labels)} "
+                    f"{histogram.sum:.9g}"
+                )
+                lines.append(
+                    f"{metric}_count{format_labels(labels)} "
+                    f"{histogram.count}"
+                )
+
+        for metric, backlogs in self.group_by_metric(
+            self.get_backlogs()
+        ).items():
+            lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, backlog in backlogs:
+                lines.append(f"{metric}{format_labels(labels)} {backlog}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def group_by_metric(values: dict) -> Dict[str, list]:
+        """
+        :param values: {(metric name, labels): value}
+        :return: {metric name: [(labels, value), ...]}
+        """
+        grouped = {}
+        for (metric, labels), value in sorted(
+            values.items(), key=lambda item: item[0]
+        ):
+            grouped.setdefault(metric, []).append((labels, value))
+        return grouped
+
+    def export_if_due(self):
+        if time.time() - self.last_exported >= self.interval:
+            self.export()
+
+    def export(self):
+        """
+        rewrites metrics.prom, the file is replaced at once so it's never
+        read half written
+        """
+        self.last_exported = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.get_prometheus_text())
+        os.replace(tmp_path, self.path)
+
+
+def create_pipeline_metrics_exporter(
+    db, output_dir: str
+) -> Optional[PipelineMetricsExporter]:
+    """
+    returns None if pipeline_metrics_enable isn't set in slips.yaml
+    """
+    conf = ConfigParser()
+    if not conf.get_pipeline_metrics_enable():
+        return None
+    return PipelineMetricsExporter(
+        db, output_dir, conf.get_pipeline_metrics_interval()
+    )
@@ -16,10 +16,16 @@ import os
 import sys
 import ipaddress
 import aid_hash
-from typing import Any, Optional
+from typing import Any, List, Optional
 from dataclasses import is_dataclass, asdict
 from enum import Enum
 
+try:
+    # faster json decoder, used instead of the stdlib json when installed
+    import orjson
+except ImportError:
+    orjson = None
+
 IS_IN_A_DOCKER_CONTAINER = os.environ.get("IS_IN_A_DOCKER_CONTAINER", False)
 
 
@@ -79,6 +85,21 @@ class Utils(object):
             "utf-8"
         )
 
+    def json_loads(self, data):
+        """
+        decodes the given json str using orjson when it's installed and
+        the stdlib json otherwise
+        raises json.JSONDecodeError if the given str isn't a valid json
+        """
+        if orjson:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # orjson is stricter than the stdlib json, e.g. it
+                # doesn't support NaN and Infinity
+                pass
+        return json.loads(data)
+
     def is_iso_format(self, date_time: str) -> bool:
         try:
             datetime.fromisoformat(date_time)
@@ -320,6 +341,102 @@ class Utils(object):
 
         return False
 
+    def convert_ts_column(
+        self, timestamps: List[Any], required_format: str
+    ) -> List[Any]:
+        """
+        column-wise version of convert_format() for the timestamps of
+        many flows at once.
+        the format of the column is detected once using its first
+        timestamp instead of once per timestamp, the timestamps that
+        don't match it are converted one by one
+        :param required_format: 'datetimeobj' to get the same result as
+        convert_to_datetime(), or any format supported by convert_format()
+        :return: the converted timestamps, None for the ones that can't
+        be converted
+        """
+        given_format = next(
+            (self.get_time_format(ts) for ts in timestamps if ts), False
+        )
+        if given_format == "unixtimestamp":
+
+            def parse(ts):
+                return datetime.fromtimestamp(float(ts), tz=self.local_tz)
+
+        elif given_format and given_format != "datetimeobj":
+
+            def parse(ts):
+                return datetime.strptime(ts, given_format)
+
+            # fromisoformat() is much faster than strptime(), use it for
+            # the timestamps that look like the first one if it parses
+            # the first one the same way
+            first_ts = next(ts for ts in timestamps if ts)
+            try:
+                expected = parse(first_ts)
+                iso_parsed = datetime.fromisoformat(first_ts)
+                if (
+                    iso_parsed == expected
+                    and iso_parsed.utcoffset() == expected.utcoffset()
+                ):
+                    strptime = parse
+
+                    def parse(ts):
+                        if len(ts) == len(first_ts):
+                            return datetime.fromisoformat(ts)
+                        return strptime(ts)
+
+            except (ValueError, TypeError):
+                pass
+
+        else:
+            parse = None
+
+        if required_format == "datetimeobj":
+
+            def to_required_format(ts, datetime_obj):
+                return datetime_obj
+
+        elif required_format == given_format:
+
+            def to_required_format(ts, datetime_obj):
+                return ts
+
+        elif required_format == "iso":
+
+            def to_required_format(ts, datetime_obj):
+                return datetime_obj.astimezone(self.local_tz).isoformat()
+
+        elif required_format == "unixtimestamp":
+
+            def to_required_format(ts, datetime_obj):
+                return datetime_obj.timestamp()
+
+        else:
+
+            def to_required_format(ts, datetime_obj):
+                return datetime_obj.strftime(required_format)
+
+        converted = []
+        for ts in timestamps:
+            if parse and ts and isinstance(ts, str):
+                try:
+                    converted.append(to_required_format(ts, parse(ts)))
+                    continue
+                except (ValueError, OverflowError, OSError):
+                    pass
+
+            # doesn't match the format of the column
+            try:
+                converted.append(
+                    self.convert_to_datetime(ts)
+                    if required_format == "datetimeobj"
+                    else self.convert_format(ts, required_format)
+                )
+            except (ValueError, TypeError, OverflowError, OSError):
+                converted.append(None)
+        return converted
+
     def to_delta(self, time_in_seconds):
         return timedelta(seconds=int(time_in_seconds))
 
@@ -1,6 +1,7 @@
 from typing import (
     List,
     Dict,
+    Optional,
 )
 
 from slips_files.common.printer import Printer
@@ -34,6 +35,7 @@ class DBManager:
         self.redis_port = redis_port
         self.logger = logger
         self.printer = Printer(self.logger, self.name)
+        self.read_configuration()
         self.rdb = RedisDB(
             self.logger, redis_port, start_redis_server, **kwargs
         )
@@ -44,6 +46,8 @@ class DBManager:
         self.sqlite = None
         if start_sqlite:
             self.sqlite = self.create_sqlite_db(output_dir)
+            if self.archive_tws:
+                self.rdb.restore_archived_tw = self.restore_archived_tw
 
     def print(self, *args, **kwargs):
         return self.printer.print(*args, **kwargs)
@@ -55,6 +59,7 @@ class DBManager:
     def read_configuration(cls):
         conf = ConfigParser()
         cls.width = conf.get_tw_width_as_float()
+        cls.archive_tws: bool = conf.archive_closed_timewindows()
 
     def get_sqlite_db_path(self) -> str:
         return self.sqlite.get_db_path()
@@ -62,6 +67,12 @@ class DBManager:
     def iterate_flows(self, *args, **kwargs):
         return self.sqlite.iterate_flows(*args, **kwargs)
 
+    def iterate_flows_in_chunks(self, *args, **kwargs):
+        return self.sqlite.iterate_flows_in_chunks(*args, **kwargs)
+
+    def iterate_relabeled_flows_in_chunks(self, *args, **kwargs):
+        return self.sqlite.iterate_relabeled_flows_in_chunks(*args, **kwargs)
+
     def get_columns(self, *args, **kwargs):
         return self.sqlite.get_columns(*args, **kwargs)
 
@@ -171,6 +182,12 @@ class DBManager:
     def get_dns_resolution(self, *args, **kwargs):
         return self.rdb.get_dns_resolution(*args, **kwargs)
 
+    def get_domains_of_resolved_ip(self, *args, **kwargs):
+        return self.rdb.get_domains_of_resolved_ip(*args, **kwargs)
+
+    def is_ip_resolved_by(self, *args, **kwargs):
+        return self.rdb.is_ip_resolved_by(*args, **kwargs)
+
     def is_ip_resolved(self, *args, **kwargs):
         return self.rdb.is_ip_resolved(*args, **kwargs)
 
@@ -252,6 +269,9 @@ class DBManager:
     def set_port_info(self, *args, **kwargs):
         return self.rdb.set_port_info(*args, **kwargs)
 
+    def set_ports_info(self, *args, **kwargs):
+        return self.rdb.set_ports_info(*args, **kwargs)
+
     def get_port_info(self, *args, **kwargs):
         return self.rdb.get_port_info(*args, **kwargs)
 
@@ -264,9 +284,15 @@ class DBManager:
     def set_organization_of_port(self, *args, **kwargs):
         return self.rdb.set_organization_of_port(*args, **kwargs)
 
+    def set_organizations_of_ports(self, *args, **kwargs):
+        return self.rdb.set_organizations_of_ports(*args, **kwargs)
+
     def get_organization_of_port(self, *args, **kwargs):
         return self.rdb.get_organization_of_port(*args, **kwargs)
 
+    def has_cached_ports_info(self, *args, **kwargs):
+        return self.rdb.has_cached_ports_info(*args, **kwargs)
+
     def add_zeek_file(self, *args, **kwargs):
         return self.rdb.add_zeek_file(*args, **kwargs)
 
@@ -333,6 +359,9 @@ class DBManager:
     def set_whitelist(self, *args, **kwargs):
         return self.rdb.set_whitelist(*args, **kwargs)
 
+    def set_whitelists(self, *args, **kwargs):
+        return self.rdb.set_whitelists(*args, **kwargs)
+
     def get_all_whitelist(self, *args, **kwargs):
         return self.rdb.get_all_whitelist(*args, **kwargs)
 
@@ -342,6 +371,9 @@ class DBManager:
     def has_cached_whitelist(self, *args, **kwargs):
         return self.rdb.has_cached_whitelist(*args, **kwargs)
 
+    def load_cached_whitelist(self, *args, **kwargs):
+        return self.rdb.load_cached_whitelist(*args, **kwargs)
+
     def is_doh_server(self, *args, **kwargs):
         return self.rdb.is_doh_server(*args, **kwargs)
 
@@ -445,8 +477,13 @@ class DBManager:
     def get_profileid_twid_alerts(self, *args, **kwargs):
         return self.rdb.get_profileid_twid_alerts(*args, **kwargs)
 
-    def get_twid_evidence(self, *args, **kwargs):
-        return self.rdb.get_twid_evidence(*args, **kwargs)
+    def get_twid_evidence(self, profileid: str, twid: str) -> Dict[str, dict]:
+        if evidence := self.rdb.get_twid_evidence(profileid, twid):
+            return evidence
+        # the tw may be archived
+        if self.load_archived_tw(profileid, twid):
+            return self.rdb.get_twid_evidence(profileid, twid)
+        return {}
 
     def update_threat_level(self, *args, **kwargs):
         return self.rdb.update_threat_level(*args, **kwargs)
@@ -517,6 +554,12 @@ class DBManager:
     def is_blacklisted_jarm(self, *args, **kwargs):
         return self.rdb.is_blacklisted_jarm(*args, **kwargs)
 
+    def set_jarm_hash(self, *args, **kwargs):
+        return self.rdb.set_jarm_hash(*args, **kwargs)
+
+    def get_jarm_hash(self, *args, **kwargs):
+        return self.rdb.get_jarm_hash(*args, **kwargs)
+
     def is_blacklisted_ip(self, *args, **kwargs):
         return self.rdb.is_blacklisted_ip(*args, **kwargs)
 
@@ -556,8 +599,19 @@ class DBManager:
     def cache_url_info_by_virustotal(self, *args, **kwargs):
         return self.rdb.cache_url_info_by_virustotal(*args, **kwargs)
 
-    def get_data_from_profile_tw(self, *args, **kwargs):
-        return self.rdb.get_data_from_profile_tw(*args, **kwargs)
+    def get_data_from_profile_tw(
+        self, profileid: str, twid: str, *args, **kwargs
+    ) -> dict:
+        if data := self.rdb.get_data_from_profile_tw(
+            profileid, twid, *args, **kwargs
+        ):
+            return data
+        # the tw may be archived
+        if self.load_archived_tw(profileid, twid):
+            return self.rdb.get_data_from_profile_tw(
+                profileid, twid, *args, **kwargs
+            )
+        return data
 
     def get_outtuples_from_profile_tw(self, *args, **kwargs):
         return self.rdb.get_outtuples_from_profile_tw(*args, **kwargs)
@@ -565,6 +619,18 @@ class DBManager:
     def get_intuples_from_profile_tw(self, *args, **kwargs):
         return self.rdb.get_intuples_from_profile_tw(*args, **kwargs)
 
+    def init_msgs_received_in_channels(self, *args, **kwargs):
+        return self.rdb.init_msgs_received_in_channels(*args, **kwargs)
+
+    def register_module(self, *args, **kwargs):
+        return self.rdb.register_module(*args, **kwargs)
+
+    def unregister_module(self, *args, **kwargs):
+        return self.rdb.unregister_module(*args, **kwargs)
+
+    def get_msgs_received_by_modules(self, *args, **kwargs):
+        return self.rdb.get_msgs_received_by_modules(*args, **kwargs)
+
     def incr_msgs_received_in_channel(self, *args, **kwargs):
         return self.rdb.incr_msgs_received_in_channel(*args, **kwargs)
 
@@ -577,8 +643,21 @@ class DBManager:
     def get_msgs_published_in_channel(self, *args, **kwargs):
         return self.rdb.get_msgs_published_in_channel(*args, **kwargs)
 
-    def get_dhcp_flows(self, *args, **kwargs):
-        return self.rdb.get_dhcp_flows(*args, **kwargs)
+    def get_msgs_published_at_runtime(self, *args, **kwargs):
+        return self.rdb.get_msgs_published_at_runtime(*args, **kwargs)
+
+    def store_pipeline_metrics(self, *args, **kwargs):
+        return self.rdb.store_pipeline_metrics(*args, **kwargs)
+
+    def get_pipeline_metrics(self, *args, **kwargs):
+        return self.rdb.get_pipeline_metrics(*args, **kwargs)
+
+    def get_dhcp_flows(self, profileid: str, twid: str):
+        if flows := self.rdb.get_dhcp_flows(profileid, twid):
+            return flows
+        # the tw may be archived
+        if self.load_archived_tw(profileid, twid):
+            return self.rdb.get_dhcp_flows(profileid, twid)
 
     def set_dhcp_flow(self, *args, **kwargs):
         return self.rdb.set_dhcp_flow(*args, **kwargs)
@@ -738,6 +817,81 @@ class DBManager:
     def check_tw_to_close(self, *args, **kwargs):
         return self.rdb.check_tw_to_close(*args, **kwargs)
 
+    def archive_closed_tws(self):
+        """
+        Moves the closed timewindows from redis to the sqlite db once all
+        modules processed the msgs published before closing them
+        """
+        if not (self.archive_tws and self.sqlite):
+            return
+
+        received: Dict[str, Dict[str, str]] = (
+            self.rdb.get_msgs_received_by_modules()
+        )
+        for profileid_tw, published in self.rdb.get_tws_to_archive().items():
+            if self.were_msgs_processed(published, received):
+                self.rdb.archive_tw(
+                    profileid_tw, self.sqlite.archive_timewindow
+                )
+
+    @staticmethod
+    def were_msgs_processed(
+        published: Dict[str, str], received: Dict[str, Dict[str, str]]
+    ) -> bool:
+        """
+        checks if all modules processed the given number of msgs published
+        in each of the channels they're subscribed to
+        :param published: {channel: number of msgs}
+        :param received: {module: {channel: number of msgs}}
+        """
+        return all(
+            int(msgs) >= int(published.get(channel, 0))
+            for channels in received.values()
+            for channel, msgs in channels.items()
+        )
+
+    def restore_archived_tw(self, profileid_tw: str) -> bool:
+        """
+        Loads the archived data of the given timewindow back to redis,
+        merged with the data written to it after archiving it.
+        the tw should be claimed using claim_archived_tw() first
+        :return: True if there was archived data to load
+        """
+        data: dict = self.sqlite.get_archived_timewindow(profileid_tw)
+        if not data:
+            return False
+        # deleted first so the data is never in both dbs if the tw is
+        # archived again in the meantime
+        self.sqlite.delete_archived_timewindow(profileid_tw)
+        self.rdb.restore_tw(profileid_tw, data, self.sqlite.merge_timewindows)
+        return True
+
+    def load_archived_tw(self, profileid: str, twid: str) -> bool:
+        """
+        Loads the data of the given timewindow back to redis if it was
+        archived. should be called before reading the data of old
+        timewindows. the tw is archived again once the modules are done
+        with it
+        :return: True if the tw was loaded
+        """
+        profileid_tw = f"{profileid}_{twid}"
+        if not (
+            self.sqlite
+            and self.archive_tws
+            and self.rdb.claim_archived_tw(profileid_tw)
+        ):
+            return False
+
+        loaded = self.restore_archived_tw(profileid_tw)
+        self.rdb.queue_tw_to_archive(profileid_tw)
+        return loaded
+
+    def is_tw_archived(self, *args, **kwargs):
+        return self.rdb.is_tw_archived(*args, **kwargs)
+
+    def get_archived_timewindow(self, *args, **kwargs):
+        return self.sqlite.get_archived_timewindow(*args, **kwargs)
+
     def check_health(self):
         self.rdb.pubsub.check_health()
 
@@ -844,12 +998,23 @@ class DBManager:
         """returns the raw flow as read from the log file"""
         return self.sqlite.get_flow(*args, **kwargs)
 
-    def add_flow(self, flow, profileid: str, twid: str, label="benign"):
+    def add_flow(
+        self,
+        flow,
+        profileid: str,
+        twid: str,
+        label="benign",
+        time_read: Optional[float] = None,
+    ):
         # stores it in the db
         self.sqlite.add_flow(flow, profileid, twid, label=label)
         # handles the channels and labels etc.
         return self.rdb.add_flow(
-            flow, profileid=profileid, twid=twid, label=label
+            flow,
+            profileid=profileid,
+            twid=twid,
+            label=label,
+            time_read=time_read,
         )
 
     def get_slips_start_time(self):
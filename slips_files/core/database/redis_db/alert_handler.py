@@ -6,6 +6,7 @@ from typing import (
     Optional,
     Dict,
     Union,
+    Any,
 )
 from slips_files.common.slips_utils import utils
 from slips_files.core.structures.alerts import Alert
@@ -26,6 +27,14 @@ class AlertHandler:
     """
 
     name = "DB"
+    # evidence about the same attacker/victim usually comes in bursts,
+    # so the TI, AS, rDNS and SNI info of each of them is cached here for
+    # a few seconds instead of being read from the cache db every time.
+    # {(ioc_type, value): (time_cached, enrichment_info)}
+    _enrichment_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+    # in seconds
+    enrichment_cache_ttl = 5
+    enrichment_cache_max_size = 10000
 
     def increment_attack_counter(
         self, attacker: str, victim: Optional[Victim], evidence_type: str
@@ -149,6 +158,130 @@ class AlertHandler:
         except (KeyError, TypeError):
             return
 
+    @staticmethod
+    def _get_ioc_type(ioc: Union[Victim, Attacker]) -> str:
+        if isinstance(ioc, Victim):
+            return ioc.victim_type.name
+        return ioc.attacker_type.name
+
+    def _get_cached_enrichment(
+        self, key: Tuple[str, str], now: float
+    ) -> Optional[Dict[str, Any]]:
+        cached = self._enrichment_cache.get(key)
+        if not cached:
+            return
+
+        time_cached, enrichment = cached
+        if now - time_cached > self.enrichment_cache_ttl:
+            del self._enrichment_cache[key]
+            return
+        return enrichment
+
+    def _cache_enrichment(
+        self, key: Tuple[str, str], enrichment: Dict[str, Any], now: float
+    ):
+        if len(self._enrichment_cache) >= self.enrichment_cache_max_size:
+            # drop the expired entries first, if all of them are still
+            # valid, start over
+            for cached_key, (time_cached, _) in list(
+                self._enrichment_cache.items()
+            ):
+                if now - time_cached > self.enrichment_cache_ttl:
+                    del self._enrichment_cache[cached_key]
+
+            if len(self._enrichment_cache) >= self.enrichment_cache_max_size:
+                self._enrichment_cache.clear()
+
+        self._enrichment_cache[key] = (now, enrichment)
+
+    def _extract_enrichment_from_ip_info(
+        self, ip: str, ip_info: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        extracts the AS, rDNS and SNI of the given ip from its
+        serialized IPsInfo entry.
+        has the same output as get_asn_info(), get_rdns_info() and
+        get_sni_info() combined
+        """
+        enrichment = {"AS": None, "rDNS": None, "SNI": None}
+        if not ip_info or utils.is_ignored_ip(ip):
+            return enrichment
+
+        ip_info: dict = json.loads(ip_info)
+        enrichment["AS"] = ip_info.get("asn") or None
+        enrichment["rDNS"] = ip_info.get("reverse_dns") or None
+        if sni := ip_info.get("SNI"):
+            sni = sni[0] if isinstance(sni, list) else sni
+            enrichment["SNI"] = sni.get("server_name")
+        return enrichment
+
+    def get_enrichment_info(
+        self, iocs: List[Union[Victim, Attacker]]
+    ) -> List[Dict[str, Any]]:
+        """
+        returns the TI, AS, rDNS and SNI of each of the given
+        attackers/victims in the same order they're given.
+        the IPsInfo and the IoC_ips entries of all of them are retrieved
+        in 1 round trip to the cache db, and the result is cached for
+        enrichment_cache_ttl seconds.
+        """
+        now = time.time()
+        results: List[Optional[Dict[str, Any]]] = []
+        # indices of the iocs that aren't cached
+        to_lookup: List[int] = []
+        for idx, ioc in enumerate(iocs):
+            key = (self._get_ioc_type(ioc), ioc.value)
+            enrichment = self._get_cached_enrichment(key, now)
+            results.append(enrichment)
+            if enrichment is None:
+                to_lookup.append(idx)
+
+        if not to_lookup:
+            return results
+
+        values = [iocs[idx].value for idx in to_lookup]
+        pipe = self.rcache.pipeline(transaction=False)
+        pipe.hmget(self.constants.IPS_INFO, values)
+        pipe.hmget(self.constants.IOC_IPS, values)
+        ips_info, ioc_ips_info = pipe.execute()
+
+        for pos, idx in enumerate(to_lookup):
+            ioc = iocs[idx]
+            ioc_type = self._get_ioc_type(ioc)
+            enrichment = self._extract_enrichment_from_ip_info(
+                ioc.value, ips_info[pos]
+            )
+
+            if ioc_type == IoCType.IP.name:
+                ti_info = ioc_ips_info[pos]
+                enrichment["TI"] = (
+                    json.loads(ti_info).get("source") if ti_info else None
+                )
+            else:
+                # domains may match a blacklisted parent domain, that
+                # can't be done in the above pipeline
+                enrichment["TI"] = self.get_ti(ioc)
+
+            self._cache_enrichment((ioc_type, ioc.value), enrichment, now)
+            results[idx] = enrichment
+
+        return results
+
+    def enrich_evidence(self, evidence: Evidence):
+        """
+        sets the TI, AS, rDNS and SNI of the attacker and victim
+        of the given evidence
+        """
+        iocs = [evidence.attacker]
+        if hasattr(evidence, "victim") and evidence.victim:
+            iocs.append(evidence.victim)
+
+        for ioc, enrichment in zip(iocs, self.get_enrichment_info(iocs)):
+            ioc.TI = enrichment["TI"]
+            ioc.AS = enrichment["AS"]
+            ioc.rDNS = enrichment["rDNS"]
+            ioc.SNI = enrichment["SNI"]
+
     def set_evidence(self, evidence: Evidence):
         """
         Set the evidence for this Profile and Timewindow.
@@ -165,15 +298,7 @@ class AlertHandler:
 
         self.set_flow_causing_evidence(evidence.uid, evidence.id)
 
-        evidence.attacker.TI = self.get_ti(evidence.attacker)
-        evidence.attacker.AS = self.get_asn_info(evidence.attacker.value)
-        evidence.attacker.rDNS = self.get_rdns_info(evidence.attacker.value)
-        evidence.attacker.SNI = self.get_sni_info(evidence.attacker.value)
-        if hasattr(evidence, "victim") and evidence.victim:
-            evidence.victim.TI = self.get_ti(evidence.victim)
-            evidence.victim.AS = self.get_asn_info(evidence.victim.value)
-            evidence.victim.rDNS = self.get_rdns_info(evidence.victim.value)
-            evidence.victim.SNI = self.get_sni_info(evidence.victim.value)
+        self.enrich_evidence(evidence)
 
         evidence_to_send: dict = utils.to_dict(evidence)
         evidence_to_send: str = json.dumps(evidence_to_send)
@@ -340,6 +465,22 @@ class AlertHandler:
             {profile_twid: accumulated_threat_lvl},
         )
 
+    @staticmethod
+    def _get_max_threat_level(
+        old_max_threat_level: Optional[str], threat_level: str
+    ) -> Tuple[str, float]:
+        """
+        returns the max of the given 2 threat levels, and its numerical val
+        """
+        threat_level_float = utils.threat_levels[threat_level]
+        if not old_max_threat_level:
+            return threat_level, threat_level_float
+
+        old_max_threat_level_float = utils.threat_levels[old_max_threat_level]
+        if old_max_threat_level_float < threat_level_float:
+            return threat_level, threat_level_float
+        return old_max_threat_level, old_max_threat_level_float
+
     def update_max_threat_level(
         self, profileid: str, threat_level: str
     ) -> float:
@@ -349,35 +490,29 @@ class AlertHandler:
         the given
         :returns: the numerical val of the max threat level
         """
-        threat_level_float = utils.threat_levels[threat_level]
-
         old_max_threat_level: str = self.r.hget(profileid, "max_threat_level")
+        max_threat_level, max_threat_level_float = self._get_max_threat_level(
+            old_max_threat_level, threat_level
+        )
+        if max_threat_level != old_max_threat_level:
+            self.set_max_threat_level(profileid, max_threat_level)
+        return max_threat_level_float
 
-        if not old_max_threat_level:
-            # first time setting max tl
-            self.set_max_threat_level(profileid, threat_level)
-            return threat_level_float
-
-        old_max_threat_level_float = utils.threat_levels[old_max_threat_level]
-
-        if old_max_threat_level_float < threat_level_float:
-            self.set_max_threat_level(profileid, threat_level)
-            return threat_level_float
-
-        return old_max_threat_level_float
-
-    def update_past_threat_levels(self, profileid, threat_level, confidence):
+    @staticmethod
+    def _add_to_past_threat_levels(
+        past_threat_levels: Optional[str], threat_level: str, confidence
+    ) -> str:
         """
-        updates the past_threat_levels key of the given profileid
-        if the past threat level and confidence
-        are the same as the ones we wanna store, we replace the timestamp only
+        adds the given threat level and confidence to the given serialized
+        past threat levels, if the latest past threat level and confidence
+        are the same as the given ones, the timestamp is replaced only.
+        returns the serialized updated past threat levels
         """
         now = utils.convert_format(time.time(), utils.alerts_format)
         confidence = f"confidence: {confidence}"
         # this is what we'll be storing in the db, tl, ts, and confidence
         threat_level_data = (threat_level, now, confidence)
 
-        past_threat_levels: str = self.r.hget(profileid, "past_threat_levels")
         if past_threat_levels:
             # get the list of ts and past threat levels
             past_threat_levels: List[Tuple] = json.loads(past_threat_levels)
@@ -402,7 +537,18 @@ class AlertHandler:
             # first time setting a threat level for this profile
             past_threat_levels = [threat_level_data]
 
-        past_threat_levels = json.dumps(past_threat_levels)
+        return json.dumps(past_threat_levels)
+
+    def update_past_threat_levels(self, profileid, threat_level, confidence):
+        """
+        updates the past_threat_levels key of the given profileid
+        if the past threat level and confidence
+        are the same as the ones we wanna store, we replace the timestamp only
+        """
+        past_threat_levels: str = self.r.hget(profileid, "past_threat_levels")
+        past_threat_levels = self._add_to_past_threat_levels(
+            past_threat_levels, threat_level, confidence
+        )
         self.r.hset(profileid, "past_threat_levels", past_threat_levels)
 
     def update_ips_info(self, profileid, max_threat_lvl, confidence):
@@ -432,12 +578,23 @@ class AlertHandler:
          'medium' 'critical' etc
         """
 
-        self.r.hset(profileid, "threat_level", threat_level)
-
-        self.update_past_threat_levels(profileid, threat_level, confidence)
-
-        max_threat_lvl: float = self.update_max_threat_level(
-            profileid, threat_level
+        # read everything we need in 1 round trip, and write it back in
+        # another instead of a read-modify-write per field
+        past_threat_levels, old_max_threat_level = self.r.hmget(
+            profileid, "past_threat_levels", "max_threat_level"
+        )
+        max_threat_level, max_threat_lvl = self._get_max_threat_level(
+            old_max_threat_level, threat_level
+        )
+        self.r.hset(
+            profileid,
+            mapping={
+                "threat_level": threat_level,
+                "past_threat_levels": self._add_to_past_threat_levels(
+                    past_threat_levels, threat_level, confidence
+                ),
+                "max_threat_level": max_threat_level,
+            },
         )
 
         self.update_ips_info(profileid, max_threat_lvl, confidence)
@@ -14,6 +14,23 @@ class Constants:
     LABELED_AS_MALICIOUS = "labeled_as_malicious"
     # used to cache url info by the virustotal module only
     VT_CACHED_URL_INFO = "virustotal_cached_url_info"
+    # prefix of the keys of the cached JARM hashes of each ip and port
+    JARM_HASH = "jarm_hash"
+    # prefix of the keys of the DNS resolution of each ip
+    DNS_RESOLUTION = "DNSresolution"
+    # all the IPs that have a DNS resolution
+    RESOLVED_IPS = "resolved_ips"
+    # hash of the closed timewindows waiting to be archived, with the
+    # number of msgs published in each channel when they were closed
+    TWS_TO_ARCHIVE = "tws_to_archive"
+    # the timewindows moved from redis to the sqlite db
+    ARCHIVED_TWS = "archived_tws"
+    # the running modules that are subscribed to channels, each one
+    # counts the msgs it processed in {module}_msgs_received_at_runtime
+    SUBSCRIBED_MODULES = "subscribed_modules"
+    # the parsed whitelist of the last run, used until the whitelist is
+    # parsed again
+    CACHED_WHITELIST = "cached_whitelist"
     # used for Kalipso
     DOMAINS_INFO = "DomainsInfo"
     IPS_INFO = "IPsInfo"
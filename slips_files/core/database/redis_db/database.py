@@ -9,12 +9,15 @@ from slips_files.core.database.redis_db.ioc_handler import IoCHandler
 from slips_files.core.database.redis_db.alert_handler import AlertHandler
 from slips_files.core.database.redis_db.profile_handler import ProfileHandler
 
+import contextlib
 import os
 import signal
+import stat
 import redis
 import time
 import json
 import subprocess
+import tempfile
 from datetime import datetime
 import ipaddress
 import sys
@@ -106,6 +109,12 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
     # to keep track of connection retries. once it reaches max_retries,
     # slips will terminate
     connection_retry = 0
+    # max number of timewindows stored per resolved ip, the oldest ones
+    # are removed first
+    max_dns_resolution_tws = 100
+    # seconds to keep the timewindows of a resolved ip after its last
+    # resolution
+    dns_resolution_tws_ttl = 86400
 
     def __new__(
         cls, logger, redis_port, start_redis_server=True, flush_db=True
@@ -189,6 +198,8 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         cls.disabled_detections: List[str] = conf.disabled_detections()
         cls.width = conf.get_tw_width_as_float()
         cls.client_ips: List[str] = conf.client_ips()
+        cls.use_unix_socket: bool = conf.use_redis_unix_socket()
+        cls.max_connections: int = conf.redis_max_connections()
 
     @classmethod
     def set_slips_internal_time(cls, timestamp):
@@ -262,7 +273,99 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
             )
 
     @staticmethod
-    def _connect(port: int, db: int) -> redis.StrictRedis:
+    def get_slips_user() -> Tuple[int, int]:
+        """
+        returns the (uid, gid) of the user that started slips, even if
+        it was started using sudo
+        """
+        try:
+            return int(os.environ["SUDO_UID"]), int(os.environ["SUDO_GID"])
+        except (KeyError, ValueError):
+            return os.getuid(), os.getgid()
+
+    @classmethod
+    def get_unix_socket_dir(cls) -> Optional[str]:
+        """
+        returns the dir of the unix sockets of the redis servers slips
+        starts, it's only accessible by the user that started slips so
+        other local users can't create or connect to sockets in it.
+        returns None if the dir is owned by another user or is accessible
+        by others, e.g. if another user created it before slips did
+        """
+        uid, gid = cls.get_slips_user()
+        socket_dir = os.path.join(tempfile.gettempdir(), f"slips-redis-{uid}")
+        try:
+            os.mkdir(socket_dir, 0o700)
+            if os.getuid() != uid:
+                # slips was started using sudo, the modules drop root
+                # privileges before connecting
+                os.chown(socket_dir, uid, gid)
+        except FileExistsError:
+            pass
+        except OSError:
+            return None
+
+        try:
+            dir_stat = os.lstat(socket_dir)
+        except OSError:
+            return None
+
+        if (
+            not stat.S_ISDIR(dir_stat.st_mode)
+            or dir_stat.st_uid != uid
+            or stat.S_IMODE(dir_stat.st_mode) != 0o700
+        ):
+            return None
+        return socket_dir
+
+    @classmethod
+    def get_unix_socket_path(cls, port: int) -> Optional[str]:
+        """
+        returns the path of the unix socket of the redis server slips
+        starts on the given port, or None if there's no private dir
+        to create it in
+        """
+        if socket_dir := cls.get_unix_socket_dir():
+            return os.path.join(socket_dir, f"{port}.sock")
+        return None
+
+    @classmethod
+    def is_trusted_unix_socket(cls, socket_path: str) -> bool:
+        """
+        checks that the given path is a unix socket created by a redis
+        server started by the user that started slips or by root
+        """
+        try:
+            socket_stat = os.lstat(socket_path)
+        except OSError:
+            return False
+        return stat.S_ISSOCK(socket_stat.st_mode) and (
+            socket_stat.st_uid in (cls.get_slips_user()[0], 0)
+        )
+
+    @classmethod
+    def set_unix_socket_owner(cls, socket_path: str):
+        """
+        the redis server started using sudo creates its socket as root,
+        the modules drop root privileges before connecting, so the
+        socket is given to the user that started slips
+        """
+        uid, gid = cls.get_slips_user()
+        if os.getuid() == uid:
+            return
+        with contextlib.suppress(OSError):
+            os.chown(socket_path, uid, gid)
+
+    @classmethod
+    def _connect(cls, port: int, db: int) -> redis.StrictRedis:
+        """
+        connects to the redis server on the given port using its unix
+        socket if slips started it with one, and using TCP otherwise.
+        the command client and the pubsubs created using it share 1
+        connection pool of max_connections. the pool is recreated in each
+        child process the first time it's used, so each process has
+        its own pool
+        """
         # set health_check_interval to avoid redis ConnectionReset errors:
         # if the connection is idle for more than health_check_interval seconds,
         # a round trip PING/PONG will be attempted before next redis cmd.
@@ -270,16 +373,42 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
 
         # retry_on_timeout=True after the command times out, it will be retried once,
         # if the retry is successful, it will return normally; if it fails, an exception will be thrown
+        connection_args = {
+            "db": db,
+            "encoding": "utf-8",
+            "decode_responses": True,
+            "retry_on_timeout": True,
+            "health_check_interval": 20,
+            "max_connections": cls.max_connections,
+        }
+        socket_path = (
+            cls.get_unix_socket_path(port) if cls.use_unix_socket else None
+        )
+        if socket_path and cls.is_trusted_unix_socket(socket_path):
+            client = redis.StrictRedis(
+                connection_pool=redis.ConnectionPool(
+                    connection_class=redis.UnixDomainSocketConnection,
+                    path=socket_path,
+                    **connection_args,
+                )
+            )
+            try:
+                # the socket may be left by a redis server that was
+                # killed and another server may be listening on its port
+                if int(client.info("server")["tcp_port"]) == port:
+                    cls.set_unix_socket_owner(socket_path)
+                    return client
+            except (redis.exceptions.ConnectionError, KeyError, ValueError):
+                pass
+            client.connection_pool.disconnect()
 
         return redis.StrictRedis(
-            host="localhost",
-            port=port,
-            db=db,
-            charset="utf-8",
-            socket_keepalive=True,
-            decode_responses=True,
-            retry_on_timeout=True,
-            health_check_interval=20,
+            connection_pool=redis.ConnectionPool(
+                host="localhost",
+                port=port,
+                socket_keepalive=True,
+                **connection_args,
+            )
         )
 
     @classmethod
@@ -288,6 +417,10 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
             f"redis-server {cls._conf_file} --port {cls.redis_port} "
             f" --daemonize yes"
         )
+        if cls.use_unix_socket and (
+            socket_path := cls.get_unix_socket_path(cls.redis_port)
+        ):
+            cmd += f" --unixsocket {socket_path} --unixsocketperm 700"
         process = subprocess.Popen(
             cmd,
             cwd=os.getcwd(),
@@ -318,14 +451,15 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         Returns a tuple of (bool, error message).
         """
         try:
+            # fix  ConnectionRefused error by giving redis time to open
+            # and to create its unix socket
+            time.sleep(1)
+
             # db 0 changes everytime we run slips
             cls.r = cls._connect(cls.redis_port, 0)
             # port 6379 db 0 is cache, delete it using -cc flag
             cls.rcache = cls._connect(6379, 1)
 
-            # fix  ConnectionRefused error by giving redis time to open
-            time.sleep(1)
-
             # the connection to redis is only established
             # when you try to execute a command on the server.
             # so make sure it's established first
@@ -338,6 +472,10 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
     def close_redis_server(cls, redis_port):
         if server_pid := cls.get_redis_server_PID(redis_port):
             os.kill(int(server_pid), signal.SIGKILL)
+            # redis doesn't get the chance to remove its socket
+            if socket_path := cls.get_unix_socket_path(redis_port):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(socket_path)
 
     @classmethod
     def change_redis_limits(cls, client: redis.StrictRedis):
@@ -376,6 +514,13 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         """returns the number of msgs published in a channel"""
         return self.r.hget("msgs_published_at_runtime", channel)
 
+    def get_msgs_published_at_runtime(self) -> Dict[str, int]:
+        """
+        returns how many msgs were published in each channel so far
+        :returns: {channel_name: number_of_msgs, ...}
+        """
+        return self.r.hgetall("msgs_published_at_runtime")
+
     def subscribe(self, channel: str, ignore_subscribe_messages=True):
         """Subscribe to channel"""
         # For when a TW is modified
@@ -696,43 +841,100 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
 
         self.rcache.hset("p2p_reports", ip, json.dumps(report_data))
 
+    def get_dns_resolution_key(self, ip: str, field: str = "") -> str:
+        """
+        returns the key of the given field of the DNS resolution of
+        the given ip.
+        each resolution is stored in 4 keys:
+        DNSresolution_<ip>: hash with the ts and uid of the last resolution
+        DNSresolution_<ip>_domains: zset of domains, scored by the time
+        they first resolved to this ip
+        DNSresolution_<ip>_resolvers: set of the IPs that resolved it
+        DNSresolution_<ip>_timewindows: zset of the twids where it was
+        resolved, scored by the tw number
+        """
+        key = f"{self.constants.DNS_RESOLUTION}_{ip}"
+        return f"{key}_{field}" if field else key
+
     def get_dns_resolution(self, ip):
         """
         IF this IP was resolved by slips
         returns a dict with {ts: .. ,
                             'domains': .. ,
                             'uid':...,
-                            'resolved-by':.. }
+                            'resolved-by':..,
+                            'timewindows': ..}
         If not resolved, returns {}
         this function is called for every IP in the timeline of kalipso
-        """
-        if ip_info := self.r.hget("DNSresolution", ip):
-            ip_info = json.loads(ip_info)
-            # return a dict with 'ts' 'uid' 'domains' about this IP
-            return ip_info
-        return {}
+        use get_domains_of_resolved_ip() or is_ip_resolved() when only
+        one field is needed
+        """
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hgetall(self.get_dns_resolution_key(ip))
+        pipe.zrange(self.get_dns_resolution_key(ip, "domains"), 0, -1)
+        pipe.smembers(self.get_dns_resolution_key(ip, "resolvers"))
+        pipe.zrange(self.get_dns_resolution_key(ip, "timewindows"), 0, -1)
+        last_resolution, domains, resolvers, timewindows = pipe.execute()
+        if not last_resolution:
+            return {}
+
+        ts = last_resolution["ts"]
+        with contextlib.suppress(ValueError):
+            ts = float(ts)
+        return {
+            "ts": ts,
+            "uid": last_resolution["uid"],
+            "domains": domains,
+            "resolved-by": list(resolvers),
+            "timewindows": timewindows,
+        }
 
-    def is_ip_resolved(self, ip, hrs):
+    def get_domains_of_resolved_ip(self, ip: str) -> List[str]:
         """
-        :param hrs: float, how many hours to look back for resolutions
+        returns the domains that resolved to the given ip, in the order
+        they were seen
         """
-        ip_info = self.get_dns_resolution(ip)
-        if ip_info == {}:
-            return False
+        return self.r.zrange(self.get_dns_resolution_key(ip, "domains"), 0, -1)
 
-        # these are the tws this ip was resolved in
-        tws_where_ip_was_resolved = ip_info["timewindows"]
+    def is_ip_resolved_by(self, ip: str, resolver: str) -> bool:
+        """checks if the given resolver asked for a domain of the given ip"""
+        return bool(
+            self.r.sismember(
+                self.get_dns_resolution_key(ip, "resolvers"), resolver
+            )
+        )
 
+    def is_ip_resolved(self, ip, hrs, twid: str = None):
+        """
+        :param hrs: float, how many hours to look back for resolutions
+        :param twid: the tw to look back from. if not given, the
+        resolutions in the first hrs of the capture are checked
+        """
         # IP is resolved, was it resolved in the past x hrs?
         tws_to_search: int = self.get_equivalent_tws(hrs)
+        if twid:
+            current_tw = int(twid.replace("timewindow", ""))
+            min_tw, max_tw = current_tw - tws_to_search, "+inf"
+        else:
+            min_tw, max_tw = 0, tws_to_search - 1
 
-        for tw_number in range(tws_to_search):
-            if f"timewindow{tw_number}" in tws_where_ip_was_resolved:
-                return True
-        return False
+        # these are the tws this ip was resolved in
+        return bool(
+            self.r.zrangebyscore(
+                self.get_dns_resolution_key(ip, "timewindows"),
+                min_tw,
+                max_tw,
+                start=0,
+                num=1,
+            )
+        )
 
     def delete_dns_resolution(self, ip):
-        self.r.hdel("DNSresolution", ip)
+        pipe = self.r.pipeline(transaction=False)
+        for field in ("", "domains", "resolvers", "timewindows"):
+            pipe.delete(self.get_dns_resolution_key(ip, field))
+        pipe.srem(self.constants.RESOLVED_IPS, ip)
+        pipe.execute()
 
     def should_store_resolution(
         self, query: str, answers: list, qtype_name: str
@@ -778,8 +980,13 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         # Also store these IPs inside the domain
         ips_to_add = []
         CNAMEs = []
-        profileid_twid = f"profile_{srcip}_{twid}"
+        try:
+            tw_number = int(twid.replace("timewindow", ""))
+        except ValueError:
+            tw_number = 0
 
+        # all the answers are written in 1 round trip
+        pipe = self.r.pipeline(transaction=False)
         for answer in answers:
             # Make sure it's an ip not a CNAME
             if not validators.ipv6(answer) and not validators.ipv4(answer):
@@ -790,52 +997,33 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
                 CNAMEs.append(answer)
                 continue
 
-            # get stored DNS resolution from our db
-            ip_info_from_db = self.get_dns_resolution(answer)
-            if ip_info_from_db == {}:
-                # if the domain(query) we have isn't already in
-                # DNSresolution in the db
-                resolved_by = [srcip]
-                domains = []
-                timewindows = [profileid_twid]
-            else:
-                # we have info about this domain in DNSresolution in the db
-                # keep track of all srcips that resolved this domain
-                resolved_by = ip_info_from_db.get("resolved-by", [])
-                if srcip not in resolved_by:
-                    resolved_by.append(srcip)
-
-                # timewindows in which this odmain was resolved
-                timewindows = ip_info_from_db.get("timewindows", [])
-                if profileid_twid not in timewindows:
-                    timewindows.append(profileid_twid)
-
-                # we'll be appending the current answer
-                # to these cached domains
-                domains = ip_info_from_db.get("domains", [])
-
-            # if the domain(query) we have isn't already in
-            # DNSresolution in the db, add it
-            if query not in domains:
-                domains.append(query)
-
-            # domains should be a list, not a string!,
-            # so don't use json.dumps here
-            ip_info = {
-                "ts": ts,
-                "uid": uid,
-                "domains": domains,
-                "resolved-by": resolved_by,
-                "timewindows": timewindows,
-            }
-            ip_info = json.dumps(ip_info)
             # we store ALL dns resolutions seen since starting slips
             # store with the IP as the key
-            self.r.hset("DNSresolution", answer, ip_info)
+            pipe.hset(
+                self.get_dns_resolution_key(answer),
+                mapping={"ts": ts, "uid": uid},
+            )
+            # nx keeps the time the domain was first seen so the domains
+            # stay in the order they were resolved
+            pipe.zadd(
+                self.get_dns_resolution_key(answer, "domains"),
+                {query: ts},
+                nx=True,
+            )
+            # keep track of all srcips that resolved this domain
+            pipe.sadd(self.get_dns_resolution_key(answer, "resolvers"), srcip)
+            # timewindows in which this domain was resolved. only the
+            # newest max_dns_resolution_tws are kept
+            tws_key = self.get_dns_resolution_key(answer, "timewindows")
+            pipe.zadd(tws_key, {twid: tw_number})
+            pipe.zremrangebyrank(tws_key, 0, -self.max_dns_resolution_tws - 1)
+            pipe.expire(tws_key, self.dns_resolution_tws_ttl)
+            pipe.sadd(self.constants.RESOLVED_IPS, answer)
             # store with the domain as the key:
-            self.r.hset("ResolvedDomains", domains[0], answer)
+            pipe.hset("ResolvedDomains", query, answer)
             # these ips will be associated with the query in our db
             ips_to_add.append(answer)
+        pipe.execute()
 
         # For each CNAME in the answer
         # store it in DomainsInfo in the cache db (used for kalipso)
@@ -1073,6 +1261,25 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         """
         self.rcache.hset("portinfo", portproto, name)
 
+    def replace_cached_hash(self, key: str, mapping: Dict[str, str]):
+        """
+        Replaces the content of the given hash in the cache db with the
+        given mapping in 1 transaction, so readers either see the old or
+        the new content, never a mix of both
+        """
+        pipe = self.rcache.pipeline()
+        pipe.delete(key)
+        if mapping:
+            pipe.hset(key, mapping=mapping)
+        pipe.execute()
+
+    def set_ports_info(self, ports_info: Dict[str, str]):
+        """
+        Replaces the stored ports descriptions with the given ones
+        :param ports_info: {portnumber/protocol: name}
+        """
+        self.replace_cached_hash("portinfo", ports_info)
+
     def get_port_info(self, portproto: str):
         """
         Retrieve the name of a port
@@ -1080,6 +1287,13 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         """
         return self.rcache.hget("portinfo", portproto)
 
+    def has_cached_ports_info(self) -> bool:
+        """
+        returns True if the ports info and the organizations of ports
+        stored by a previous run are in the cache db
+        """
+        return self.rcache.exists("portinfo", "organization_port") == 2
+
     def set_ftp_port(self, port):
         """
         Stores the used ftp port in our main db (not the cache like set_port_info)
@@ -1111,6 +1325,19 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         org_info = json.dumps(org_info)
         self.rcache.hset("organization_port", portproto, org_info)
 
+    def set_organizations_of_ports(self, ports: Dict[str, dict]):
+        """
+        Replaces the stored organizations of ports with the given ones
+        :param ports: {portnumber/protocol: {"org_name": [..], "ip": [..]}}
+        """
+        self.replace_cached_hash(
+            "organization_port",
+            {
+                portproto: json.dumps(org_info)
+                for portproto, org_info in ports.items()
+            },
+        )
+
     def get_organization_of_port(self, portproto: str):
         """
         Retrieve the organization info that uses this port
@@ -1158,7 +1385,13 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         return json.loads(ips) if ips else []
 
     def get_all_dns_resolutions(self):
-        dns_resolutions = self.r.hgetall("DNSresolution")
+        """
+        returns {ip: serialized resolution} of all the resolved IPs
+        """
+        dns_resolutions = {
+            ip: json.dumps(self.get_dns_resolution(ip))
+            for ip in self.r.sscan_iter(self.constants.RESOLVED_IPS)
+        }
         return dns_resolutions or []
 
     def is_running_non_stop(self) -> bool:
@@ -1187,6 +1420,20 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         else:
             return False
 
+    def set_jarm_hash(self, ip: str, port: int, jarm_hash: str, ttl: int):
+        """
+        Caches the JARM hash of the given ip and port for ttl seconds
+        """
+        self.rcache.set(
+            f"{self.constants.JARM_HASH}_{ip}_{port}", jarm_hash, ex=ttl
+        )
+
+    def get_jarm_hash(self, ip: str, port: int) -> Optional[str]:
+        """
+        returns the cached JARM hash of the given ip and port
+        """
+        return self.rcache.get(f"{self.constants.JARM_HASH}_{ip}_{port}")
+
     def get_reconnections_for_tw(self, profileid, twid):
         """Get the reconnections for this TW for this Profile"""
         data = self.r.hget(f"{profileid}_{twid}", "Reconnections")
@@ -1325,6 +1572,32 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         """
         self.r.hset("whitelist", type_, json.dumps(whitelist_dict))
 
+    def set_whitelists(self, whitelists: Dict[str, dict]):
+        """
+        Stores all the given whitelists in 1 command, so readers never
+        see a partially updated whitelist.
+        they're cached in the cache db too, so the next run of slips can
+        use them before parsing the whitelist again
+        :param whitelists: {type_: whitelist_dict}, supported types are
+        IPs, domains, macs and organizations
+        """
+        mapping = {
+            type_: json.dumps(whitelist)
+            for type_, whitelist in whitelists.items()
+        }
+        self.r.hset("whitelist", mapping=mapping)
+        self.replace_cached_hash(Constants.CACHED_WHITELIST, mapping)
+
+    def load_cached_whitelist(self) -> bool:
+        """
+        Stores the whitelist parsed by the previous run of slips in the db
+        :return: True if there was a cached whitelist
+        """
+        if not (whitelist := self.rcache.hgetall(Constants.CACHED_WHITELIST)):
+            return False
+        self.r.hset("whitelist", mapping=whitelist)
+        return True
+
     def get_all_whitelist(self) -> Optional[Dict[str, dict]]:
         """
         Returns a dict with the following keys from the whitelist
@@ -1512,11 +1785,56 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
     def get_stdfile(self, file_type):
         return self.r.get(file_type)
 
+    def init_msgs_received_in_channels(self, module: str, channels: List[str]):
+        """
+        sets the number of msgs received by the given module in each of
+        the given channels to the msgs published in them so far. the msgs
+        published before the module subscribed never reach it
+        """
+        if not channels:
+            return
+        published = self.r.hmget("msgs_published_at_runtime", channels)
+        self.r.hset(
+            f"{module}_msgs_received_at_runtime",
+            mapping={
+                channel: int(msgs or 0)
+                for channel, msgs in zip(channels, published)
+            },
+        )
+
+    def register_module(self, module: str):
+        """
+        closed timewindows are archived once all registered modules
+        processed the msgs published before closing them
+        """
+        self.r.sadd(Constants.SUBSCRIBED_MODULES, module)
+
+    def unregister_module(self, module: str):
+        """
+        called when the given module stops, the msgs it didn't process
+        don't delay archiving closed timewindows anymore.
+        the msgs it received are kept for the stats
+        """
+        self.r.srem(Constants.SUBSCRIBED_MODULES, module)
+
     def incr_msgs_received_in_channel(self, module: str, channel: str):
         """increments the number of msgs received by a module in the given
-        channel by 1"""
+        channel by 1. modules call this once they're done processing
+        the msg"""
         self.r.hincrby(f"{module}_msgs_received_at_runtime", channel, 1)
 
+    def get_msgs_received_by_modules(self) -> Dict[str, Dict[str, str]]:
+        """
+        returns how many msgs each running module received in each of
+        its channels
+        :returns: {module: {channel_name: number_of_msgs, ...}, ...}
+        """
+        modules = list(self.r.smembers(Constants.SUBSCRIBED_MODULES))
+        pipe = self.r.pipeline()
+        for module in modules:
+            pipe.hgetall(f"{module}_msgs_received_at_runtime")
+        return dict(zip(modules, pipe.execute()))
+
     def get_msgs_received_at_runtime(self, module: str) -> Dict[str, int]:
         """
         returns a list of channels this module is subscribed to, and how
@@ -1524,3 +1842,17 @@ class RedisDB(IoCHandler, AlertHandler, ProfileHandler):
         :returns: {channel_name: number_of_msgs, ...}
         """
         return self.r.hgetall(f"{module}_msgs_received_at_runtime")
+
+    def store_pipeline_metrics(self, process: str, metrics: str):
+        """
+        stores the serialized pipeline metrics recorded by the given
+        process, replacing the ones it stored before
+        """
+        self.r.hset("pipeline_metrics", process, metrics)
+
+    def get_pipeline_metrics(self) -> Dict[str, str]:
+        """
+        returns the serialized pipeline metrics stored by each process
+        :returns: {process_name: metrics, ...}
+        """
+        return self.r.hgetall("pipeline_metrics")
@@ -5,6 +5,8 @@ import traceback
 from dataclasses import asdict
 from math import floor
 from typing import (
+    Callable,
+    Dict,
     Tuple,
     Union,
     Optional,
@@ -14,6 +16,8 @@ from typing import (
 import redis
 import validators
 
+from slips_files.core.database.redis_db.constants import Constants
+
 
 class ProfileHandler:
     """
@@ -22,6 +26,10 @@ class ProfileHandler:
     """
 
     name = "DB"
+    # called with the profileid_twid of an archived tw that is modified
+    # again to load its archived data back to redis. set by the
+    # DBManager because the archived data is in the sqlite db
+    restore_archived_tw: Optional[Callable[[str], bool]] = None
 
     def is_doh_server(self, ip: str) -> bool:
         """returns whether the given ip is a DoH server"""
@@ -719,11 +727,15 @@ class ProfileHandler:
         profileid="",
         twid="",
         label="",
+        time_read: Optional[float] = None,
     ):
         """
         Function to add a flow by interpreting the data. The flow is added to
         the correct TW for this profile.
         The profileid is the main profile that this flow is related too.
+        :param time_read: when the input process read the flow. only
+        given when pipeline_metrics_enable is set, it's sent with the flow
+        for the modules to record how long the flow took to reach them
         """
         if label:
             self.r.zincrby("labels", 1, label)
@@ -739,6 +751,9 @@ class ProfileHandler:
             "label": label,
             "module_labels": {},
         }
+        if time_read:
+            to_send["time_read"] = time_read
+            to_send["time_published"] = time.time()
         to_send = json.dumps(to_send)
 
         # set the pcap/file stime in the analysis key
@@ -881,16 +896,12 @@ class ProfileHandler:
             # Verify that the SNI is equal to any of the domains in the DNS
             # resolution
             # only add this SNI to our db if it has a DNS resolution
-            if dns_resolutions := self.r.hgetall("DNSresolution"):
-                # dns_resolutions is a dict with {ip:{'ts'..,'domains':...,
-                # 'uid':..}}
-                for ip, resolution in dns_resolutions.items():
-                    resolution = json.loads(resolution)
-                    if SNI_port["server_name"] in resolution["domains"]:
-                        # add SNI to our db as it has a DNS resolution
-                        sni_ipdata.append(SNI_port)
-                        self.set_ip_info(flow.daddr, {"SNI": sni_ipdata})
-                        break
+            # DomainsResolved has all the domains of all the DNS
+            # resolutions
+            if self.r.hexists("DomainsResolved", SNI_port["server_name"]):
+                # add SNI to our db as it has a DNS resolution
+                sni_ipdata.append(SNI_port)
+                self.set_ip_info(flow.daddr, {"SNI": sni_ipdata})
 
     def get_profileid_from_ip(self, ip: str) -> Optional[str]:
         """
@@ -1369,23 +1380,28 @@ class ProfileHandler:
          and individual hashmaps for each profile (like a table)
         """
         try:
-            if self.r.sismember("profiles", profileid):
+            # Add the profile to the index. The index is called 'profiles'
+            # sadd returns 0 if the profile was already there
+            if not self.r.sadd("profiles", str(profileid)):
                 # we already have this profile
                 return False
 
-            # Add the profile to the index. The index is called 'profiles'
-            self.r.sadd("profiles", str(profileid))
+            # When a new profiled is created assign threat level = 0
+            # and confidence = 0.05
+            confidence = 0.05
             # Create the hashmap with the profileid.
             # The hasmap of each profile is named with the profileid
             # Add the start time of profile
-            self.r.hset(profileid, "starttime", starttime)
             # For now duration of the TW is fixed
-            self.r.hset(profileid, "duration", self.width)
-            # When a new profiled is created assign threat level = 0
-            # and confidence = 0.05
-            confidence = 0.05
+            self.r.hset(
+                profileid,
+                mapping={
+                    "starttime": starttime,
+                    "duration": self.width,
+                    "confidence": confidence,
+                },
+            )
             self.update_threat_level(profileid, "info", confidence)
-            self.r.hset(profileid, "confidence", confidence)
             # The IP of the profile should also be added as a new IP
             # we know about.
             ip = profileid.split(self.separator)[1]
@@ -1451,6 +1467,147 @@ class ProfileHandler:
         self.r.sadd("ClosedTW", profileid_tw)
         self.r.zrem("ModifiedTW", profileid_tw)
         self.publish("tw_closed", profileid_tw)
+        # the data of this tw is archived once the modules processed all
+        # the msgs published until now, including the tw_closed one
+        self.queue_tw_to_archive(profileid_tw)
+
+    def queue_tw_to_archive(self, profileid_tw: str):
+        self.r.hset(
+            Constants.TWS_TO_ARCHIVE,
+            profileid_tw,
+            json.dumps(self.get_msgs_published_at_runtime()),
+        )
+
+    def get_tw_keys(self, profileid_tw: str) -> Tuple[str, str, str]:
+        """
+        returns the keys of the hash, the timeline and the evidence of the
+        given profileid_twid
+        """
+        return (
+            profileid_tw,
+            f"{profileid_tw}{self.separator}timeline",
+            f"{profileid_tw}{self.separator}evidence",
+        )
+
+    def get_tws_to_archive(self) -> Dict[str, Dict[str, str]]:
+        """
+        returns the closed timewindows that are not archived yet
+        :return: {profileid_twid: {channel: msgs published in it before
+        closing the tw}}
+        """
+        return {
+            profileid_tw: json.loads(published)
+            for profileid_tw, published in self.r.hgetall(
+                Constants.TWS_TO_ARCHIVE
+            ).items()
+        }
+
+    def get_tw_data(self, client, profileid_tw: str) -> dict:
+        """
+        returns the data of the given tw as stored in the sqlite db
+        :param client: the redis client or pipeline to read with
+        """
+        tw_key, timeline_key, evidence_key = self.get_tw_keys(profileid_tw)
+        return {
+            "tw": client.hgetall(tw_key),
+            "timeline": client.zrange(timeline_key, 0, -1, withscores=True),
+            "evidence": client.hgetall(evidence_key),
+            "dhcp_flows": client.hget("DHCP_flows", profileid_tw),
+        }
+
+    def archive_tw(
+        self, profileid_tw: str, store: Callable[[str, dict], None]
+    ) -> bool:
+        """
+        Moves the data of the given closed timewindow out of redis.
+        the data is only deleted from redis if nothing was written to the
+        tw in the meantime, and is passed to the given store function
+        after that.
+        :param store: called with (profileid_tw, data) to archive the data
+        :return: True if the tw was archived
+        """
+        tw_key, timeline_key, evidence_key = self.get_tw_keys(profileid_tw)
+        with self.r.pipeline() as pipe:
+            try:
+                pipe.watch(tw_key, timeline_key, evidence_key, "DHCP_flows")
+                if pipe.zscore("ModifiedTW", profileid_tw) is not None:
+                    # the tw was modified after closing it, it will be
+                    # archived when it's closed again
+                    pipe.unwatch()
+                    self.r.hdel(Constants.TWS_TO_ARCHIVE, profileid_tw)
+                    return False
+
+                data = self.get_tw_data(pipe, profileid_tw)
+                archived = any(data.values())
+                pipe.multi()
+                pipe.delete(tw_key, timeline_key, evidence_key)
+                pipe.hdel("DHCP_flows", profileid_tw)
+                pipe.hdel(Constants.TWS_TO_ARCHIVE, profileid_tw)
+                if archived:
+                    pipe.sadd(Constants.ARCHIVED_TWS, profileid_tw)
+                pipe.execute()
+            except redis.exceptions.WatchError:
+                # new data was written to the tw while archiving it,
+                # try again in the next round
+                return False
+
+        if archived:
+            store(profileid_tw, data)
+        return archived
+
+    def is_tw_archived(self, profileid: str, twid: str) -> bool:
+        return bool(
+            self.r.sismember(
+                Constants.ARCHIVED_TWS, f"{profileid}{self.separator}{twid}"
+            )
+        )
+
+    def claim_archived_tw(self, profileid_tw: str) -> bool:
+        """
+        marks the given tw as not archived anymore.
+        :return: True if the tw was archived, only the process that
+        claimed it should restore its data
+        """
+        return bool(self.r.srem(Constants.ARCHIVED_TWS, profileid_tw))
+
+    def restore_tw(
+        self,
+        profileid_tw: str,
+        data: dict,
+        merge: Callable[[dict, dict], dict],
+    ):
+        """
+        Writes the archived data of the given timewindow back to redis,
+        merged with the data written to the tw after archiving it
+        :param data: the data as given to the store function of
+        archive_tw()
+        :param merge: called with (archived data, data in redis),
+        returns the data to write to redis
+        """
+        keys = self.get_tw_keys(profileid_tw)
+        tw_key, timeline_key, evidence_key = keys
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*keys, "DHCP_flows")
+                    merged = merge(data, self.get_tw_data(pipe, profileid_tw))
+                    pipe.multi()
+                    pipe.delete(*keys)
+                    if merged["tw"]:
+                        pipe.hset(tw_key, mapping=merged["tw"])
+                    if merged["timeline"]:
+                        pipe.zadd(timeline_key, dict(merged["timeline"]))
+                    if merged["evidence"]:
+                        pipe.hset(evidence_key, mapping=merged["evidence"])
+                    if merged["dhcp_flows"]:
+                        pipe.hset(
+                            "DHCP_flows", profileid_tw, merged["dhcp_flows"]
+                        )
+                    pipe.execute()
+                    return
+                except redis.exceptions.WatchError:
+                    # data was written to the tw while restoring it
+                    continue
 
     def mark_profile_tw_as_modified(self, profileid, twid, timestamp):
         """
@@ -1463,8 +1620,17 @@ class ProfileHandler:
         4- To check if we should 'close' some TW
         """
         timestamp = time.time()
-        data = {f"{profileid}{self.separator}{twid}": float(timestamp)}
-        self.r.zadd("ModifiedTW", data)
+        profileid_tw = f"{profileid}{self.separator}{twid}"
+        pipe = self.r.pipeline()
+        pipe.zadd("ModifiedTW", {profileid_tw: float(timestamp)})
+        if self.restore_archived_tw:
+            pipe.srem(Constants.ARCHIVED_TWS, profileid_tw)
+        results = pipe.execute()
+        if self.restore_archived_tw and results[-1]:
+            # the tw was reopened after archiving it, it's archived again
+            # with the new data once it's closed
+            self.restore_archived_tw(profileid_tw)
+
         self.publish("tw_modified", f"{profileid}:{twid}")
         # Check if we should close some TW
         self.check_tw_to_close()
@@ -1,9 +1,10 @@
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
 import os.path
 import sqlite3
 import json
 import csv
+import zlib
 from dataclasses import asdict
 from threading import Lock
 from time import sleep
@@ -31,11 +32,7 @@ class SQLiteDB:
         """
         Creates the db if it doesn't exist and connects to it
         """
-        db_newly_created = False
         if not os.path.exists(self._flows_db):
-            # db not created, mark it as first time accessing it so we can
-            # init tables once we connect
-            db_newly_created = True
             self._init_db()
 
         # you can get multithreaded access on a single pysqlite connection by
@@ -45,9 +42,9 @@ class SQLiteDB:
         )
 
         self.cursor = self.conn.cursor()
-        if db_newly_created:
-            # only init tables if the db is newly created
-            self.init_tables()
+        # the tables are only created if they don't exist, so the tables
+        # added after the db was created are there too
+        self.init_tables()
 
     def get_number_of_tables(self):
         """
@@ -64,6 +61,10 @@ class SQLiteDB:
             "flows": "uid TEXT PRIMARY KEY, flow TEXT, label TEXT, profileid TEXT, twid TEXT, aid TEXT",
             "altflows": "uid TEXT PRIMARY KEY, flow TEXT, label TEXT, profileid TEXT, twid TEXT, flow_type TEXT",
             "alerts": "alert_id TEXT PRIMARY KEY, alert_time TEXT, ip_alerted TEXT, timewindow TEXT, tw_start TEXT, tw_end TEXT, label TEXT",
+            "archived_timewindows": "profileid_twid TEXT PRIMARY KEY, data BLOB",
+            # the flows whose label changed after they were stored, in
+            # the order they were relabeled
+            "relabeled_flows": "id INTEGER PRIMARY KEY AUTOINCREMENT, uid TEXT",
         }
         for table_name, schema in table_schema.items():
             self.create_table(table_name, schema)
@@ -154,6 +155,13 @@ class SQLiteDB:
         sets the given new_label to each flow in the uids list
         """
         for uid in uids:
+            # keep track of the flows whose label changed, the ones that
+            # were already used for training are trained again
+            self.execute(
+                "INSERT INTO relabeled_flows (uid) "
+                "SELECT uid FROM flows WHERE uid = ? AND label != ?",
+                (uid, new_label),
+            )
             # add the label to the flow (conn.log flow)
             query = f'UPDATE flows SET label="{new_label}" WHERE uid="{uid}"'
             self.execute(query)
@@ -219,6 +227,51 @@ class SQLiteDB:
         # Return the combined iterator
         return iter(row_generator())
 
+    def iterate_flows_in_chunks(
+        self, after_rowid: int = 0, chunk_size: int = 1000
+    ) -> Iterator[List[Tuple[int, str, str]]]:
+        """
+        yields the flows stored after the given rowid, chunk_size flows at
+        a time, in the order they were stored.
+        each chunk is a list of (rowid, flow, label) tuples, so the caller
+        can continue from the rowid of the last flow it received
+        """
+        while True:
+            self.execute(
+                "SELECT rowid, flow, label FROM flows "
+                "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (after_rowid, chunk_size),
+            )
+            chunk = self.fetchall()
+            if not chunk:
+                return
+            yield chunk
+            after_rowid = chunk[-1][0]
+
+    def iterate_relabeled_flows_in_chunks(
+        self, after_id: int = 0, chunk_size: int = 1000
+    ) -> Iterator[List[Tuple[int, int, str, str]]]:
+        """
+        yields the flows relabeled after the given relabeling id,
+        chunk_size flows at a time, in the order they were relabeled.
+        each chunk is a list of (relabeling id, rowid of the flow, flow,
+        current label) tuples
+        """
+        while True:
+            self.execute(
+                "SELECT relabeled_flows.id, flows.rowid, flows.flow, "
+                "flows.label FROM relabeled_flows "
+                "JOIN flows ON flows.uid = relabeled_flows.uid "
+                "WHERE relabeled_flows.id > ? "
+                "ORDER BY relabeled_flows.id LIMIT ?",
+                (after_id, chunk_size),
+            )
+            chunk = self.fetchall()
+            if not chunk:
+                return
+            yield chunk
+            after_id = chunk[-1][0]
+
     def get_flow(self, uid: str, twid=False) -> dict:
         """
         Returns the flow with the given uid
@@ -316,6 +369,148 @@ class SQLiteDB:
             ),
         )
 
+    @staticmethod
+    def compress_timewindow(data: dict) -> bytes:
+        return zlib.compress(json.dumps(data).encode())
+
+    @staticmethod
+    def decompress_timewindow(data: bytes) -> dict:
+        return json.loads(zlib.decompress(data))
+
+    @classmethod
+    def merge_json(cls, old, new):
+        """
+        merges 2 values of the same json field of a timewindow.
+        counters are added, lists are concatenated, dicts are merged
+        key by key and the rest of the old values are kept, e.g. the
+        stime of an ip
+        """
+        if isinstance(old, dict) and isinstance(new, dict):
+            merged = dict(old)
+            for key, value in new.items():
+                merged[key] = (
+                    cls.merge_json(old[key], value) if key in old else value
+                )
+            return merged
+        if isinstance(old, list) and isinstance(new, list):
+            return old + new
+        if all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in (old, new)
+        ):
+            return old + new
+        return old
+
+    @staticmethod
+    def merge_symbols(old: dict, new: dict) -> dict:
+        """
+        merges the In/OutTuples of a timewindow,
+        {tupleid: [symbols, timestamps of the last 2 flows]}
+        """
+        merged = dict(old)
+        for tupleid, (symbols, timestamps) in new.items():
+            if tupleid in merged:
+                symbols = merged[tupleid][0] + symbols
+            merged[tupleid] = [symbols, timestamps]
+        return merged
+
+    @staticmethod
+    def merge_reconnections(old: dict, new: dict) -> dict:
+        """
+        merges the reconnections of a timewindow,
+        {saddr-daddr-dport: [reconnections, uids]}
+        """
+        merged = dict(old)
+        for key, (reconnections, uids) in new.items():
+            if key in merged:
+                reconnections += merged[key][0]
+                uids = merged[key][1] + uids
+            merged[key] = [reconnections, uids]
+        return merged
+
+    @classmethod
+    def merge_tw_field(cls, field: str, old: str, new: str) -> str:
+        """
+        merges the old and new values of a field of the hash of a
+        timewindow. the fields are json written incrementally, so the
+        new value only has what was written after the old one
+        """
+        try:
+            old, new = json.loads(old), json.loads(new)
+        except (json.JSONDecodeError, TypeError):
+            return new
+
+        merge = {
+            "InTuples": cls.merge_symbols,
+            "OutTuples": cls.merge_symbols,
+            "Reconnections": cls.merge_reconnections,
+        }.get(field, cls.merge_json)
+        return json.dumps(merge(old, new))
+
+    @classmethod
+    def merge_timewindows(cls, old: dict, new: dict) -> dict:
+        """
+        merges the data of a timewindow that was archived with the data
+        written to it after archiving it
+        """
+        tw = dict(old["tw"])
+        for field, value in new["tw"].items():
+            tw[field] = (
+                cls.merge_tw_field(field, tw[field], value)
+                if field in tw
+                else value
+            )
+
+        dhcp_flows = old["dhcp_flows"]
+        if dhcp_flows and new["dhcp_flows"]:
+            dhcp_flows = json.dumps(
+                {**json.loads(dhcp_flows), **json.loads(new["dhcp_flows"])}
+            )
+        timeline = {line: score for line, score in old["timeline"]}
+        timeline.update(new["timeline"])
+        return {
+            "tw": tw,
+            "timeline": sorted(timeline.items(), key=lambda x: x[1]),
+            "evidence": {**old["evidence"], **new["evidence"]},
+            "dhcp_flows": dhcp_flows or new["dhcp_flows"],
+        }
+
+    def archive_timewindow(self, profileid_tw: str, data: dict):
+        """
+        stores the data of the given closed timewindow compressed
+        :param data: {"tw": the hash of the tw, "timeline": [(line,
+        timestamp)], "evidence": {evidence_id: evidence},
+        "dhcp_flows": serialized dhcp flows or None}
+        """
+        if archived := self.get_archived_timewindow(profileid_tw):
+            # data was written to the tw after archiving it without
+            # restoring it first
+            data = self.merge_timewindows(archived, data)
+
+        self.execute(
+            "INSERT OR REPLACE INTO archived_timewindows "
+            "(profileid_twid, data) VALUES (?, ?);",
+            (profileid_tw, self.compress_timewindow(data)),
+        )
+
+    def get_archived_timewindow(self, profileid_tw: str) -> dict:
+        """
+        returns the archived data of the given timewindow or {} if it
+        wasn't archived
+        """
+        self.execute(
+            "SELECT data FROM archived_timewindows WHERE profileid_twid = ?",
+            (profileid_tw,),
+        )
+        row = self.fetchone()
+        return self.decompress_timewindow(row[0]) if row else {}
+
+    def delete_archived_timewindow(self, profileid_tw: str):
+        self.execute(
+            "DELETE FROM archived_timewindows WHERE profileid_twid = ?",
+            (profileid_tw,),
+        )
+
     def insert(self, table_name, values):
         query = f"INSERT INTO {table_name} VALUES ({values})"
         self.execute(query)
@@ -121,14 +121,12 @@ class EvidenceHandler(ICore):
         :return : string with a correct evidence displacement
         """
         evidence_string = ""
-        dns_resolution_attacker = self.db.get_dns_resolution(attacker)
-        dns_resolution_attacker = dns_resolution_attacker.get("domains", [])
+        dns_resolution_attacker = self.db.get_domains_of_resolved_ip(attacker)
         dns_resolution_attacker = (
             dns_resolution_attacker[:3] if dns_resolution_attacker else ""
         )
 
-        dns_resolution_ip = self.db.get_dns_resolution(ip)
-        dns_resolution_ip = dns_resolution_ip.get("domains", [])
+        dns_resolution_ip = self.db.get_domains_of_resolved_ip(ip)
         if len(dns_resolution_ip) >= 1:
             dns_resolution_ip = dns_resolution_ip[0]
         elif len(dns_resolution_ip) == 0:
@@ -19,6 +19,11 @@
 import os
 import json
 import time
+from typing import (
+    Callable,
+    Optional,
+)
+
 from watchdog.events import RegexMatchingEventHandler
 from slips_files.common.slips_utils import utils
 
@@ -26,18 +31,33 @@ from slips_files.common.slips_utils import utils
 class FileEventHandler(RegexMatchingEventHandler):
     REGEX = [r".*\.log$", r".*\.conf$"]
 
-    def __init__(self, dir_to_monitor, input_type, db):
+    def __init__(
+        self,
+        dir_to_monitor,
+        input_type,
+        db,
+        on_log_change: Optional[Callable[[str], None]] = None,
+    ):
         super().__init__(regexes=self.REGEX)
         self.dir_to_monitor = dir_to_monitor
         utils.drop_root_privs()
         self.db = db
         self.input_type = input_type
+        # is called with the path of every log file that zeek creates,
+        # writes to or rotates, so the input process doesn't have to
+        # poll the log files for new lines
+        self.on_log_change = on_log_change
+
+    def notify_log_change(self, path: str):
+        if self.on_log_change and path.endswith(".log"):
+            self.on_log_change(path)
 
     def on_created(self, event):
         """this will be triggered everytime zeek creates a log file"""
         filename, ext = os.path.splitext(event.src_path)
         if "log" in ext:
             self.db.add_zeek_file(filename + ext)
+            self.notify_log_change(event.src_path)
 
     def on_moved(self, event):
         """
@@ -45,6 +65,9 @@ class FileEventHandler(RegexMatchingEventHandler):
         """
         # tell inputProcess to change open handles
         if event.dest_path != "True":
+            # read what's left in the rotated file and the new one
+            self.notify_log_change(event.src_path)
+            self.notify_log_change(event.dest_path)
             to_send = {"old_file": event.dest_path, "new_file": event.src_path}
             to_send = json.dumps(to_send)
             self.db.publish("remove_old_files", to_send)
@@ -60,6 +83,7 @@ class FileEventHandler(RegexMatchingEventHandler):
         # so if zeek receives a termination signal,
         # slips would know about it
         filename, ext = os.path.splitext(event.src_path)
+        self.notify_log_change(event.src_path)
         if "reporter" in filename:
             # check if it's a termination signal
             # get the exact file name (a ts is appended to it)
@@ -1,7 +1,10 @@
 import ipaddress
 import json
 from dataclasses import asdict
-from typing import Tuple
+from typing import (
+    Optional,
+    Tuple,
+)
 
 from slips_files.core.flows.suricata import SuricataFile
 from slips_files.common.slips_utils import utils
@@ -67,6 +70,9 @@ class FlowHandler:
         self.flow = flow
         self.symbol = symbol_handler
         self.running_non_stop: bool = self.db.is_running_non_stop()
+        # when the input process read the flow, set by the profiler only
+        # if pipeline_metrics_enable is set
+        self.time_read: Optional[float] = None
 
     def is_supported_flow_type(self):
         supported_types = (
@@ -124,7 +130,13 @@ class FlowHandler:
         port_type = "Src"
         self.db.add_port(self.profileid, self.twid, self.flow, role, port_type)
         # store the original flow as benign in sqlite
-        self.db.add_flow(self.flow, self.profileid, self.twid, "benign")
+        self.db.add_flow(
+            self.flow,
+            self.profileid,
+            self.twid,
+            "benign",
+            time_read=self.time_read,
+        )
 
         self.db.add_mac_addr_to_profile(self.profileid, self.flow.smac)
 
@@ -0,0 +1,273 @@
+import struct
+import zlib
+from typing import (
+    BinaryIO,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+# the first 4 bytes of a libpcap file and the byte order they indicate.
+# pcapng files aren't supported
+PCAP_MAGICS = {
+    b"\xd4\xc3\xb2\xa1": "<",
+    b"\x4d\x3c\xb2\xa1": "<",  # nanosecond timestamps
+    b"\xa1\xb2\xc3\xd4": ">",
+    b"\xa1\xb2\x3c\x4d": ">",  # nanosecond timestamps
+}
+GLOBAL_HEADER_LEN = 24
+RECORD_HEADER_LEN = 16
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+# link types whose packets start with the IP header
+LINKTYPES_RAW = (12, 14, 101, 228, 229)
+SUPPORTED_LINKTYPES = (
+    LINKTYPE_ETHERNET,
+    LINKTYPE_LINUX_SLL,
+    LINKTYPE_LINUX_SLL2,
+) + LINKTYPES_RAW
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_ARP = 0x0806
+ETHERTYPES_VLAN = (0x8100, 0x88A8, 0x9100)
+
+# IP protocols whose first 4 bytes are the src and dst ports
+PROTOS_WITH_PORTS = (6, 17, 132)
+# ICMP and ICMPv6. zeek-scripts/icmp-scans.zeek counts the hosts each
+# IP sends ICMP to, so all the ICMP packets go to the same shard
+PROTOS_ICMP = (1, 58)
+PROTO_TCP = 6
+# zeek's protocols/ssh/detect-bruteforcing counts the failed logins of
+# each client across connections, so all the SSH packets go to the same
+# shard
+SSH_PORT = 22
+SSH_FLOW_KEY = b"ssh"
+# IPv6 extension headers skipped to get to the transport header
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT_HEADER = 44
+
+
+class PcapSplitter:
+    """
+    Splits a libpcap file into shards so that zeek can analyze each one
+    of them in a separate process. all the packets of a connection, in
+    both directions, are written to the same shard, and each shard keeps
+    the order of the packets in the original pcap
+    """
+
+    def __init__(self, pcap_path: str):
+        self.pcap_path = pcap_path
+        self.byte_order: Optional[str] = None
+        self.linktype: Optional[int] = None
+        self.global_header: bytes = b""
+        # the IPs that exchanged fragmented packets. all the
+        # connections between them go to the same shard, because the
+        # fragments have no ports to tell their connection
+        self.fragmented_pairs: Set[bytes] = set()
+
+    def read_global_header(self) -> bool:
+        """
+        reads the byte order and the link type of the pcap
+        :return: True if it's a libpcap file that can be split
+        """
+        with open(self.pcap_path, "rb") as pcap:
+            header = pcap.read(GLOBAL_HEADER_LEN)
+
+        if len(header) < GLOBAL_HEADER_LEN:
+            return False
+        self.byte_order = PCAP_MAGICS.get(header[:4])
+        if not self.byte_order:
+            return False
+
+        self.global_header = header
+        self.linktype = (
+            struct.unpack_from(f"{self.byte_order}I", header, 20)[0]
+            & 0x0FFFFFFF
+        )
+        return self.linktype in SUPPORTED_LINKTYPES
+
+    def is_supported(self) -> bool:
+        try:
+            return self.read_global_header()
+        except OSError:
+            return False
+
+    def read_packets(self, pcap: BinaryIO) -> Iterator[Tuple[bytes, bytes]]:
+        """yields the record header and the data of each packet"""
+        pcap.seek(GLOBAL_HEADER_LEN)
+        record_header = struct.Struct(f"{self.byte_order}IIII")
+        while True:
+            header = pcap.read(RECORD_HEADER_LEN)
+            if len(header) < RECORD_HEADER_LEN:
+                return
+            captured_len = record_header.unpack(header)[2]
+            data = pcap.read(captured_len)
+            if len(data) < captured_len:
+                # truncated pcap
+                return
+            yield header, data
+
+    def get_network_layer(self, packet: bytes) -> Tuple[int, memoryview]:
+        """
+        :return: the ethertype of the given packet and its
+        network layer
+        """
+        packet = memoryview(packet)
+        if self.linktype == LINKTYPE_ETHERNET:
+            ethertype, offset = struct.unpack_from("!H", packet, 12)[0], 14
+            while ethertype in ETHERTYPES_VLAN:
+                ethertype = struct.unpack_from("!H", packet, offset + 2)[0]
+                offset += 4
+            return ethertype, packet[offset:]
+
+        if self.linktype == LINKTYPE_LINUX_SLL:
+            return struct.unpack_from("!H", packet, 14)[0], packet[16:]
+
+        if self.linktype == LINKTYPE_LINUX_SLL2:
+            return struct.unpack_from("!H", packet, 0)[0], packet[20:]
+
+        # raw IP
+        version = packet[0] >> 4
+        ethertype = ETHERTYPE_IPV6 if version == 6 else ETHERTYPE_IPV4
+        return ethertype, packet
+
+    @staticmethod
+    def parse_ipv4(ip: memoryview) -> Tuple[bytes, bytes, int, int, bool]:
+        """
+        :return: src IP, dst IP, protocol, offset of the transport
+        header and whether the packet is a fragment
+        """
+        # the MF flag and the fragment offset
+        fragmented = bool(struct.unpack_from("!H", ip, 6)[0] & 0x3FFF)
+        return (
+            bytes(ip[12:16]),
+            bytes(ip[16:20]),
+            ip[9],
+            (ip[0] & 0x0F) * 4,
+            fragmented,
+        )
+
+    @staticmethod
+    def parse_ipv6(ip: memoryview) -> Tuple[bytes, bytes, int, int, bool]:
+        """
+        :return: src IP, dst IP, protocol, offset of the transport
+        header and whether the packet is a fragment
+        """
+        proto, offset = ip[6], 40
+        while proto in IPV6_EXTENSION_HEADERS:
+            proto, offset = ip[offset], offset + (ip[offset + 1] + 1) * 8
+
+        fragmented = proto == IPV6_FRAGMENT_HEADER
+        if fragmented:
+            # the protocol of the fragmented packet
+            proto = ip[offset]
+        return bytes(ip[8:24]), bytes(ip[24:40]), proto, offset, fragmented
+
+    def parse_packet(
+        self, packet: bytes
+    ) -> Optional[Tuple[bytes, bytes, int, int, bool, memoryview]]:
+        """
+        :return: src IP, dst IP, protocol, offset of the transport
+        header, whether the packet is a fragment and the IP packet.
+        None if it's not an IP packet
+        """
+        ethertype, ip = self.get_network_layer(packet)
+        if ethertype == ETHERTYPE_IPV4:
+            return *self.parse_ipv4(ip), ip
+        if ethertype == ETHERTYPE_IPV6:
+            return *self.parse_ipv6(ip), ip
+        return None
+
+    @staticmethod
+    def get_pair(src: bytes, dst: bytes) -> bytes:
+        """returns the same key for both directions between 2 IPs"""
+        return min(src, dst) + max(src, dst)
+
+    def get_flow_key(self, packet: bytes) -> bytes:
+        """
+        returns a key that is the same for all the packets of a
+        connection in both directions.
+        the symmetric 5-tuple is used for TCP, UDP and SCTP, and the 2
+        IPs for everything else. all ICMP packets share the same key,
+        and so do SSH packets and non-IP packets
+        """
+        try:
+            parsed = self.parse_packet(packet)
+            if not parsed:
+                ethertype, arp = self.get_network_layer(packet)
+                if ethertype == ETHERTYPE_ARP:
+                    # the sender and target IPs
+                    return self.get_pair(bytes(arp[14:18]), bytes(arp[24:28]))
+                return b""
+
+            src, dst, proto, offset, fragmented, ip = parsed
+            if proto in PROTOS_ICMP:
+                return bytes([proto])
+
+            pair = self.get_pair(src, dst)
+            if (
+                proto not in PROTOS_WITH_PORTS
+                or fragmented
+                or pair in self.fragmented_pairs
+            ):
+                return pair
+
+            ports = bytes(ip[offset : offset + 4])
+            if len(ports) < 4:
+                return pair
+            if proto == PROTO_TCP and SSH_PORT in struct.unpack("!HH", ports):
+                return SSH_FLOW_KEY
+            src += ports[:2]
+            dst += ports[2:]
+            return bytes([proto]) + min(src, dst) + max(src, dst)
+        except (struct.error, IndexError):
+            # truncated packet
+            return b""
+
+    def find_fragmented_pairs(self):
+        """
+        finds the IPs that exchanged fragmented packets, the first
+        fragment of a packet has ports but the rest of them don't
+        """
+        self.fragmented_pairs = set()
+        with open(self.pcap_path, "rb") as pcap:
+            for _, packet in self.read_packets(pcap):
+                try:
+                    parsed = self.parse_packet(packet)
+                except (struct.error, IndexError):
+                    continue
+                if parsed and parsed[4]:
+                    self.fragmented_pairs.add(self.get_pair(*parsed[:2]))
+
+    def get_shard(self, packet: bytes, shards: int) -> int:
+        return zlib.crc32(self.get_flow_key(packet)) % shards
+
+    def split(self, output_paths: List[str]) -> bool:
+        """
+        writes the packets of the pcap to len(output_paths) pcaps
+        :return: False if the pcap can't be split
+        """
+        if not self.is_supported():
+            return False
+
+        self.find_fragmented_pairs()
+        shards = len(output_paths)
+        outputs = [open(path, "wb", buffering=2**20) for path in output_paths]
+        try:
+            for output in outputs:
+                output.write(self.global_header)
+
+            with open(self.pcap_path, "rb", buffering=2**20) as pcap:
+                for header, packet in self.read_packets(pcap):
+                    output = outputs[self.get_shard(packet, shards)]
+                    output.write(header)
+                    output.write(packet)
+        finally:
+            for output in outputs:
+                output.close()
+        return True
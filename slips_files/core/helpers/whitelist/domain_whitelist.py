@@ -26,11 +26,7 @@ class DomainAnalyzer(IWhitelistAnalyzer):
             if sni_info := ip_data.get("SNI", [{}])[0]:
                 domains.append(sni_info.get("server_name", ""))
 
-        try:
-            resolution = self.db.get_dns_resolution(ip).get("domains", [])
-            domains.extend(iter(resolution))
-        except (KeyError, TypeError):
-            pass
+        domains.extend(self.db.get_domains_of_resolved_ip(ip))
 
         return domains
 
@@ -36,11 +36,19 @@ class Whitelist:
         parses the whitelist specified in the slips.yaml and stores the
         parsed results in the db
         """
+        # parse the whole file again so the entries removed from it are
+        # removed from the db too
+        self.parser.reset_whitelists()
         self.parser.parse()
-        self.db.set_whitelist("IPs", self.parser.whitelisted_ips)
-        self.db.set_whitelist("domains", self.parser.whitelisted_domains)
-        self.db.set_whitelist("organizations", self.parser.whitelisted_orgs)
-        self.db.set_whitelist("macs", self.parser.whitelisted_mac)
+        # the readers switch to the new whitelists at once
+        self.db.set_whitelists(
+            {
+                "IPs": self.parser.whitelisted_ips,
+                "domains": self.parser.whitelisted_domains,
+                "organizations": self.parser.whitelisted_orgs,
+                "macs": self.parser.whitelisted_mac,
+            }
+        )
 
     def _check_if_whitelisted_domains_of_flow(self, flow) -> bool:
         dst_domains_to_check: List[str] = (
@@ -25,10 +25,7 @@ class WhitelistParser:
         whitelists.
         uses existing dicts from the db if found.
         """
-        self.whitelisted_ips = {}
-        self.whitelisted_domains = {}
-        self.whitelisted_orgs = {}
-        self.whitelisted_mac = {}
+        self.reset_whitelists()
         if self.db.has_cached_whitelist():
             # since this parser can run when the user modifies whitelist.conf
             # and not just when the user starts slips
@@ -38,6 +35,12 @@ class WhitelistParser:
             self.whitelisted_orgs = self.db.get_whitelist("organizations")
             self.whitelisted_mac = self.db.get_whitelist("mac")
 
+    def reset_whitelists(self):
+        self.whitelisted_ips = {}
+        self.whitelisted_domains = {}
+        self.whitelisted_orgs = {}
+        self.whitelisted_mac = {}
+
     def get_dict_for_storing_data(self, data_type: str):
         """
         returns the appropriate dict for storing the given data type
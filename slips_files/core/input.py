@@ -14,11 +14,13 @@
 import datetime
 import json
 import os
+import shutil
 import signal
 import subprocess
 import sys
 import threading
 import time
+from itertools import islice
 
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
@@ -26,6 +28,15 @@ import time
 # Contact: eldraco@gmail.com, sebastian.garcia@agents.fel.cvut.cz, stratosphere@aic.fel.cvut.cz
 from pathlib import Path
 from re import split
+from collections import deque
+from typing import (
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
 
 from watchdog.observers import Observer
 
@@ -36,6 +47,7 @@ from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
 import multiprocessing
 from slips_files.core.helpers.filemonitor import FileEventHandler
+from slips_files.core.helpers.pcap_splitter import PcapSplitter
 
 SUPPORTED_LOGFILES = (
     "conn",
@@ -96,6 +108,9 @@ class Input(ICore):
         self.testing = False
         # number of lines read
         self.lines = 0
+        # argus, nfdump and suricata lines are sent to the profiler in
+        # batches of this size to be parsed at once
+        self.lines_per_batch = 5000
 
         # create the remover thread
         self.remover_thread = threading.Thread(
@@ -107,7 +122,28 @@ class Input(ICore):
         self.timeout = None
         # zeek rotated files to be deleted after a period of time
         self.to_be_deleted = []
+        # set by the file monitor whenever zeek writes to a log file,
+        # the zeek reader waits for it when there's nothing to read
+        self.zeek_files_changed = threading.Event()
+        # the log files zeek wrote to since the reader last checked
+        self.changed_zeek_files: Set[str] = set()
+        self.changed_zeek_files_lock = threading.Lock()
+        # log files that were read until their end, they're not read
+        # again until zeek writes to them
+        self.drained_files: Set[str] = set()
+        # lines read from each log file that weren't sent yet
+        self.file_lines: Dict[str, Deque[str]] = {}
+        # {log file: (its handle, the incomplete line at its end)}
+        self.partial_lines: Dict[str, tuple] = {}
+        # seconds to wait for zeek to write something before reading
+        # all the log files anyway
+        self.zeek_files_poll_interval = 1
+        # max number of chars to read from a log file at once
+        self.max_chars_per_read = 2**20
         self.zeek_thread = threading.Thread(target=self.run_zeek, daemon=True)
+        # {name of the zeek process: its pid}, there's 1 zeek process
+        # per shard when a pcap is split between many zeek processes
+        self.zeek_pids: Dict[str, int] = {}
         # used to give the profiler the total amount of flows to
         # read with the first flow only
         self.is_first_flow = True
@@ -143,6 +179,7 @@ class Input(ICore):
         self.enable_rotation = conf.rotation()
         self.rotation_period = conf.rotation_period()
         self.keep_rotated_files_for = conf.keep_rotated_files_for()
+        self.zeek_workers = conf.zeek_workers()
 
     def stop_queues(self):
         """Stops the profiler queue"""
@@ -152,27 +189,32 @@ class Input(ICore):
         # do nothing.
         self.profiler_queue.cancel_join_thread()
 
-    def read_nfdump_output(self) -> int:
+    def read_nfdump_output(self, nfdump_output: Iterable[str]) -> int:
         """
         A binary file generated by nfcapd can be read by nfdump.
-        The task for this function is to send nfdump output line by line to
-        performance_profiler.py for processing
+        The task for this function is to send nfdump output in batches of
+        lines to the profiler for processing
+        :param nfdump_output: the lines printed by nfdump, read as they
+        are printed
+        :return: the number of lines sent to the profiler
         """
-        if not self.nfdump_output:
+        lines = 0
+        nfdump_output = iter(nfdump_output)
+        batch_size = 1 if self.testing else self.lines_per_batch
+        while batch := list(islice(nfdump_output, batch_size)):
+            line = {
+                "type": "nfdump",
+                "data": [nfdump_line.rstrip("\n") for nfdump_line in batch],
+            }
+            self.give_profiler(line)
+            lines += len(batch)
+            if self.testing:
+                break
+
+        if not lines:
             # The nfdump command returned nothing
             self.print("Error reading nfdump output ", 1, 3)
-        else:
-            self.total_flows = len(self.nfdump_output.splitlines())
-            self.db.set_input_metadata({"total_flows": self.total_flows})
-            for nfdump_line in self.nfdump_output.splitlines():
-                # this line is taken from stdout we need to remove whitespaces
-                nfdump_line.replace(" ", "")
-                line = {"type": "nfdump", "data": nfdump_line}
-                self.give_profiler(line)
-                if self.testing:
-                    break
-
-        return self.total_flows
+        return lines
 
     def check_if_time_to_del_rotated_files(self):
         """
@@ -247,7 +289,7 @@ class Input(ICore):
             timestamp = nline_list[0]
         else:
             try:
-                nline = json.loads(zeek_line)
+                nline = utils.json_loads(zeek_line)
             except json.decoder.JSONDecodeError:
                 return False, False
             # In some Zeek files there may not be a ts field
@@ -261,29 +303,116 @@ class Input(ICore):
 
         return timestamp, nline
 
-    def cache_nxt_line_in_file(self, filename: str):
+    def on_zeek_file_change(self, filepath: str):
         """
-        reads 1 line of the given file and stores in queue for sending to the profiler
-        :param: full path to the file. includes the .log extension
+        is called by the file monitor thread whenever zeek creates,
+        writes to or rotates a log file
         """
+        with self.changed_zeek_files_lock:
+            self.changed_zeek_files.add(filepath)
+        self.zeek_files_changed.set()
+
+    def handle_zeek_file_changes(self, timeout: float = 0):
+        """
+        waits up to timeout seconds for zeek to write to any of the log
+        files, and marks the ones it wrote to as not drained so they're
+        read again.
+        if the timeout is over without any change, all files are marked
+        as not drained, in case the zeek dir isn't monitored (e.g. a
+        log file given with -f) or a change was missed
+        """
+        if self.zeek_files_changed.wait(timeout):
+            self.zeek_files_changed.clear()
+            with self.changed_zeek_files_lock:
+                changed_files = self.changed_zeek_files
+                self.changed_zeek_files = set()
+            self.drained_files -= changed_files
+        elif timeout:
+            self.drained_files.clear()
+        else:
+            return
+        # Get the new list of files. Since new files may have been created by
+        # Zeek while we were processing them.
+        self.zeek_files = self.db.get_all_zeek_files()
+
+    def read_new_lines(self, filename: str) -> Deque[str]:
+        """
+        reads all the lines zeek appended to the given file since the
+        last read, at once
+        :param filename: full path to the file. includes the .log extension
+        :return: the complete lines read, the incomplete line at the end
+        of the file is kept until zeek writes the rest of it
+        """
+        lines = deque()
+        if filename in self.drained_files:
+            return lines
+
         file_handle = self.get_file_handle(filename)
         if not file_handle:
-            return False
-
-        # Only read the next line if the previous line from this file was sent to profiler
-        if filename in self.cache_lines:
-            # We have still something to send, do not read the next line from this file
-            return False
+            return lines
 
-        # We don't have any waiting line for this file, so proceed
         try:
-            zeek_line = file_handle.readline()
+            data = file_handle.read(self.max_chars_per_read)
         except ValueError:
             # remover thread just finished closing all old handles.
             # comes here if I/O operation failed due to a closed file.
             # to get the new dict of open handles.
+            return lines
+
+        if len(data) < self.max_chars_per_read:
+            # we reached the end of the file, don't read it again until
+            # zeek writes to it
+            self.drained_files.add(filename)
+
+        partial_line_handle, partial_line = self.partial_lines.pop(
+            filename, (None, "")
+        )
+        if not data:
+            # zeek didn't write the rest of the partial line, this is
+            # the last line of the file
+            if partial_line:
+                lines.append(partial_line)
+            return lines
+
+        self.last_updated_file_time = datetime.datetime.now()
+        if partial_line_handle is file_handle:
+            data = partial_line + data
+        elif partial_line:
+            # the file was rotated, its partial line is complete
+            lines.append(partial_line)
+
+        new_lines = data.split("\n")
+        if rest := new_lines.pop():
+            self.partial_lines[filename] = (file_handle, rest)
+        lines.extend(f"{line}\n" for line in new_lines)
+        return lines
+
+    def get_next_line(self, filename: str) -> Optional[str]:
+        """
+        returns the next line of the given file that wasn't sent to the
+        profiler yet, None if there's no new line
+        """
+        lines: Deque[str] = self.file_lines.get(filename)
+        if not lines:
+            lines = self.read_new_lines(filename)
+            if not lines:
+                return None
+            self.file_lines[filename] = lines
+        return lines.popleft()
+
+    def cache_nxt_line_in_file(self, filename: str):
+        """
+        reads 1 line of the given file and stores in queue for sending to the profiler
+        :param: full path to the file. includes the .log extension
+        """
+        # Only read the next line if the previous line from this file was sent to profiler
+        if filename in self.cache_lines:
+            # We have still something to send, do not read the next line from this file
             return False
 
+        # We don't have any waiting line for this file, so proceed
+        zeek_line = self.get_next_line(filename)
+
         # Did the file end?
         if not zeek_line or zeek_line.startswith("#"):
             # We reached the end of one of the files that we were reading.
@@ -365,6 +494,7 @@ class Input(ICore):
         self.last_updated_file_time = datetime.datetime.now()
         while not self.should_stop():
             self.check_if_time_to_del_rotated_files()
+            self.handle_zeek_file_changes()
             # Go to all the files generated by Zeek and read 1
             # line from each of them
             for filename in self.zeek_files:
@@ -380,6 +510,10 @@ class Input(ICore):
 
             earliest_line, file_with_earliest_flow = self.get_earliest_line()
             if not file_with_earliest_flow:
+                # nothing to send, sleep until zeek writes something
+                self.handle_zeek_file_changes(
+                    timeout=self.zeek_files_poll_interval
+                )
                 continue
 
             # self.print('	> Sent Line: {}'.format(earliest_line), 0, 3)
@@ -392,9 +526,6 @@ class Input(ICore):
             # Delete this line from the cache and the time list
             del self.cache_lines[file_with_earliest_flow]
             del self.file_time[file_with_earliest_flow]
-            # Get the new list of files. Since new files may have been created by
-            # Zeek while we were processing them.
-            self.zeek_files = self.db.get_all_zeek_files()
 
         self.close_all_handles()
         return self.lines
@@ -508,7 +639,7 @@ class Input(ICore):
             # tabs aren't supported
             if self.line_type == "zeek":
                 try:
-                    line = json.loads(line)
+                    line = utils.json_loads(line)
                 except json.decoder.JSONDecodeError:
                     self.print("Invalid json line")
                     continue
@@ -539,14 +670,16 @@ class Input(ICore):
             self.give_profiler(line)
             self.lines += 1
 
-            # go through the rest of the file
-            for t_line in file_stream:
-                line = {"type": type_, "data": t_line}
+            # go through the rest of the file in batches, the profiler
+            # parses each batch at once
+            batch_size = 1 if self.testing else self.lines_per_batch
+            while batch := list(islice(file_stream, batch_size)):
                 # argus files are either tab separated orr comma separated
-                if len(t_line.strip()) != 0:
-                    self.give_profiler(line)
+                data = [t_line for t_line in batch if len(t_line.strip()) != 0]
+                if data:
+                    self.give_profiler({"type": type_, "data": data})
 
-                self.lines += 1
+                self.lines += len(batch)
                 if self.testing:
                     break
 
@@ -557,15 +690,16 @@ class Input(ICore):
         self.total_flows = self.get_flows_number(self.given_path)
         self.db.set_input_metadata({"total_flows": self.total_flows})
         with open(self.given_path) as file_stream:
-            for t_line in file_stream:
-                line = {
-                    "type": "suricata",
-                    "data": t_line,
-                }
-                self.print(f"	> Sent Line: {line}", 0, 3)
-                if len(t_line.strip()) != 0:
+            # send the lines in batches, the profiler decodes each batch
+            # at once and skips the events slips doesn't read
+            batch_size = 1 if self.testing else self.lines_per_batch
+            while batch := list(islice(file_stream, batch_size)):
+                data = [t_line for t_line in batch if len(t_line.strip()) != 0]
+                if data:
+                    line = {"type": "suricata", "data": data}
+                    self.print(f"	> Sent Lines: {line}", 0, 3)
                     self.give_profiler(line)
-                self.lines += 1
+                self.lines += len(batch)
                 if self.testing:
                     break
         self.is_done_processing()
@@ -621,13 +755,75 @@ class Input(ICore):
         self.is_done_processing()
         return True
 
+    def get_nfdump_flows_number(self) -> Optional[int]:
+        """
+        returns the number of flows in the given nfcapd file as stored in
+        its stat record, without reading the flows,
+        or None if nfdump can't read it
+        """
+        try:
+            result = subprocess.run(
+                ["nfdump", "-I", "-r", self.given_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        except OSError:
+            return None
+
+        for line in result.stdout.splitlines():
+            # the total is in the "Flows: <n>" line, the other lines are
+            # the flows per protocol e.g. "Flows_tcp: <n>"
+            if line.startswith("Flows:"):
+                try:
+                    return int(line.split(":")[1])
+                except ValueError:
+                    return None
+        return None
+
+    def get_nfdump_command(self) -> List[str]:
+        return ["nfdump", "-b", "-N", "-o", "csv", "-q", "-r", self.given_path]
+
+    def count_nfdump_flows(self) -> int:
+        """
+        counts the flows printed by nfdump without storing them, used
+        when the file has no stat record
+        """
+        with subprocess.Popen(
+            self.get_nfdump_command(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+        ) as nfdump:
+            return sum(1 for _ in nfdump.stdout)
+
     def handle_nfdump(self):
-        command = f"nfdump -b -N -o csv -q -r {self.given_path}"
-        # Execute command
-        result = subprocess.run(command.split(), stdout=subprocess.PIPE)
-        # Get command output
-        self.nfdump_output = result.stdout.decode("utf-8")
-        self.lines = self.read_nfdump_output()
+        # the total is only needed for the progress bar, it's read from
+        # the file's stats so the flows don't have to be read twice
+        total_flows: Optional[int] = self.get_nfdump_flows_number()
+        if total_flows is None:
+            # the progress bar gets the total with the first flow, so the
+            # flows are counted before sending any of them
+            total_flows = self.count_nfdump_flows()
+        self.total_flows = total_flows
+        self.db.set_input_metadata({"total_flows": total_flows})
+
+        # the output is read from the pipe while nfdump is still
+        # decoding the file, so it's never stored in memory at once
+        with subprocess.Popen(
+            self.get_nfdump_command(),
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        ) as nfdump:
+            self.lines = self.read_nfdump_output(nfdump.stdout)
+
+        if total_flows != self.lines and not self.testing:
+            # the stats of the file were wrong
+            self.total_flows = self.lines
+            self.db.set_input_metadata({"total_flows": self.lines})
+
         self.print_lines_read()
         self.is_done_processing()
         return True
@@ -639,7 +835,10 @@ class Input(ICore):
         # Get the file eventhandler
         # We have to set event_handler and event_observer before running zeek.
         event_handler = FileEventHandler(
-            self.zeek_dir, self.input_type, self.db
+            self.zeek_dir,
+            self.input_type,
+            self.db,
+            on_log_change=self.on_zeek_file_change,
         )
         # Create an observer
         self.event_observer = Observer()
@@ -673,25 +872,34 @@ class Input(ICore):
         if len(zeek_files) > 0:
             # First clear the zeek folder of old .log files
             for f in zeek_files:
-                os.remove(os.path.join(self.zeek_dir, f))
+                path = os.path.join(self.zeek_dir, f)
+                if os.path.isdir(path):
+                    # the logs of a previous sharded run
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
 
         # run zeek
-        self.zeek_thread.start()
+        zeek_dirs: List[str] = self.start_zeek()
         # Give Zeek some time to generate at least 1 file.
         time.sleep(3)
 
-        self.db.store_pid("Zeek", self.zeek_pid)
+        for name, pid in self.zeek_pids.items():
+            self.db.store_pid(name, pid)
         if not hasattr(self, "is_zeek_tabs"):
             self.is_zeek_tabs = False
         self.lines = self.read_zeek_files()
         self.print_lines_read()
         self.is_done_processing()
 
-        connlog_path = os.path.join(self.zeek_dir, "conn.log")
+        flows = 0
+        for zeek_dir in zeek_dirs:
+            connlog_path = os.path.join(zeek_dir, "conn.log")
+            if os.path.exists(connlog_path):
+                flows += self.get_flows_number(connlog_path)
 
         self.print(
-            f"Number of zeek generated flows in conn.log: "
-            f"{self.get_flows_number(connlog_path)}",
+            f"Number of zeek generated flows in conn.log: {flows}",
             2,
             0,
         )
@@ -769,25 +977,111 @@ class Input(ICore):
             self.zeek_thread.join(3)
         except Exception:
             pass
+        for thread in getattr(self, "zeek_threads", []):
+            thread.join(3)
 
         if hasattr(self, "open_file_handlers"):
             self.close_all_handles()
 
+        # the zeek processes of a split pcap
+        zeek_pids = set(self.zeek_pids.values())
         if hasattr(self, "zeek_pid"):
+            zeek_pids.add(self.zeek_pid)
+        for pid in zeek_pids:
             # kill zeek manually if it started bc it's detached from this
             # process and will never recv the sigint also withoutt this,
             # inputproc will never shutdown and will always remain in memory
             # causing 1000 bugs in proc_man:shutdown_gracefully()
             try:
-                os.kill(self.zeek_pid, signal.SIGKILL)
+                os.kill(pid, signal.SIGKILL)
             except Exception:
                 pass
 
         return True
 
-    def run_zeek(self):
+    def split_pcap(self) -> List[str]:
+        """
+        splits the given pcap into zeek_workers pcaps, each one of them
+        is written to its own dir inside the zeek dir
+        :return: the paths of the written pcaps, an empty list if the
+        pcap can't be split
+        """
+        splitter = PcapSplitter(self.given_path)
+        if not splitter.is_supported():
+            self.print(
+                f"Unable to split {self.given_path} between "
+                f"{self.zeek_workers} zeek processes, only libpcap files "
+                f"are supported. Analyzing it using 1 zeek process.",
+                0,
+                1,
+            )
+            return []
+
+        shards = []
+        for shard in range(self.zeek_workers):
+            shard_dir = os.path.join(self.zeek_dir, f"shard_{shard}")
+            os.makedirs(shard_dir, exist_ok=True)
+            shards.append(os.path.join(shard_dir, "shard.pcap"))
+
+        splitter.split(shards)
+        return shards
+
+    def run_zeek_on_shard(self, shard: str, name: str):
+        """
+        runs zeek on 1 shard of a split pcap and deletes the
+        shard when zeek is done
+        """
+        self.run_zeek(
+            pcap=shard, zeek_dir=os.path.dirname(shard), process_name=name
+        )
+        try:
+            os.remove(shard)
+        except FileNotFoundError:
+            pass
+
+    def start_zeek(self) -> List[str]:
+        """
+        starts the zeek thread. if slips is reading a pcap and
+        zeek_workers is more than 1, the pcap is split and each part is
+        given to a separate zeek process
+        :return: the dirs zeek stores the logs in
+        """
+        shards = []
+        if self.input_type == "pcap" and self.zeek_workers > 1:
+            shards = self.split_pcap()
+
+        if not shards:
+            self.zeek_thread.start()
+            return [self.zeek_dir]
+
+        self.print(
+            f"Analyzing {self.given_path} using {len(shards)} zeek processes",
+            2,
+            0,
+        )
+        self.zeek_threads = []
+        for shard_number, shard in enumerate(shards):
+            thread = threading.Thread(
+                target=self.run_zeek_on_shard,
+                args=(shard, f"Zeek shard {shard_number}"),
+                daemon=True,
+            )
+            thread.start()
+            self.zeek_threads.append(thread)
+        return [os.path.dirname(shard) for shard in shards]
+
+    def run_zeek(
+        self,
+        pcap: Optional[str] = None,
+        zeek_dir: Optional[str] = None,
+        process_name: str = "Zeek",
+    ):
         """
         This thread sets the correct zeek parameters and starts zeek
+        :param pcap: the pcap to read instead of the given one
+        :param zeek_dir: the dir to store the zeek logs in instead of
+        the zeek dir
+        :param process_name: the name to store the pid of zeek with
         """
 
         def detach_child():
@@ -812,15 +1106,15 @@ class Input(ICore):
 
         elif self.input_type == "pcap":
             # Find if the pcap file name was absolute or relative
-            given_path = self.given_path
-            if not os.path.isabs(self.given_path):
+            given_path = pcap or self.given_path
+            if not os.path.isabs(given_path):
                 # now the given pcap is relative to slips main dir
                 # slips can store the zeek logs dir either in the
                 # output dir (by default in Slips/output/<filename>_<date>/zeek_files/),
                 # or in any dir specified with -o
                 # construct an abs path from the given path so slips can find the given pcap
                 # no matter where the zeek dir is placed
-                given_path = os.path.join(os.getcwd(), self.given_path)
+                given_path = os.path.join(os.getcwd(), given_path)
 
             # using a list of params instead of a str for storing the cmd
             # becaus ethe given path may contain spaces
@@ -854,11 +1148,13 @@ class Input(ICore):
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             stdin=subprocess.PIPE,
-            cwd=self.zeek_dir,
+            cwd=zeek_dir or self.zeek_dir,
             start_new_session=True,
         )
         # you have to get the pid before communicate()
-        self.zeek_pid = zeek.pid
+        if process_name == "Zeek":
+            self.zeek_pid = zeek.pid
+        self.zeek_pids[process_name] = zeek.pid
 
         out, error = zeek.communicate()
         if out:
@@ -914,6 +1210,9 @@ class Input(ICore):
         sends the total amount of flows to process with the first flow only
         """
         to_send = {"line": line, "input_type": self.input_type}
+        if self.pipeline_metrics:
+            # used by the profiler to measure the latency of each flow
+            to_send["time_read"] = time.time()
         # send the total flows slips is going to read to the profiler
         # the profiler will give it to output() for initialising
         # the progress bar in case of interface and pcaps, we don't know
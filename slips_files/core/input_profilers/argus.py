@@ -1,5 +1,9 @@
 import sys
 import traceback
+from typing import (
+    List,
+    Union,
+)
 
 from slips_files.common.abstracts.input_type import IInputType
 from slips_files.common.slips_utils import utils
@@ -60,6 +64,85 @@ class Argus(IInputType):
 
         return self.flow
 
+    def get_column(self, rows: List[List[str]], field_name: str) -> list:
+        """
+        returns the values of the given field in all the given rows,
+        with the same defaults as process_line()
+        """
+        idx = self.column_idx.get(field_name)
+        if idx is None:
+            return [False] * len(rows)
+        return [
+            row[idx] if idx < len(row) and row[idx] else False for row in rows
+        ]
+
+    def process_lines(
+        self, new_lines: dict
+    ) -> List[Union[ArgusConn, None, Exception]]:
+        """
+        Process a batch of argus lines at once. the lines are split by
+        the csv reader and each field is converted column-wise, the
+        flows are the same as the ones process_line() returns
+        """
+        lines: List[str] = new_lines["data"]
+        flows = []
+        if not hasattr(self, "column_idx"):
+            # the first line is the header
+            flows.append(self.process_line({**new_lines, "data": lines[0]}))
+            lines = lines[1:]
+
+        if not lines:
+            return flows
+
+        self.separator = "," if lines[0].count(",") > 5 else "\t"
+        rows = self.split_lines(lines, self.separator)
+
+        starttimes = utils.convert_ts_column(
+            self.get_column(rows, "starttime"), "datetimeobj"
+        )
+        str_columns = zip(
+            *(
+                self.get_column(rows, field_name)
+                for field_name in (
+                    "endtime",
+                    "dur",
+                    "proto",
+                    "appproto",
+                    "saddr",
+                    "sport",
+                    "dir",
+                    "daddr",
+                    "dport",
+                    "state",
+                )
+            )
+        )
+        int_columns = zip(
+            *(
+                self.convert_int_column(self.get_column(rows, field_name))
+                for field_name in (
+                    "pkts",
+                    "spkts",
+                    "dpkts",
+                    "bytes",
+                    "sbytes",
+                    "dbytes",
+                )
+            )
+        )
+
+        for line, starttime, str_fields, int_fields in zip(
+            lines, starttimes, str_columns, int_columns
+        ):
+            if starttime is None or None in int_fields:
+                flows.append(ValueError(f"Invalid argus line: {line}"))
+                continue
+            flows.append(ArgusConn(starttime, *str_fields, *int_fields))
+
+        if flows:
+            self.flow = flows[-1]
+        return flows
+
     def get_predefined_argus_column_indices(self):
         """default column indices in case of reading argus from stdin"""
         return {
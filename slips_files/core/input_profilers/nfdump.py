@@ -1,3 +1,8 @@
+from typing import (
+    List,
+    Union,
+)
+
 from slips_files.common.abstracts.input_type import IInputType
 from slips_files.common.slips_utils import utils
 from slips_files.core.flows.nfdump import NfdumpConn
@@ -43,3 +48,42 @@ class Nfdump(IInputType):
             get_value_at(14),
         )
         return self.flow
+
+    def process_lines(
+        self, new_lines: dict
+    ) -> List[Union[NfdumpConn, Exception]]:
+        """
+        Process a batch of nfdump lines at once. the lines are split by
+        the csv reader and the timestamps are converted column-wise,
+        the flows are the same as the ones process_line() returns
+        """
+        lines: List[str] = new_lines["data"]
+        rows = self.split_lines(lines, self.separator)
+
+        def get_column(indx: int) -> list:
+            return [
+                row[indx] if indx < len(row) and row[indx] else False
+                for row in rows
+            ]
+
+        starttimes = utils.convert_ts_column(get_column(0), "unixtimestamp")
+        endtimes = utils.convert_ts_column(get_column(1), "unixtimestamp")
+        columns = zip(
+            *(
+                get_column(indx)
+                for indx in (2, 7, 3, 5, 22, 4, 6, 8, 11, 13, 12, 14)
+            )
+        )
+
+        flows = []
+        for line, starttime, endtime, fields in zip(
+            lines, starttimes, endtimes, columns
+        ):
+            if starttime is None or endtime is None:
+                flows.append(ValueError(f"Invalid nfdump line: {line}"))
+                continue
+            flows.append(NfdumpConn(starttime, endtime, *fields))
+
+        if flows:
+            self.flow = flows[-1]
+        return flows
@@ -1,4 +1,10 @@
-import json
+import re
+from typing import (
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from slips_files.common.abstracts.input_type import IInputType
 from slips_files.common.slips_utils import utils
@@ -11,10 +17,22 @@ from slips_files.core.flows.suricata import (
     SuricataSSH,
 )
 
+# matches the event type of a raw eve.json line
+EVENT_TYPE_PATTERN = re.compile(r'"event_type"\s*:\s*"([^"]*)"')
+
 
 class Suricata(IInputType):
     def __init__(self):
-        pass
+        # the handler of each event type slips reads from eve.json,
+        # the rest of the event types are ignored
+        self.event_handlers = {
+            "flow": self.get_flow,
+            "http": self.get_http,
+            "dns": self.get_dns,
+            "tls": self.get_tls,
+            "fileinfo": self.get_file,
+            "ssh": self.get_ssh,
+        }
 
     def get_answers(self, line: dict) -> list:
         """
@@ -33,27 +51,138 @@ class Suricata(IInputType):
 
         return cnames + ips
 
+    @staticmethod
+    def get_value_at(line: dict, field, subfield, default_=False):
+        try:
+            val = line[field][subfield]
+            return val or default_
+        except (IndexError, KeyError):
+            return default_
+
+    def get_flow(self, line: dict, timestamp, common: tuple) -> SuricataFlow:
+        starttime = utils.convert_format(
+            self.get_value_at(line, "flow", "start"), "unixtimestamp"
+        )
+        endtime = utils.convert_format(
+            self.get_value_at(line, "flow", "end"), "unixtimestamp"
+        )
+        return SuricataFlow(
+            *common,
+            starttime,
+            endtime,
+            int(self.get_value_at(line, "flow", "pkts_toserver", 0)),
+            int(self.get_value_at(line, "flow", "pkts_toclient", 0)),
+            int(self.get_value_at(line, "flow", "bytes_toserver", 0)),
+            int(self.get_value_at(line, "flow", "bytes_toclient", 0)),
+            self.get_value_at(line, "flow", "state", ""),
+        )
+
+    def get_http(self, line: dict, timestamp, common: tuple) -> SuricataHTTP:
+        return SuricataHTTP(
+            timestamp,
+            *common,
+            self.get_value_at(line, "http", "http_method", ""),
+            self.get_value_at(line, "http", "hostname", ""),
+            self.get_value_at(line, "http", "url", ""),
+            self.get_value_at(line, "http", "http_user_agent", ""),
+            self.get_value_at(line, "http", "status", ""),
+            self.get_value_at(line, "http", "protocol", ""),
+            int(self.get_value_at(line, "http", "request_body_len", 0)),
+            int(self.get_value_at(line, "http", "length", 0)),
+        )
+
+    def get_dns(self, line: dict, timestamp, common: tuple) -> SuricataDNS:
+        answers: list = self.get_answers(line)
+        return SuricataDNS(
+            timestamp,
+            *common,
+            self.get_value_at(line, "dns", "rdata", ""),
+            self.get_value_at(line, "dns", "ttl", ""),
+            self.get_value_at(line, "qtype_name", "rrtype", ""),
+            answers,
+        )
+
+    def get_tls(self, line: dict, timestamp, common: tuple) -> SuricataTLS:
+        return SuricataTLS(
+            timestamp,
+            *common,
+            self.get_value_at(line, "tls", "version", ""),
+            self.get_value_at(line, "tls", "subject", ""),
+            self.get_value_at(line, "tls", "issuerdn", ""),
+            self.get_value_at(line, "tls", "sni", ""),
+            self.get_value_at(line, "tls", "notbefore", ""),
+            self.get_value_at(line, "tls", "notafter", ""),
+            self.get_value_at(line, "tls", "sni", ""),
+        )
+
+    def get_file(self, line: dict, timestamp, common: tuple) -> SuricataFile:
+        return SuricataFile(
+            timestamp,
+            *common,
+            self.get_value_at(line, "fileinfo", "size", ""),
+        )
+
+    def get_ssh(self, line: dict, timestamp, common: tuple) -> SuricataSSH:
+        client: dict = self.get_value_at(line, "ssh", "client", {})
+        server: dict = self.get_value_at(line, "ssh", "server", {})
+        return SuricataSSH(
+            timestamp,
+            *common,
+            client.get("software_version", ""),
+            client.get("proto_version", ""),
+            server.get("software_version", ""),
+        )
+
+    def get_event_type(self, line: str) -> Optional[str]:
+        """
+        returns the event type of the given raw eve.json line without
+        decoding it, None if it can't be determined this way
+        """
+        if line.count('"event_type"') != 1:
+            return None
+        if match := EVENT_TYPE_PATTERN.search(line):
+            return match.group(1)
+        return None
+
+    def is_ignored_event(self, line: str) -> bool:
+        """
+        checks if the given raw eve.json line is an event that slips
+        doesn't read, without decoding it
+        """
+        event_type: Optional[str] = self.get_event_type(line)
+        return event_type is not None and event_type not in self.event_handlers
+
     def process_line(self, line) -> None:
         """Read suricata json input and store it in column_values"""
 
         # convert to dict if it's not a dict already
         if type(line) == str:
-            line = json.loads(line)
+            line = utils.json_loads(line)
         else:
             # line is a dict with data and type as keys
-            line = json.loads(line.get("data", False))
+            line = utils.json_loads(line.get("data", False))
 
         if not line:
             return
+        return self.process_event(line)
+
+    def process_event(self, line: dict):
+        """creates the flow of the given decoded eve.json event"""
         # these fields are common in all suricata lines regardless of the event type
         event_type = line["event_type"]
-        flow_id = line["flow_id"]
-        saddr = line["src_ip"]
-        sport = line["src_port"]
-        daddr = line["dest_ip"]
-        dport = line["dest_port"]
-        proto = line["proto"]
-        appproto = line.get("app_proto", False)
+        handler = self.event_handlers.get(event_type)
+        if not handler:
+            return False
+
+        common = (
+            line["flow_id"],
+            line["src_ip"],
+            line["src_port"],
+            line["dest_ip"],
+            line["dest_port"],
+            line["proto"],
+            line.get("app_proto", False),
+        )
 
         try:
             timestamp = utils.convert_to_datetime(line["timestamp"])
@@ -66,119 +195,82 @@ class Suricata(IInputType):
             # there this not valid time.
             timestamp = False
 
-        def get_value_at(field, subfield, default_=False):
-            try:
-                val = line[field][subfield]
-                return val or default_
-            except (IndexError, KeyError):
-                return default_
-
-        if event_type == "flow":
-            starttime = utils.convert_format(
-                get_value_at("flow", "start"), "unixtimestamp"
-            )
-            endtime = utils.convert_format(
-                get_value_at("flow", "end"), "unixtimestamp"
-            )
-            self.flow: SuricataFlow = SuricataFlow(
-                flow_id,
-                saddr,
-                sport,
-                daddr,
-                dport,
-                proto,
-                appproto,
-                starttime,
-                endtime,
-                int(get_value_at("flow", "pkts_toserver", 0)),
-                int(get_value_at("flow", "pkts_toclient", 0)),
-                int(get_value_at("flow", "bytes_toserver", 0)),
-                int(get_value_at("flow", "bytes_toclient", 0)),
-                get_value_at("flow", "state", ""),
-            )
+        self.flow = handler(line, timestamp, common)
+        return self.flow
 
-        elif event_type == "http":
-            self.flow: SuricataHTTP = SuricataHTTP(
-                timestamp,
-                flow_id,
-                saddr,
-                sport,
-                daddr,
-                dport,
-                proto,
-                appproto,
-                get_value_at("http", "http_method", ""),
-                get_value_at("http", "hostname", ""),
-                get_value_at("http", "url", ""),
-                get_value_at("http", "http_user_agent", ""),
-                get_value_at("http", "status", ""),
-                get_value_at("http", "protocol", ""),
-                int(get_value_at("http", "request_body_len", 0)),
-                int(get_value_at("http", "length", 0)),
-            )
+    @staticmethod
+    def convert_ts_fields(
+        fields: List[Tuple[dict, str]], required_format: str
+    ):
+        """
+        converts the timestamps stored in the given (dict, key) fields
+        column-wise and in place. the ones that can't be converted are
+        left as they are
+        """
+        fields = [(dict_, key) for dict_, key in fields if dict_.get(key)]
+        converted = utils.convert_ts_column(
+            [dict_[key] for dict_, key in fields], required_format
+        )
+        for (dict_, key), ts in zip(fields, converted):
+            if ts is not None:
+                dict_[key] = ts
 
-        elif event_type == "dns":
-            answers: list = self.get_answers(line)
-            self.flow: SuricataDNS = SuricataDNS(
-                timestamp,
-                flow_id,
-                saddr,
-                sport,
-                daddr,
-                dport,
-                proto,
-                appproto,
-                get_value_at("dns", "rdata", ""),
-                get_value_at("dns", "ttl", ""),
-                get_value_at("qtype_name", "rrtype", ""),
-                answers,
+    def convert_timestamps(self, events: List[dict]):
+        """
+        converts the timestamps of all the given events at once.
+        they replace the original timestamps, so process_event() doesn't
+        have to detect the format of each one of them again
+        """
+        self.convert_ts_fields(
+            [(event, "timestamp") for event in events], "datetimeobj"
+        )
+        flows = [
+            event["flow"]
+            for event in events
+            if event["event_type"] == "flow"
+            and isinstance(event.get("flow"), dict)
+        ]
+        for field in ("start", "end"):
+            self.convert_ts_fields(
+                [(flow, field) for flow in flows], "unixtimestamp"
             )
 
-        elif event_type == "tls":
-            self.flow: SuricataTLS = SuricataTLS(
-                timestamp,
-                flow_id,
-                saddr,
-                sport,
-                daddr,
-                dport,
-                proto,
-                appproto,
-                get_value_at("tls", "version", ""),
-                get_value_at("tls", "subject", ""),
-                get_value_at("tls", "issuerdn", ""),
-                get_value_at("tls", "sni", ""),
-                get_value_at("tls", "notbefore", ""),
-                get_value_at("tls", "notafter", ""),
-                get_value_at("tls", "sni", ""),
-            )
+    def process_lines(self, lines: dict) -> List[Union[bool, Exception]]:
+        """
+        Process a batch of raw eve.json lines. the events slips doesn't
+        read are skipped without decoding them, and the timestamps of
+        the rest are converted column-wise
+        """
+        decoded = []
+        for line in lines["data"]:
+            if self.is_ignored_event(line):
+                decoded.append(False)
+                continue
+            try:
+                decoded.append(utils.json_loads(line))
+            except Exception as e:
+                decoded.append(e)
 
-        elif event_type == "fileinfo":
-            self.flow: SuricataFile = SuricataFile(
-                timestamp,
-                flow_id,
-                saddr,
-                sport,
-                daddr,
-                dport,
-                proto,
-                appproto,
-                get_value_at("fileinfo", "size", ""),
-            )
-        elif event_type == "ssh":
-            self.flow: SuricataSSH = SuricataSSH(
-                timestamp,
-                flow_id,
-                saddr,
-                sport,
-                daddr,
-                dport,
-                proto,
-                appproto,
-                get_value_at("ssh", "client", {}).get("software_version", ""),
-                get_value_at("ssh", "client", {}).get("proto_version", ""),
-                get_value_at("ssh", "server", {}).get("software_version", ""),
-            )
-        else:
-            return False
-        return self.flow
+        self.convert_timestamps(
+            [
+                event
+                for event in decoded
+                if isinstance(event, dict)
+                and event.get("event_type") in self.event_handlers
+            ]
+        )
+
+        flows = []
+        for event in decoded:
+            if event is False or isinstance(event, Exception):
+                # ignored event or invalid json
+                flows.append(event)
+                continue
+            if not event:
+                flows.append(None)
+                continue
+            try:
+                flows.append(self.process_event(event))
+            except Exception as e:
+                flows.append(e)
+        return flows
@@ -1,5 +1,9 @@
 from datetime import datetime
 from re import split
+from typing import (
+    Callable,
+    Optional,
+)
 
 from slips_files.common.abstracts.input_type import IInputType
 from slips_files.common.slips_utils import utils
@@ -23,7 +27,255 @@ from slips_files.core.flows.zeek import (
 
 class ZeekJSON(IInputType):
     def __init__(self):
-        pass
+        # the handler of each zeek log file slips reads. the first
+        # handler whose key is in the file type is used
+        self.log_handlers = (
+            ("conn", self.get_conn),
+            ("dns", self.get_dns),
+            ("http", self.get_http),
+            ("ssl", self.get_ssl),
+            ("ssh", self.get_ssh),
+            ("dhcp", self.get_dhcp),
+            ("ftp", self.get_ftp),
+            ("smtp", self.get_smtp),
+            ("tunnel", self.get_tunnel),
+            ("notice", self.get_notice),
+            ("files.log", self.get_files),
+            ("arp", self.get_arp),
+            ("software", self.get_software),
+            ("weird", self.get_weird),
+        )
+        # {file_type: handler}, so the handler of each file type is
+        # looked up only once
+        self.handlers_cache = {}
+
+    def get_handler(self, file_type: str) -> Optional[Callable]:
+        """
+        returns the function that parses the lines of the given
+        zeek log file, None if slips doesn't read this file
+        """
+        try:
+            return self.handlers_cache[file_type]
+        except KeyError:
+            pass
+
+        handler = next(
+            (
+                handler
+                for key, handler in self.log_handlers
+                if key in file_type
+            ),
+            None,
+        )
+        self.handlers_cache[file_type] = handler
+        return handler
+
+    def get_conn(self, line: dict, starttime) -> Conn:
+        # orig_bytes: The number of payload bytes the src sent.
+        # orig_ip_bytes: the length of the header + the payload
+        return Conn(
+            starttime,
+            line.get("uid", False),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("duration", 0),
+            line.get("proto", ""),
+            line.get("service", ""),
+            line.get("id.orig_p", ""),
+            line.get("id.resp_p", ""),
+            line.get("orig_pkts", 0),
+            line.get("resp_pkts", 0),
+            line.get("orig_bytes", 0),
+            line.get("resp_bytes", 0),
+            line.get("orig_l2_addr", ""),
+            line.get("resp_l2_addr", ""),
+            line.get("conn_state", ""),
+            line.get("history", ""),
+        )
+
+    def get_dns(self, line: dict, starttime) -> DNS:
+        return DNS(
+            starttime,
+            line.get("uid", False),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("query", ""),
+            line.get("qclass_name", ""),
+            line.get("qtype_name", ""),
+            line.get("rcode_name", ""),
+            line.get("answers", ""),
+            line.get("TTLs", ""),
+        )
+
+    def get_http(self, line: dict, starttime) -> HTTP:
+        return HTTP(
+            starttime,
+            line.get("uid", False),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("method", ""),
+            line.get("host", ""),
+            line.get("uri", ""),
+            line.get("version", 0),
+            line.get("user_agent", ""),
+            line.get("request_body_len", 0),
+            line.get("response_body_len", 0),
+            line.get("status_code", ""),
+            line.get("status_msg", ""),
+            line.get("resp_mime_types", ""),
+            line.get("resp_fuids", ""),
+        )
+
+    def get_ssl(self, line: dict, starttime) -> SSL:
+        return SSL(
+            starttime,
+            line.get("uid", False),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("version", ""),
+            line.get("id.orig_p", ","),
+            line.get("id.resp_p", ","),
+            line.get("cipher", ""),
+            line.get("resumed", ""),
+            line.get("established", ""),
+            line.get("cert_chain_fuids", ""),
+            line.get("client_cert_chain_fuids", ""),
+            line.get("subject", ""),
+            line.get("issuer", ""),
+            line.get("validation_status", ""),
+            line.get("curve", ""),
+            line.get("server_name", ""),
+            line.get("ja3", ""),
+            line.get("ja3s", ""),
+            line.get("is_DoH", "false"),
+        )
+
+    def get_ssh(self, line: dict, starttime) -> SSH:
+        return SSH(
+            starttime,
+            line.get("uid", False),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("version", ""),
+            line.get("auth_success", ""),
+            line.get("auth_attempts", ""),
+            line.get("client", ""),
+            line.get("server", ""),
+            line.get("cipher_alg", ""),
+            line.get("mac_alg", ""),
+            line.get("compression_alg", ""),
+            line.get("kex_alg", ""),
+            line.get("host_key_alg", ""),
+            line.get("host_key", ""),
+        )
+
+    def get_dhcp(self, line: dict, starttime) -> DHCP:
+        return DHCP(
+            starttime,
+            line.get("uids", []),
+            line.get("client_addr", ""),  # saddr
+            line.get("server_addr", ""),  # daddr
+            line.get("client_addr", ""),
+            line.get("server_addr", ""),
+            line.get("host_name", ""),
+            line.get("mac", ""),  # this is the client mac
+            line.get("requested_addr", ""),
+        )
+
+    def get_ftp(self, line: dict, starttime) -> FTP:
+        return FTP(
+            starttime,
+            line.get("uids", []),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("data_channel.resp_p", False),
+        )
+
+    def get_smtp(self, line: dict, starttime) -> SMTP:
+        return SMTP(
+            starttime,
+            line.get("uid", ""),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("last_reply", ""),
+        )
+
+    def get_tunnel(self, line: dict, starttime) -> Tunnel:
+        return Tunnel(
+            starttime,
+            line.get("uid", ""),
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("id.orig_p", ""),
+            line.get("id.resp_p", ""),
+            line.get("tunnel_type", ""),
+            line.get("action", ""),
+        )
+
+    def get_notice(self, line: dict, starttime) -> Notice:
+        return Notice(
+            starttime=starttime,
+            uid=line.get("uid", ""),
+            saddr=line.get("id.orig_h", ""),
+            daddr=line.get("id.resp_h", ""),
+            sport=line.get("id.orig_p", ""),
+            dport=line.get("id.resp_p", ""),
+            note=line.get("note", ""),
+            msg=line.get("msg", ""),
+            scanned_port=line.get("p", ""),
+            scanning_ip=line.get("src", ""),
+            dst=line.get("dst", ""),
+        )
+
+    def get_files(self, line: dict, starttime) -> Files:
+        return Files(
+            starttime,
+            line.get("conn_uids", [""])[0],
+            line.get("id.orig_h", ""),
+            line.get("id.resp_h", ""),
+            line.get("seen_bytes", ""),  # downloaded file size
+            line.get("md5", ""),
+            line.get("source", ""),
+            line.get("analyzers", ""),
+            line.get("sha1", ""),
+            line.get("tx_hosts", ""),
+            line.get("rx_hosts", ""),
+        )
+
+    def get_arp(self, line: dict, starttime) -> ARP:
+        return ARP(
+            starttime,
+            line.get("uid", ""),
+            line.get("orig_h", ""),
+            line.get("resp_h", ""),
+            line.get("src_mac", ""),
+            line.get("dst_mac", ""),
+            line.get("orig_hw", ""),
+            line.get("resp_hw", ""),
+            line.get("operation", ""),
+        )
+
+    def get_software(self, line: dict, starttime) -> Software:
+        return Software(
+            starttime,
+            line.get("uid", ""),
+            line.get("host", ""),
+            line.get("resp_h", ""),
+            line.get("software_type", ""),
+            line.get("unparsed_version", ""),
+            line.get("version.major", ""),
+            line.get("version.minor", ""),
+        )
+
+    def get_weird(self, line: dict, starttime) -> Weird:
+        return Weird(
+            starttime,
+            line.get("uid", ""),
+            line.get("host", ""),
+            line.get("resp_h", ""),
+            line.get("name", ""),
+            line.get("addl", ""),
+        )
 
     def process_line(self, new_line: dict):
         """
@@ -45,214 +297,16 @@ class ZeekJSON(IInputType):
             # to fix this, only use the file name as file 'type'
             file_type = file_type.split("/")[-1]
 
+        handler = self.get_handler(file_type)
+        if not handler:
+            return False
+
         if ts := line.get("ts", False):
             starttime: datetime = utils.convert_to_datetime(ts)
         else:
             starttime = ""
 
-        if "conn" in file_type:
-            self.flow: Conn = Conn(
-                starttime,
-                line.get("uid", False),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("duration", 0),
-                line.get("proto", ""),
-                line.get("service", ""),
-                line.get("id.orig_p", ""),
-                line.get("id.resp_p", ""),
-                line.get("orig_pkts", 0),
-                line.get("resp_pkts", 0),
-                line.get("orig_bytes", 0),
-                line.get("resp_bytes", 0),
-                line.get("orig_l2_addr", ""),
-                line.get("resp_l2_addr", ""),
-                line.get("conn_state", ""),
-                line.get("history", ""),
-            )
-            # orig_bytes: The number of payload bytes the src sent.
-            # orig_ip_bytes: the length of the header + the payload
-
-        elif "dns" in file_type:
-            self.flow: DNS = DNS(
-                starttime,
-                line.get("uid", False),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("query", ""),
-                line.get("qclass_name", ""),
-                line.get("qtype_name", ""),
-                line.get("rcode_name", ""),
-                line.get("answers", ""),
-                line.get("TTLs", ""),
-            )
-
-        elif "http" in file_type:
-            self.flow: HTTP = HTTP(
-                starttime,
-                line.get("uid", False),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("method", ""),
-                line.get("host", ""),
-                line.get("uri", ""),
-                line.get("version", 0),
-                line.get("user_agent", ""),
-                line.get("request_body_len", 0),
-                line.get("response_body_len", 0),
-                line.get("status_code", ""),
-                line.get("status_msg", ""),
-                line.get("resp_mime_types", ""),
-                line.get("resp_fuids", ""),
-            )
-
-        elif "ssl" in file_type:
-            self.flow: SSL = SSL(
-                starttime,
-                line.get("uid", False),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("version", ""),
-                line.get("id.orig_p", ","),
-                line.get("id.resp_p", ","),
-                line.get("cipher", ""),
-                line.get("resumed", ""),
-                line.get("established", ""),
-                line.get("cert_chain_fuids", ""),
-                line.get("client_cert_chain_fuids", ""),
-                line.get("subject", ""),
-                line.get("issuer", ""),
-                line.get("validation_status", ""),
-                line.get("curve", ""),
-                line.get("server_name", ""),
-                line.get("ja3", ""),
-                line.get("ja3s", ""),
-                line.get("is_DoH", "false"),
-            )
-        elif "ssh" in file_type:
-            self.flow: SSH = SSH(
-                starttime,
-                line.get("uid", False),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("version", ""),
-                line.get("auth_success", ""),
-                line.get("auth_attempts", ""),
-                line.get("client", ""),
-                line.get("server", ""),
-                line.get("cipher_alg", ""),
-                line.get("mac_alg", ""),
-                line.get("compression_alg", ""),
-                line.get("kex_alg", ""),
-                line.get("host_key_alg", ""),
-                line.get("host_key", ""),
-            )
-        elif "dhcp" in file_type:
-            self.flow: DHCP = DHCP(
-                starttime,
-                line.get("uids", []),
-                line.get("client_addr", ""),  # saddr
-                line.get("server_addr", ""),  # daddr
-                line.get("client_addr", ""),
-                line.get("server_addr", ""),
-                line.get("host_name", ""),
-                line.get("mac", ""),  # this is the client mac
-                line.get("requested_addr", ""),
-            )
-        elif "ftp" in file_type:
-            self.flow: FTP = FTP(
-                starttime,
-                line.get("uids", []),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("data_channel.resp_p", False),
-            )
-        elif "smtp" in file_type:
-            self.flow: SMTP = SMTP(
-                starttime,
-                line.get("uid", ""),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("last_reply", ""),
-            )
-        elif "tunnel" in file_type:
-            self.flow: Tunnel = Tunnel(
-                starttime,
-                line.get("uid", ""),
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("id.orig_p", ""),
-                line.get("id.resp_p", ""),
-                line.get("tunnel_type", ""),
-                line.get("action", ""),
-            )
-
-        elif "notice" in file_type:
-            self.flow: Notice = Notice(
-                starttime=starttime,
-                uid=line.get("uid", ""),
-                saddr=line.get("id.orig_h", ""),
-                daddr=line.get("id.resp_h", ""),
-                sport=line.get("id.orig_p", ""),
-                dport=line.get("id.resp_p", ""),
-                note=line.get("note", ""),
-                msg=line.get("msg", ""),
-                scanned_port=line.get("p", ""),
-                scanning_ip=line.get("src", ""),
-                dst=line.get("dst", ""),
-            )
-
-        elif "files.log" in file_type:
-            self.flow: Files = Files(
-                starttime,
-                line.get("conn_uids", [""])[0],
-                line.get("id.orig_h", ""),
-                line.get("id.resp_h", ""),
-                line.get("seen_bytes", ""),  # downloaded file size
-                line.get("md5", ""),
-                line.get("source", ""),
-                line.get("analyzers", ""),
-                line.get("sha1", ""),
-                line.get("tx_hosts", ""),
-                line.get("rx_hosts", ""),
-            )
-        elif "arp" in file_type:
-            self.flow: ARP = ARP(
-                starttime,
-                line.get("uid", ""),
-                line.get("orig_h", ""),
-                line.get("resp_h", ""),
-                line.get("src_mac", ""),
-                line.get("dst_mac", ""),
-                line.get("orig_hw", ""),
-                line.get("resp_hw", ""),
-                line.get("operation", ""),
-            )
-
-        elif "software" in file_type:
-            self.flow: Software = Software(
-                starttime,
-                line.get("uid", ""),
-                line.get("host", ""),
-                line.get("resp_h", ""),
-                line.get("software_type", ""),
-                line.get("unparsed_version", ""),
-                line.get("version.major", ""),
-                line.get("version.minor", ""),
-            )
-
-        elif "weird" in file_type:
-            self.flow: Weird = Weird(
-                starttime,
-                line.get("uid", ""),
-                line.get("host", ""),
-                line.get("resp_h", ""),
-                line.get("name", ""),
-                line.get("addl", ""),
-            )
-
-        else:
-            return False
+        self.flow = handler(line, starttime)
         return self.flow
 
 
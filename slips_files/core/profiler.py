@@ -17,11 +17,13 @@
 # stratosphere@aic.fel.cvut.cz
 from dataclasses import asdict
 import queue
+import time
 import ipaddress
 import pprint
 import multiprocessing
 from typing import (
     List,
+    Optional,
 )
 
 import validators
@@ -30,6 +32,10 @@ from slips_files.common.abstracts.observer import IObservable
 from slips_files.common.parsers.config_parser import ConfigParser
 from slips_files.common.slips_utils import utils
 from slips_files.common.abstracts.core import ICore
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    PROFILER_QUEUE_DEPTH,
+    STAGE_LATENCY,
+)
 from slips_files.core.helpers.flow_handler import FlowHandler
 from slips_files.core.helpers.symbols_handler import SymbolHandler
 from slips_files.core.helpers.whitelist.whitelist import Whitelist
@@ -98,6 +104,9 @@ class Profiler(ICore, IObservable):
         # is set by this proc to tell input proc that we are done
         # processing and it can exit no issue
         self.is_profiler_done_event = is_profiler_done_event
+        # when the input process read the line being processed, set only
+        # if pipeline_metrics_enable is set
+        self.time_read: Optional[float] = None
 
     def read_configuration(self):
         conf = ConfigParser()
@@ -157,6 +166,9 @@ class Profiler(ICore, IObservable):
             return False
 
         self.flow_parser = FlowHandler(self.db, self.symbol, self.flow)
+        if self.pipeline_metrics:
+            # sent with the flow to the modules
+            self.flow_parser.time_read = self.time_read
 
         if not self.flow_parser.is_supported_flow_type():
             return False
@@ -347,6 +359,35 @@ class Profiler(ICore, IObservable):
         )
         self.mark_process_as_done_processing()
 
+    def record_profiled_flow(self):
+        """
+        records how long the flow took from being read until it was added
+        to its profile
+        """
+        now = time.time()
+        self.pipeline_metrics.add(
+            STAGE_LATENCY,
+            now - self.time_read,
+            timestamp=now,
+            stage="profiled",
+        )
+
+    def record_dequeued_msg(self):
+        """
+        records the depth of the profiler queue and how long the msg
+        that was just dequeued waited since it was read
+        """
+        if self.time_read:
+            self.pipeline_metrics.add(
+                STAGE_LATENCY, time.time() - self.time_read, stage="dequeued"
+            )
+        try:
+            depth = self.profiler_queue.qsize()
+        except NotImplementedError:
+            # qsize() isn't implemented on macOS
+            return
+        self.pipeline_metrics.add(PROFILER_QUEUE_DEPTH, depth)
+
     def mark_process_as_done_processing(self):
         """
         is called to mark this process as done processing so
@@ -454,6 +495,72 @@ class Profiler(ICore, IObservable):
             # ValueError is raised when the queue is closed
             return
 
+    def handle_flow(self, line, flow):
+        """
+        adds the given flow, parsed from the given line, to its profile
+        """
+        try:
+            self.flow = flow
+            if self.flow:
+                self.add_flow_to_profile()
+                self.handle_setting_local_net()
+                if self.time_read:
+                    self.record_profiled_flow()
+
+            # now that one flow is processed tell output.py
+            # to update the bar
+            if self.has_pbar:
+                self.notify_observers({"bar": "update"})
+        except Exception as e:
+            self.print(
+                f"Problem processing line {line}. Line discarded. {e}",
+                0,
+                1,
+            )
+            self.flow = False
+
+    def process_line(self, line: dict):
+        try:
+            flow = self.input.process_line(line)
+        except Exception as e:
+            self.print(
+                f"Problem processing line {line}. Line discarded. {e}",
+                0,
+                1,
+            )
+            self.flow = False
+            return
+        self.handle_flow(line, flow)
+
+    def process_lines(self, lines: dict):
+        """
+        parses a batch of lines at once and adds their flows to
+        their profiles
+        :param lines: dict with a list of lines in the 'data' key
+        """
+        try:
+            flows: list = self.input.process_lines(lines)
+        except Exception as e:
+            self.print(
+                f"Problem processing {len(lines['data'])} lines. "
+                f"Lines discarded. {e}",
+                0,
+                1,
+            )
+            self.flow = False
+            return
+
+        for line, flow in zip(lines["data"], flows):
+            if isinstance(flow, Exception):
+                self.print(
+                    f"Problem processing line {line}. Line discarded. {flow}",
+                    0,
+                    1,
+                )
+                self.flow = False
+                continue
+            self.handle_flow(line, flow)
+
     def pre_main(self):
         utils.drop_root_privs()
 
@@ -470,6 +577,9 @@ class Profiler(ICore, IObservable):
             line: dict = msg["line"]
             input_type: str = msg["input_type"]
             total_flows: int = msg.get("total_flows", 0)
+            self.time_read = msg.get("time_read")
+            if self.pipeline_metrics:
+                self.record_dequeued_msg()
 
             # TODO who is putting this True here?
             if line is True:
@@ -499,23 +609,12 @@ class Profiler(ICore, IObservable):
                 self.input = SUPPORTED_INPUT_TYPES[self.input_type]()
 
             # get the correct input type class and process the line based on it
-            try:
-                self.flow = self.input.process_line(line)
-                if self.flow:
-                    self.add_flow_to_profile()
-                    self.handle_setting_local_net()
-
-                # now that one flow is processed tell output.py
-                # to update the bar
-                if self.has_pbar:
-                    self.notify_observers({"bar": "update"})
-            except Exception as e:
-                self.print(
-                    f"Problem processing line {line}. Line discarded. {e}",
-                    0,
-                    1,
-                )
-                self.flow = False
+            if isinstance(line, dict) and isinstance(line.get("data"), list):
+                # a batch of lines read at once by the input process
+                self.rec_lines += len(line["data"]) - 1
+                self.process_lines(line)
+            else:
+                self.process_line(line)
 
             # listen on this channel in case whitelist.conf is changed,
             # we need to process the new changes
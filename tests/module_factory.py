@@ -12,6 +12,11 @@ from modules.flowalerts.conn import Conn
 from slips_files.core.database.database_manager import DBManager
 
 from slips_files.core.helpers.notify import Notify
+from slips_files.core.helpers.pcap_splitter import PcapSplitter
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    PipelineMetrics,
+    PipelineMetricsExporter,
+)
 from modules.flowalerts.dns import DNS
 from multiprocessing.connection import Connection
 from modules.flowalerts.downloaded_file import DownloadedFile
@@ -38,6 +43,8 @@ from slips_files.core.input import Input
 from modules.blocking.blocking import Blocking
 from modules.http_analyzer.http_analyzer import HTTPAnalyzer
 from modules.ip_info.ip_info import IPInfo
+from modules.flowmldetection.flowmldetection import FlowMLDetection
+from modules.rnn_cc_detection.rnn_cc_detection import CCDetection
 from slips_files.common.slips_utils import utils
 from slips_files.core.helpers.whitelist.whitelist import Whitelist
 from tests.common_test_utils import do_nothing
@@ -162,15 +169,12 @@ class ModuleFactory:
 
     @patch(MODULE_DB_MANAGER, name="mock_db")
     def create_arp_obj(self, mock_db):
-        with patch(
-            "modules.arp.arp.ARP.wait_for_arp_scans", return_value=Mock()
-        ):
-            arp = ARP(
-                self.logger,
-                "dummy_output_dir",
-                6379,
-                Mock(),
-            )
+        arp = ARP(
+            self.logger,
+            "dummy_output_dir",
+            6379,
+            Mock(),
+        )
         arp.print = Mock()
         return arp
 
@@ -292,6 +296,30 @@ class ModuleFactory:
         ip_info.print = Mock()
         return ip_info
 
+    @patch(MODULE_DB_MANAGER, name="mock_db")
+    def create_flowmldetection_obj(self, mock_db):
+        flowmldetection = FlowMLDetection(
+            self.logger,
+            "dummy_output_dir",
+            6379,
+            Mock(),
+        )
+        # override the self.print function to avoid broken pipes
+        flowmldetection.print = Mock()
+        return flowmldetection
+
+    @patch(MODULE_DB_MANAGER, name="mock_db")
+    def create_rnn_cc_detection_obj(self, mock_db):
+        rnn_cc_detection = CCDetection(
+            self.logger,
+            "dummy_output_dir",
+            6379,
+            Mock(),
+        )
+        # override the self.print function to avoid broken pipes
+        rnn_cc_detection.print = Mock()
+        return rnn_cc_detection
+
     @patch(DB_MANAGER, name="mock_db")
     def create_asn_obj(self, mock_db):
         return ASN(mock_db)
@@ -571,6 +599,15 @@ class ModuleFactory:
         notify = Notify()
         return notify
 
+    def create_pcap_splitter_obj(self, pcap_path: str):
+        return PcapSplitter(pcap_path)
+
+    def create_pipeline_metrics_obj(self, interval: float = 10):
+        return PipelineMetrics(Mock(), "Flow Alerts", interval)
+
+    def create_pipeline_metrics_exporter_obj(self, output_dir: str):
+        return PipelineMetricsExporter(Mock(), output_dir, 10)
+
     @patch(MODULE_DB_MANAGER, name="mock_db")
     def create_cesnet_obj(self, mock_db):
         output_dir = "dummy_output_dir"
@@ -608,4 +645,3 @@ class ModuleFactory:
             termination_event,
         )
         return riskiq
-
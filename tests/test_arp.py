@@ -3,7 +3,9 @@
 from tests.module_factory import ModuleFactory
 import json
 import ipaddress
+import time
 import pytest
+from modules.arp.arp_scan_aggregator import ArpScanAggregator
 from slips_files.core.structures.evidence import EvidenceType
 from slips_files.core.flows.zeek import ARP
 
@@ -307,66 +309,103 @@ def test_check_if_gratutitous_arp(operation, dst_hw, expected_result):
     assert result == expected_result
 
 
-# def test_wait_for_arp_scans():
-#     ARP = ModuleFactory().create_arp_obj()
-#     ARP.pending_arp_scan_evidence = Queue()
-#     ARP.time_to_wait = 0.1
-#     evidence1 = (
-#         "1636305825.755132",
-#         "profile_192.168.1.1",
-#         "timewindow1",
-#         ["uid1"],
-#         5,
-#     )
-#     evidence2 = (
-#         "1636305826.755132",
-#         "profile_192.168.1.1",
-#         "timewindow1",
-#         ["uid2"],
-#         6,
-#     )
-#     evidence3 = (
-#         "1636305827.755132",
-#         "profile_192.168.1.2",
-#         "timewindow1",
-#         ["uid3"],
-#         7,
-#     )
-#
-#     ARP.pending_arp_scan_evidence.put(evidence1)
-#     ARP.pending_arp_scan_evidence.put(evidence2)
-#     ARP.pending_arp_scan_evidence.put(evidence3)
-#
-#     ARP.set_evidence_arp_scan = MagicMock()
-#
-#     thread = threading.Thread(target=ARP.wait_for_arp_scans)
-#     thread.daemon = True
-#     thread.start()
-#
-#     time.sleep(1)
-#     expected_calls = [
-#         call(
-#             "1636305826.755132",
-#             "profile_192.168.1.1",
-#             "timewindow1",
-#             ["uid1", "uid2"],
-#             6,
-#         ),
-#         call(
-#             "1636305827.755132",
-#             "profile_192.168.1.2",
-#             "timewindow1",
-#             ["uid3"],
-#             7,
-#         ),
-#     ]
-#     (
-#         ARP.set_evidence_arp_scan.assert_has_calls(
-#             expected_calls, any_order=True
-#         )
-#     )
-#     assert ARP.set_evidence_arp_scan.call_count == 2
-#     assert ARP.pending_arp_scan_evidence.empty()
-#     ARP.stop_thread = True
-#     thread.join(timeout=1)
-#
+def create_arp_request(daddr, ts, saddr="192.168.1.1"):
+    return ARP(
+        starttime=str(ts),
+        uid=f"uid_{daddr}_{ts}",
+        saddr=saddr,
+        daddr=daddr,
+        smac="44:11:44:11:44:11",
+        dmac="ff:ff:ff:ff:ff:ff",
+        src_hw="44:11:44:11:44:11",
+        dst_hw="00:00:00:00:00:00",
+        operation="request",
+    )
+
+
+def test_check_arp_scan():
+    arp = ModuleFactory().create_arp_obj()
+    arp.db.get_gateway_ip.return_value = "192.168.1.254"
+    ts = 1726238443.0
+    results = [
+        arp.check_arp_scan(
+            profileid, twid, create_arp_request(f"192.168.1.{i}", ts + i)
+        )
+        for i in range(10, 15)
+    ]
+    assert results == [False, False, False, False, True]
+    arp.db.set_evidence.assert_called_once()
+    evidence = arp.db.set_evidence.call_args[0][0]
+    assert evidence.evidence_type == EvidenceType.ARP_SCAN
+    assert len(evidence.uid) == 5
+
+
+def test_check_arp_scan_requests_too_far_apart():
+    arp = ModuleFactory().create_arp_obj()
+    arp.db.get_gateway_ip.return_value = "192.168.1.254"
+    ts = 1726238443.0
+    for i in range(10, 20):
+        assert not arp.check_arp_scan(
+            profileid, twid, create_arp_request(f"192.168.1.{i}", ts + i * 10)
+        )
+    # only the requests of the last 30s are kept
+    state = arp.arp_scans.states[f"{profileid}_{twid}"]
+    assert len(state.requests) == 4
+
+
+def test_arp_scans_are_combined_until_the_deadline():
+    aggregator = ArpScanAggregator(threshold=2, time_to_wait=10)
+    # the first scan is reported immediately
+    assert aggregator.add_request(profileid, twid, "1.1.1.1", 1, "a") == (
+        False,
+        [],
+    )
+    assert aggregator.add_request(profileid, twid, "1.1.1.2", 2, "b") == (
+        True,
+        [(2, profileid, twid, ["a", "b"])],
+    )
+    # the next ones wait for the deadline
+    aggregator.add_request(profileid, twid, "1.1.1.3", 3, "c")
+    aggregator.add_request(profileid, twid, "1.1.1.4", 4, "d")
+    aggregator.add_request(profileid, twid, "1.1.1.5", 5, "e")
+    aggregator.add_request(profileid, twid, "1.1.1.6", 6, "f")
+    assert aggregator.flush_due() == []
+    assert aggregator.flush_due(now=time.time() + 11) == [
+        (6, profileid, twid, ["c", "d", "e", "f"])
+    ]
+    assert aggregator.flush_due(now=time.time() + 11) == []
+
+
+def test_arp_scans_are_flushed_when_the_tw_is_closed():
+    aggregator = ArpScanAggregator(threshold=1)
+    aggregator.add_request(profileid, twid, "1.1.1.1", 1, "a")
+    aggregator.add_request(profileid, twid, "1.1.1.2", 2, "b")
+    aggregator.add_request(profileid, "timewindow10", "1.1.1.2", 2, "c")
+
+    assert aggregator.close_tw(f"{profileid}_{twid}") == [
+        (2, profileid, twid, ["b"])
+    ]
+    # other timewindows aren't affected
+    assert list(aggregator.states) == [f"{profileid}_timewindow10"]
+    # the deadline of the closed tw is ignored
+    assert aggregator.flush_due(now=time.time() + 11) == []
+
+
+def test_arp_scan_state_is_bounded():
+    aggregator = ArpScanAggregator(threshold=1, max_tracked=2, max_uids=3)
+    for tw in range(1, 4):
+        aggregator.add_request(profileid, f"timewindow{tw}", "1", 1, "a")
+        for uid in range(5):
+            aggregator.add_request(
+                profileid, f"timewindow{tw}", "1", 1, str(uid)
+            )
+    assert list(aggregator.states) == [
+        f"{profileid}_timewindow2",
+        f"{profileid}_timewindow3",
+    ]
+    # the evicted tw had a pending scan, it's reported once evicted
+    _, scans = aggregator.add_request(profileid, "timewindow4", "1", 1, "a")
+    assert scans == [
+        (1, profileid, "timewindow2", ["2", "3", "4"]),
+        (1, profileid, "timewindow4", ["a"]),
+    ]
@@ -0,0 +1,221 @@
+import json
+import os
+import time
+
+import pytest
+import yaml
+
+from benchmarks.benchmark import (
+    compare_with_baseline,
+    get_flow_latency,
+    write_config,
+)
+from benchmarks.inputs import (
+    BENCHMARK_INPUTS,
+    prepare_input,
+    scale_binetflow,
+    scale_suricata,
+    scale_zeek_dir,
+    shift_ts,
+)
+from benchmarks.process_monitor import ProcessMonitor
+from slips_files.common.performance_profilers.latency_histogram import (
+    LatencyHistogram,
+)
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    MODULE_LAG,
+    STAGE_LATENCY,
+)
+from slips_files.common.slips_utils import utils
+
+
+@pytest.mark.parametrize(
+    "ts, seconds, expected_ts",
+    [
+        # testcase1: unix timestamp
+        (1601998366.785668, 10, 1601998376.785668),
+        # testcase2: unix timestamp in a tab zeek log
+        ("1601998366.785668", 10, "1601998376.785668"),
+        # testcase3: argus timestamp
+        ("2019/04/04 16:23:00.325010", 3600, "2019/04/04 17:23:00.325010"),
+        # testcase4: suricata timestamp
+        (
+            "2021-06-06T15:59:46.457984+0200",
+            86400,
+            "2021-06-07T15:59:46.457984+0200",
+        ),
+        # testcase5: not a timestamp
+        ("-", 10, "-"),
+    ],
+)
+def test_shift_ts(ts, seconds, expected_ts):
+    assert shift_ts(ts, seconds) == expected_ts
+
+
+def get_ts(ts) -> float:
+    return float(utils.convert_format(ts, "unixtimestamp"))
+
+
+def test_scale_binetflow(tmp_path):
+    path = "dataset/test4-malicious.binetflow"
+    output = os.path.join(tmp_path, "scaled.binetflow")
+    scale_binetflow(path, 3, output)
+
+    with open(path) as f:
+        original = f.readlines()
+    with open(output) as f:
+        scaled = f.readlines()
+    assert scaled[0] == original[0]
+    assert len(scaled) == 3 * (len(original) - 1) + 1
+    # each copy starts after the previous one ends
+    timestamps = [get_ts(line.split(",")[0]) for line in scaled[1:]]
+    flows = len(original) - 1
+    assert max(timestamps[:flows]) < min(timestamps[flows : 2 * flows])
+
+
+def test_scale_suricata(tmp_path):
+    path = "dataset/test6-malicious.suricata.json"
+    output = os.path.join(tmp_path, "scaled.json")
+    scale_suricata(path, 2, output)
+
+    with open(output) as f:
+        events = [json.loads(line) for line in f]
+    assert len(events) == 10000
+    first, copy = events[0], events[5000]
+    assert copy["flow_id"] != first["flow_id"]
+    assert get_ts(copy["timestamp"]) > get_ts(first["timestamp"])
+
+
+@pytest.mark.parametrize(
+    "zeek_dir",
+    ["dataset/test9-mixed-zeek-dir", "dataset/test10-mixed-zeek-dir"],
+)
+def test_scale_zeek_dir(zeek_dir, tmp_path):
+    output = os.path.join(tmp_path, "scaled")
+    scale_zeek_dir(zeek_dir, 2, output)
+
+    with open(os.path.join(zeek_dir, "conn.log")) as f:
+        original = [line for line in f if not line.startswith("#")]
+    with open(os.path.join(output, "conn.log")) as f:
+        scaled = [line for line in f if not line.startswith("#")]
+    assert len(scaled) == 2 * len(original)
+
+    if scaled[0].startswith("{"):
+        uids = [json.loads(line)["uid"] for line in scaled]
+    else:
+        uids = [line.split("\t")[1] for line in scaled]
+    assert len(set(uids)) == len(uids)
+
+
+def test_prepare_input_not_scaled(tmp_path):
+    benchmark_input = BENCHMARK_INPUTS["nfdump"]
+    assert (
+        prepare_input(benchmark_input, 10, str(tmp_path))
+        == benchmark_input.path
+    )
+
+
+def test_write_config(tmp_path):
+    path = write_config(["flowalerts"], str(tmp_path))
+    with open(path) as f:
+        config = yaml.safe_load(f)
+    disabled = config["modules"]["disable"]
+    assert "flowalerts" not in disabled
+    assert "progress_bar" not in disabled
+    assert "threat_intelligence" in disabled
+    assert config["Profiling"]["pipeline_metrics_enable"] is True
+    assert config["parameters"]["redis_unix_socket"] is True
+
+
+def test_write_config_redis_tcp(tmp_path):
+    path = write_config(["flowalerts"], str(tmp_path), redis_unix_socket=False)
+    with open(path) as f:
+        config = yaml.safe_load(f)
+    assert config["parameters"]["redis_unix_socket"] is False
+
+
+def get_results(throughput: float, p99: float, peak_rss: int = 100) -> dict:
+    return {
+        "scale": 1,
+        "modules": ["flowalerts"],
+        "inputs": {
+            "zeek": {
+                "throughput": throughput,
+                "latency": {"flowalerts": {"p50": 0.001, "p99": p99}},
+                "cpu_time": 10,
+                "peak_rss": peak_rss,
+            }
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "results, expected_regressions",
+    [
+        # testcase1: same results
+        (get_results(1000, 0.01), 0),
+        # testcase2: within the tolerance
+        (get_results(950, 0.0105), 0),
+        # testcase3: better results
+        (get_results(2000, 0.001, peak_rss=50), 0),
+        # testcase4: lower throughput
+        (get_results(800, 0.01), 1),
+        # testcase5: lower throughput, higher latency and memory
+        (get_results(800, 0.02, peak_rss=200), 3),
+    ],
+)
+def test_compare_with_baseline(results, expected_regressions):
+    baseline = get_results(1000, 0.01)
+    assert (
+        len(compare_with_baseline(results, baseline, tolerance=0.1))
+        == expected_regressions
+    )
+
+
+def test_compare_with_baseline_different_settings():
+    results = get_results(1000, 0.01)
+    baseline = get_results(1000, 0.01)
+    baseline["scale"] = 10
+    regressions = compare_with_baseline(results, baseline, tolerance=0.1)
+    assert len(regressions) == 1
+    assert "scale" in regressions[0]
+
+
+def test_get_flow_latency():
+    profiled = LatencyHistogram()
+    profiled.add(0.1, timestamp=110)
+    consumed = LatencyHistogram()
+    consumed.add(0.5, timestamp=111)
+    metrics = {
+        (STAGE_LATENCY, (("stage", "profiled"),)): profiled,
+        (STAGE_LATENCY, (("stage", "dequeued"),)): LatencyHistogram(),
+        (STAGE_LATENCY, (("module", "flowalerts"), ("stage", "consumed"))): (
+            consumed
+        ),
+        (MODULE_LAG, (("channel", "new_flow"), ("module", "flowalerts"))): (
+            LatencyHistogram()
+        ),
+    }
+
+    assert get_flow_latency(metrics) == (
+        profiled,
+        {"flowalerts": consumed},
+    )
+
+
+def test_get_flow_latency_no_metrics():
+    profiled, consumed = get_flow_latency({})
+    assert profiled.count == 0
+    assert profiled.get_period() == 0
+    assert consumed == {}
+
+
+def test_process_monitor():
+    # no redis server is listening on this port, the processes are
+    # named using their PIDs only
+    monitor = ProcessMonitor(os.getpid(), redis_port=1, interval=0.01)
+    monitor.start()
+    time.sleep(0.1)
+    usage = monitor.stop()
+    assert usage["slips.py"]["cpu_time"] > 0
+    assert usage["slips.py"]["peak_rss"] > 0
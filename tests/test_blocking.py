@@ -4,9 +4,16 @@ this file needs sudoroot to run
 
 from tests.common_test_utils import IS_IN_A_DOCKER_CONTAINER
 from tests.module_factory import ModuleFactory
+from modules.blocking.set_blocker import (
+    IpsetBlocker,
+    NftablesBlocker,
+    RecordingCommandRunner,
+)
+from unittest.mock import patch
 import platform
 import pytest
 import os
+import time
 
 
 def has_netadmin_cap():
@@ -100,3 +107,153 @@ def test_unblock_ip():
     if not blocking.is_ip_blocked("2.2.0.0"):
         assert blocking.block_ip(ip, from_, to) is True
     assert blocking.unblock_ip(ip, from_, to) is True
+
+
+def test_nftables_blocker_batches_changes():
+    runner = RecordingCommandRunner()
+    blocker = NftablesBlocker(runner=runner)
+    assert blocker.block("2.2.0.0") is True
+    assert blocker.block("2001:db8::1", from_=True, to=False, timeout=60)
+    # already blocked
+    assert blocker.block("2.2.0.0") is False
+    # nothing is applied until the batch is due
+    assert runner.commands == []
+    assert blocker.is_blocked("2.2.0.0")
+    assert blocker.is_blocked("2001:db8::1", "from")
+    assert not blocker.is_blocked("2001:db8::1", "to")
+
+    assert blocker.apply() is True
+    assert runner.commands == [
+        (
+            ["nft", "-f", "-"],
+            "add element inet slipsBlocking from_ipv4 { 2.2.0.0 }\n"
+            "add element inet slipsBlocking to_ipv4 { 2.2.0.0 }\n"
+            "add element inet slipsBlocking from_ipv6 "
+            "{ 2001:db8::1 timeout 60s }\n",
+        )
+    ]
+
+
+def test_nftables_blocker_unblock():
+    runner = RecordingCommandRunner()
+    blocker = NftablesBlocker(runner=runner)
+    blocker.block("2.2.0.0")
+    blocker.apply()
+    assert blocker.unblock("2.2.0.0", from_=True, to=False) is True
+    assert blocker.unblock("2.2.0.0", from_=True, to=False) is False
+    assert not blocker.is_blocked("2.2.0.0", "from")
+    assert blocker.is_blocked("2.2.0.0", "to")
+    blocker.apply()
+    assert runner.commands[-1][1] == (
+        "add element inet slipsBlocking from_ipv4 { 2.2.0.0 }\n"
+        "delete element inet slipsBlocking from_ipv4 { 2.2.0.0 }\n"
+    )
+
+
+def test_set_blocker_applies_full_batches():
+    runner = RecordingCommandRunner()
+    blocker = NftablesBlocker(runner=runner)
+    blocker.batch_size = 4
+    for i in range(3):
+        blocker.block(f"2.2.0.{i}")
+    # the 4th change filled the first batch
+    assert len(runner.commands) == 1
+    assert blocker.pending != []
+    assert blocker.apply_if_due() is True
+    assert len(runner.commands) == 1
+
+
+def test_set_blocker_expired_blocks():
+    blocker = NftablesBlocker(runner=RecordingCommandRunner())
+    blocker.block("2.2.0.0", timeout=60)
+    with patch("time.time", return_value=time.time() + 61):
+        assert not blocker.is_blocked("2.2.0.0")
+        # can be blocked again
+        assert blocker.block("2.2.0.0") is True
+
+
+def test_set_blocker_reverts_mirror_on_failure():
+    runner = RecordingCommandRunner()
+    blocker = NftablesBlocker(runner=runner)
+    blocker.block("2.2.0.0")
+    blocker.apply()
+
+    runner.returncode = 1
+    runner.output = "Error: Could not process rule"
+    blocker.unblock("2.2.0.0")
+    blocker.block("3.3.0.0")
+    assert blocker.apply() is False
+    assert blocker.last_error == "Error: Could not process rule"
+    assert blocker.is_blocked("2.2.0.0", "from")
+    assert blocker.is_blocked("2.2.0.0", "to")
+    assert not blocker.is_blocked("3.3.0.0")
+
+
+def test_set_blocker_invalid_ip():
+    runner = RecordingCommandRunner()
+    blocker = NftablesBlocker(runner=runner)
+    assert blocker.block("not an ip") is False
+    assert blocker.pending == []
+
+
+def test_nftables_blocker_initialize():
+    runner = RecordingCommandRunner()
+    blocker = NftablesBlocker(sudo=True, runner=runner)
+    assert blocker.initialize() is True
+    cmd, script = runner.commands[0]
+    assert cmd == ["sudo", "nft", "-f", "-"]
+    assert (
+        "add set inet slipsBlocking from_ipv4 "
+        "{ type ipv4_addr; flags timeout; }" in script
+    )
+    assert (
+        "add rule inet slipsBlocking input ip6 daddr @to_ipv6 drop" in script
+    )
+
+
+def test_ipset_blocker():
+    runner = RecordingCommandRunner()
+    blocker = IpsetBlocker(runner=runner)
+    blocker.block("2.2.0.0", timeout=10)
+    blocker.block("2001:db8::1", from_=False, to=True)
+    blocker.unblock("2.2.0.0", from_=True, to=False)
+    assert blocker.apply() is True
+    assert runner.commands == [
+        (
+            ["ipset", "restore", "-exist"],
+            "add slipsBlocking_from_ipv4 2.2.0.0 timeout 10\n"
+            "add slipsBlocking_to_ipv4 2.2.0.0 timeout 10\n"
+            "add slipsBlocking_to_ipv6 2001:db8::1\n"
+            "del slipsBlocking_from_ipv4 2.2.0.0\n",
+        )
+    ]
+
+
+def test_ipset_blocker_initialize():
+    runner = RecordingCommandRunner()
+    blocker = IpsetBlocker(runner=runner)
+    assert blocker.initialize() is True
+    assert (
+        ["ipset", "restore", "-exist"],
+        "create slipsBlocking_from_ipv4 hash:ip family inet timeout 0\n"
+        "create slipsBlocking_to_ipv4 hash:ip family inet timeout 0\n"
+        "create slipsBlocking_from_ipv6 hash:ip family inet6 timeout 0\n"
+        "create slipsBlocking_to_ipv6 hash:ip family inet6 timeout 0\n",
+    ) in runner.commands
+    # the rules already exist, -C succeeded
+    assert (
+        [
+            "ip6tables",
+            "-C",
+            "slipsBlocking",
+            "-m",
+            "set",
+            "--match-set",
+            "slipsBlocking_to_ipv6",
+            "dst",
+            "-j",
+            "DROP",
+        ],
+        None,
+    ) in runner.commands
+    assert not any("-I" in cmd for cmd, _ in runner.commands)
@@ -425,51 +425,44 @@ def test_should_ignore_conn_without_dns(
 
 @pytest.mark.parametrize(
     "profileid, daddr, mock_get_the_other_ip_version_return_value, "
-    "mock_get_dns_resolution_return_value, expected_result",
+    "resolvers, expected_result",
     [
         (  # Test case 1: Resolution done by the other IP version
             profileid,
             daddr,
             json.dumps("2001:0db8:85a3:0000:0000:8a2e:0370:7334"),
-            {"resolved-by": ["2001:0db8:85a3:0000:0000:8a2e:0370:7334"]},
+            ["2001:0db8:85a3:0000:0000:8a2e:0370:7334"],
             True,
         ),
         (  # Test case 2: Resolution not done by another IP
             profileid,
             "2.3.4.5",
             json.dumps("2001:0db8:85a3:0000:0000:8a2e:0370:7334"),
-            {"resolved-by": []},
+            [],
             False,
         ),
         (  # Test case 3: No other IP version found
             profileid,
             daddr,
             None,
-            {"resolved-by": ["192.168.1.2"]},
+            ["192.168.1.2"],
             False,
         ),
-        (  # Test case 4: 'resolved-by' is a string, not a list
-            profileid,
-            daddr,
-            json.dumps("2001:0db8:85a3:0000:0000:8a2e:0370:7334"),
-            {"resolved-by": "2001:0db8:85a3:0000:0000:8a2e:0370:7334"},
-            True,
-        ),
     ],
 )
 def test_check_if_resolution_was_made_by_different_version(
     profileid,
     daddr,
     mock_get_the_other_ip_version_return_value,
-    mock_get_dns_resolution_return_value,
+    resolvers,
     expected_result,
 ):
     conn = ModuleFactory().create_conn_analyzer_obj()
     conn.db.get_the_other_ip_version.return_value = (
         mock_get_the_other_ip_version_return_value
     )
-    conn.db.get_dns_resolution.return_value = (
-        mock_get_dns_resolution_return_value
+    conn.db.is_ip_resolved_by.side_effect = (
+        lambda ip, resolver: resolver in resolvers
     )
 
     assert (
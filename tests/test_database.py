@@ -1,11 +1,19 @@
 import redis
 import json
+import os
+import socket
+import stat
 import time
 import pytest
+from multiprocessing import Event
+from unittest.mock import Mock, patch
 
 from slips_files.common.slips_utils import utils
 from slips_files.core.flows.zeek import Conn
-from tests.module_factory import ModuleFactory
+from slips_files.core.database.redis_db.database import RedisDB
+from slips_files.core.database.sqlite_db.database import SQLiteDB
+from slips_files.common.abstracts.module import IModule
+from tests.module_factory import MODULE_DB_MANAGER, ModuleFactory
 from slips_files.core.structures.evidence import (
     Evidence,
     Direction,
@@ -238,3 +246,596 @@ def test_update_max_threat_level(
     assert (
         db.update_max_threat_level(profileid, cur_threat_level) == expected_max
     )
+
+
+def test_get_enrichment_info():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    db.rdb._enrichment_cache.clear()
+    db.rdb.rcache.flushdb()
+    db.rdb.rcache.hset(
+        "IPsInfo",
+        "8.8.8.8",
+        json.dumps(
+            {
+                "asn": {"number": "AS15169", "org": "GOOGLE"},
+                "reverse_dns": "dns.google",
+                "SNI": [{"server_name": "dns.google", "dport": 443}],
+            }
+        ),
+    )
+    db.rdb.rcache.hset(
+        "IoC_ips", "8.8.8.8", json.dumps({"source": "feed.csv"})
+    )
+    attacker = Attacker(
+        direction=Direction.SRC, attacker_type=IoCType.IP, value=test_ip
+    )
+    victim = Victim(
+        direction=Direction.DST, victim_type=IoCType.IP, value="8.8.8.8"
+    )
+
+    attacker_info, victim_info = db.rdb.get_enrichment_info([attacker, victim])
+    assert attacker_info == {
+        "TI": None,
+        "AS": None,
+        "rDNS": None,
+        "SNI": None,
+    }
+    assert victim_info == {
+        "TI": "feed.csv",
+        "AS": {"number": "AS15169", "org": "GOOGLE"},
+        "rDNS": "dns.google",
+        "SNI": "dns.google",
+    }
+
+    # the second lookup should be served from the cache
+    db.rdb.rcache.hdel("IPsInfo", "8.8.8.8")
+    assert db.rdb.get_enrichment_info([victim]) == [victim_info]
+
+
+def test_update_threat_level():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    profileid = "profile_192.168.1.2"
+    db.update_threat_level(profileid, "high", 0.5)
+    db.update_threat_level(profileid, "low", 0.5)
+
+    assert db.r.hget(profileid, "threat_level") == "low"
+    assert db.r.hget(profileid, "max_threat_level") == "high"
+    past_threat_levels = json.loads(db.r.hget(profileid, "past_threat_levels"))
+    assert [tl[0] for tl in past_threat_levels] == ["high", "low"]
+
+
+def test_jarm_hash_cache():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    db.rdb.rcache.delete("jarm_hash_8.8.8.8_443")
+    assert db.get_jarm_hash("8.8.8.8", 443) is None
+
+    db.set_jarm_hash("8.8.8.8", 443, "2ad2ad0002ad2ad", 100)
+    assert db.get_jarm_hash("8.8.8.8", 443) == "2ad2ad0002ad2ad"
+    assert db.get_jarm_hash("8.8.8.8", 8443) is None
+    assert 0 < db.rdb.rcache.ttl("jarm_hash_8.8.8.8_443") <= 100
+
+
+def test_has_cached_ports_info():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    db.rdb.rcache.delete("portinfo", "organization_port")
+    assert not db.has_cached_ports_info()
+
+    db.set_ports_info({"443/tcp": "https"})
+    assert not db.has_cached_ports_info()
+    db.set_organizations_of_ports(
+        {"5222/tcp": {"org_name": ["google"], "ip": [""]}}
+    )
+    assert db.has_cached_ports_info()
+
+
+def test_dns_resolution():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    db.delete_dns_resolution("1.1.1.1")
+    assert db.get_dns_resolution("1.1.1.1") == {}
+
+    db.set_dns_resolution(
+        "example.com",
+        ["1.1.1.1", "example.net"],
+        1.0,
+        "uid1",
+        "A",
+        "192.168.1.1",
+        "timewindow1",
+    )
+    db.set_dns_resolution(
+        "example.org",
+        ["1.1.1.1"],
+        2.0,
+        "uid2",
+        "A",
+        "192.168.1.2",
+        "timewindow1",
+    )
+    db.set_dns_resolution(
+        "example.com",
+        ["1.1.1.1"],
+        3.0,
+        "uid3",
+        "A",
+        "192.168.1.1",
+        "timewindow3",
+    )
+
+    resolution = db.get_dns_resolution("1.1.1.1")
+    assert resolution["ts"] == 3.0
+    assert resolution["uid"] == "uid3"
+    assert resolution["domains"] == ["example.com", "example.org"]
+    assert sorted(resolution["resolved-by"]) == ["192.168.1.1", "192.168.1.2"]
+    assert resolution["timewindows"] == ["timewindow1", "timewindow3"]
+    assert db.get_domains_of_resolved_ip("1.1.1.1") == [
+        "example.com",
+        "example.org",
+    ]
+    assert db.is_ip_resolved_by("1.1.1.1", "192.168.1.2")
+    assert not db.is_ip_resolved_by("1.1.1.1", "192.168.1.3")
+
+    db.delete_dns_resolution("1.1.1.1")
+    assert db.get_dns_resolution("1.1.1.1") == {}
+    assert db.get_domains_of_resolved_ip("1.1.1.1") == []
+
+
+def test_dns_resolution_timewindows_are_bounded():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    db.delete_dns_resolution("1.1.1.1")
+    db.rdb.max_dns_resolution_tws = 3
+    for tw in range(1, 6):
+        db.set_dns_resolution(
+            "example.com",
+            ["1.1.1.1"],
+            float(tw),
+            "uid",
+            "A",
+            "192.168.1.1",
+            f"timewindow{tw}",
+        )
+    assert db.get_dns_resolution("1.1.1.1")["timewindows"] == [
+        "timewindow3",
+        "timewindow4",
+        "timewindow5",
+    ]
+    assert db.rdb.r.ttl("DNSresolution_1.1.1.1_timewindows") > 0
+    db.rdb.width = 3600
+    # resolved in the 24 tws before timewindow20
+    assert db.is_ip_resolved("1.1.1.1", 24, twid="timewindow20")
+    assert not db.is_ip_resolved("1.1.1.1", 24, twid="timewindow40")
+    db.delete_dns_resolution("1.1.1.1")
+
+
+def test_iterate_relabeled_flows_in_chunks(tmp_path):
+    db = ModuleFactory().create_db_manager_obj(
+        6379, output_dir=str(tmp_path), flush_db=True
+    )
+    db.sqlite.add_flow(flow, profileid, twid)
+    db.set_flow_label([flow.uid], "malicious")
+    # the label didn't change
+    db.set_flow_label([flow.uid], "malicious")
+
+    chunks = list(db.iterate_relabeled_flows_in_chunks(0, 10))
+    assert len(chunks) == 1
+    ((relabel_id, rowid, stored_flow, label),) = chunks[0]
+    assert json.loads(stored_flow)["uid"] == flow.uid
+    assert label == "malicious"
+    assert not list(db.iterate_relabeled_flows_in_chunks(relabel_id, 10))
+
+
+def test_archive_closed_tws(tmp_path):
+    db = ModuleFactory().create_db_manager_obj(
+        6379, output_dir=str(tmp_path), flush_db=True
+    )
+    db.archive_tws = True
+    profileid_tw = f"{profileid}_timewindow900"
+    db.r.hset(profileid_tw, "OutTuples", '{"8.8.8.8-53-udp": ["1", []]}')
+    db.r.zadd(f"{profileid_tw}_timeline", {'{"line": 1}': 1.0})
+    db.r.hset(f"{profileid_tw}_evidence", "evidence_id", "{}")
+    db.mark_profile_tw_as_closed(profileid_tw)
+
+    db.archive_closed_tws()
+
+    assert not db.r.exists(
+        profileid_tw, f"{profileid_tw}_timeline", f"{profileid_tw}_evidence"
+    )
+    assert db.is_tw_archived(profileid, "timewindow900")
+    archived = db.get_archived_timewindow(profileid_tw)
+    assert archived["tw"] == {"OutTuples": '{"8.8.8.8-53-udp": ["1", []]}'}
+    assert archived["timeline"] == [['{"line": 1}', 1.0]]
+    assert archived["evidence"] == {"evidence_id": "{}"}
+
+    assert db.get_twid_evidence(profileid, "timewindow900") == {
+        "evidence_id": "{}"
+    }
+    assert not db.is_tw_archived(profileid, "timewindow900")
+    assert not db.get_archived_timewindow(profileid_tw)
+    assert db.get_outtuples_from_profile_tw(profileid, "timewindow900")
+    assert db.r.zcard(f"{profileid_tw}_timeline") == 1
+    # archived again once the modules are done with it
+    assert profileid_tw in db.rdb.get_tws_to_archive()
+
+    db.r.hset(profileid_tw, "Reconnections", "{}")
+    db.archive_closed_tws()
+    archived = db.get_archived_timewindow(profileid_tw)
+    assert set(archived["tw"]) == {"OutTuples", "Reconnections"}
+    assert not db.r.exists(profileid_tw)
+
+
+def test_reopened_tw_is_not_archived(tmp_path):
+    db = ModuleFactory().create_db_manager_obj(
+        6379, output_dir=str(tmp_path), flush_db=True
+    )
+    db.archive_tws = True
+    profileid_tw = f"{profileid}_timewindow901"
+    db.r.hset(profileid_tw, "OutTuples", "{}")
+    db.mark_profile_tw_as_closed(profileid_tw)
+    db.r.zadd("ModifiedTW", {profileid_tw: time.time()})
+
+    db.archive_closed_tws()
+
+    assert db.r.exists(profileid_tw)
+    assert not db.is_tw_archived(profileid, "timewindow901")
+    assert not db.rdb.get_tws_to_archive()
+    assert not db.load_archived_tw(profileid, "timewindow901")
+
+
+def test_reopened_tw_is_restored(tmp_path):
+    db = ModuleFactory().create_db_manager_obj(
+        6379, output_dir=str(tmp_path), flush_db=True
+    )
+    db.archive_tws = True
+    profileid_tw = f"{profileid}_timewindow902"
+    db.r.hset(
+        profileid_tw,
+        mapping={
+            "OutTuples": '{"8.8.8.8-53-udp": ["ab", [1.0, 2.0]]}',
+            "DstIPs": '{"8.8.8.8": 2}',
+        },
+    )
+    db.mark_profile_tw_as_closed(profileid_tw)
+    db.archive_closed_tws()
+    assert db.is_tw_archived(profileid, "timewindow902")
+
+    # a new flow in the archived tw
+    db.r.hset(
+        profileid_tw,
+        mapping={
+            "OutTuples": '{"8.8.8.8-53-udp": ["c", [2.0, 3.0]]}',
+            "DstIPs": '{"8.8.8.8": 1, "1.1.1.1": 1}',
+        },
+    )
+    db.mark_profile_tw_as_modified(profileid, "timewindow902", 0)
+
+    assert not db.is_tw_archived(profileid, "timewindow902")
+    assert not db.get_archived_timewindow(profileid_tw)
+    assert json.loads(
+        db.get_outtuples_from_profile_tw(profileid, "timewindow902")
+    ) == {"8.8.8.8-53-udp": ["abc", [2.0, 3.0]]}
+    assert json.loads(db.r.hget(profileid_tw, "DstIPs")) == {
+        "8.8.8.8": 3,
+        "1.1.1.1": 1,
+    }
+
+
+def test_tw_is_archived_after_modules_process_its_msgs(tmp_path):
+    db = ModuleFactory().create_db_manager_obj(
+        6379, output_dir=str(tmp_path), flush_db=True
+    )
+    db.archive_tws = True
+    # the msgs published by the previous tests
+    db.r.flushdb()
+    db.init_msgs_received_in_channels("Flow Alerts", ["tw_closed", "new_flow"])
+    db.register_module("Flow Alerts")
+    profileid_tw = f"{profileid}_timewindow903"
+    db.r.hset(profileid_tw, "OutTuples", "{}")
+    db.mark_profile_tw_as_closed(profileid_tw)
+
+    # the module didn't process the tw_closed msg yet
+    db.archive_closed_tws()
+    assert db.r.exists(profileid_tw)
+
+    db.incr_msgs_received_in_channel("Flow Alerts", "tw_closed")
+    db.archive_closed_tws()
+    assert not db.r.exists(profileid_tw)
+    assert db.is_tw_archived(profileid, "timewindow903")
+
+
+def test_stopped_modules_dont_delay_archiving(tmp_path):
+    db = ModuleFactory().create_db_manager_obj(
+        6379, output_dir=str(tmp_path), flush_db=True
+    )
+    db.archive_tws = True
+    db.r.flushdb()
+    db.publish("tw_closed", "profile_1.1.1.1_timewindow1")
+    for module in ("Flow Alerts", "Virustotal"):
+        db.init_msgs_received_in_channels(module, ["tw_closed"])
+        db.register_module(module)
+    # msgs published before subscribing never reach the module
+    assert db.get_msgs_received_at_runtime("Virustotal") == {"tw_closed": "1"}
+    profileid_tw = f"{profileid}_timewindow904"
+    db.r.hset(profileid_tw, "OutTuples", "{}")
+    db.mark_profile_tw_as_closed(profileid_tw)
+    db.incr_msgs_received_in_channel("Flow Alerts", "tw_closed")
+
+    # virustotal didn't process the tw_closed msg
+    db.archive_closed_tws()
+    assert db.r.exists(profileid_tw)
+
+    # virustotal stopped
+    db.unregister_module("Virustotal")
+    db.archive_closed_tws()
+    assert db.is_tw_archived(profileid, "timewindow904")
+
+
+class DummyModule(IModule):
+    name = "Dummy"
+    description = "Dummy module"
+    authors = ["Dummy Author"]
+
+    def init(self):
+        self.channels = {"new_flow": Mock(), "tw_closed": Mock()}
+
+    def main(self):
+        pass
+
+
+def create_dummy_module() -> DummyModule:
+    with patch(MODULE_DB_MANAGER):
+        module = DummyModule(Mock(), "dummy_output_dir", 6379, Event())
+    module.print = Mock()
+    return module
+
+
+def test_get_msg_counts_processed_msgs():
+    module = create_dummy_module()
+    module.db.get_message.return_value = {
+        "channel": "new_flow",
+        "data": "{}",
+    }
+    assert module.get_msg("new_flow")
+    # the msg is counted once the module asks for the next one
+    module.db.incr_msgs_received_in_channel.assert_not_called()
+    module.db.get_message.return_value = None
+    assert not module.get_msg("tw_closed")
+    module.db.incr_msgs_received_in_channel.assert_called_once_with(
+        "Dummy", "new_flow"
+    )
+
+
+@pytest.mark.parametrize(
+    "pre_main_error, main_error, expected_registered",
+    [
+        # testcase1: the module stopped in pre_main()
+        (True, None, False),
+        # testcase2: the module crashed in main()
+        (False, ValueError, True),
+    ],
+)
+def test_modules_are_unregistered_when_they_stop(
+    pre_main_error, main_error, expected_registered
+):
+    module = create_dummy_module()
+    module.pre_main = Mock(return_value=pre_main_error)
+    module.main = Mock(side_effect=main_error)
+    module.run()
+    assert module.db.register_module.called == expected_registered
+    assert module.db.unregister_module.called == expected_registered
+
+
+@pytest.mark.parametrize(
+    "published, received, expected_result",
+    [
+        # testcase1: all msgs processed
+        ({"tw_closed": "2"}, {"Flow Alerts": {"tw_closed": "2"}}, True),
+        # testcase2: a module is behind
+        (
+            {"tw_closed": "2", "new_flow": "5"},
+            {
+                "Flow Alerts": {"tw_closed": "2", "new_flow": "4"},
+                "ARP": {"tw_closed": "2"},
+            },
+            False,
+        ),
+        # testcase3: nothing published in the channel of the module
+        ({"tw_closed": "2"}, {"ARP": {"new_arp": "0"}}, True),
+    ],
+)
+def test_were_msgs_processed(published, received, expected_result):
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    assert db.were_msgs_processed(published, received) == expected_result
+
+
+@pytest.mark.parametrize(
+    "field, old, new, expected_merged",
+    [
+        # testcase1: counters are added
+        (
+            "DstIPs",
+            {"8.8.8.8": 2},
+            {"8.8.8.8": 1, "1.1.1.1": 1},
+            {"8.8.8.8": 3, "1.1.1.1": 1},
+        ),
+        # testcase2: the uids are concatenated, the old stime is kept
+        (
+            "DstPortClientTCPEstablished",
+            {"80": {"totalflows": 1, "stime": "1", "uid": ["a"]}},
+            {"80": {"totalflows": 2, "stime": "2", "uid": ["b", "c"]}},
+            {"80": {"totalflows": 3, "stime": "1", "uid": ["a", "b", "c"]}},
+        ),
+        # testcase3: the symbols are concatenated
+        (
+            "OutTuples",
+            {"8.8.8.8-53-udp": ["ab", [1, 2]], "1.1.1.1-53-udp": ["a", []]},
+            {"8.8.8.8-53-udp": ["c", [2, 3]]},
+            {"8.8.8.8-53-udp": ["abc", [2, 3]], "1.1.1.1-53-udp": ["a", []]},
+        ),
+        # testcase4: the reconnections are added
+        (
+            "Reconnections",
+            {"1.1.1.1-8.8.8.8-80": [2, ["a", "b"]]},
+            {"1.1.1.1-8.8.8.8-80": [1, ["c"]]},
+            {"1.1.1.1-8.8.8.8-80": [3, ["a", "b", "c"]]},
+        ),
+    ],
+)
+def test_merge_tw_field(field, old, new, expected_merged):
+    merged = SQLiteDB.merge_tw_field(field, json.dumps(old), json.dumps(new))
+    assert json.loads(merged) == expected_merged
+
+
+def test_set_organizations_of_ports_replaces_old_info():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    db.set_organizations_of_ports(
+        {"53/udp": {"org_name": ["OrgA"], "ip": ["1.1.1.1"]}}
+    )
+    db.set_organizations_of_ports(
+        {"80/tcp": {"org_name": ["OrgB"], "ip": ["2.2.2.2"]}}
+    )
+    assert db.get_organization_of_port("53/udp") is None
+    assert json.loads(db.get_organization_of_port("80/tcp")) == {
+        "org_name": ["OrgB"],
+        "ip": ["2.2.2.2"],
+    }
+
+
+def test_cached_whitelist():
+    db = ModuleFactory().create_db_manager_obj(6379, flush_db=True)
+    whitelists = {
+        "IPs": {"1.1.1.1": {"from": "both", "what_to_ignore": "both"}},
+        "domains": {},
+        "organizations": {},
+        "macs": {},
+    }
+    db.set_whitelists(whitelists)
+    assert db.get_all_whitelist()["IPs"] == whitelists["IPs"]
+
+    # a new run starts with an empty main db
+    db.r.delete("whitelist")
+    assert not db.has_cached_whitelist()
+    assert db.load_cached_whitelist()
+    assert db.get_whitelist("IPs") == whitelists["IPs"]
+
+
+def test_get_unix_socket_dir(tmp_path):
+    with patch("tempfile.gettempdir", return_value=str(tmp_path)):
+        socket_dir = RedisDB.get_unix_socket_dir()
+        # the dir already exists
+        assert RedisDB.get_unix_socket_dir() == socket_dir
+
+        assert os.path.dirname(socket_dir) == str(tmp_path)
+        assert stat.S_IMODE(os.stat(socket_dir).st_mode) == 0o700
+        assert RedisDB.get_unix_socket_path(6379) == os.path.join(
+            socket_dir, "6379.sock"
+        )
+
+        # other users can access it
+        os.chmod(socket_dir, 0o777)
+        assert RedisDB.get_unix_socket_dir() is None
+        assert RedisDB.get_unix_socket_path(6379) is None
+
+        # another user replaced it with a symlink to their own dir
+        os.rmdir(socket_dir)
+        os.symlink(tmp_path, socket_dir)
+        assert RedisDB.get_unix_socket_dir() is None
+
+
+@pytest.mark.parametrize(
+    "use_unix_socket, create_socket, server_port, expected_connection_class",
+    [
+        # testcase1: slips started redis with a socket
+        (True, True, 6379, redis.UnixDomainSocketConnection),
+        # testcase2: the redis server has no socket
+        (True, False, 6379, redis.Connection),
+        # testcase3: the socket was left by a killed redis server
+        (True, True, None, redis.Connection),
+        # testcase4: the socket belongs to a server on another port
+        (True, True, 6380, redis.Connection),
+        # testcase5: unix sockets are disabled in slips.yaml
+        (False, True, 6379, redis.Connection),
+    ],
+)
+def test_connect(
+    tmp_path,
+    use_unix_socket,
+    create_socket,
+    server_port,
+    expected_connection_class,
+):
+    with patch("tempfile.gettempdir", return_value=str(tmp_path)):
+        socket_path = RedisDB.get_unix_socket_path(6379)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if create_socket:
+            server.bind(socket_path)
+
+        if server_port:
+            info = {"redis_mode": "standalone", "tcp_port": server_port}
+            info_patch = patch.object(
+                redis.StrictRedis, "info", return_value=info
+            )
+        else:
+            info_patch = patch.object(
+                redis.StrictRedis,
+                "info",
+                side_effect=redis.exceptions.ConnectionError,
+            )
+
+        with patch.object(
+            RedisDB, "use_unix_socket", use_unix_socket, create=True
+        ), patch.object(
+            RedisDB, "max_connections", 16, create=True
+        ), info_patch:
+            client = RedisDB._connect(6379, 0)
+        server.close()
+
+    pool = client.connection_pool
+    assert pool.connection_class == expected_connection_class
+    assert pool.max_connections == 16
+    assert pool.connection_kwargs["db"] == 0
+    if expected_connection_class == redis.UnixDomainSocketConnection:
+        assert pool.connection_kwargs["path"] == socket_path
+    else:
+        assert pool.connection_kwargs["port"] == 6379
+
+
+def test_is_trusted_unix_socket(tmp_path):
+    socket_path = str(tmp_path / "6379.sock")
+    assert not RedisDB.is_trusted_unix_socket(socket_path)
+
+    # a regular file isn't a socket
+    (tmp_path / "6379.sock").write_text("")
+    assert not RedisDB.is_trusted_unix_socket(socket_path)
+    os.remove(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    assert RedisDB.is_trusted_unix_socket(socket_path)
+    # the socket was created by another user
+    with patch.object(
+        RedisDB, "get_slips_user", return_value=(os.getuid() + 1, 0)
+    ), patch(
+        "slips_files.core.database.redis_db.database.os.lstat",
+        return_value=Mock(st_mode=stat.S_IFSOCK, st_uid=os.getuid() + 2),
+    ):
+        assert not RedisDB.is_trusted_unix_socket(socket_path)
+    server.close()
+
+
+@pytest.mark.parametrize("use_unix_socket", [True, False])
+def test_start_a_redis_server(tmp_path, use_unix_socket):
+    with patch.object(
+        RedisDB, "use_unix_socket", use_unix_socket, create=True
+    ), patch.object(RedisDB, "redis_port", 32768, create=True), patch(
+        "slips_files.core.database.redis_db.database.subprocess.Popen"
+    ) as popen, patch(
+        "tempfile.gettempdir", return_value=str(tmp_path)
+    ):
+        popen.return_value.communicate.return_value = (b"", b"")
+        popen.return_value.returncode = 0
+        assert RedisDB._start_a_redis_server()
+        socket_path = RedisDB.get_unix_socket_path(32768)
+
+    cmd = popen.call_args[0][0]
+    assert "--port 32768" in cmd
+    socket_arg = f"--unixsocket {socket_path} --unixsocketperm 700"
+    assert (socket_arg in cmd) == use_unix_socket
@@ -0,0 +1,94 @@
+import threading
+import time
+from unittest.mock import Mock
+
+from modules.ip_info.enrichment_pool import EnrichmentPool
+
+
+def test_submit_runs_lookup():
+    pool = EnrichmentPool(max_workers=2)
+    lookup = Mock()
+    assert pool.submit("rdns", "1.1.1.1", lookup, "1.1.1.1")
+    pool.wait(timeout=5)
+    lookup.assert_called_once_with("1.1.1.1")
+    assert not pool.is_in_flight("rdns", "1.1.1.1")
+    pool.shutdown()
+
+
+def test_submit_deduplicates_in_flight_lookups():
+    pool = EnrichmentPool(max_workers=2)
+    done = threading.Event()
+    lookup = Mock(side_effect=lambda *_: done.wait(5))
+
+    assert pool.submit("rdns", "1.1.1.1", lookup, "1.1.1.1")
+    assert not pool.submit("rdns", "1.1.1.1", lookup, "1.1.1.1")
+    # other kinds of lookups of the same ip aren't affected
+    assert pool.submit("asn", "1.1.1.1", lookup, "1.1.1.1")
+
+    done.set()
+    pool.wait(timeout=5)
+    assert lookup.call_count == 2
+    # it can be looked up again once it's done
+    assert pool.submit("rdns", "1.1.1.1", lookup, "1.1.1.1")
+    pool.shutdown()
+
+
+def test_concurrency_is_bounded():
+    pool = EnrichmentPool(max_workers=2)
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def lookup():
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    for i in range(6):
+        pool.submit("rdns", i, lookup)
+    pool.wait(timeout=5)
+    assert max_running == 2
+    pool.shutdown()
+
+
+def test_max_pending():
+    pool = EnrichmentPool(max_workers=1, max_pending=2)
+    done = threading.Event()
+    lookup = Mock(side_effect=lambda *_: done.wait(5))
+    assert pool.submit("rdns", 1, lookup)
+    assert pool.submit("rdns", 2, lookup)
+    assert not pool.submit("rdns", 3, lookup)
+    done.set()
+    pool.wait(timeout=5)
+    pool.shutdown()
+
+
+def test_expire_timed_out():
+    pool = EnrichmentPool(max_workers=1, timeouts={"jarm": 0})
+    done = threading.Event()
+    lookup = Mock(side_effect=lambda *_: done.wait(5))
+    pool.submit("jarm", ("1.1.1.1", 443), lookup)
+    time.sleep(0.01)
+
+    assert pool.expire_timed_out() == [("jarm", ("1.1.1.1", 443))]
+    assert not pool.is_in_flight("jarm", ("1.1.1.1", 443))
+    # the timed out lookup can be submitted again
+    assert pool.submit("jarm", ("1.1.1.1", 443), lookup)
+
+    done.set()
+    pool.wait(timeout=5)
+    pool.shutdown()
+
+
+def test_on_error():
+    on_error = Mock()
+    pool = EnrichmentPool(max_workers=1, on_error=on_error)
+    error = ValueError("lookup failed")
+    pool.submit("age", "example.com", Mock(side_effect=error))
+    pool.wait(timeout=5)
+    on_error.assert_called_once_with("age", "example.com", error)
+    pool.shutdown()
@@ -177,7 +177,11 @@ def test_handle_conn(flow):
         ]
     )
     flow_handler.db.add_flow.assert_called_with(
-        flow, flow_handler.profileid, flow_handler.twid, "benign"
+        flow,
+        flow_handler.profileid,
+        flow_handler.twid,
+        "benign",
+        time_read=None,
     )
     flow_handler.db.add_mac_addr_to_profile.assert_called_with(
         flow_handler.profileid, flow.smac
@@ -0,0 +1,212 @@
+"""Unit test for modules/flowmldetection/flowmldetection.py"""
+
+import json
+from unittest.mock import Mock
+import numpy
+import pytest
+
+from tests.module_factory import ModuleFactory
+
+
+def get_flow(proto="tcp", state="Established", sport="49733"):
+    return {
+        "starttime": 1594417039.029793,
+        "uid": "CAeDWs37BipkfP21u8",
+        "saddr": "10.7.10.101",
+        "daddr": "40.70.224.145",
+        "dur": 1.94,
+        "proto": proto,
+        "appproto": "ssl",
+        "sport": sport,
+        "dport": "443",
+        "spkts": 37,
+        "dpkts": 20,
+        "sbytes": 25517,
+        "dbytes": 17247,
+        "smac": "",
+        "dmac": "",
+        "state": state,
+        "history": "",
+        "type_": "conn",
+        "dir_": "->",
+        "allbytes": 42764,
+        "pkts": 57,
+        "label": "",
+        "module_labels": {},
+    }
+
+
+@pytest.mark.parametrize(
+    "proto, expected",
+    [
+        ("tcp", 0.0),
+        ("TCP", 0.0),
+        ("udp", 1.0),
+        ("icmp-ipv6", 2.0),
+        ("sctp", None),
+    ],
+)
+def test_encode_proto(proto, expected):
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    assert flowml.encode_proto(proto) == expected
+
+
+@pytest.mark.parametrize(
+    "state, expected",
+    [
+        ("Established", 1.0),
+        ("NotEstablished", 0.0),
+        ("INT", None),
+    ],
+)
+def test_encode_state(state, expected):
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    assert flowml.encode_state(state) == expected
+
+
+def test_get_flow_features():
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    # dur, proto, sport, dport, spkts, sbytes, state, allbytes, pkts
+    assert flowml.get_flow_features(get_flow()) == [
+        1.94,
+        0.0,
+        49733.0,
+        443.0,
+        37.0,
+        25517.0,
+        1.0,
+        42764.0,
+        57.0,
+    ]
+
+
+def test_get_flow_features_with_invalid_value():
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    assert flowml.get_flow_features(get_flow(sport="")) is None
+
+
+@pytest.mark.parametrize(
+    "flow, expected_batch_len",
+    [
+        (get_flow(), 1),
+        # discarded proto
+        (get_flow(proto="arp"), 0),
+        # unknown proto
+        (get_flow(proto="sctp"), 0),
+    ],
+)
+def test_add_flow_to_batch(flow, expected_batch_len):
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    flowml.add_flow_to_batch(flow, "timewindow1")
+    assert len(flowml.batch) == expected_batch_len
+
+
+def test_is_batch_ready():
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    flowml.batch_size = 2
+    flowml.batch_timeout = 1000
+    assert not flowml.is_batch_ready()
+    flowml.add_flow_to_batch(get_flow(), "timewindow1")
+    assert not flowml.is_batch_ready()
+    flowml.add_flow_to_batch(get_flow(), "timewindow1")
+    assert flowml.is_batch_ready()
+
+
+def test_detect_batch():
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    flowml.scaler = Mock()
+    flowml.scaler.transform.side_effect = lambda x: x
+    flowml.clf = Mock()
+    flowml.clf.predict.return_value = numpy.array(["Malware", "Normal"])
+    flowml.set_evidence_malicious_flow = Mock()
+
+    flowml.add_flow_to_batch(get_flow(), "timewindow1")
+    flowml.add_flow_to_batch(get_flow(), "timewindow2")
+    flowml.detect_batch()
+
+    # the model is called once for the whole batch
+    flowml.clf.predict.assert_called_once()
+    assert flowml.clf.predict.call_args[0][0].shape == (2, 9)
+    flowml.set_evidence_malicious_flow.assert_called_once_with(
+        get_flow(), "timewindow1"
+    )
+    assert flowml.batch == []
+
+
+@pytest.mark.parametrize(
+    "label, expected",
+    [
+        ("normal", "Normal"),
+        ("benign", "Normal"),
+        ("malicious", "Malware"),
+        ("Malware", "Malware"),
+        ("unknown", None),
+        ("", None),
+    ],
+)
+def test_get_training_label(label, expected):
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    assert flowml.get_training_label(label) == expected
+
+
+def test_process_training_chunk():
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    flowml.db.get_final_state_from_flags.return_value = "Established"
+    chunk = [
+        (1, json.dumps(get_flow()), "normal"),
+        (2, json.dumps(get_flow()), "unknown"),
+        (3, json.dumps(get_flow(proto="arp")), "malicious"),
+        (4, json.dumps(get_flow()), "malicious"),
+    ]
+    x_flows, y_flows = flowml.process_training_chunk(chunk)
+    assert x_flows.shape == (2, 9)
+    assert y_flows == ["Normal", "Malware"]
+
+
+def test_train_on_new_flows():
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    flowml.db.get_final_state_from_flags.return_value = "Established"
+    flowml.train = Mock()
+    flowml.store_model = Mock()
+    flowml.db.iterate_flows_in_chunks.return_value = iter(
+        [
+            [(1, json.dumps(get_flow()), "normal")],
+            [(2, json.dumps(get_flow()), "unknown")],
+        ]
+    )
+    flowml.db.iterate_relabeled_flows_in_chunks.return_value = iter([])
+
+    flowml.train_on_new_flows()
+
+    flowml.db.iterate_flows_in_chunks.assert_called_once_with(
+        0, flowml.training_chunk_size
+    )
+    # the second chunk has no labeled flows
+    flowml.train.assert_called_once()
+    # the next training starts after the last flow we read
+    assert flowml.last_trained_rowid == 2
+    # the model was stored less than model_store_interval ago
+    flowml.store_model.assert_not_called()
+
+
+def test_train_on_relabeled_flows():
+    flowml = ModuleFactory().create_flowmldetection_obj()
+    flowml.db.get_final_state_from_flags.return_value = "Established"
+    flowml.train = Mock()
+    flowml.last_trained_rowid = 5
+    flowml.db.iterate_relabeled_flows_in_chunks.return_value = iter(
+        [
+            [
+                (1, 3, json.dumps(get_flow()), "malicious"),
+                # not trained on yet
+                (2, 7, json.dumps(get_flow()), "malicious"),
+            ],
+        ]
+    )
+
+    flowml.train_on_relabeled_flows()
+
+    x_flows, y_flows = flowml.train.call_args[0]
+    assert x_flows.shape[0] == 1
+    assert y_flows == ["Malware"]
+    assert flowml.last_relabel_id == 2
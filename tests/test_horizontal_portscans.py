@@ -482,10 +482,10 @@ def test_get_resolved_ips():
     horizontal_ps = ModuleFactory().create_horizontal_portscan_obj()
     dstips = ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
 
-    horizontal_ps.db.get_dns_resolution.side_effect = [
-        {"domains": ["example.com"]},
-        {"domains": []},
-        {"domains": ["test.com", "another.com"]},
+    horizontal_ps.db.get_domains_of_resolved_ip.side_effect = [
+        ["example.com"],
+        [],
+        ["test.com", "another.com"],
     ]
 
     resolved_ips = horizontal_ps.get_resolved_ips(dstips)
@@ -503,10 +503,10 @@ def test_get_resolved_ips_empty_list():
 def test_get_resolved_ips_invalid_ip():
     horizontal_ps = ModuleFactory().create_horizontal_portscan_obj()
     dstips = ["1.1.1.1", "256.256.256.256", "3.3.3.3"]
-    horizontal_ps.db.get_dns_resolution.side_effect = [
-        {"domains": ["example.com"]},
-        {},
-        {"domains": ["test.com"]},
+    horizontal_ps.db.get_domains_of_resolved_ip.side_effect = [
+        ["example.com"],
+        [],
+        ["test.com"],
     ]
 
     resolved_ips = horizontal_ps.get_resolved_ips(dstips)
@@ -516,10 +516,10 @@ def test_get_resolved_ips_invalid_ip():
 def test_get_resolved_ips_mixed_list():
     horizontal_ps = ModuleFactory().create_horizontal_portscan_obj()
     dstips = ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
-    horizontal_ps.db.get_dns_resolution.side_effect = [
-        {"domains": ["example.com"]},
-        {"domains": []},
-        {"domains": ["test.com"]},
+    horizontal_ps.db.get_domains_of_resolved_ip.side_effect = [
+        ["example.com"],
+        [],
+        ["test.com"],
     ]
     resolved_ips = horizontal_ps.get_resolved_ips(dstips)
     assert sorted(resolved_ips) == ["1.1.1.1", "3.3.3.3"]
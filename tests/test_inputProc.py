@@ -112,6 +112,50 @@ def test_cache_nxt_line_in_file(path: str, is_tabs: str, line_cached: bool):
         assert input.cache_lines[path]["data"]
 
 
+def test_read_new_lines(tmp_path):
+    log_file = tmp_path / "conn.log"
+    log_file.write_text('{"ts": 1}\n{"ts": 2}\n{"ts"')
+    path = str(log_file)
+    input = ModuleFactory().create_input_obj(path, "zeek_log_file")
+    input.open_file_handlers = {}
+
+    assert list(input.read_new_lines(path)) == ['{"ts": 1}\n', '{"ts": 2}\n']
+    # the file is drained, it's not read until zeek writes to it
+    assert path in input.drained_files
+    with open(path, "a") as f:
+        f.write(': 3}\n{"ts": 4}')
+    assert not input.read_new_lines(path)
+
+    input.on_zeek_file_change(path)
+    input.handle_zeek_file_changes()
+    assert list(input.read_new_lines(path)) == ['{"ts": 3}\n']
+
+    # zeek didn't write anything else, the partial line is complete
+    input.handle_zeek_file_changes(timeout=0.01)
+    assert list(input.read_new_lines(path)) == ['{"ts": 4}']
+
+
+def test_handle_zeek_file_changes():
+    input = ModuleFactory().create_input_obj("", "zeek_folder")
+    input.db.get_all_zeek_files.return_value = {"conn.log", "dns.log"}
+    input.drained_files = {"conn.log", "dns.log"}
+
+    # nothing changed
+    input.handle_zeek_file_changes()
+    assert input.drained_files == {"conn.log", "dns.log"}
+    input.db.get_all_zeek_files.assert_not_called()
+
+    input.on_zeek_file_change("dns.log")
+    input.handle_zeek_file_changes(timeout=1)
+    assert input.drained_files == {"conn.log"}
+    assert not input.zeek_files_changed.is_set()
+    assert input.zeek_files == {"conn.log", "dns.log"}
+
+    # the timeout is over without changes, all files are read again
+    input.handle_zeek_file_changes(timeout=0.01)
+    assert input.drained_files == set()
+
+
 @pytest.mark.parametrize(
     "path, is_tabs, zeek_line, expected_val",
     [
@@ -189,6 +233,63 @@ def test_handle_nfdump(path):
     assert input.handle_nfdump() is True
 
 
+def test_read_nfdump_output():
+    input = ModuleFactory().create_input_obj("", "nfdump")
+    input.testing = False
+    input.give_profiler = Mock()
+    nfdump_output = iter(["line1,a\n", "line2,b\n"])
+
+    assert input.read_nfdump_output(nfdump_output) == 2
+    input.give_profiler.assert_called_once_with(
+        {"type": "nfdump", "data": ["line1,a", "line2,b"]}
+    )
+
+
+@pytest.mark.parametrize(
+    "nfdump_stats, expected_flows_number",
+    [
+        # testcase1: the total is read, not the flows per protocol
+        ("Ident: none\nFlows: 120\nFlows_tcp: 100\n", 120),
+        # testcase2: the file has no stats
+        ("", None),
+        # testcase3: invalid number of flows
+        ("Flows: unknown\n", None),
+    ],
+)
+def test_get_nfdump_flows_number(nfdump_stats, expected_flows_number):
+    input = ModuleFactory().create_input_obj("file.nfdump", "nfdump")
+    with patch("subprocess.run") as run:
+        run.return_value.stdout = nfdump_stats
+        assert input.get_nfdump_flows_number() == expected_flows_number
+
+
+@pytest.mark.parametrize(
+    "flows_in_stats, expected_total_flows",
+    [
+        # testcase1: the total is read from the stats of the file
+        (120, 120),
+        # testcase2: the file has no stats, the flows are counted first
+        (None, 2),
+    ],
+)
+def test_handle_nfdump_total_flows(flows_in_stats, expected_total_flows):
+    input = ModuleFactory().create_input_obj("file.nfdump", "nfdump")
+    input.testing = True
+    input.get_nfdump_flows_number = Mock(return_value=flows_in_stats)
+    input.read_nfdump_output = Mock(return_value=1)
+    input.print_lines_read = Mock()
+    input.is_done_processing = Mock()
+    with patch("subprocess.Popen") as popen:
+        nfdump = popen.return_value.__enter__.return_value
+        nfdump.stdout = iter(["line1,a\n", "line2,b\n"])
+        assert input.handle_nfdump() is True
+
+    assert input.total_flows == expected_total_flows
+    input.db.set_input_metadata.assert_called_once_with(
+        {"total_flows": expected_total_flows}
+    )
+
+
 def test_get_earliest_line():
     input = ModuleFactory().create_input_obj("", "zeek_log_file")
     input.file_time = {
@@ -545,3 +646,75 @@ def test__make_gen(data, expected_chunks):
     gen = input_process._make_gen(reader)
     for expected_chunk in expected_chunks:
         assert next(gen) == expected_chunk
+
+
+def test_split_pcap():
+    input = ModuleFactory().create_input_obj(
+        "dataset/test8-malicious.pcap", "pcap"
+    )
+    input.zeek_workers = 3
+    shards = input.split_pcap()
+
+    assert shards == [
+        os.path.join(input.zeek_dir, f"shard_{shard}", "shard.pcap")
+        for shard in range(3)
+    ]
+    assert all(os.path.exists(shard) for shard in shards)
+    shutil.rmtree(input.zeek_dir)
+
+
+def test_split_pcap_unsupported_file():
+    input = ModuleFactory().create_input_obj(
+        "dataset/test6-malicious.suricata.json", "pcap"
+    )
+    input.zeek_workers = 3
+    assert input.split_pcap() == []
+
+
+def test_start_zeek_with_shards():
+    input = ModuleFactory().create_input_obj(
+        "dataset/test7-malicious.pcap", "pcap"
+    )
+    input.zeek_workers = 2
+    shards = ["zeek_dir/shard_0/shard.pcap", "zeek_dir/shard_1/shard.pcap"]
+    input.zeek_thread = Mock()
+    with (
+        patch.object(input, "split_pcap", return_value=shards),
+        patch.object(input, "run_zeek") as run_zeek,
+        patch("os.remove"),
+    ):
+        zeek_dirs = input.start_zeek()
+        for thread in input.zeek_threads:
+            thread.join()
+
+    assert zeek_dirs == ["zeek_dir/shard_0", "zeek_dir/shard_1"]
+    input.zeek_thread.start.assert_not_called()
+    run_zeek.assert_any_call(
+        pcap=shards[1],
+        zeek_dir="zeek_dir/shard_1",
+        process_name="Zeek shard 1",
+    )
+    assert run_zeek.call_count == 2
+
+
+def test_start_zeek_one_worker():
+    input = ModuleFactory().create_input_obj(
+        "dataset/test7-malicious.pcap", "pcap"
+    )
+    input.zeek_workers = 1
+    input.zeek_thread = Mock()
+    with patch.object(input, "split_pcap") as split_pcap:
+        assert input.start_zeek() == [input.zeek_dir]
+    split_pcap.assert_not_called()
+    input.zeek_thread.start.assert_called_once()
+
+
+@pytest.mark.parametrize("pipeline_metrics_enable", [True, False])
+def test_give_profiler_time_read(pipeline_metrics_enable):
+    input_process = ModuleFactory().create_input_obj("", "zeek_log_file")
+    input_process.pipeline_metrics = (
+        Mock() if pipeline_metrics_enable else None
+    )
+    input_process.give_profiler({"type": "conn", "data": "line"})
+    line_sent = input_process.profiler_queue.get()
+    assert ("time_read" in line_sent) == pipeline_metrics_enable
@@ -7,7 +7,10 @@ from unittest.mock import Mock, patch
 import json
 import requests
 import socket
+import threading
+import time
 import subprocess
+from modules.ip_info.jarm import JARM
 from slips_files.core.structures.evidence import (
     ThreatLevel,
     Evidence,
@@ -139,6 +142,61 @@ def test_get_vendor_broadcast_mac(
     ip_info.db.set_mac_vendor_to_profile.assert_not_called()
 
 
+MAC_DB = (
+    '{"macPrefix":"00:00:0C","vendorName":"Cisco Systems, Inc",'
+    '"private":false,"blockType":"MA-L","lastUpdate":"2015/11/17"}\n'
+    '{"macPrefix":"70:B3:D5","vendorName":"IEEE Registration Authority",'
+    '"private":false,"blockType":"MA-L","lastUpdate":"2016/02/29"}\n'
+    '{"macPrefix":"70:B3:D5:F2:F","vendorName":"Tele Radio AB",'
+    '"private":false,"blockType":"MA-S","lastUpdate":"2018/02/13"}\n'
+)
+
+
+@pytest.mark.parametrize(
+    "mac_addr, expected_vendor",
+    [
+        # testcase1: OUI match
+        ("00:00:0c:12:34:56", "Cisco Systems, Inc"),
+        # testcase2: the longer MA-S prefix wins over the OUI
+        ("70:b3:d5:f2:f1:23", "Tele Radio AB"),
+        # testcase3: OUI of the MA-S block
+        ("70:b3:d5:00:01:23", "IEEE Registration Authority"),
+        # testcase4: unknown vendor
+        ("aa:bb:cc:dd:ee:ff", False),
+    ],
+)
+def test_get_vendor_offline(tmp_path, mac_addr, expected_vendor):
+    ip_info = ModuleFactory().create_ip_info_obj()
+    mac_db = tmp_path / "macaddress-db.json"
+    mac_db.write_text(MAC_DB)
+    ip_info.mac_db_path = str(mac_db)
+    assert ip_info.load_mac_db()
+    assert ip_info.get_vendor_offline(mac_addr, "profile_1") == expected_vendor
+
+
+def test_get_vendor_offline_reloads_updated_mac_db(tmp_path):
+    ip_info = ModuleFactory().create_ip_info_obj()
+    mac_db = tmp_path / "macaddress-db.json"
+    mac_db.write_text(MAC_DB)
+    ip_info.mac_db_path = str(mac_db)
+    ip_info.load_mac_db()
+
+    mac_db.write_text(
+        '{"macPrefix":"AA:BB:CC","vendorName":"New Vendor",'
+        '"private":false,"blockType":"MA-L","lastUpdate":"2024/01/01"}\n'
+    )
+    # make sure the mtime changes
+    ip_info.mac_db_mtime -= 1
+    assert ip_info.get_vendor_offline("aa:bb:cc:dd:ee:ff", "") == "New Vendor"
+
+
+def test_load_mac_db_missing_file(tmp_path):
+    ip_info = ModuleFactory().create_ip_info_obj()
+    ip_info.mac_db_path = str(tmp_path / "macaddress-db.json")
+    assert not ip_info.load_mac_db()
+    assert not hasattr(ip_info, "mac_db")
+
+
 def test_get_age_no_creation_date():
     domain = "example.com"
     ip_info = ModuleFactory().create_ip_info_obj()
@@ -377,16 +435,13 @@ def test_shutdown_gracefully(
 
     mock_asn_db = mocker.Mock()
     mock_country_db = mocker.Mock()
-    mock_mac_db = mocker.Mock()
 
     ip_info.asn_db = mock_asn_db
     ip_info.country_db = mock_country_db
-    ip_info.mac_db = mock_mac_db
 
     ip_info.shutdown_gracefully()
     mock_asn_db.close.assert_called_once()
     mock_country_db.close.assert_called_once()
-    mock_mac_db.close.assert_called_once()
 
 
 @pytest.mark.parametrize(
@@ -449,6 +504,7 @@ def test_handle_new_ip(mocker, ip, is_multicast, cached_info, expected_calls):
 
     mocker.patch.object(ip_info.asn, "update_asn", return_value=True)
     ip_info.handle_new_ip(ip)
+    ip_info.enrichment_pool.wait(timeout=5)
     assert mock_get_geocountry.call_count == expected_calls.get(
         "get_geocountry", 0
     )
@@ -640,3 +696,98 @@ def test_get_gateway_mac_ip_command_failure(
 def test_get_ip_family(ip_address, expected_family):
     ip_info = ModuleFactory().create_ip_info_obj()
     assert ip_info.get_ip_family(ip_address) == expected_family
+
+
+def test_handle_new_ip_doesnt_wait_for_slow_lookups(mocker):
+    ip_info = ModuleFactory().create_ip_info_obj()
+    ip_info.db.get_ip_info.return_value = {"geocountry": "USA"}
+    mocker.patch.object(ip_info.asn, "update_asn", return_value=False)
+    resolver_done = threading.Event()
+
+    def slow_resolver(ip):
+        resolver_done.wait(5)
+        raise socket.herror
+
+    mocker.patch("socket.gethostbyaddr", side_effect=slow_resolver)
+    start = time.time()
+    ip_info.handle_new_ip("8.8.8.8")
+    # the same ip is only looked up once while the lookup is running
+    ip_info.handle_new_ip("8.8.8.8")
+    assert time.time() - start < 1
+    assert ip_info.enrichment_pool.is_in_flight("rdns", "8.8.8.8")
+
+    resolver_done.set()
+    ip_info.enrichment_pool.wait(timeout=5)
+    assert not ip_info.enrichment_pool.is_in_flight("rdns", "8.8.8.8")
+    ip_info.enrichment_pool.shutdown()
+
+
+def test_check_jarm_hash_with_stub_tls_server(mocker):
+    ip_info = ModuleFactory().create_ip_info_obj()
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(10)
+    port = server.getsockname()[1]
+
+    def serve():
+        # reply to each client hello with an alert
+        for _ in range(10):
+            conn, _ = server.accept()
+            conn.recv(1484)
+            conn.sendall(b"\x15\x03\x03\x00\x02\x02\x28")
+            conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ip_info.db.get_jarm_hash.return_value = None
+    ip_info.db.is_blacklisted_jarm.return_value = True
+    mock_set_evidence = mocker.patch.object(
+        ip_info, "set_evidence_malicious_jarm_hash"
+    )
+    flow = {"daddr": "127.0.0.1", "dport": port}
+
+    ip_info.enrichment_pool.submit(
+        "jarm", ("127.0.0.1", port), ip_info.check_jarm_hash, flow, "tw1"
+    )
+    ip_info.enrichment_pool.wait(timeout=10)
+    server.close()
+
+    # the server replied to all the client hellos with alerts
+    jarm_hash = ip_info.db.is_blacklisted_jarm.call_args[0][0]
+    assert jarm_hash == JARM.empty_hash
+    mock_set_evidence.assert_called_once_with(flow, "tw1")
+    ip_info.db.set_jarm_hash.assert_called_once_with(
+        "127.0.0.1", port, jarm_hash, ip_info.failed_jarm_cache_ttl
+    )
+
+
+def test_check_jarm_hash_cached(mocker):
+    ip_info = ModuleFactory().create_ip_info_obj()
+    ip_info.db.get_jarm_hash.return_value = "2ad2ad0002ad2ad"
+    ip_info.db.is_blacklisted_jarm.return_value = False
+    mock_jarm_hash = mocker.patch.object(ip_info.JARM, "JARM_hash")
+
+    ip_info.check_jarm_hash({"daddr": "8.8.8.8", "dport": 443}, "tw1")
+    mock_jarm_hash.assert_not_called()
+    ip_info.db.set_jarm_hash.assert_not_called()
+    ip_info.db.is_blacklisted_jarm.assert_called_once_with("2ad2ad0002ad2ad")
+
+
+@pytest.mark.parametrize(
+    "jarm_hash, expected_ttl",
+    [
+        # testcase1: the target replied to the probes
+        ("2ad2ad0002ad2ad", 86400),
+        # testcase2: the probes failed or timed out
+        ("0" * 62, 600),
+    ],
+)
+def test_check_jarm_hash_cache_ttl(mocker, jarm_hash, expected_ttl):
+    ip_info = ModuleFactory().create_ip_info_obj()
+    ip_info.db.get_jarm_hash.return_value = None
+    ip_info.db.is_blacklisted_jarm.return_value = False
+    mocker.patch.object(ip_info.JARM, "JARM_hash", return_value=jarm_hash)
+
+    ip_info.check_jarm_hash({"daddr": "8.8.8.8", "dport": 443}, "tw1")
+    ip_info.db.set_jarm_hash.assert_called_once_with(
+        "8.8.8.8", 443, jarm_hash, expected_ttl
+    )
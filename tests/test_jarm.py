@@ -0,0 +1,51 @@
+import socket
+import threading
+import time
+
+from modules.ip_info.jarm import JARM
+
+
+def start_stub_tls_server(hello_delay: float = 0):
+    """
+    starts a server that replies to each client hello with a TLS alert
+    :return: the port of the server
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(20)
+
+    def reply(conn):
+        conn.recv(1484)
+        time.sleep(hello_delay)
+        conn.sendall(b"\x15\x03\x03\x00\x02\x02\x28")
+        conn.close()
+
+    def serve():
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=reply, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def test_jarm_hash_of_stub_tls_server():
+    port = start_stub_tls_server()
+    # every hello was rejected
+    assert JARM().JARM_hash("127.0.0.1", port) == "0" * 62
+
+
+def test_jarm_hash_sends_hellos_concurrently():
+    port = start_stub_tls_server(hello_delay=0.3)
+    start = time.time()
+    JARM().JARM_hash("127.0.0.1", port)
+    # the 10 hellos would take 3s if sent one after the other
+    assert time.time() - start < 2
+
+
+def test_jarm_hash_shared_deadline(mocker):
+    port = start_stub_tls_server(hello_delay=5)
+    mocker.patch.object(JARM, "timeout", 0.5)
+    start = time.time()
+    assert JARM().JARM_hash("127.0.0.1", port) == "0" * 62
+    assert time.time() - start < 2
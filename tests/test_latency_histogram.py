@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from slips_files.common.performance_profilers.latency_histogram import (
+    LatencyHistogram,
+)
+
+
+@pytest.mark.parametrize(
+    "latencies, percentile, expected_value",
+    [
+        # testcase1: all latencies are the same
+        ([0.005] * 100, 50, 0.005),
+        # testcase2: p50 of 1ms..100ms
+        ([i / 1000 for i in range(1, 101)], 50, 0.05),
+        # testcase3: p99 of 1ms..100ms
+        ([i / 1000 for i in range(1, 101)], 99, 0.099),
+        # testcase4: latency smaller than the min latency
+        ([1e-9], 50, 1e-9),
+    ],
+)
+def test_percentile(latencies, percentile, expected_value):
+    histogram = LatencyHistogram()
+    for latency in latencies:
+        histogram.add(latency)
+    # the error is less than 1/buckets_per_doubling
+    assert histogram.percentile(percentile) == pytest.approx(
+        expected_value, rel=1 / histogram.buckets_per_doubling
+    )
+    assert histogram.percentile(percentile) >= expected_value
+
+
+def test_percentile_no_latencies():
+    assert LatencyHistogram().percentile(99) == 0
+
+
+def test_add_latency_bigger_than_max_latency():
+    histogram = LatencyHistogram(max_latency=1)
+    histogram.add(10)
+    assert histogram.count == 1
+    assert histogram.percentile(50) == 10
+
+
+def test_merge():
+    histogram = LatencyHistogram()
+    histogram.add(0.001, count=99)
+    other = LatencyHistogram()
+    other.add(1)
+
+    histogram.merge(other)
+
+    assert histogram.count == 100
+    assert histogram.max == 1
+    assert histogram.percentile(100) == 1
+    assert histogram.percentile(50) == pytest.approx(0.001, rel=0.1)
+
+
+def test_summary():
+    histogram = LatencyHistogram()
+    histogram.add(0.002, count=3)
+    summary = histogram.summary()
+    assert summary["count"] == 3
+    assert summary["mean"] == pytest.approx(0.002)
+    assert summary["max"] == 0.002
+    assert summary["p99"] == 0.002
+
+
+def test_to_dict_and_from_dict():
+    histogram = LatencyHistogram(max_latency=10)
+    histogram.add(0.003, count=2)
+    histogram.add(5)
+
+    serialized = json.loads(json.dumps(histogram.to_dict()))
+    restored = LatencyHistogram.from_dict(serialized)
+
+    assert restored.buckets == histogram.buckets
+    assert restored.max_latency == 10
+    assert restored.summary() == histogram.summary()
+
+
+def test_get_period():
+    histogram = LatencyHistogram()
+    histogram.add(0.5)
+    assert histogram.get_period() == 0
+
+    histogram.add(2, timestamp=102)
+    histogram.add(1, timestamp=110)
+    other = LatencyHistogram()
+    other.add(0.5, timestamp=120)
+    histogram.merge(other)
+
+    assert histogram.first == 100
+    assert histogram.last == 120
+    assert histogram.get_period() == 20
+    restored = LatencyHistogram.from_dict(
+        json.loads(json.dumps(histogram.to_dict()))
+    )
+    assert restored.get_period() == 20
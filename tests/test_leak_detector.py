@@ -3,10 +3,13 @@
 from tests.module_factory import ModuleFactory
 from unittest import mock
 import pytest
-from unittest.mock import patch, mock_open
-import json
+from unittest.mock import patch
+import socket
+import struct
 from unittest.mock import MagicMock
 
+from modules.leak_detector.pcap_index import PcapIndex
+
 
 @pytest.mark.parametrize(
     "return_code, expected_result",
@@ -76,51 +79,6 @@ def test_main(mock_db):
     assert result == 1
 
 
-@pytest.mark.parametrize(
-    "input_json, mock_json_loads_return, " "expected_output",
-    [
-        (
-            # Testcase1: Valid JSON with extra characters
-            '{"some": "data"}Killed',
-            {"some": "data"},
-            {"some": "data"},
-        ),
-        (
-            # Testcase2: Valid JSON without extra characters
-            '{"some": "data"}',
-            {"some": "data"},
-            {"some": "data"},
-        ),
-        (
-            # Testcase3: Invalid JSON, JSONDecodeError raised
-            "Invalid JSON",
-            json.JSONDecodeError("Expecting ',' delimiter", "", 0),
-            False,
-        ),
-    ],
-)
-@patch("json.loads")
-def test_fix_json_packet(
-    mock_json_loads,
-    mock_db,
-    input_json,
-    mock_json_loads_return,
-    expected_output,
-):
-    """Tests the fix_json_packet method of LeakDetector."""
-
-    mock_json_loads.side_effect = (
-        mock_json_loads_return
-        if isinstance(mock_json_loads_return, Exception)
-        else lambda x: mock_json_loads_return
-    )
-
-    leak_detector = ModuleFactory().create_leak_detector_obj()
-    result = leak_detector.fix_json_packet(input_json)
-
-    assert result == expected_output
-
-
 @pytest.mark.parametrize(
     "listdir_return, popen_communicate_return, " "evidence_set_call_count",
     [
@@ -144,11 +102,13 @@ def test_fix_json_packet(
         ),
     ],
 )
+@mock.patch("time.sleep")
 @mock.patch("subprocess.Popen")
 @mock.patch("os.listdir")
 def test_find_matches(
     mock_listdir,
     mock_popen,
+    mock_sleep,
     listdir_return,
     popen_communicate_return,
     evidence_set_call_count,
@@ -172,72 +132,121 @@ def test_find_matches(
     )
 
 
-@pytest.mark.parametrize(
-    "pcap_data, offset, tshark_output, expected_result",
-    [
+def create_pcap(path, packets, linktype=1):
+    """writes the given packets to a little endian pcap"""
+    with open(path, "wb") as pcap:
+        pcap.write(
+            struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, linktype)
+        )
+        for ts, packet in packets:
+            pcap.write(
+                struct.pack("<IIII", ts, 500000, len(packet), len(packet))
+            )
+            pcap.write(packet)
+
+
+def ethernet_ipv4_packet(srcip, dstip, proto, sport, dport, payload):
+    ethernet = b"\x00" * 12 + struct.pack("!H", 0x0800)
+    ip = (
+        struct.pack(
+            "!BBHHHBBH", 0x45, 0, 20 + 8 + len(payload), 0, 0, 64, proto, 0
+        )
+        + socket.inet_aton(srcip)
+        + socket.inet_aton(dstip)
+    )
+    return ethernet + ip + struct.pack("!HHHH", sport, dport, 0, 0) + payload
+
+
+def ethernet_ipv6_packet(srcip, dstip, proto, sport, dport):
+    ethernet = b"\x00" * 12 + struct.pack("!H", 0x86DD)
+    # hop by hop extension header before the transport header
+    ip = (
+        struct.pack("!IHBB", 0x60000000, 16, 0, 64)
+        + socket.inet_pton(socket.AF_INET6, srcip)
+        + socket.inet_pton(socket.AF_INET6, dstip)
+        + struct.pack("!BB6x", proto, 0)
+    )
+    return ethernet + ip + struct.pack("!HHHH", sport, dport, 0, 0)
+
+
+def test_get_packet_info(tmp_path):
+    """Tests the get_packet_info method of LeakDetector."""
+    pcap = str(tmp_path / "test.pcap")
+    packets = [
         (
-            # Testcase1: Packet found successfully
-            b"\x00" * 24 + b"\x00" * 16 + b"\x00\x00\x00\x14" + b"\x00" * 20,
-            25,
-            json.dumps(
-                [
-                    {
-                        "_source": {
-                            "layers": {
-                                "frame": {
-                                    "frame.protocols": "ip:ipv4:ip:tcp",
-                                    "frame.time_epoch": 1669852800,
-                                },
-                                "ip": {
-                                    "ip.src": "10.0.0.1",
-                                    "ip.dst": "10.0.0.2",
-                                },
-                                "tcp": {
-                                    "tcp.srcport": "80",
-                                    "tcp.dstport": "443",
-                                },
-                            }
-                        }
-                    }
-                ]
-            ).encode(),
-            ("10.0.0.1", "10.0.0.2", "tcp", "80", "443", 1669852800),
+            1669852800,
+            ethernet_ipv4_packet(
+                "10.0.0.1", "10.0.0.2", 6, 80, 443, b"ll=1.0,2.0"
+            ),
         ),
         (
-            # Testcase3: Error during tshark execution
-            b"\x00" * 24 + b"\x00" * 16 + b"\x00\x00\x00\x14" + b"\x00" * 20,
-            25,
-            b"",
-            None,
+            1669852801,
+            ethernet_ipv4_packet("10.0.0.3", "8.8.8.8", 17, 5353, 53, b""),
         ),
-    ],
-)
-def test_get_packet_info(
-    mock_db,
-    pcap_data,
-    offset,
-    tshark_output,
-    expected_result,
-):
-    """Tests the get_packet_info method of LeakDetector."""
+        # icmp
+        (
+            1669852802,
+            ethernet_ipv4_packet("10.0.0.3", "8.8.8.8", 1, 0, 0, b""),
+        ),
+        (
+            1669852803,
+            ethernet_ipv6_packet("fe80::1", "2001:db8::1", 6, 1234, 80),
+        ),
+    ]
+    create_pcap(pcap, packets)
+    leak_detector = ModuleFactory().create_leak_detector_obj()
+    leak_detector.pcap = pcap
+    # offsets of the first byte of each packet's data
+    first_packet = 24 + 16
+    second_packet = first_packet + len(packets[0][1]) + 16
+    third_packet = second_packet + len(packets[1][1]) + 16
+    fourth_packet = third_packet + len(packets[2][1]) + 16
+
+    assert leak_detector.get_packet_info(first_packet + 50) == (
+        "10.0.0.1",
+        "10.0.0.2",
+        "tcp",
+        80,
+        443,
+        1669852800.5,
+    )
+    assert leak_detector.get_packet_info(second_packet) == (
+        "10.0.0.3",
+        "8.8.8.8",
+        "udp",
+        5353,
+        53,
+        1669852801.5,
+    )
+    assert leak_detector.get_packet_info(third_packet) is None
+    assert leak_detector.get_packet_info(fourth_packet) == (
+        "fe80::1",
+        "2001:db8::1",
+        "tcp",
+        1234,
+        80,
+        1669852803.5,
+    )
+    # the pcap header isn't part of any packet
+    assert leak_detector.get_packet_info(10) is None
 
+
+def test_resolve_offsets_reads_the_pcap_once(tmp_path):
+    pcap = str(tmp_path / "test.pcap")
+    packet = ethernet_ipv4_packet("10.0.0.1", "10.0.0.2", 6, 80, 443, b"")
+    create_pcap(pcap, [(1669852800, packet)] * 100)
     leak_detector = ModuleFactory().create_leak_detector_obj()
-    leak_detector.fix_json_packet = MagicMock()
-    with patch(
-        "builtins.open", mock_open(read_data=pcap_data)
-    ) as mock_file, patch("subprocess.Popen") as mock_popen:
-        mock_file.return_value.tell.side_effect = [
-            24,
-            100,
-        ]
-
-        mock_popen.return_value.communicate.return_value = (
-            tshark_output,
-            None,
-        )
+    leak_detector.pcap = pcap
 
-        result = leak_detector.get_packet_info(offset)
-        assert result == expected_result
+    with patch(
+        "modules.leak_detector.leak_detector.PcapIndex",
+        wraps=PcapIndex,
+    ) as mock_index:
+        offsets = [24 + i * (16 + len(packet)) + 20 for i in range(100)]
+        leak_detector.resolve_offsets(offsets)
+        for offset in offsets:
+            assert leak_detector.get_packet_info(offset)[0] == "10.0.0.1"
+        mock_index.assert_called_once_with(pcap)
 
 
 @pytest.mark.parametrize(
@@ -320,3 +329,39 @@ def test_set_evidence_yara_match(
     )
 
     assert mock_set_evidence.call_count == expected_call_count
+
+
+def test_find_matches_in_process(tmp_path, mock_db):
+    pytest.importorskip("yara")
+    pcap = str(tmp_path / "test.pcap")
+    leak = b"GET /?lat=50.0755381&lon=14.4378005 HTTP/1.1"
+    packet = ethernet_ipv4_packet("10.0.0.1", "10.0.0.2", 6, 80, 443, leak)
+    create_pcap(pcap, [(1669852800, packet)])
+    leak_detector = ModuleFactory().create_leak_detector_obj()
+    leak_detector.pcap = pcap
+    leak_detector.yara_rules_path = "modules/leak_detector/yara_rules/rules/"
+
+    assert leak_detector.compile_and_save_rules()
+    matches = leak_detector.find_matches_in_process()
+
+    assert {match["vars_matched"] for match in matches} == {
+        "rgx_gps_lat",
+        "rgx_gps_lon",
+    }
+    for match in matches:
+        assert match["rule"] == "NETWORK_gps_location_leaked"
+        assert leak_detector.get_packet_info(match["offset"])[:2] == (
+            "10.0.0.1",
+            "10.0.0.2",
+        )
+    lat = next(m for m in matches if m["vars_matched"] == "rgx_gps_lat")
+    assert lat["strings_matched"] == "lat=50.0755381"
+
+
+def test_compile_rules_error(tmp_path, mock_db):
+    pytest.importorskip("yara")
+    (tmp_path / "bad.yara").write_text("rule bad { condition: }")
+    leak_detector = ModuleFactory().create_leak_detector_obj()
+    leak_detector.yara_rules_path = str(tmp_path)
+    assert not leak_detector.compile_rules()
+    assert leak_detector.rules is None
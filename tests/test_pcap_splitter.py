@@ -0,0 +1,183 @@
+import os
+import struct
+from collections import defaultdict
+
+import pytest
+from tests.module_factory import ModuleFactory
+
+
+def ethernet(ethertype: int, payload: bytes) -> bytes:
+    return b"\x00" * 12 + struct.pack("!H", ethertype) + payload
+
+
+def ipv4(
+    src: bytes, dst: bytes, proto: int, payload: bytes, frag: int = 0
+) -> bytes:
+    return (
+        struct.pack(
+            "!BBHHHBBH", 0x45, 0, 20 + len(payload), 1, frag, 64, proto, 0
+        )
+        + src
+        + dst
+        + payload
+    )
+
+
+def tcp(sport: int, dport: int) -> bytes:
+    return struct.pack("!HH", sport, dport) + b"\x00" * 16
+
+
+def read_shards(splitter, shards):
+    packets = []
+    for shard in shards:
+        with open(shard, "rb") as pcap:
+            packets.append(list(splitter.read_packets(pcap)))
+    return packets
+
+
+@pytest.mark.parametrize(
+    "pcap",
+    [
+        "dataset/test7-malicious.pcap",
+        "dataset/test8-malicious.pcap",
+        "dataset/test12-icmp-portscan.pcap",
+    ],
+)
+def test_split(pcap, tmp_path):
+    splitter = ModuleFactory().create_pcap_splitter_obj(pcap)
+    shards = [os.path.join(tmp_path, f"shard_{i}.pcap") for i in range(4)]
+    assert splitter.split(shards) is True
+
+    with open(pcap, "rb") as original:
+        global_header = original.read(24)
+        original_packets = list(splitter.read_packets(original))
+
+    for shard in shards:
+        with open(shard, "rb") as f:
+            assert f.read(24) == global_header
+
+    shard_packets = read_shards(splitter, shards)
+    # no packet is lost or duplicated
+    assert sum(len(packets) for packets in shard_packets) == len(
+        original_packets
+    )
+    # each shard keeps the order of the original pcap
+    for packets in shard_packets:
+        remaining = iter(original_packets)
+        assert all(packet in remaining for packet in packets)
+
+    # each connection is in 1 shard only
+    shards_of_flow = defaultdict(set)
+    for shard, packets in enumerate(shard_packets):
+        for _, packet in packets:
+            shards_of_flow[splitter.get_flow_key(packet)].add(shard)
+    assert all(len(shards) == 1 for shards in shards_of_flow.values())
+
+
+def test_get_flow_key_is_symmetric():
+    splitter = ModuleFactory().create_pcap_splitter_obj("")
+    splitter.linktype = 1
+    src, dst = bytes([10, 0, 0, 1]), bytes([8, 8, 8, 8])
+    request = ethernet(0x0800, ipv4(src, dst, 6, tcp(50000, 443)))
+    response = ethernet(0x0800, ipv4(dst, src, 6, tcp(443, 50000)))
+    other_conn = ethernet(0x0800, ipv4(src, dst, 6, tcp(50001, 443)))
+
+    assert splitter.get_flow_key(request) == splitter.get_flow_key(response)
+    assert splitter.get_flow_key(request) != splitter.get_flow_key(other_conn)
+
+
+def test_get_flow_key_fragmented_packets():
+    splitter = ModuleFactory().create_pcap_splitter_obj("")
+    splitter.linktype = 1
+    src, dst = bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2])
+    first_fragment = ethernet(
+        0x0800, ipv4(src, dst, 17, tcp(5000, 53), frag=0x2000)
+    )
+    last_fragment = ethernet(0x0800, ipv4(src, dst, 17, b"\x00" * 8, frag=3))
+    # fragments don't have ports, all the connections between the
+    # 2 IPs should go to the same shard
+    splitter.fragmented_pairs.add(splitter.get_pair(src, dst))
+    unfragmented = ethernet(0x0800, ipv4(dst, src, 17, tcp(53, 5000)))
+
+    assert (
+        splitter.get_flow_key(first_fragment)
+        == splitter.get_flow_key(last_fragment)
+        == splitter.get_flow_key(unfragmented)
+    )
+
+
+@pytest.mark.parametrize(
+    "content, expected_result",
+    [
+        # pcapng section header block
+        (b"\x0a\x0d\x0d\x0a" + b"\x00" * 24, False),
+        # not a pcap
+        (b"StartTime,Dur,Proto,SrcAddr,Sport,Dir,DstAddr\n", False),
+        # truncated global header
+        (b"\xd4\xc3\xb2\xa1\x02\x00", False),
+        # linux cooked capture
+        (b"\xd4\xc3\xb2\xa1" + b"\x00" * 16 + struct.pack("<I", 113), True),
+        # unsupported link type (802.11)
+        (b"\xd4\xc3\xb2\xa1" + b"\x00" * 16 + struct.pack("<I", 105), False),
+    ],
+)
+def test_is_supported(content, expected_result, tmp_path):
+    pcap = os.path.join(tmp_path, "test.pcap")
+    with open(pcap, "wb") as f:
+        f.write(content)
+    splitter = ModuleFactory().create_pcap_splitter_obj(pcap)
+    assert splitter.is_supported() == expected_result
+
+
+def test_get_flow_key_icmp():
+    splitter = ModuleFactory().create_pcap_splitter_obj("")
+    splitter.linktype = 1
+    scanner = bytes([10, 0, 0, 1])
+    echo_request = b"\x08\x00" + b"\x00" * 6
+    # zeek detects ICMP scans by counting the hosts each IP pings,
+    # so all of them should be in the same shard
+    keys = {
+        splitter.get_flow_key(
+            ethernet(
+                0x0800, ipv4(scanner, bytes([10, 0, 0, host]), 1, echo_request)
+            )
+        )
+        for host in range(2, 50)
+    }
+    assert len(keys) == 1
+
+
+def test_get_flow_key_ssh():
+    splitter = ModuleFactory().create_pcap_splitter_obj("")
+    splitter.linktype = 1
+    client = bytes([10, 0, 0, 1])
+    # zeek detects SSH password guessing by counting the failed logins
+    # of each client across connections
+    keys = {
+        splitter.get_flow_key(
+            ethernet(
+                0x0800,
+                ipv4(client, bytes([10, 0, 0, host]), 6, tcp(sport, 22)),
+            )
+        )
+        for host in range(2, 10)
+        for sport in range(40000, 40010)
+    }
+    # the replies of the server
+    keys.add(
+        splitter.get_flow_key(
+            ethernet(
+                0x0800, ipv4(bytes([10, 0, 0, 2]), client, 6, tcp(22, 40000))
+            )
+        )
+    )
+    assert len(keys) == 1
+    # other TCP connections are still split
+    assert (
+        splitter.get_flow_key(
+            ethernet(
+                0x0800, ipv4(client, bytes([10, 0, 0, 2]), 6, tcp(40000, 80))
+            )
+        )
+        not in keys
+    )
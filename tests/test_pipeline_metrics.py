@@ -0,0 +1,181 @@
+import json
+import time
+
+import pytest
+
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    MODULE_LAG,
+    PROFILER_QUEUE_DEPTH,
+    STAGE_LATENCY,
+    format_labels,
+)
+from tests.module_factory import ModuleFactory
+
+
+def test_add():
+    metrics = ModuleFactory().create_pipeline_metrics_obj()
+    metrics.add(STAGE_LATENCY, 0.1, stage="profiled")
+    metrics.add(STAGE_LATENCY, 0.2, stage="profiled")
+    metrics.add(STAGE_LATENCY, 0.3, stage="dequeued")
+    metrics.add(PROFILER_QUEUE_DEPTH, 5000)
+
+    assert len(metrics.histograms) == 3
+    profiled = metrics.histograms[(STAGE_LATENCY, (("stage", "profiled"),))]
+    assert profiled.count == 2
+    depth = metrics.histograms[(PROFILER_QUEUE_DEPTH, ())]
+    # queue depths aren't capped by the max latency of the histogram
+    assert depth.percentile(50) == pytest.approx(5000, rel=0.1)
+    metrics.db.store_pipeline_metrics.assert_not_called()
+
+
+def test_add_stores_when_due():
+    metrics = ModuleFactory().create_pipeline_metrics_obj(interval=0)
+    metrics.add(STAGE_LATENCY, 0.1, stage="profiled")
+    metrics.db.store_pipeline_metrics.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "data, expected_histograms",
+    [
+        # testcase1: msg published with timestamps
+        ({"profileid": "profile_192.168.1.1", "read": 2, "published": 1}, 2),
+        # testcase2: msg published without timestamps
+        ({"profileid": "profile_192.168.1.1"}, 0),
+        # testcase3: msg that isn't a dict
+        ("192.168.1.1", 0),
+    ],
+)
+def test_add_consumed_msg(data, expected_histograms):
+    if isinstance(data, dict):
+        data = dict(data)
+        # the seconds since the flow was read and published
+        if "read" in data:
+            data["time_read"] = time.time() - data.pop("read")
+            data["time_published"] = time.time() - data.pop("published")
+        data = json.dumps(data)
+    metrics = ModuleFactory().create_pipeline_metrics_obj()
+    metrics.add_consumed_msg("new_flow", {"data": data})
+    assert len(metrics.histograms) == expected_histograms
+    if expected_histograms:
+        lag = metrics.histograms[
+            (MODULE_LAG, (("channel", "new_flow"), ("module", "Flow Alerts")))
+        ]
+        assert lag.max == pytest.approx(1, abs=0.5)
+
+
+def test_store():
+    metrics = ModuleFactory().create_pipeline_metrics_obj()
+    metrics.add(STAGE_LATENCY, 0.1, stage="profiled")
+    metrics.store()
+
+    process, stored = metrics.db.store_pipeline_metrics.call_args[0]
+    assert process == "Flow Alerts"
+    (metric,) = json.loads(stored)
+    assert metric["metric"] == STAGE_LATENCY
+    assert metric["labels"] == {"stage": "profiled"}
+    assert metric["histogram"]["count"] == 1
+
+
+def test_store_nothing_recorded():
+    metrics = ModuleFactory().create_pipeline_metrics_obj()
+    metrics.store()
+    metrics.db.store_pipeline_metrics.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "labels, expected_labels",
+    [
+        # testcase1: no labels
+        ((), ""),
+        # testcase2: a module name with spaces
+        (
+            (("channel", "new_flow"), ("module", "Flow Alerts")),
+            '{channel="new_flow",module="Flow Alerts"}',
+        ),
+        # testcase3: values that need escaping
+        ((("module", 'a"b\\c'),), '{module="a\\"b\\\\c"}'),
+    ],
+)
+def test_format_labels(labels, expected_labels):
+    assert format_labels(labels) == expected_labels
+
+
+def test_get_histograms_merges_processes():
+    metrics = ModuleFactory().create_pipeline_metrics_obj()
+    metrics.add(STAGE_LATENCY, 0.1, stage="profiled")
+    metrics.store()
+    stored = metrics.db.store_pipeline_metrics.call_args[0][1]
+
+    exporter = ModuleFactory().create_pipeline_metrics_exporter_obj("")
+    exporter.db.get_pipeline_metrics.return_value = {
+        "Profiler": stored,
+        "Input": stored,
+    }
+    histograms = exporter.get_histograms()
+    assert histograms[(STAGE_LATENCY, (("stage", "profiled"),))].count == 2
+
+
+def test_get_backlogs():
+    exporter = ModuleFactory().create_pipeline_metrics_exporter_obj("")
+    exporter.db.get_msgs_published_at_runtime.return_value = {
+        "new_flow": "10",
+        "new_dns": "3",
+    }
+    exporter.db.get_pids.return_value = {"Flow Alerts": "1", "Profiler": "2"}
+    exporter.db.get_msgs_received_at_runtime.side_effect = [
+        {"new_flow": "4", "new_dns": "3"},
+        {},
+    ]
+    assert exporter.get_backlogs() == {
+        (
+            "slips_module_backlog_messages",
+            (("channel", "new_flow"), ("module", "Flow Alerts")),
+        ): 6,
+        (
+            "slips_module_backlog_messages",
+            (("channel", "new_dns"), ("module", "Flow Alerts")),
+        ): 0,
+    }
+
+
+def test_export(tmp_path):
+    metrics = ModuleFactory().create_pipeline_metrics_obj()
+    metrics.add(STAGE_LATENCY, 0.5, stage="profiled")
+    metrics.store()
+    stored = metrics.db.store_pipeline_metrics.call_args[0][1]
+
+    exporter = ModuleFactory().create_pipeline_metrics_exporter_obj(
+        str(tmp_path)
+    )
+    exporter.db.get_pipeline_metrics.return_value = {"Profiler": stored}
+    exporter.db.get_msgs_published_at_runtime.return_value = {"new_flow": "2"}
+    exporter.db.get_pids.return_value = {"Flow Alerts": "1"}
+    exporter.db.get_msgs_received_at_runtime.return_value = {"new_flow": "1"}
+    exporter.export()
+
+    with open(tmp_path / "metrics.prom") as f:
+        lines = f.read().splitlines()
+    assert f"# TYPE {STAGE_LATENCY} summary" in lines
+    assert f'{STAGE_LATENCY}{{stage="profiled",quantile="0.5"}} 0.5' in lines
+    assert f'{STAGE_LATENCY}_count{{stage="profiled"}} 1' in lines
+    assert "# TYPE slips_module_backlog_messages gauge" in lines
+    assert (
+        'slips_module_backlog_messages{channel="new_flow",'
+        'module="Flow Alerts"} 1' in lines
+    )
+    assert not (tmp_path / "metrics.prom.tmp").exists()
+
+
+def test_export_if_due(tmp_path):
+    exporter = ModuleFactory().create_pipeline_metrics_exporter_obj(
+        str(tmp_path)
+    )
+    exporter.db.get_pipeline_metrics.return_value = {}
+    exporter.db.get_msgs_published_at_runtime.return_value = {}
+    exporter.db.get_pids.return_value = {}
+    exporter.export_if_due()
+    assert (tmp_path / "metrics.prom").exists()
+    (tmp_path / "metrics.prom").unlink()
+    # the interval didn't pass yet
+    exporter.export_if_due()
+    assert not (tmp_path / "metrics.prom").exists()
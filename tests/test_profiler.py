@@ -12,6 +12,11 @@ from slips_files.core.flows.zeek import Conn
 import ipaddress
 from unittest.mock import patch
 import queue
+import time
+from slips_files.common.performance_profilers.pipeline_metrics import (
+    PROFILER_QUEUE_DEPTH,
+    STAGE_LATENCY,
+)
 
 
 @pytest.mark.parametrize(
@@ -662,3 +667,206 @@ def test_notify_observers_with_correct_message():
     test_msg = {"action": "test_action"}
     profiler.notify_observers(test_msg)
     observer_mock.update.assert_called_once_with(test_msg)
+
+
+def compare_flows(batch_flows, flows):
+    """compares the fields of the given flows, except their uids"""
+    assert len(batch_flows) == len(flows)
+    for batch_flow, flow in zip(batch_flows, flows):
+        batch_flow.uid = flow.uid = "uid"
+        assert batch_flow == flow
+
+
+@pytest.mark.parametrize(
+    "file",
+    [
+        "dataset/test2-malicious.binetflow",
+        "dataset/test5-mixed.binetflow",
+    ],
+)
+def test_argus_process_lines(file):
+    with open(file) as f:
+        lines = [line for line in f.readlines()[:100] if line.strip()]
+    type_ = "argus-tabs" if "\t" in lines[0] else "argus"
+
+    argus = SUPPORTED_INPUT_TYPES["binetflow"]()
+    flows = [
+        argus.process_line({"type": type_, "data": line}) for line in lines
+    ]
+
+    batch_argus = SUPPORTED_INPUT_TYPES["binetflow"]()
+    batch_flows = batch_argus.process_lines({"type": type_, "data": lines})
+
+    # the header doesn't have a flow
+    assert batch_flows[0] is None
+    compare_flows(batch_flows[1:], flows[1:])
+
+
+def test_argus_process_lines_invalid_line():
+    argus = SUPPORTED_INPUT_TYPES["binetflow"]()
+    header = (
+        "StartTime,Dur,Proto,SrcAddr,Sport,Dir,DstAddr,Dport,State,"
+        "sTos,dTos,TotPkts,TotBytes,SrcBytes,SrcPkts,Label\n"
+    )
+    valid_line = (
+        "2019/04/04 16:23:00.325010,0.027947,udp,10.8.0.69,48427,  <->,"
+        "8.8.8.8,53,CON,0,0,2,142,63,1,\n"
+    )
+    invalid_line = valid_line.replace(",2,142,", ",two,142,")
+    flows = argus.process_lines(
+        {"type": "argus", "data": [header, valid_line, invalid_line]}
+    )
+
+    assert flows[0] is None
+    assert flows[1].pkts == 2
+    assert flows[1].bytes == 142
+    assert isinstance(flows[2], ValueError)
+
+
+def test_nfdump_process_lines():
+    lines = [
+        "2016-12-19 10:40:43,2016-12-19 10:40:43,0.000,10.0.2.15,"
+        "192.168.1.1,53,52873,UDP,......,0,0,1,0,93,0,0,0,0,0,0,"
+        "0,0,0.0.0.0,0,0,0,0,0",
+        "2016-12-19 10:40:44,2016-12-19 10:40:45,1.000,10.0.2.15,"
+        "1.1.1.1,443,52874,TCP,.AP.SF,0,0,5,0,300,0,0,0,0,0,0,"
+        "0,0,0.0.0.0,0,0,0,0,0",
+    ]
+    nfdump = SUPPORTED_INPUT_TYPES["nfdump"]()
+    flows = [
+        nfdump.process_line({"type": "nfdump", "data": line}) for line in lines
+    ]
+    batch_flows = nfdump.process_lines({"type": "nfdump", "data": lines})
+    compare_flows(batch_flows, flows)
+
+
+@patch("slips_files.core.profiler.Profiler.add_flow_to_profile")
+@patch("slips_files.core.profiler.Profiler.handle_setting_local_net")
+def test_main_batch_of_lines(
+    mock_handle_setting_local_net, mock_add_flow_to_profile
+):
+    profiler = ModuleFactory().create_profiler_obj()
+    profiler.profiler_queue = Mock(spec=queue.Queue)
+    profiler.profiler_queue.get.side_effect = [
+        {
+            "line": {"type": "argus", "data": ["line1", "line2", "line3"]},
+            "input_type": "binetflow",
+        },
+        "stop",
+    ]
+    profiler.input = Mock()
+    profiler.input.process_lines = Mock(
+        return_value=["flow1", ValueError("invalid line"), "flow3"]
+    )
+
+    profiler.main()
+
+    assert mock_add_flow_to_profile.call_count == 2
+    assert mock_handle_setting_local_net.call_count == 2
+    assert profiler.rec_lines == 3
+
+
+@pytest.mark.parametrize(
+    "line, expected_result",
+    [
+        # testcase1: event type slips doesn't read
+        ('{"timestamp":"2020-01-01","event_type":"alert","src_ip":"1"}', True),
+        # testcase2: event type slips reads
+        ('{"timestamp":"2020-01-01","event_type":"flow","src_ip":"1"}', False),
+        # testcase3: the event type can't be found without decoding
+        ('{"event_type":"alert","alert":{"event_type":"flow"}}', False),
+    ],
+)
+def test_suricata_is_ignored_event(line, expected_result):
+    suricata = SUPPORTED_INPUT_TYPES["suricata"]()
+    assert suricata.is_ignored_event(line) == expected_result
+
+
+def test_suricata_process_lines():
+    with open("dataset/test6-malicious.suricata.json") as f:
+        lines = [line for line in f.readlines()[:300] if line.strip()]
+    lines.append("invalid json")
+
+    suricata = SUPPORTED_INPUT_TYPES["suricata"]()
+    flows = []
+    for line in lines:
+        try:
+            flows.append(suricata.process_line(line))
+        except Exception as e:
+            flows.append(e)
+
+    batch_flows = suricata.process_lines({"type": "suricata", "data": lines})
+
+    assert len(batch_flows) == len(flows)
+    for batch_flow, flow in zip(batch_flows, flows):
+        if isinstance(flow, Exception):
+            assert isinstance(batch_flow, Exception)
+        else:
+            assert batch_flow == flow
+    # alerts are skipped
+    assert False in batch_flows
+
+
+@patch("slips_files.core.profiler.Profiler.add_flow_to_profile")
+@patch("slips_files.core.profiler.Profiler.handle_setting_local_net")
+def test_main_records_profiled_flows(
+    mock_handle_setting_local_net, mock_add_flow_to_profile
+):
+    profiler = ModuleFactory().create_profiler_obj()
+    profiler.pipeline_metrics = ModuleFactory().create_pipeline_metrics_obj()
+    profiler.profiler_queue = Mock(spec=queue.Queue)
+    profiler.profiler_queue.qsize.return_value = 0
+    time_read = time.time() - 2
+    profiler.profiler_queue.get.side_effect = [
+        {
+            "line": {"type": "argus", "data": ["line1", "line2", "line3"]},
+            "input_type": "binetflow",
+            "time_read": time_read,
+        },
+        "stop",
+    ]
+    profiler.input = Mock()
+    profiler.input.process_lines = Mock(
+        return_value=["flow1", ValueError("invalid line"), "flow3"]
+    )
+
+    profiler.main()
+
+    profiled = profiler.pipeline_metrics.histograms[
+        (STAGE_LATENCY, (("stage", "profiled"),))
+    ]
+    # only the lines that have flows are counted
+    assert profiled.count == 2
+    assert 2 <= profiled.percentile(50) < 3
+    assert profiled.first == pytest.approx(time_read)
+    assert 2 <= profiled.get_period() < 3
+
+
+@patch("slips_files.core.profiler.Profiler.add_flow_to_profile")
+@patch("slips_files.core.profiler.Profiler.handle_setting_local_net")
+def test_main_records_pipeline_metrics(
+    mock_handle_setting_local_net, mock_add_flow_to_profile
+):
+    profiler = ModuleFactory().create_profiler_obj()
+    profiler.pipeline_metrics = ModuleFactory().create_pipeline_metrics_obj()
+    profiler.profiler_queue = Mock(spec=queue.Queue)
+    profiler.profiler_queue.qsize.return_value = 7
+    profiler.profiler_queue.get.side_effect = [
+        {
+            "line": {"type": "argus", "data": ["line1", "line2"]},
+            "input_type": "binetflow",
+            "time_read": time.time() - 2,
+        },
+        "stop",
+    ]
+    profiler.input = Mock()
+    profiler.input.process_lines = Mock(return_value=["flow1", "flow2"])
+
+    profiler.main()
+
+    histograms = profiler.pipeline_metrics.histograms
+    assert histograms[(STAGE_LATENCY, (("stage", "profiled"),))].count == 2
+    dequeued = histograms[(STAGE_LATENCY, (("stage", "dequeued"),))]
+    assert dequeued.count == 1
+    assert 2 <= dequeued.percentile(50) < 3
+    assert histograms[(PROFILER_QUEUE_DEPTH, ())].max == 7
@@ -0,0 +1,131 @@
+"""Unit test for modules/rnn_cc_detection/rnn_cc_detection.py"""
+
+import json
+from unittest.mock import Mock
+import numpy as np
+import pytest
+
+from tests.module_factory import ModuleFactory
+
+
+def get_new_letters_msg(
+    new_symbol="88*y*y*h*h*h*h*h*h*h*y*y*h*h*h*y*y*",
+    tupleid="8.8.8.8-443-tcp",
+    state="Established",
+):
+    return {
+        "data": json.dumps(
+            {
+                "new_symbol": new_symbol,
+                "profileid": "profile_192.168.1.1",
+                "twid": "timewindow1",
+                "tupleid": tupleid,
+                "uid": "CAeDWs37BipkfP21u8",
+                "flow": {
+                    "state": state,
+                    "starttime": 1594417039.029793,
+                    "daddr": "8.8.8.8",
+                },
+            }
+        )
+    }
+
+
+@pytest.mark.parametrize(
+    "sequence, expected",
+    [
+        ("88*y*y*h*h*", True),
+        ("", True),
+        ("88*y*y*h*h*-", False),
+        ("88*y*y*h*h*é", False),
+    ],
+)
+def test_is_valid_sequence(sequence, expected):
+    cc_detection = ModuleFactory().create_rnn_cc_detection_obj()
+    assert cc_detection.is_valid_sequence(sequence) == expected
+
+
+def test_convert_input_for_module():
+    cc_detection = ModuleFactory().create_rnn_cc_detection_obj()
+    sequences = ["aB*", "1" * 600]
+    converted = cc_detection.convert_input_for_module(sequences)
+    assert converted.shape == (2, 500, 1)
+    vocabulary = cc_detection.vocabulary
+    assert list(converted[0, :3, 0]) == [
+        vocabulary.index("a"),
+        vocabulary.index("B"),
+        vocabulary.index("*"),
+    ]
+    # padding
+    assert (converted[0, 3:, 0] == vocabulary.index("0")).all()
+    # only max_length letters are used
+    assert (converted[1, :, 0] == vocabulary.index("1")).all()
+
+
+@pytest.mark.parametrize(
+    "msg, expected_pending",
+    [
+        (get_new_letters_msg(), 1),
+        # not tcp
+        (get_new_letters_msg(tupleid="8.8.8.8-53-udp"), 0),
+        # not established
+        (get_new_letters_msg(state="S0"), 0),
+    ],
+)
+def test_handle_new_letters(msg, expected_pending):
+    cc_detection = ModuleFactory().create_rnn_cc_detection_obj()
+    cc_detection.handle_new_letters(msg)
+    assert len(cc_detection.pending_sequences) == expected_pending
+
+
+def test_handle_new_letters_keeps_latest_per_tuple():
+    cc_detection = ModuleFactory().create_rnn_cc_detection_obj()
+    cc_detection.handle_new_letters(get_new_letters_msg(new_symbol="88*"))
+    cc_detection.handle_new_letters(get_new_letters_msg(new_symbol="88*y*y"))
+    assert len(cc_detection.pending_sequences) == 1
+    (msg,) = cc_detection.pending_sequences.values()
+    assert msg["new_symbol"] == "88*y*y"
+
+
+def test_score_pending_sequences():
+    cc_detection = ModuleFactory().create_rnn_cc_detection_obj()
+    cc_detection.tcpmodel = Mock()
+    cc_detection.tcpmodel.predict.return_value = np.array([[0.999], [0.1]])
+    cc_detection.handle_score = Mock()
+    cc_detection.handle_new_letters(get_new_letters_msg(new_symbol="88*"))
+    cc_detection.handle_new_letters(
+        get_new_letters_msg(new_symbol="99*", tupleid="1.1.1.1-443-tcp")
+    )
+
+    cc_detection.score_pending_sequences()
+
+    # 1 call to the model for the whole batch
+    cc_detection.tcpmodel.predict.assert_called_once()
+    assert cc_detection.tcpmodel.predict.call_args[0][0].shape == (2, 500, 1)
+    assert cc_detection.handle_score.call_count == 2
+    assert cc_detection.pending_sequences == {}
+
+    # the same sequence again should be scored from the cache
+    cc_detection.handle_new_letters(get_new_letters_msg(new_symbol="88*"))
+    cc_detection.score_pending_sequences()
+    cc_detection.tcpmodel.predict.assert_called_once()
+    assert cc_detection.handle_score.call_args[0][1] == pytest.approx(0.999)
+
+
+def test_cache_score_evicts_least_recently_used():
+    cc_detection = ModuleFactory().create_rnn_cc_detection_obj()
+    cc_detection.scores_cache_size = 2
+    cc_detection.cache_score("a", 0.1)
+    cc_detection.cache_score("b", 0.2)
+    cc_detection.get_cached_score("a")
+    cc_detection.cache_score("c", 0.3)
+    assert list(cc_detection.scores_cache) == ["a", "c"]
+
+
+@pytest.mark.parametrize("score, expected_evidence", [(0.999, 1), (0.5, 0)])
+def test_handle_score(score, expected_evidence):
+    cc_detection = ModuleFactory().create_rnn_cc_detection_obj()
+    cc_detection.set_evidence_cc_channel = Mock()
+    msg = json.loads(get_new_letters_msg()["data"])
+    cc_detection.handle_score(msg, score)
+    assert cc_detection.set_evidence_cc_channel.call_count == expected_evidence
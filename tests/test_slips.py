@@ -1,5 +1,11 @@
 """Unit test for ../slips.py"""
 
+import queue
+from unittest.mock import Mock, patch
+
+import pytest
+
+from managers.process_manager import ProcessManager, run_module
 from tests.module_factory import ModuleFactory
 
 
@@ -13,6 +19,177 @@ def test_load_modules():
     assert failed_to_load_modules == 0
 
 
+def test_get_modules_without_importing_them():
+    proc_manager = ModuleFactory().create_process_manager_obj()
+    proc_manager.modules_to_ignore = ["template"]
+    with patch("importlib.import_module") as import_module:
+        modules, failed_to_load_modules = proc_manager.get_modules()
+
+    import_module.assert_not_called()
+    assert failed_to_load_modules == 0
+    assert "Template" not in modules
+    assert modules["RNN C&C Detection"] == {
+        "module": "modules.rnn_cc_detection.rnn_cc_detection",
+        "cls": "CCDetection",
+        "description": "Detect C&C channels based on behavioral letters",
+    }
+    # blocking is started first
+    assert next(iter(modules)) == "Blocking"
+
+
+def test_get_module_metadata(tmp_path):
+    module_path = tmp_path / "dummy.py"
+    module_path.write_text(
+        "import tensorflow\n"
+        "class Helper:\n"
+        "    name = 'not a module'\n"
+        "class Dummy(abstracts.IModule):\n"
+        "    name = 'Dummy'\n"
+        "    description = ('dummy '\n"
+        "                   'module')\n"
+    )
+    assert ProcessManager.get_module_metadata(str(module_path)) == {
+        "class": "Dummy",
+        "name": "Dummy",
+        "description": "dummy module",
+    }
+
+    module_path.write_text("class Helper:\n    name = 'not a module'\n")
+    assert ProcessManager.get_module_metadata(str(module_path)) is None
+
+
+def test_run_module():
+    module = Mock()
+    modules_ready = Mock()
+    with patch("importlib.import_module", return_value=module) as import_:
+        run_module(
+            "modules.dummy.dummy", "Dummy", modules_ready, "logger", "output"
+        )
+
+    import_.assert_called_once_with("modules.dummy.dummy")
+    module.Dummy.assert_called_once_with("logger", "output")
+    modules_ready.put.assert_called_once_with(("modules.dummy.dummy", None))
+    module.Dummy.return_value.run.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "import_error, init_error",
+    [
+        # testcase1: the module failed to import
+        (ImportError("No module named 'tensorflow'"), None),
+        # testcase2: the module's init() failed
+        (None, ValueError("invalid config")),
+    ],
+)
+def test_run_module_reports_errors(import_error, init_error):
+    module = Mock()
+    module.Dummy.side_effect = init_error
+    modules_ready = Mock()
+    with patch(
+        "importlib.import_module",
+        return_value=module,
+        side_effect=import_error,
+    ):
+        run_module("modules.dummy.dummy", "Dummy", modules_ready)
+
+    module_path, error = modules_ready.put.call_args[0][0]
+    assert module_path == "modules.dummy.dummy"
+    assert str(import_error or init_error) in error
+    module.Dummy.return_value.run.assert_not_called()
+
+
+def test_wait_for_modules_to_start():
+    proc_manager = ModuleFactory().create_process_manager_obj()
+    proc_manager.main.print = Mock()
+    proc_manager.modules_ready = Mock()
+    proc_manager.modules_ready.get.side_effect = [
+        ("modules.arp.arp", None),
+        queue.Empty,
+        ("modules.rnn.rnn", "No module named 'tensorflow'"),
+    ]
+    arp, rnn, crashed = Mock(pid=1), Mock(pid=2), Mock(pid=3)
+    crashed.is_alive.return_value = False
+    started_modules = {
+        "modules.arp.arp": ("ARP", arp),
+        "modules.rnn.rnn": ("RNN", rnn),
+        "modules.crashed.crashed": ("Crashed", crashed),
+    }
+    modules_to_call = {
+        "ARP": {"description": "arp"},
+        "RNN": {"description": "rnn"},
+        "Crashed": {"description": "crashed"},
+    }
+    with patch.object(proc_manager, "print_started_module") as print_started:
+        failed = proc_manager.wait_for_modules_to_start(
+            started_modules, modules_to_call
+        )
+
+    assert failed == 2
+    print_started.assert_called_once_with("ARP", 1, "arp")
+
+
+def test_wait_for_modules_to_start_timeout():
+    proc_manager = ModuleFactory().create_process_manager_obj()
+    proc_manager.main.print = Mock()
+    proc_manager.modules_init_timeout = 0
+    proc_manager.modules_ready = Mock()
+    started_modules = {"modules.rnn.rnn": ("RNN", Mock(pid=2))}
+
+    failed = proc_manager.wait_for_modules_to_start(
+        started_modules, {"RNN": {"description": "rnn"}}
+    )
+    # slow modules aren't failed modules
+    assert failed == 0
+    proc_manager.modules_ready.get.assert_not_called()
+    assert "RNN" in proc_manager.main.print.call_args[0][0]
+
+
+def test_start_update_manager_updates_local_files_in_the_background():
+    proc_manager = ModuleFactory().create_process_manager_obj()
+    proc_manager.main.db = Mock()
+    with patch("managers.process_manager.Process") as process, patch.object(
+        proc_manager, "create_update_manager"
+    ) as create_update_manager:
+        proc_manager.start_update_manager(local_files=True)
+
+    # modules start with the whitelist of the previous run
+    proc_manager.main.db.load_cached_whitelist.assert_called_once()
+    process.assert_called_once_with(
+        target=proc_manager.update_local_files, name="Local Files Updater"
+    )
+    process.return_value.start.assert_called_once()
+    # nothing is parsed by slips.py itself
+    create_update_manager.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "cached_whitelist, cached_ports_info",
+    [
+        # testcase1: the first run of slips
+        (False, False),
+        # testcase2: the ports info was flushed from the cache db
+        (True, False),
+        # testcase3: the whitelist was flushed from the cache db
+        (False, True),
+    ],
+)
+def test_start_update_manager_updates_missing_local_files(
+    cached_whitelist, cached_ports_info
+):
+    proc_manager = ModuleFactory().create_process_manager_obj()
+    proc_manager.main.db = Mock()
+    proc_manager.main.db.load_cached_whitelist.return_value = cached_whitelist
+    proc_manager.main.db.has_cached_ports_info.return_value = cached_ports_info
+    with patch("managers.process_manager.Process") as process, patch.object(
+        proc_manager, "update_local_files"
+    ) as update_local_files:
+        proc_manager.start_update_manager(local_files=True)
+
+    # the modules don't start until the local files are loaded
+    update_local_files.assert_called_once_with()
+    process.assert_not_called()
+
+
 #
 # @pytest.mark.skipif(IS_IN_A_DOCKER_CONTAINER, reason='This functionality is not supported in docker')
 # def test_save():
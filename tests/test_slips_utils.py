@@ -154,6 +154,73 @@ def test_convert_format(input_value, input_format, expected_output):
     assert utils.convert_format(input_value, input_format) == expected_output
 
 
+@pytest.mark.parametrize(
+    "timestamps, required_format",
+    [
+        # testcase1: iso timestamps, parsed by fromisoformat()
+        (
+            [
+                "2023-04-06T12:34:56.789000+0200",
+                "2023-04-06T12:34:57.000001+0000",
+                # doesn't match the format of the column
+                "2023-04-06 12:34:58",
+            ],
+            "datetimeobj",
+        ),
+        # testcase2: custom format to unix timestamps
+        (
+            ["2019/04/04 16:23:00.325010", "2019/04/04 16:23:01.5", False],
+            "unixtimestamp",
+        ),
+        # testcase3: unix timestamps to iso
+        (["1680788096.789", "1680788097", False], "iso"),
+    ],
+)
+def test_convert_ts_column(timestamps, required_format):
+    utils = ModuleFactory().create_utils_obj()
+    utils.local_tz = datetime.timezone.utc
+    if required_format == "datetimeobj":
+        expected = [utils.convert_to_datetime(ts) for ts in timestamps]
+    else:
+        expected = [
+            utils.convert_format(ts, required_format) for ts in timestamps
+        ]
+    assert utils.convert_ts_column(timestamps, required_format) == expected
+
+
+def test_convert_ts_column_invalid_timestamp():
+    utils = ModuleFactory().create_utils_obj()
+    converted = utils.convert_ts_column(
+        ["2019/04/04 16:23:00.325010", "invalid"], "unixtimestamp"
+    )
+    assert converted[1] is None
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        # testcase1: valid json
+        ('{"ts": 1.5, "uid": "CsYeNL"}', {"ts": 1.5, "uid": "CsYeNL"}),
+        # testcase2: suricata flow ids are unsigned 64 bit ints
+        (
+            '{"flow_id": 18446744073709551615}',
+            {"flow_id": 18446744073709551615},
+        ),
+        # testcase3: Infinity isn't supported by orjson
+        ('{"duration": Infinity}', {"duration": float("inf")}),
+    ],
+)
+def test_json_loads(data, expected):
+    utils = ModuleFactory().create_utils_obj()
+    assert utils.json_loads(data) == expected
+
+
+def test_json_loads_invalid_json():
+    utils = ModuleFactory().create_utils_obj()
+    with pytest.raises(json.JSONDecodeError):
+        utils.json_loads('{"ts": ')
+
+
 @pytest.mark.parametrize(
     "input_value, expected_output",
     [
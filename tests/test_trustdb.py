@@ -2,11 +2,11 @@ import pytest
 from unittest.mock import (
     patch,
     call,
-    MagicMock,
     Mock,
 )
 from tests.module_factory import ModuleFactory
 import datetime
+import sqlite3
 import time
 
 
@@ -561,6 +561,23 @@ def test_get_reporter_ip(
     assert ip == expected_ip
 
 
+def create_in_memory_trust_db():
+    trust_db = ModuleFactory().create_trust_db_obj()
+    trust_db.conn = sqlite3.connect(":memory:")
+    trust_db.create_tables()
+    # reporter_1 changed its ip from 192.168.1.2 to 192.168.1.4
+    trust_db.insert_go_ip_pairing("reporter_1", "192.168.1.2", 100.0)
+    trust_db.insert_go_ip_pairing("reporter_1", "192.168.1.4", 300.0)
+    trust_db.insert_go_ip_pairing("reporter_2", "192.168.1.3", 100.0)
+    trust_db.insert_go_reliability("reporter_1", 0.1, 100.0)
+    trust_db.insert_go_reliability("reporter_1", 0.7, 200.0)
+    trust_db.insert_go_reliability("reporter_2", 0.8, 100.0)
+    trust_db.insert_slips_score("192.168.1.2", 0.1, 0.1, 100.0)
+    trust_db.insert_slips_score("192.168.1.2", 0.6, 0.9, 200.0)
+    trust_db.insert_slips_score("192.168.1.3", 0.4, 0.7, 100.0)
+    return trust_db
+
+
 @pytest.mark.parametrize(
     "ipaddress, reports, expected_result",
     [
@@ -569,31 +586,72 @@ def test_get_reporter_ip(
         # Testcase 2: One report with valid reporter data
         (
             "192.168.1.1",
-            [("reporter_1", 1678886400, 0.5, 0.8, "192.168.1.1")],
+            [("reporter_1", "ip", "192.168.1.1", 0.5, 0.8, 250.0)],
             [(0.5, 0.8, 0.7, 0.6, 0.9)],
         ),
-        # Testcase 3: Multiple reports with valid reporter data
+        # Testcase 3: Multiple reports with valid reporter data,
+        # latest first
         (
             "192.168.1.1",
             [
-                ("reporter_1", 1678886400, 0.5, 0.8, "192.168.1.1"),
-                ("reporter_2", 1678886500, 0.3, 0.6, "192.168.1.1"),
+                ("reporter_1", "ip", "192.168.1.1", 0.5, 0.8, 250.0),
+                ("reporter_2", "ip", "192.168.1.1", 0.3, 0.6, 260.0),
             ],
-            [(0.5, 0.8, 0.7, 0.6, 0.9), (0.3, 0.6, 0.8, 0.4, 0.7)],
+            [(0.3, 0.6, 0.8, 0.4, 0.7), (0.5, 0.8, 0.7, 0.6, 0.9)],
+        ),
+        # Testcase 4: reporters without an ip at the time of the
+        # report, reporters without a reputation and reports about
+        # other IPs are skipped
+        (
+            "192.168.1.1",
+            [
+                ("reporter_2", "ip", "192.168.1.1", 0.3, 0.6, 50.0),
+                ("reporter_1", "ip", "192.168.1.1", 0.5, 0.8, 350.0),
+                ("reporter_1", "ip", "192.168.1.5", 0.5, 0.8, 250.0),
+            ],
+            [],
+        ),
+        # Testcase 5: reports by the reported IP itself are skipped
+        (
+            "192.168.1.3",
+            [("reporter_2", "ip", "192.168.1.3", 0.3, 0.6, 250.0)],
+            [],
         ),
     ],
 )
 def test_get_opinion_on_ip(ipaddress, reports, expected_result):
-    trust_db = ModuleFactory().create_trust_db_obj()
-
-    trust_db.get_reports_for_ip = MagicMock(return_value=reports)
-    trust_db.get_reporter_ip = MagicMock(
-        side_effect=["192.168.1.2", "192.168.1.3", "192.168.1.2"]
-    )
-    trust_db.get_reporter_reliability = MagicMock(side_effect=[0.7, 0.8, 0.7])
-    trust_db.get_reporter_reputation = MagicMock(
-        side_effect=[(0.6, 0.9), (0.4, 0.7), (0.6, 0.9)]
-    )
+    trust_db = create_in_memory_trust_db()
+    trust_db.insert_new_go_data(reports)
 
     result = trust_db.get_opinion_on_ip(ipaddress)
     assert result == expected_result
+
+
+def test_get_opinions_on_ips():
+    trust_db = create_in_memory_trust_db()
+    trust_db.max_ips_per_query = 1
+    trust_db.insert_new_go_data(
+        [
+            ("reporter_1", "ip", "192.168.1.1", 0.5, 0.8, 250.0),
+            ("reporter_2", "ip", "192.168.1.5", 0.3, 0.6, 260.0),
+        ]
+    )
+
+    result = trust_db.get_opinions_on_ips(
+        ["192.168.1.1", "192.168.1.5", "192.168.1.6", "192.168.1.1"]
+    )
+    assert result == {
+        "192.168.1.1": [(0.5, 0.8, 0.7, 0.6, 0.9)],
+        "192.168.1.5": [(0.3, 0.6, 0.8, 0.4, 0.7)],
+        "192.168.1.6": [],
+    }
+
+
+def test_opinion_query_uses_indexes():
+    trust_db = create_in_memory_trust_db()
+    plan = trust_db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT score FROM reports "
+        "WHERE key_type = 'ip' AND reported_key = ?;",
+        ("192.168.1.1",),
+    ).fetchall()
+    assert "reports_reported_key_idx" in str(plan)
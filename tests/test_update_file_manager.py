@@ -182,7 +182,7 @@ def test_download_file(
 
 
 @pytest.mark.parametrize(
-    "test_data, expected_calls",
+    "test_data, expected_ports",
     [
         # Testcase1: Valid file with single and range ports.
         (
@@ -214,13 +214,32 @@ TestOrg,192.168.1.2,443-445,udp""",
         ),
     ],
 )
-def test_read_ports_info(mocker, tmp_path, test_data, expected_calls):
+def test_read_ports_info(mocker, tmp_path, test_data, expected_ports):
     """Test read_ports_info with different file contents."""
     update_manager = ModuleFactory().create_update_manager_obj()
     mocker.patch("builtins.open", mock_open(read_data=test_data))
     update_manager.read_ports_info(str(tmp_path / "ports_info.csv"))
-    for call in expected_calls:
-        update_manager.db.set_organization_of_port.assert_any_call(*call)
+    update_manager.db.set_organizations_of_ports.assert_called_once()
+    ports = update_manager.db.set_organizations_of_ports.call_args[0][0]
+    for org, ip, portproto in expected_ports:
+        assert ports[portproto] == {"org_name": [org], "ip": [ip]}
+
+
+def test_read_ports_info_combines_orgs_of_the_same_port(mocker, tmp_path):
+    update_manager = ModuleFactory().create_update_manager_obj()
+    mocker.patch(
+        "builtins.open",
+        mock_open(read_data="OrgA,1.1.1.1,53,udp\nOrgB,2.2.2.2,53,UDP\n"),
+    )
+    update_manager.read_ports_info(str(tmp_path / "ports_info.csv"))
+    update_manager.db.set_organizations_of_ports.assert_called_once_with(
+        {
+            "53/udp": {
+                "org_name": ["OrgA", "OrgB"],
+                "ip": ["1.1.1.1", "2.2.2.2"],
+            }
+        }
+    )
 
 
 @pytest.mark.parametrize(
@@ -232,14 +251,14 @@ def test_read_ports_info(mocker, tmp_path, test_data, expected_calls):
             TestOrg,192.168.1.1,80,tcp
             TestOrg,192.168.1.2,443-445,udp""",
             "ports_used_by_specific_orgs.csv",
-            "set_organization_of_port",
+            "set_organizations_of_ports",
         ),
         # Testcase2: Update services.csv.
         (
             """ssh,22,tcp
             http,80,tcp""",
             "services.csv",
-            "set_port_info",
+            "set_ports_info",
         ),
     ],
 )
@@ -251,12 +270,43 @@ def test_update_local_file(
     update_manager.new_hash = "test_hash"
     mocker.patch("builtins.open", mock_open(read_data=test_data))
     result = update_manager.update_local_file(str(tmp_path / file_name))
+    getattr(update_manager.db, expected_db_call).assert_called_once()
     update_manager.db.set_ti_feed_info.assert_called_once_with(
         str(tmp_path / file_name), {"hash": "test_hash"}
     )
     assert result is True
 
 
+@pytest.mark.parametrize(
+    "has_cached_whitelist, file_changed, should_parse",
+    [
+        # the cached whitelist is up to date
+        (True, False, False),
+        # the whitelist file changed
+        (True, True, True),
+        # first run, there's no cached whitelist
+        (False, False, True),
+    ],
+)
+def test_update_whitelist(
+    mocker, tmp_path, has_cached_whitelist, file_changed, should_parse
+):
+    update_manager = ModuleFactory().create_update_manager_obj()
+    whitelist_path = tmp_path / "whitelist.conf"
+    whitelist_path.write_text('"IoCType","IoCValue","Direction","IgnoreType"')
+    update_manager.whitelist = Mock()
+    update_manager.whitelist.parser.whitelist_path = str(whitelist_path)
+    update_manager.db.has_cached_whitelist.return_value = has_cached_whitelist
+    mocker.patch.object(
+        update_manager, "check_if_update_local_file", return_value=file_changed
+    )
+
+    update_manager.update_whitelist()
+
+    assert update_manager.whitelist.update.called == should_parse
+    assert update_manager.db.set_ti_feed_info.called == should_parse
+
+
 def test_check_if_update_online_whitelist_download_updated(
     mocker,
 ):
@@ -78,9 +78,9 @@ def test_get_src_domains_of_flow():
     whitelist.db.get_ip_info.return_value = {
         "SNI": [{"server_name": "sni.com"}]
     }
-    whitelist.db.get_dns_resolution.return_value = {
-        "domains": ["dns_resolution.com"]
-    }
+    whitelist.db.get_domains_of_resolved_ip.return_value = [
+        "dns_resolution.com"
+    ]
     flow = Mock()
     flow.saddr = "5.6.7.8"
 
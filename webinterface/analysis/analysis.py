@@ -2,8 +2,19 @@ from flask import Blueprint
 from flask import render_template
 import json
 from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 from ..database.database import __database__
+from ..database.pagination import (
+    cached_response,
+    get_page_args,
+    get_search_args,
+    hget_many,
+    hmget_dict,
+    paginate,
+    scan_set,
+    sismember_many,
+    zrange_page,
+)
 from slips_files.common.slips_utils import utils
 
 analysis = Blueprint(
@@ -24,8 +35,12 @@ def ts_to_date(ts, seconds=False):
     return utils.convert_format(ts, "%Y/%m/%d %H:%M:%S")
 
 
-def get_all_tw_with_ts(profileid):
-    tws = __database__.db.zrange(f"tws{profileid}", 0, -1, withscores=True)
+def get_all_tw_with_ts(
+    profileid, offset: int = 0, limit: Optional[int] = None
+):
+    tws = zrange_page(
+        __database__.db, f"tws{profileid}", offset, limit, withscores=True
+    )
     dict_tws = defaultdict(dict)
 
     for tw_tuple in tws:
@@ -40,10 +55,11 @@ def get_all_tw_with_ts(profileid):
     return dict_tws
 
 
-def get_ip_info(ip):
+def parse_ip_info(ip_info: Optional[str]) -> dict:
     """
-    Retrieve IP information from database
-    :param ip: active IP
+    Extracts the info displayed in the web interface from the IP info
+    stored in the cache db
+    :param ip_info: the serialized info of the IP from IPsInfo
     :return: all data about the IP in database
     """
     data = {
@@ -56,7 +72,7 @@ def get_ip_info(ip):
         "ref_file": "-",
         "com_file": "-",
     }
-    if ip_info := __database__.cachedb.hget("IPsInfo", ip):
+    if ip_info:
         ip_info = json.loads(ip_info)
         # Hardcoded decapsulation due to the complexity of data in side. Ex: {"asn":{"asnorg": "CESNET", "timestamp": 0.001}}
 
@@ -110,6 +126,73 @@ def get_ip_info(ip):
     return data
 
 
+def get_ip_info(ip):
+    """
+    Retrieve IP information from database
+    :param ip: active IP
+    :return: all data about the IP in database
+    """
+    return parse_ip_info(__database__.cachedb.hget("IPsInfo", ip))
+
+
+def get_ips_info(ips: Iterable[str]) -> Dict[str, dict]:
+    """
+    Retrieve the information of all the given IPs in 1 round trip
+    :return: {ip: all data about the IP in database}
+    """
+    ips_info = hmget_dict(__database__.cachedb, "IPsInfo", ips)
+    return {ip: parse_ip_info(info) for ip, info in ips_info.items()}
+
+
+def get_tuples(profile: str, timewindow: str, direction: str) -> dict:
+    """
+    Returns the requested page of the in/out tuples of the given
+    profile and timewindow, with the info of each IP.
+    the tuples can be searched and ordered by the tuple or its string,
+    the info of the IPs is only looked up for the returned page
+    :param direction: InTuples or OutTuples
+    :return: {"data": [(tuple, string, ip_info)], "recordsTotal": ..,
+    "recordsFiltered": ..}
+    """
+    data = []
+    tuples = __database__.get_tw_field(
+        f"profile_{profile}_{timewindow}", direction
+    )
+    tuples: List[tuple] = list(json.loads(tuples).items()) if tuples else []
+    total = len(tuples)
+
+    search, order_by, descending = get_search_args()
+    if search:
+        tuples = [
+            (key, value)
+            for key, value in tuples
+            if search in key.lower() or search in value[0].lower()
+        ]
+    if order_by == "tuple":
+        tuples.sort(key=lambda tuple_: tuple_[0], reverse=descending)
+    elif order_by == "string":
+        tuples.sort(key=lambda tuple_: tuple_[1][0], reverse=descending)
+    filtered = len(tuples)
+
+    offset, limit, _ = get_page_args()
+    tuples = paginate(tuples, offset, limit)
+
+    # only the ips in this page are looked up
+    ips_info = get_ips_info(key.split("-")[0] for key, _ in tuples)
+    for key, value in tuples:
+        ip, port, protocol = key.split("-")
+        tuple_dict = dict({"tuple": key, "string": value[0]})
+        tuple_dict.update(ips_info[ip])
+        data.append(tuple_dict)
+
+    return {
+        "data": data,
+        "total": total,
+        "recordsTotal": total,
+        "recordsFiltered": filtered,
+    }
+
+
 # ----------------------------------------
 #
 # ----------------------------------------
@@ -119,30 +202,44 @@ def get_ip_info(ip):
 # ROUTE FUNCTIONS
 # ----------------------------------------
 @analysis.route("/profiles_tws")
+@cached_response
 def set_profile_tws():
     """
     Set profiles and their timewindows into the tree.
     Blocked are highligted in red.
+    Accepts optional cursor and limit args to scan the profiles in pages,
+    the returned cursor is 0 when there are no more profiles.
     :return: (profile, [tw, blocked], blocked)
     """
+    _, limit, cursor = get_page_args()
+    # Fetch profiles
+    profiles, next_cursor = scan_set(
+        __database__.db, "profiles", limit, cursor
+    )
+    if limit is None:
+        # all profiles are returned, reading the whole set of blocked
+        # profiles is cheaper than checking each profile
+        blocked_profiles = __database__.db.smembers("malicious_profiles")
+        blocked = [profileid in blocked_profiles for profileid in profiles]
+    else:
+        blocked = sismember_many(
+            __database__.db, "malicious_profiles", profiles
+        )
 
     profiles_dict = {}
-    # Fetch profiles
-    profiles = __database__.db.smembers("profiles")
-    for profileid in profiles:
+    for profileid, blocked_state in zip(profiles, blocked):
         profile_word, profile_ip = profileid.split("_")
-        profiles_dict[profile_ip] = False
-
-    if blocked_profiles := __database__.db.smembers("malicious_profiles"):
-        for profile in blocked_profiles:
-            blocked_ip = profile.split("_")[-1]
-            profiles_dict[blocked_ip] = True
+        profiles_dict[profile_ip] = blocked_state
 
     data = [
         {"profile": profile_ip, "blocked": blocked_state}
         for profile_ip, blocked_state in profiles_dict.items()
     ]
-    return {"data": data}
+    return {
+        "data": data,
+        "cursor": next_cursor,
+        "total": __database__.db.scard("profiles"),
+    }
 
 
 @analysis.route("/info/<ip>")
@@ -160,26 +257,28 @@ def set_ip_info(ip):
 
 
 @analysis.route("/tws/<profileid>")
+@cached_response
 def set_tws(profileid):
     """
     Set timewindows for selected profile
+    Accepts optional offset and limit args to get the tws in pages
     :param profileid: ip of the profile
     :return:
     """
+    offset, limit, _ = get_page_args()
+    # Fetch the requested page of profile TWs
+    tws: Dict[str, dict] = get_all_tw_with_ts(
+        f"profile_{profileid}", offset, limit
+    )
 
-    # Fetch all profile TWs
-    tws: Dict[str, dict] = get_all_tw_with_ts(f"profile_{profileid}")
-
-    blocked_tws: List[str] = []
-    for tw_id, twid_details in tws.items():
-        is_blocked: bool = __database__.db.hget(
-            f"profile_{profileid}_{tw_id}", "alerts"
-        )
+    alerts = hget_many(
+        __database__.db,
+        (f"profile_{profileid}_{tw_id}" for tw_id in tws),
+        "alerts",
+    )
+    for tw_id, is_blocked in zip(list(tws), alerts):
         if is_blocked:
-            blocked_tws.append(tw_id)
-
-    for tw in blocked_tws:
-        tws[tw]["blocked"] = True
+            tws[tw_id]["blocked"] = True
 
     data = [
         {
@@ -189,56 +288,38 @@ def set_tws(profileid):
         }
         for tw_key, tw_value in tws.items()
     ]
-    return {"data": data}
+    return {
+        "data": data,
+        "total": __database__.db.zcard(f"twsprofile_{profileid}"),
+    }
 
 
 @analysis.route("/intuples/<profile>/<timewindow>")
+@cached_response
 def set_intuples(profile, timewindow):
     """
     Set intuples of a chosen profile and timewindow.
+    Accepts optional offset and limit args to get the tuples in pages,
+    and search, order_by and order_dir args to filter and order them
     :param profile: active profile
     :param timewindow: active timewindow
     :return: (tuple, string, ip_info)
     """
-    data = []
-    if intuples := __database__.db.hget(
-        f"profile_{profile}_{timewindow}", "InTuples"
-    ):
-        intuples = json.loads(intuples)
-        for key, value in intuples.items():
-            ip, port, protocol = key.split("-")
-            ip_info = get_ip_info(ip)
-
-            outtuple_dict = dict({"tuple": key, "string": value[0]})
-            outtuple_dict.update(ip_info)
-            data.append(outtuple_dict)
-
-    return {"data": data}
+    return get_tuples(profile, timewindow, "InTuples")
 
 
 @analysis.route("/outtuples/<profile>/<timewindow>")
+@cached_response
 def set_outtuples(profile, timewindow):
     """
     Set outtuples of a chosen profile and timewindow.
+    Accepts optional offset and limit args to get the tuples in pages,
+    and search, order_by and order_dir args to filter and order them
     :param profile: active profile
     :param timewindow: active timewindow
     :return: (tuple, key, ip_info)
     """
-
-    data = []
-    if outtuples := __database__.db.hget(
-        f"profile_{profile}_{timewindow}", "OutTuples"
-    ):
-        outtuples = json.loads(outtuples)
-
-        for key, value in outtuples.items():
-            ip, port, protocol = key.split("-")
-            ip_info = get_ip_info(ip)
-            outtuple_dict = dict({"tuple": key, "string": value[0]})
-            outtuple_dict.update(ip_info)
-            data.append(outtuple_dict)
-
-    return {"data": data}
+    return get_tuples(profile, timewindow, "OutTuples")
 
 
 @analysis.route("/timeline_flows/<profile>/<timewindow>")
@@ -279,8 +360,8 @@ def set_timeline(
     """
     data = []
 
-    if timeline := __database__.db.zrange(
-        f"profile_{profile}_{timewindow}_timeline", 0, -1
+    if timeline := __database__.get_tw_timeline(
+        f"profile_{profile}_{timewindow}"
     ):
         for flow in timeline:
             flow = json.loads(flow)
@@ -322,8 +403,8 @@ def set_alerts(profile, timewindow):
         alerts_tw = alerts.get(timewindow, {})
         tws = get_all_tw_with_ts(profile)
 
-        evidence: Dict[str, str] = __database__.db.hgetall(
-            f"{profile}_{timewindow}_evidence"
+        evidence: Dict[str, str] = __database__.get_tw_evidence(
+            f"{profile}_{timewindow}"
         )
 
         for alert_id, evidence_id_list in alerts_tw.items():
@@ -363,8 +444,8 @@ def set_evidence(profile, timewindow, alert_id):
         evidence_ids: List[str] = alerts_tw[alert_id]
 
         profileid = f"profile_{profile}"
-        evidence: Dict[str, str] = __database__.db.hgetall(
-            f"{profileid}_{timewindow}_evidence"
+        evidence: Dict[str, str] = __database__.get_tw_evidence(
+            f"{profileid}_{timewindow}"
         )
 
         for evidence_id in evidence_ids:
@@ -384,8 +465,8 @@ def set_evidence_general(profile: str, timewindow: str):
     data = []
     profile = f"profile_{profile}"
 
-    evidence: Dict[str, str] = __database__.db.hgetall(
-        f"{profile}_{timewindow}_evidence"
+    evidence: Dict[str, str] = __database__.get_tw_evidence(
+        f"{profile}_{timewindow}"
     )
     if evidence:
         for evidence_details in evidence.values():
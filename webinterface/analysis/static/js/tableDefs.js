@@ -2,6 +2,20 @@ const custom_dom = "<'row'<'col-lg-8 col-md-8 col-xs-12'B><'col-lg-4 col-md-4 co
            "<'row'<'col-sm-12'tr>>" +
            "<'row'<'col-sm-12 col-md-5'i><'col-sm-12 col-md-7'p>>"
 
+// the params of the tables paged by the server, only the displayed page
+// of the table is read from the db and sent to the browser
+function serverSideParams(d) {
+    let order = d.order.length ? d.order[0] : null
+    return {
+        draw: d.draw,
+        offset: d.start,
+        limit: d.length,
+        search: d.search.value,
+        order_by: order ? d.columns[order.column].data : "",
+        order_dir: order ? order.dir : ""
+    }
+}
+
 let analysisSubTableDefs = {
     "tw":{
         "bDestroy": true,
@@ -76,6 +90,16 @@ let analysisTableDefs = {
         buttons: ['colvis'],
         scrollX: true,
         searching: true,
+        serverSide: true,
+        // the url is set once a timewindow is selected
+        deferLoading: 0,
+        ajax: { data: serverSideParams },
+        searchDelay: 500,
+        order: [],
+        // the server can only order by the tuple and its string
+        columnDefs: [
+            { orderable: false, targets: [2, 3, 4, 5, 6, 7, 8, 9] }
+        ],
         columns: [
             { data: 'tuple' },
             { data: 'string' },
@@ -96,6 +120,16 @@ let analysisTableDefs = {
         buttons: ['colvis'],
         searching: true,
         scrollX: true,
+        serverSide: true,
+        // the url is set once a timewindow is selected
+        deferLoading: 0,
+        ajax: { data: serverSideParams },
+        searchDelay: 500,
+        order: [],
+        // the server can only order by the tuple and its string
+        columnDefs: [
+            { orderable: false, targets: [2, 3, 4, 5, 6, 7, 8, 9] }
+        ],
         columns: [
             { data: 'tuple' },
             { data: 'string' },
@@ -1,5 +1,12 @@
+import os
+import sqlite3
+from typing import Dict, List
+
 import redis
+from slips_files.core.database.redis_db.constants import Constants
+from slips_files.core.database.sqlite_db.database import SQLiteDB
 from .signals import message_sent
+from .pagination import response_cache
 from webinterface.utils import *
 
 
@@ -37,6 +44,54 @@ class Database(object):
             health_check_interval=30,
         )
 
+    def get_archived_tw(self, profileid_tw: str) -> dict:
+        """
+        returns the data of the given timewindow from the sqlite db in the
+        output dir of the analysis if it was archived, or {} if its data
+        is still in redis
+        """
+        if not self.db.sismember(Constants.ARCHIVED_TWS, profileid_tw):
+            return {}
+
+        output_dir = self.db.hget("analysis", "output_dir")
+        if not output_dir:
+            return {}
+
+        db_path = os.path.join(output_dir, "flows.sqlite")
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        except sqlite3.Error:
+            return {}
+
+        try:
+            row = conn.execute(
+                "SELECT data FROM archived_timewindows "
+                "WHERE profileid_twid = ?",
+                (profileid_tw,),
+            ).fetchone()
+        except sqlite3.Error:
+            return {}
+        finally:
+            conn.close()
+        return SQLiteDB.decompress_timewindow(row[0]) if row else {}
+
+    def get_tw_field(self, profileid_tw: str, field: str):
+        """returns the given field of the hash of the given timewindow"""
+        if value := self.db.hget(profileid_tw, field):
+            return value
+        return self.get_archived_tw(profileid_tw).get("tw", {}).get(field)
+
+    def get_tw_evidence(self, profileid_tw: str) -> Dict[str, str]:
+        if evidence := self.db.hgetall(f"{profileid_tw}_evidence"):
+            return evidence
+        return self.get_archived_tw(profileid_tw).get("evidence", {})
+
+    def get_tw_timeline(self, profileid_tw: str) -> List[str]:
+        if timeline := self.db.zrange(f"{profileid_tw}_timeline", 0, -1):
+            return timeline
+        archived = self.get_archived_tw(profileid_tw)
+        return [line for line, _ in archived.get("timeline", [])]
+
 
 __database__ = Database()
 
@@ -44,3 +99,5 @@ __database__ = Database()
 @message_sent.connect
 def update_db(app, port, dbnumber):
     __database__.set_db(port, dbnumber)
+    # the cached responses belong to the previous db
+    response_cache.clear()
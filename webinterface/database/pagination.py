@@ -0,0 +1,221 @@
+"""
+Paged and pipelined access to the analysis db for the web interface routes.
+Every route reads only the page it was asked for, and the responses are
+cached for a few seconds so refreshing the UI doesn't query redis again.
+"""
+
+import time
+from functools import wraps
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from flask import request
+import redis
+
+# the max number of items SSCAN checks per call
+SCAN_COUNT = 1000
+
+
+class ResponseCache:
+    """
+    Short-lived cache of the route responses,
+    keyed by (route, profile, tw, page)
+    """
+
+    def __init__(self, ttl: float = 5, max_size: int = 1000):
+        # in seconds
+        self.ttl = ttl
+        self.max_size = max_size
+        # {key: (time_cached, response)}
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        # flask may serve requests from multiple threads
+        self._lock = Lock()
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            cached = self._cache.get(key)
+            if not cached:
+                return None
+
+            time_cached, response = cached
+            if time.time() - time_cached > self.ttl:
+                del self._cache[key]
+                return None
+            return response
+
+    def set(self, key: Tuple, response: Any):
+        with self._lock:
+            if len(self._cache) >= self.max_size:
+                self._cache.clear()
+            self._cache[key] = (time.time(), response)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+response_cache = ResponseCache()
+
+
+def get_page_args() -> Tuple[int, Optional[int], Optional[str]]:
+    """
+    reads the paging parameters of the current request
+    :return: (offset, limit, cursor). limit is None if the whole data
+    was requested. cursor is None if not given
+    """
+    try:
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        offset = 0
+
+    try:
+        limit = int(request.args["limit"])
+        limit = limit if limit > 0 else None
+    except (KeyError, ValueError):
+        limit = None
+
+    cursor = request.args.get("cursor")
+    return offset, limit, cursor
+
+
+def get_search_args() -> Tuple[str, Optional[str], bool]:
+    """
+    reads the search and ordering parameters sent by the server-side
+    DataTables of the current request
+    :return: (search, order_by, descending). search is "" and order_by
+    is None if not given
+    """
+    search = request.args.get("search", "").strip().lower()
+    order_by = request.args.get("order_by") or None
+    descending = request.args.get("order_dir") == "desc"
+    return search, order_by, descending
+
+
+def cached_response(route: Callable) -> Callable:
+    """
+    decorator for the routes that caches their responses in
+    response_cache for a few seconds.
+    the draw counter sent by DataTables changes with every request, so
+    it's not part of the key and is added to the cached response
+    """
+
+    @wraps(route)
+    def wrapper(*args, **kwargs):
+        key = (
+            route.__name__,
+            args,
+            tuple(sorted(kwargs.items())),
+            tuple(
+                sorted(
+                    (arg, value)
+                    for arg, value in request.args.items()
+                    if arg != "draw"
+                )
+            ),
+        )
+        if (response := response_cache.get(key)) is None:
+            response = route(*args, **kwargs)
+            response_cache.set(key, response)
+
+        if "draw" in request.args:
+            try:
+                response = {**response, "draw": int(request.args["draw"])}
+            except ValueError:
+                pass
+        return response
+
+    return wrapper
+
+
+def paginate(items: List[Any], offset: int, limit: Optional[int]) -> List[Any]:
+    """returns the page of the given items"""
+    if limit is None:
+        return items[offset:]
+    return items[offset : offset + limit]
+
+
+def scan_set(
+    db: redis.StrictRedis,
+    key: str,
+    limit: Optional[int],
+    cursor: Optional[str] = None,
+) -> Tuple[List[str], int]:
+    """
+    returns at least limit members of the given set using SSCAN starting
+    from the given cursor, instead of reading the whole set with SMEMBERS.
+    if limit is None, all the members are returned using 1 SMEMBERS.
+    :return: (members, next cursor). the next cursor is 0 when there are
+    no more members
+    """
+    if limit is None:
+        return list(db.smembers(key)), 0
+
+    try:
+        cursor = int(cursor) if cursor else 0
+    except ValueError:
+        cursor = 0
+
+    members = []
+    while True:
+        cursor, page = db.sscan(key, cursor=cursor, count=SCAN_COUNT)
+        members.extend(page)
+        if cursor == 0 or len(members) >= limit:
+            return members, cursor
+
+
+def zrange_page(
+    db: redis.StrictRedis,
+    key: str,
+    offset: int,
+    limit: Optional[int],
+    withscores: bool = False,
+) -> List:
+    """returns the given page of the sorted set using ZRANGE"""
+    end = -1 if limit is None else offset + limit - 1
+    return db.zrange(key, offset, end, withscores=withscores)
+
+
+def hget_many(
+    db: redis.StrictRedis, keys: Iterable[str], field: str
+) -> List[Optional[str]]:
+    """
+    gets the given field from each of the given hashes in 1 round trip
+    """
+    pipe = db.pipeline(transaction=False)
+    for key in keys:
+        pipe.hget(key, field)
+    return pipe.execute()
+
+
+def sismember_many(
+    db: redis.StrictRedis, key: str, members: Iterable[str]
+) -> List[bool]:
+    """
+    checks if each of the given members is in the given set in 1
+    round trip
+    """
+    pipe = db.pipeline(transaction=False)
+    for member in members:
+        pipe.sismember(key, member)
+    return [bool(res) for res in pipe.execute()]
+
+
+def hmget_dict(
+    db: redis.StrictRedis, key: str, fields: Iterable[str]
+) -> Dict[str, Optional[str]]:
+    """
+    gets the given fields of the given hash in 1 round trip
+    :return: a dict with the fields as keys
+    """
+    fields = list(dict.fromkeys(fields))
+    if not fields:
+        return {}
+    return dict(zip(fields, db.hmget(key, fields)))